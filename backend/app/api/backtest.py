@@ -1,11 +1,18 @@
 """Backtest API endpoints"""
 
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from datetime import datetime
+import json
+import MetaTrader5 as mt5
 
-from app.services.backtester import backtester
+from app.core.config import settings
+from app.services import sweep
+from app.services.backtester import backtester, MODE_BARS, MODE_TICKS
+from app.services.jobs import job_manager, Job, JOB_COMPLETED
 
 router = APIRouter()
 
@@ -23,6 +30,216 @@ class BacktestRequest(BaseModel):
     start_date: datetime
     end_date: datetime
     initial_capital: float = 10000.0
+    timeframe: int = mt5.TIMEFRAME_H1
+    mode: str = "bars"  # bars, ticks
+
+
+class ParameterRange(BaseModel):
+    values: Optional[List[Any]] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    step: Optional[float] = None
+    integer: bool = False
+
+
+class SweepRequest(BaseModel):
+    strategy_id: str
+    symbol: str
+    start_date: datetime
+    end_date: datetime
+    initial_capital: float = 10000.0
+    timeframe: int = mt5.TIMEFRAME_H1
+    parameters: Dict[str, ParameterRange]
+    method: str = "grid"  # grid, random, lhs
+    samples: int = 100
+    metric: str = "sharpe_ratio"
+    top_n: int = 20
+    seed: Optional[int] = None
+
+
+class WalkForwardRequest(BaseModel):
+    strategy_id: str
+    symbol: str
+    start_date: datetime
+    end_date: datetime
+    initial_capital: float = 10000.0
+    timeframe: int = mt5.TIMEFRAME_H1
+    parameters: Dict[str, ParameterRange]
+    train_days: float
+    test_days: float
+    step_days: Optional[float] = None  # defaults to test_days
+    anchored: bool = False
+    method: str = "grid"  # grid, random, lhs
+    samples: int = 100
+    metric: str = "sharpe_ratio"
+    seed: Optional[int] = None
+
+
+class MonteCarloRequest(BaseModel):
+    strategy_id: str
+    symbol: str
+    start_date: datetime
+    end_date: datetime
+    initial_capital: float = 10000.0
+    timeframe: int = mt5.TIMEFRAME_H1
+    mode: str = "bars"  # bars, ticks
+    simulations: int = 1000
+    methods: List[str] = ["shuffle", "bootstrap"]
+    confidence: List[float] = [0.05, 0.5, 0.95]
+    seed: Optional[int] = None
+
+
+def _validate_ranges(request: Union[SweepRequest, WalkForwardRequest]) -> None:
+    for name, spec in request.parameters.items():
+        if spec.values is None and (spec.min is None or spec.max is None):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Parameter {name} needs either values or min/max"
+            )
+    
+    # Sized from the ranges, so oversized grids are rejected before they are built
+    try:
+        combinations = sweep.count_parameters(
+            {name: spec.model_dump() for name, spec in request.parameters.items()},
+            request.method,
+            request.samples
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if combinations > settings.SWEEP_MAX_COMBINATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Sweep of {combinations} combinations exceeds limit of {settings.SWEEP_MAX_COMBINATIONS}"
+        )
+
+
+def _validate_mode(request: Union[BacktestRequest, MonteCarloRequest]) -> None:
+    if request.mode not in (MODE_BARS, MODE_TICKS):
+        raise HTTPException(status_code=400, detail=f"Unknown backtest mode: {request.mode}")
+
+
+def _start_sweep(request: SweepRequest):
+    return backtester.run_sweep(
+        request.strategy_id,
+        request.symbol,
+        request.start_date,
+        request.end_date,
+        {name: spec.model_dump() for name, spec in request.parameters.items()},
+        request.method,
+        request.samples,
+        request.metric,
+        request.top_n,
+        request.initial_capital,
+        request.timeframe,
+        request.seed
+    )
+
+
+def _backtest_job(request: BacktestRequest):
+    """Build the worker function for a single backtest job"""
+    def run(job: Job) -> Dict[str, Any]:
+        results = backtester.run_backtest(
+            request.strategy_id,
+            request.symbol,
+            request.start_date,
+            request.end_date,
+            request.initial_capital,
+            request.timeframe,
+            progress=job.report_progress,
+            mode=request.mode
+        )
+        if results is None:
+            raise RuntimeError("Backtest failed")
+        return results
+    
+    return run
+
+
+def _sweep_job(request: SweepRequest):
+    """Build the worker function for a sweep job; the best run is persisted"""
+    def run(job: Job) -> Dict[str, Any]:
+        events = _start_sweep(request)
+        if events is None:
+            raise RuntimeError("Sweep failed to start")
+        
+        ranking: List[Dict[str, Any]] = []
+        try:
+            for event in events:
+                if event["type"] == "result":
+                    job.report_progress(event["completed"] / event["total"])
+                elif event["type"] == "ranking":
+                    ranking = event["results"]
+        finally:
+            events.close()
+        
+        best = next((result for result in ranking if "error" not in result), None)
+        if best is None:
+            raise RuntimeError("No parameter set completed")
+        
+        return {
+            "strategy_id": request.strategy_id,
+            "symbol": request.symbol,
+            "timeframe": request.timeframe,
+            "start_date": request.start_date.isoformat(),
+            "end_date": request.end_date.isoformat(),
+            **best,
+            "metric": request.metric,
+            "ranking": ranking
+        }
+    
+    return run
+
+
+def _walk_forward_job(request: WalkForwardRequest):
+    """Build the worker function for a walk-forward job"""
+    def run(job: Job) -> Dict[str, Any]:
+        results = backtester.run_walk_forward(
+            request.strategy_id,
+            request.symbol,
+            request.start_date,
+            request.end_date,
+            {name: spec.model_dump() for name, spec in request.parameters.items()},
+            request.train_days,
+            request.test_days,
+            request.step_days,
+            request.anchored,
+            request.method,
+            request.samples,
+            request.metric,
+            request.initial_capital,
+            request.timeframe,
+            request.seed,
+            progress=job.report_progress
+        )
+        if results is None:
+            raise RuntimeError("Walk-forward analysis failed")
+        return results
+    
+    return run
+
+
+def _monte_carlo_job(request: MonteCarloRequest):
+    """Build the worker function for a Monte Carlo job"""
+    def run(job: Job) -> Dict[str, Any]:
+        results = backtester.run_monte_carlo(
+            request.strategy_id,
+            request.symbol,
+            request.start_date,
+            request.end_date,
+            request.simulations,
+            request.methods,
+            request.confidence,
+            request.initial_capital,
+            request.timeframe,
+            request.mode,
+            request.seed,
+            progress=job.report_progress
+        )
+        if results is None:
+            raise RuntimeError("Monte Carlo analysis failed")
+        return results
+    
+    return run
 
 
 @router.post("/strategy")
@@ -46,19 +263,136 @@ async def add_strategy(strategy: StrategyConfig):
 
 @router.post("/run")
 async def run_backtest(request: BacktestRequest):
-    """Run backtest for a strategy"""
-    results = backtester.run_backtest(
-        request.strategy_id,
-        request.symbol,
-        request.start_date,
-        request.end_date,
-        request.initial_capital
+    """Run backtest for a strategy and wait for the result"""
+    _validate_mode(request)
+    
+    job = job_manager.submit(
+        "backtest",
+        _backtest_job(request),
+        description=request.model_dump(mode="json")
     )
+    await job_manager.wait(job)
     
-    if results is None:
-        raise HTTPException(status_code=500, detail="Backtest failed")
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=500, detail=job.error or "Backtest failed")
     
-    return results
+    return job.result
+
+
+@router.post("/sweep")
+async def run_sweep(request: SweepRequest):
+    """
+    Run a parameter sweep and stream results as NDJSON
+    
+    Emits a "start" event, one "result" event per parameter set as it
+    completes, and a final "ranking" event ordered by the chosen metric.
+    """
+    _validate_ranges(request)
+    
+    events = await run_in_threadpool(_start_sweep, request)
+    if events is None:
+        raise HTTPException(status_code=500, detail="Sweep failed to start")
+    
+    return StreamingResponse(
+        (json.dumps(event) + "\n" for event in events),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.post("/jobs")
+async def submit_backtest_job(request: BacktestRequest):
+    """Queue a backtest job"""
+    _validate_mode(request)
+    
+    job = job_manager.submit(
+        "backtest",
+        _backtest_job(request),
+        description=request.model_dump(mode="json")
+    )
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.post("/jobs/sweep")
+async def submit_sweep_job(request: SweepRequest):
+    """Queue a parameter sweep job"""
+    _validate_ranges(request)
+    
+    job = job_manager.submit(
+        "sweep",
+        _sweep_job(request),
+        description=request.model_dump(mode="json")
+    )
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.post("/jobs/walk-forward")
+async def submit_walk_forward_job(request: WalkForwardRequest):
+    """
+    Queue a walk-forward optimization job
+    
+    Parameters are swept on rolling train windows and the best set of each
+    window is scored on the test window that follows it.
+    """
+    _validate_ranges(request)
+    lengths = [request.train_days, request.test_days, request.step_days or request.test_days]
+    if min(lengths) <= 0:
+        raise HTTPException(status_code=400, detail="Window lengths must be positive")
+    
+    job = job_manager.submit(
+        "walk_forward",
+        _walk_forward_job(request),
+        description=request.model_dump(mode="json")
+    )
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.post("/jobs/monte-carlo")
+async def submit_monte_carlo_job(request: MonteCarloRequest):
+    """
+    Queue a Monte Carlo job
+    
+    The strategy is backtested once and its trades are shuffled and
+    bootstrapped to estimate return and drawdown confidence intervals.
+    """
+    _validate_mode(request)
+    if request.simulations < 1:
+        raise HTTPException(status_code=400, detail="simulations must be at least 1")
+    
+    job = job_manager.submit(
+        "monte_carlo",
+        _monte_carlo_job(request),
+        description=request.model_dump(mode="json")
+    )
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.get("/jobs")
+async def list_jobs():
+    """List backtest jobs, newest first"""
+    jobs = [job.to_dict() for job in job_manager.list_jobs()]
+    return {"jobs": jobs, "count": len(jobs)}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, include_result: bool = False):
+    """Get job status, progress and optionally its result"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict(include_result=include_result)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} already {job.status}")
+    
+    return {"status": "success", "message": f"Job {job_id} cancellation requested"}
 
 
 @router.get("/results/{strategy_id}")
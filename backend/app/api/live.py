@@ -0,0 +1,65 @@
+"""Live strategy API endpoints"""
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Dict, Any, List, Optional
+import MetaTrader5 as mt5
+
+from app.services.backtester import backtester
+from app.services.strategy_runtime import strategy_runtime
+
+router = APIRouter()
+
+
+class LiveStartRequest(BaseModel):
+    symbols: List[str]
+    timeframe: int = mt5.TIMEFRAME_H1
+    bars: Optional[str] = None  # bars built from ticks, e.g. "time:5", "tick:100", "renko:0.001"
+    parameters: Dict[str, Any] = {}  # overrides of the registered parameters
+
+
+@router.get("/strategies")
+async def list_live_strategies():
+    """List running strategies with their metrics"""
+    strategies = strategy_runtime.list()
+    return {"strategies": strategies, "count": len(strategies)}
+
+
+@router.post("/strategies/{strategy_id}/start")
+async def start_live_strategy(strategy_id: str, request: LiveStartRequest):
+    """Start a registered strategy against the live feed"""
+    config = backtester.strategies.get(strategy_id)
+    if config is None:
+        raise HTTPException(status_code=404, detail=f"Strategy {strategy_id} not found")
+    
+    parameters = {**config.get("parameters", {}), **request.parameters}
+    try:
+        return await strategy_runtime.start_strategy(
+            strategy_id,
+            parameters,
+            request.symbols,
+            request.timeframe,
+            request.bars
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/strategies/{strategy_id}/stop")
+async def stop_live_strategy(strategy_id: str):
+    """Stop a running strategy"""
+    info = await strategy_runtime.stop_strategy(strategy_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Strategy {strategy_id} is not running")
+    
+    return info
+
+
+@router.get("/strategies/{strategy_id}")
+async def get_live_strategy(strategy_id: str):
+    """Get state, counters and latency histograms of a running strategy"""
+    runner = strategy_runtime.runners.get(strategy_id)
+    if runner is None:
+        raise HTTPException(status_code=404, detail=f"Strategy {strategy_id} is not running")
+    
+    return runner.info()
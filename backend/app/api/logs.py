@@ -1,29 +1,88 @@
 """Logs API endpoints"""
 
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from typing import Optional
+from sqlalchemy import select, desc, tuple_
+from typing import Optional, List, Tuple
 from datetime import datetime, timedelta
 
+from app.core.config import settings
 from app.db.database import get_db
-from app.models.models import TradeLog, AccountHistory, SystemLog
+from app.services import export
+from app.services.log_handler import db_logging
+from app.models.models import TradeLog, AccountHistory, AccountHistoryAggregate, SystemLog
+from app.services.account_sampler import (
+    account_sampler,
+    select_tier,
+    TIER_RAW,
+    TIER_MINUTE,
+    TIER_HOUR
+)
 
 router = APIRouter()
 
 
+def _parse_cursor(before: str) -> Tuple[datetime, int]:
+    """Parse a "<timestamp>,<id>" pagination cursor"""
+    try:
+        timestamp, row_id = before.rsplit(",", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor {before}")
+
+
+def _paginate(
+    query,
+    model,
+    limit: int,
+    before: Optional[str],
+    from_date: Optional[datetime],
+    to_date: Optional[datetime]
+):
+    """
+    Apply time-range filters and keyset pagination, newest first
+    
+    Rows are ordered by (timestamp, id) descending and the cursor is the
+    (timestamp, id) of the last row of the previous page, so every page is
+    an index range scan regardless of how deep it is.
+    """
+    if from_date:
+        query = query.where(model.timestamp >= from_date)
+    if to_date:
+        query = query.where(model.timestamp < to_date)
+    if before:
+        query = query.where(tuple_(model.timestamp, model.id) < tuple_(*_parse_cursor(before)))
+    return query.order_by(desc(model.timestamp), desc(model.id)).limit(limit)
+
+
+def _next_cursor(rows: List, limit: int) -> Optional[str]:
+    """Cursor of the page after ``rows``, or None on the last page"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return f"{last.timestamp.isoformat()},{last.id}"
+
+
 @router.get("/trades")
 async def get_trade_logs(
     limit: int = 100,
     symbol: Optional[str] = None,
+    before: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get trade logs"""
+    """
+    Get trade logs, newest first
+    
+    Pass the returned ``next_cursor`` as ``before`` to get the next page.
+    """
     try:
-        query = select(TradeLog).order_by(desc(TradeLog.timestamp)).limit(limit)
-        
+        query = select(TradeLog)
         if symbol:
             query = query.where(TradeLog.symbol == symbol)
+        query = _paginate(query, TradeLog, limit, before, from_date, to_date)
         
         result = await db.execute(query)
         logs = result.scalars().all()
@@ -45,8 +104,11 @@ async def get_trade_logs(
                 }
                 for log in logs
             ],
-            "count": len(logs)
+            "count": len(logs),
+            "next_cursor": _next_cursor(logs, limit)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get trade logs: {e}")
 
@@ -55,24 +117,46 @@ async def get_trade_logs(
 async def get_account_history(
     limit: int = 100,
     days: int = 7,
+    resolution: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get account history"""
+    """
+    Get account history
+    
+    Ranges are served from raw samples or from 1-minute/1-hour aggregates;
+    by default the finest tier that covers the range is used. Aggregate rows
+    report equity as the bucket's close plus equity_open/high/low.
+    """
     try:
-        from_date = datetime.utcnow() - timedelta(days=days)
+        to_date = datetime.utcnow()
+        from_date = to_date - timedelta(days=days)
+        tier = resolution or select_tier(from_date, to_date)
+        if tier not in (TIER_RAW, TIER_MINUTE, TIER_HOUR):
+            raise HTTPException(status_code=400, detail=f"Unknown resolution {tier}")
         
-        query = (
-            select(AccountHistory)
-            .where(AccountHistory.timestamp >= from_date)
-            .order_by(desc(AccountHistory.timestamp))
-            .limit(limit)
-        )
+        if tier == TIER_RAW:
+            query = (
+                select(AccountHistory)
+                .where(AccountHistory.timestamp >= from_date)
+                .order_by(desc(AccountHistory.timestamp))
+                .limit(limit)
+            )
+        else:
+            query = (
+                select(AccountHistoryAggregate)
+                .where(
+                    AccountHistoryAggregate.resolution == tier,
+                    AccountHistoryAggregate.timestamp >= from_date
+                )
+                .order_by(desc(AccountHistoryAggregate.timestamp))
+                .limit(limit)
+            )
         
         result = await db.execute(query)
         history = result.scalars().all()
         
-        return {
-            "history": [
+        if tier == TIER_RAW:
+            rows = [
                 {
                     "id": h.id,
                     "timestamp": h.timestamp.isoformat(),
@@ -84,9 +168,37 @@ async def get_account_history(
                     "profit": h.profit
                 }
                 for h in history
-            ],
-            "count": len(history)
+            ]
+        else:
+            # The newest bucket is still open and only exists in memory
+            current = account_sampler.open_bucket(tier)
+            if current is not None and limit > 0:
+                history = [AccountHistoryAggregate(**current), *history[:limit - 1]]
+            rows = [
+                {
+                    "id": h.id,
+                    "timestamp": h.timestamp.isoformat(),
+                    "balance": h.balance,
+                    "equity": h.equity_close,
+                    "equity_open": h.equity_open,
+                    "equity_high": h.equity_high,
+                    "equity_low": h.equity_low,
+                    "margin": h.margin,
+                    "free_margin": h.free_margin,
+                    "margin_level": h.margin_level,
+                    "profit": h.profit,
+                    "samples": h.samples
+                }
+                for h in history
+            ]
+        
+        return {
+            "history": rows,
+            "count": len(rows),
+            "resolution": tier
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get account history: {e}")
 
@@ -95,14 +207,29 @@ async def get_account_history(
 async def get_system_logs(
     limit: int = 100,
     level: Optional[str] = None,
+    source: Optional[str] = None,
+    search: Optional[str] = None,
+    before: Optional[str] = None,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get system logs"""
+    """
+    Get system logs, newest first
+    
+    ``source`` matches logger names by prefix (e.g. app.services.mt5_connector)
+    and ``search`` matches a substring of the message. Pass the returned
+    ``next_cursor`` as ``before`` to get the next page.
+    """
     try:
-        query = select(SystemLog).order_by(desc(SystemLog.timestamp)).limit(limit)
-        
+        query = select(SystemLog)
         if level:
             query = query.where(SystemLog.level == level)
+        if source:
+            query = query.where(SystemLog.source.startswith(source, autoescape=True))
+        if search:
+            query = query.where(SystemLog.message.contains(search, autoescape=True))
+        query = _paginate(query, SystemLog, limit, before, from_date, to_date)
         
         result = await db.execute(query)
         logs = result.scalars().all()
@@ -119,7 +246,79 @@ async def get_system_logs(
                 }
                 for log in logs
             ],
-            "count": len(logs)
+            "count": len(logs),
+            "next_cursor": _next_cursor(logs, limit)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get system logs: {e}")
+
+
+@router.get("/system/stats")
+async def get_system_log_stats():
+    """Counters of log records written, collapsed as duplicates, sampled out or dropped"""
+    return db_logging.stats()
+
+
+@router.get("/export/{table}")
+async def export_logs(
+    table: str,
+    format: str = export.FORMAT_NDJSON,
+    symbol: Optional[str] = None,
+    level: Optional[str] = None,
+    resolution: str = TIER_RAW,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None
+):
+    """
+    Stream a full log table as NDJSON, CSV or Parquet, oldest first
+    
+    ``table`` is one of trades, account or system. Rows are read through a
+    server-side cursor and written out batch by batch.
+    """
+    try:
+        export.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if table == "trades":
+        model = TradeLog
+        query = select(TradeLog)
+        if symbol:
+            query = query.where(TradeLog.symbol == symbol)
+    elif table == "system":
+        model = SystemLog
+        query = select(SystemLog)
+        if level:
+            query = query.where(SystemLog.level == level)
+    elif table == "account" and resolution == TIER_RAW:
+        model = AccountHistory
+        query = select(AccountHistory)
+    elif table == "account" and resolution in (TIER_MINUTE, TIER_HOUR):
+        model = AccountHistoryAggregate
+        query = select(AccountHistoryAggregate).where(AccountHistoryAggregate.resolution == resolution)
+    elif table == "account":
+        raise HTTPException(status_code=400, detail=f"Unknown resolution {resolution}")
+    else:
+        raise HTTPException(status_code=404, detail=f"Unknown log table {table}")
+    
+    if from_date:
+        query = query.where(model.timestamp >= from_date)
+    if to_date:
+        query = query.where(model.timestamp < to_date)
+    query = query.order_by(model.timestamp, model.id)
+    
+    schema = export.model_schema(model) if format == export.FORMAT_PARQUET else None
+    body = export.stream_export(
+        export.query_batches(query, model, settings.EXPORT_BATCH_SIZE),
+        format,
+        export.model_columns(model),
+        schema
+    )
+    filename = export.export_filename(table, format)
+    return StreamingResponse(
+        body,
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
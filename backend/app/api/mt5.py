@@ -1,12 +1,18 @@
 """MT5 API endpoints"""
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import MetaTrader5 as mt5
 
 from app.services.mt5_connector import mt5_connector
+from app.services.market_data import market_data_store
+from app.services.market_feed import market_feed
+from app.services.bar_builder import bar_aggregator, create_builder
+from app.services.tick_buffer import tick_buffers
+from app.services import encoding
 from app.core.config import settings
 
 router = APIRouter()
@@ -34,10 +40,37 @@ class TicksRequest(BaseModel):
     count: int = 100
 
 
+class BarsRequest(BaseModel):
+    symbol: str
+    bars: str = "time:5"  # time:<seconds>, tick:<n>, volume:<v>, range:<price>, renko:<price>
+    count: int = 100
+
+
+def _encoded_response(
+    columns,
+    field: str,
+    symbol: str,
+    format: Optional[str],
+    accept: Optional[str]
+) -> Response:
+    """Encode columns in the requested format, bypassing per-row serialization"""
+    try:
+        fmt = encoding.negotiate_format(format, accept)
+        body, media_type = encoding.encode(
+            columns,
+            fmt,
+            field,
+            {"symbol": symbol, "count": len(columns["time"])}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=body, media_type=media_type)
+
+
 @router.post("/initialize")
 async def initialize_mt5():
     """Initialize MT5 connection"""
-    success = mt5_connector.initialize()
+    success = await mt5_connector.aio.initialize()
     if not success:
         raise HTTPException(status_code=500, detail="Failed to initialize MT5")
     return {"status": "success", "message": "MT5 initialized"}
@@ -50,7 +83,7 @@ async def login_mt5(request: LoginRequest):
     password = request.password or settings.MT5_PASSWORD
     server = request.server or settings.MT5_SERVER
     
-    success = mt5_connector.login(login, password, server)
+    success = await mt5_connector.aio.login(login, password, server)
     if not success:
         raise HTTPException(status_code=401, detail="Failed to login to MT5")
     
@@ -60,14 +93,14 @@ async def login_mt5(request: LoginRequest):
 @router.post("/shutdown")
 async def shutdown_mt5():
     """Shutdown MT5 connection"""
-    mt5_connector.shutdown()
+    await mt5_connector.aio.shutdown()
     return {"status": "success", "message": "MT5 connection closed"}
 
 
 @router.get("/account")
 async def get_account_info():
     """Get account information"""
-    account_info = mt5_connector.account_info()
+    account_info = await mt5_connector.aio.account_info()
     if account_info is None:
         raise HTTPException(status_code=500, detail="Failed to get account info")
     return account_info
@@ -76,7 +109,7 @@ async def get_account_info():
 @router.post("/symbol")
 async def get_symbol_info(request: SymbolRequest):
     """Get symbol information"""
-    symbol_info = mt5_connector.symbol_info(request.symbol)
+    symbol_info = await mt5_connector.aio.symbol_info(request.symbol)
     if symbol_info is None:
         raise HTTPException(
             status_code=404,
@@ -86,32 +119,115 @@ async def get_symbol_info(request: SymbolRequest):
 
 
 @router.post("/rates")
-async def get_rates(request: RatesRequest):
-    """Get historical rates"""
-    rates = mt5_connector.copy_rates(
+async def get_rates(
+    request: RatesRequest,
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Get historical rates from the local market data store
+    
+    The response format is chosen by the ``format`` query parameter
+    (records, columns, binary, arrow) or the Accept header.
+    """
+    rates = await run_in_threadpool(
+        market_data_store.rates_tail,
         request.symbol,
         request.timeframe,
-        request.start_pos,
-        request.count
+        request.count,
+        request.start_pos
     )
     if rates is None:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to get rates for {request.symbol}"
         )
-    return {"symbol": request.symbol, "rates": rates}
+    return _encoded_response(rates, "rates", request.symbol, format, accept)
 
 
 @router.post("/ticks")
-async def get_ticks(request: TicksRequest):
-    """Get tick data"""
-    ticks = mt5_connector.copy_ticks(request.symbol, request.count)
+async def get_ticks(
+    request: TicksRequest,
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Get the newest ticks
+    
+    Symbols polled by the live feed are served from their shared-memory
+    tick buffer when it holds ``count`` ticks; other requests read the local
+    market data store, which syncs with the terminal. The response format is
+    chosen by the ``format`` query parameter (records, columns, binary,
+    arrow) or the Accept header.
+    """
+    ticks = tick_buffers.tail(request.symbol, request.count)
+    if ticks is None:
+        ticks = await run_in_threadpool(market_data_store.ticks_tail, request.symbol, request.count)
+    if ticks is None:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get ticks for {request.symbol}"
+        )
+    return _encoded_response(ticks, "ticks", request.symbol, format, accept)
+
+
+def _build_bars(symbol: str, bars: str, count: int):
+    """Build a bar series from stored ticks"""
+    ticks = market_data_store.ticks_tail(symbol, settings.BAR_WARMUP_TICKS)
     if ticks is None:
+        return None
+    builder = create_builder(bars, max(count, 1))
+    builder.replay(ticks)
+    return builder.history.to_array()
+
+
+@router.post("/bars")
+async def get_bars(
+    request: BarsRequest,
+    format: Optional[str] = None,
+    accept: Optional[str] = Header(None)
+):
+    """
+    Get bars built from ticks (seconds, tick-count, volume, range or Renko bars)
+    
+    Series that are being built live are served from memory; other series
+    are built from the newest BAR_WARMUP_TICKS stored ticks. The response
+    format is chosen like for rates.
+    """
+    try:
+        bars = bar_aggregator.history(request.symbol, request.bars, request.count)
+        if bars is None:
+            bars = await run_in_threadpool(_build_bars, request.symbol, request.bars, request.count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if bars is None:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to get ticks for {request.symbol}"
         )
-    return {"symbol": request.symbol, "ticks": ticks}
+    columns = {name: bars[name] for name in bars.dtype.names}
+    return _encoded_response(columns, "bars", request.symbol, format, accept)
+
+
+@router.get("/bars/series")
+async def get_bar_series():
+    """List bar series built live, with their forming bar and the feed's dropped ticks"""
+    return {"series": bar_aggregator.series(), "stats": bar_aggregator.stats, "feed": market_feed.stats}
+
+
+@router.get("/ticks/buffers")
+async def get_tick_buffers():
+    """List the shared-memory tick buffers with their size and hit/miss counts"""
+    return {"buffers": tick_buffers.info(), "stats": tick_buffers.stats}
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Get hit, coalesced and miss counts of the MT5 query cache"""
+    return {
+        "methods": mt5_connector.cache.stats(),
+        "pending_calls": mt5_connector.executor.pending
+    }
 
 
 @router.get("/status")
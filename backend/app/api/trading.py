@@ -1,15 +1,26 @@
 """Trading API endpoints"""
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 import MetaTrader5 as mt5
 
+from app.core.config import settings
+from app.services import export, orders
 from app.services.mt5_connector import mt5_connector
+from app.services.deal_history import deal_history, epoch, DEAL_COLUMNS
+from app.services.position_book import position_book
+from app.db.database import async_session_maker
+from app.models.models import Deal
 
 router = APIRouter()
 
+# Deal types that are trades (as opposed to balance, credit, ... operations)
+TRADE_DEAL_TYPES = (mt5.DEAL_TYPE_BUY, mt5.DEAL_TYPE_SELL)
+
 
 class OrderRequest(BaseModel):
     action: int  # mt5.TRADE_ACTION_*
@@ -24,6 +35,11 @@ class OrderRequest(BaseModel):
     comment: str = ""
 
 
+class BasketRequest(BaseModel):
+    orders: List[OrderRequest]
+    atomic: bool = True  # send nothing if any order fails validation
+
+
 class PositionRequest(BaseModel):
     symbol: Optional[str] = None
 
@@ -32,11 +48,13 @@ class HistoryRequest(BaseModel):
     from_date: Optional[datetime] = None
     to_date: Optional[datetime] = None
     days: int = 7
+    symbol: Optional[str] = None
+    magic: Optional[int] = None
+    position_id: Optional[int] = None
 
 
-@router.post("/order")
-async def send_order(order: OrderRequest):
-    """Send trading order"""
+def _order_request(order: OrderRequest) -> Dict[str, Any]:
+    """Build an mt5.order_send request from an OrderRequest"""
     request = {
         "action": order.action,
         "symbol": order.symbol,
@@ -54,32 +72,133 @@ async def send_order(order: OrderRequest):
     if order.tp is not None:
         request["tp"] = order.tp
     
-    result = mt5_connector.order_send(request)
+    return request
+
+
+@router.post("/order")
+async def send_order(order: OrderRequest):
+    """Validate and send trading order"""
+    try:
+        result = await orders.send_order(_order_request(order))
+    except orders.OrderValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors)
     if result is None:
         raise HTTPException(status_code=500, detail="Failed to send order")
     
     return result
 
 
+@router.post("/order/check")
+async def check_order(order: OrderRequest):
+    """Run the pre-trade checks of an order without sending it"""
+    errors = await orders.order_service.validate(_order_request(order))
+    return {"valid": not errors, "errors": errors}
+
+
+@router.post("/orders")
+async def send_basket(basket: BasketRequest):
+    """
+    Validate and send several orders at once
+    
+    Valid orders are queued on the terminal back to back; each outcome
+    reports its status, result, errors and per-stage latency.
+    """
+    if not basket.orders:
+        raise HTTPException(status_code=400, detail="No orders given")
+    if len(basket.orders) > settings.ORDER_BASKET_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.ORDER_BASKET_MAX_SIZE} orders per basket"
+        )
+    
+    outcomes = await orders.order_service.submit(
+        [_order_request(order) for order in basket.orders],
+        atomic=basket.atomic
+    )
+    executed = sum(1 for outcome in outcomes if outcome["status"] == orders.STATUS_EXECUTED)
+    return {"orders": outcomes, "count": len(outcomes), "executed": executed}
+
+
+@router.get("/latency")
+async def get_order_latency(buckets: bool = False):
+    """Order counters and latency histograms per pipeline stage"""
+    return orders.order_service.stats(buckets)
+
+
 @router.post("/positions")
 async def get_positions(request: PositionRequest):
-    """Get open positions"""
-    positions = mt5_connector.positions_get(request.symbol)
+    """
+    Get open positions
+    
+    Served from the position book, which is marked to market on every
+    tick; the terminal is only asked until the book has loaded.
+    """
+    if position_book.ready:
+        positions = position_book.positions(request.symbol)
+        return {"positions": positions, "count": len(positions)}
+    
+    positions = await mt5_connector.aio.positions_get(request.symbol)
     if positions is None:
         raise HTTPException(status_code=500, detail="Failed to get positions")
     
     return {"positions": positions, "count": len(positions)}
 
 
-@router.post("/history")
-async def get_history(request: HistoryRequest):
-    """Get trading history"""
+@router.get("/positions/summary")
+async def get_position_summary():
+    """Balance, floating profit, equity and per-symbol exposure from the position book"""
+    if not position_book.ready:
+        raise HTTPException(status_code=503, detail="Position book not loaded yet")
+    return position_book.summary()
+
+
+def _history_range(request: "HistoryRequest"):
     to_date = request.to_date or datetime.now()
     from_date = request.from_date or (to_date - timedelta(days=request.days))
-    
-    deals = mt5_connector.history_deals_get(from_date, to_date)
-    if deals is None:
+    return from_date, to_date
+
+
+def _deal_query(query, login: int, request: "HistoryRequest"):
+    """Filter a deals query by account, time range, symbol, magic and position"""
+    from_date, to_date = _history_range(request)
+    query = query.where(
+        Deal.login == login,
+        Deal.time >= epoch(from_date),
+        Deal.time <= epoch(to_date)
+    )
+    if request.symbol:
+        query = query.where(Deal.symbol == request.symbol)
+    if request.magic is not None:
+        query = query.where(Deal.magic == request.magic)
+    if request.position_id is not None:
+        query = query.where(Deal.position_id == request.position_id)
+    return query, from_date, to_date
+
+
+async def _synced_login(request: "HistoryRequest") -> int:
+    from_date, _ = _history_range(request)
+    login = await deal_history.sync(date_from=from_date)
+    if login is None:
         raise HTTPException(status_code=500, detail="Failed to get history")
+    if not deal_history.covers(from_date):
+        raise HTTPException(status_code=500, detail=f"Failed to get history before {from_date.isoformat()}")
+    return login
+
+
+@router.post("/history")
+async def get_history(request: HistoryRequest):
+    """
+    Get trading history from the local deal table
+    
+    The table is synced incrementally from the terminal before reading.
+    """
+    login = await _synced_login(request)
+    columns = [Deal.__table__.c[name] for name in DEAL_COLUMNS]
+    query, from_date, to_date = _deal_query(select(*columns), login, request)
+    
+    async with async_session_maker() as session:
+        result = await session.execute(query.order_by(Deal.time, Deal.ticket))
+        deals = [dict(row) for row in result.mappings()]
     
     return {
         "deals": deals,
@@ -89,6 +208,105 @@ async def get_history(request: HistoryRequest):
     }
 
 
+@router.post("/history/summary")
+async def get_history_summary(request: HistoryRequest, group_by: str = "symbol"):
+    """
+    Aggregate P&L of buy/sell deals per symbol or magic number
+    
+    net_profit is profit plus commission, swap and fee.
+    """
+    if group_by not in ("symbol", "magic"):
+        raise HTTPException(status_code=400, detail=f"Cannot group by {group_by}")
+    login = await _synced_login(request)
+    key = getattr(Deal, group_by)
+    
+    query = select(
+        key,
+        func.count(Deal.id),
+        func.sum(Deal.volume),
+        func.sum(Deal.profit),
+        func.sum(Deal.commission),
+        func.sum(Deal.swap),
+        func.sum(Deal.fee)
+    )
+    query, from_date, to_date = _deal_query(query, login, request)
+    query = query.where(Deal.type.in_(TRADE_DEAL_TYPES)).group_by(key).order_by(key)
+    
+    async with async_session_maker() as session:
+        rows = (await session.execute(query)).all()
+    
+    groups = [
+        {
+            group_by: value,
+            "deals": count,
+            "volume": volume or 0.0,
+            "profit": profit or 0.0,
+            "commission": commission or 0.0,
+            "swap": swap or 0.0,
+            "fee": fee or 0.0,
+            "net_profit": (profit or 0.0) + (commission or 0.0) + (swap or 0.0) + (fee or 0.0)
+        }
+        for value, count, volume, profit, commission, swap, fee in rows
+    ]
+    return {
+        "groups": groups,
+        "net_profit": sum(group["net_profit"] for group in groups),
+        "from_date": from_date.isoformat(),
+        "to_date": to_date.isoformat()
+    }
+
+
+@router.get("/history/export")
+async def export_history(
+    format: str = export.FORMAT_NDJSON,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    days: int = 365,
+    symbol: Optional[str] = None,
+    magic: Optional[int] = None,
+    position_id: Optional[int] = None
+):
+    """
+    Stream deal history as NDJSON, CSV or Parquet, oldest first
+    
+    Deals are read from the local deal table through a server-side cursor.
+    """
+    try:
+        export.check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    request = HistoryRequest(
+        from_date=from_date,
+        to_date=to_date,
+        days=days,
+        symbol=symbol,
+        magic=magic,
+        position_id=position_id
+    )
+    login = await _synced_login(request)
+    query, _, _ = _deal_query(select(Deal), login, request)
+    # Fixed schema, so nullable columns that are all None in the first batch keep their type
+    schema = export.model_schema(Deal, DEAL_COLUMNS) if format == export.FORMAT_PARQUET else None
+    body = export.stream_export(
+        export.query_batches(
+            query.order_by(Deal.time, Deal.ticket),
+            Deal,
+            settings.EXPORT_BATCH_SIZE,
+            DEAL_COLUMNS
+        ),
+        format,
+        DEAL_COLUMNS,
+        schema
+    )
+    filename = export.export_filename("deals", format)
+    return StreamingResponse(
+        body,
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/order-types")
 async def get_order_types():
     """Get available order types"""
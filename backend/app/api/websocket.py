@@ -1,73 +1,406 @@
 """WebSocket endpoints for real-time streaming"""
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List, Dict
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, List, Dict, Optional, Set, Tuple
 import asyncio
+import fnmatch
+import itertools
 import json
 import logging
+import time
 from datetime import datetime
 
+from app.core.config import settings
+from app.services.bar_builder import bar_aggregator, bar_key
+from app.services.market_feed import market_feed
 from app.services.mt5_connector import mt5_connector
+from app.services.position_book import position_book
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+WILDCARD_CHARS = set("*?[")
+
+
+class ClientConnection:
+    """
+    Outbound side of one WebSocket connection
+    
+    Messages wait in a bounded queue drained by a dedicated writer task, so
+    a slow client never delays the others. Messages sharing a conflation key
+    (the symbol for ticks) replace each other in place, which keeps only the
+    latest tick per symbol while the client is behind.
+    """
+    
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_pending: int,
+        send_timeout: float,
+        slow_timeout: float
+    ):
+        self.websocket = websocket
+        self.max_pending = max_pending
+        self.send_timeout = send_timeout
+        self.slow_timeout = slow_timeout
+        self.conflated = 0
+        self.dropped = 0
+        self.full_since: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._pending: "OrderedDict[Any, str]" = OrderedDict()
+        self._ready = asyncio.Event()
+        self._sequence = itertools.count()
+    
+    def start(self, on_failure: Callable[["ClientConnection", str], None]):
+        """Start the writer task"""
+        self.task = asyncio.create_task(self._write_loop(on_failure))
+    
+    def enqueue(self, text: str, key: Optional[str] = None) -> bool:
+        """
+        Queue a serialized message
+        
+        Args:
+            text: Serialized message
+            key: Conflation key; a queued message with the same key is replaced
+            
+        Returns:
+            bool: False if the client has been unable to keep up for longer
+            than the slow-client timeout
+        """
+        if key is not None and key in self._pending:
+            self._pending[key] = text
+            self.conflated += 1
+            return True
+        
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            now = time.monotonic()
+            if self.full_since is None:
+                self.full_since = now
+            return now - self.full_since < self.slow_timeout
+        
+        self._pending[key if key is not None else next(self._sequence)] = text
+        self._ready.set()
+        return True
+    
+    async def _write_loop(self, on_failure: Callable[["ClientConnection", str], None]):
+        try:
+            while True:
+                await self._ready.wait()
+                while self._pending:
+                    _, text = self._pending.popitem(last=False)
+                    await asyncio.wait_for(self.websocket.send_text(text), self.send_timeout)
+                self._ready.clear()
+                self.full_since = None
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            on_failure(self, "send timed out")
+        except Exception as e:
+            on_failure(self, f"send failed: {e}")
+    
+    def stop(self):
+        """Cancel the writer task"""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+    
+    async def close(self, code: int):
+        """Stop writing and close the socket"""
+        self.stop()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
+
 
 class ConnectionManager:
     """Manage WebSocket connections"""
     
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
-        self.subscriptions: Dict[str, List[WebSocket]] = {}
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # Two-way index: symbol -> connections and connection -> symbols
+        self.subscriptions: Dict[str, Set[WebSocket]] = {}
+        self.connection_symbols: Dict[WebSocket, Set[str]] = {}
+        self.position_subscribers: Set[WebSocket] = set()
+        # (symbol, bar series) -> connections and connection -> series
+        self.bar_subscriptions: Dict[Tuple[str, str], Set[WebSocket]] = {}
+        self.connection_bars: Dict[WebSocket, Set[Tuple[str, str]]] = {}
     
     async def connect(self, websocket: WebSocket):
         """Accept new connection"""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = ClientConnection(
+            websocket,
+            settings.WS_MAX_PENDING_MESSAGES,
+            settings.WS_SEND_TIMEOUT,
+            settings.WS_SLOW_CLIENT_TIMEOUT
+        )
+        self.active_connections[websocket] = client
+        self.connection_symbols[websocket] = set()
+        self.connection_bars[websocket] = set()
+        client.start(self._evict)
         logger.info(f"New WebSocket connection. Total: {len(self.active_connections)}")
     
     def disconnect(self, websocket: WebSocket):
         """Remove connection"""
-        self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+        client.stop()
         
         # Remove from subscriptions
-        for symbol in list(self.subscriptions.keys()):
-            if websocket in self.subscriptions[symbol]:
-                self.subscriptions[symbol].remove(websocket)
-                if not self.subscriptions[symbol]:
-                    del self.subscriptions[symbol]
+        self.unsubscribe(websocket, list(self.connection_symbols.pop(websocket, ())))
+        self.position_subscribers.discard(websocket)
+        for symbol, bars in self.connection_bars.pop(websocket, set()):
+            self._release_bars(websocket, symbol, bars)
         
         logger.info(f"WebSocket disconnected. Total: {len(self.active_connections)}")
     
-    def subscribe(self, websocket: WebSocket, symbol: str):
-        """Subscribe to symbol updates"""
-        if symbol not in self.subscriptions:
-            self.subscriptions[symbol] = []
-        if websocket not in self.subscriptions[symbol]:
-            self.subscriptions[symbol].append(websocket)
-            logger.info(f"Subscribed to {symbol}")
-    
-    def unsubscribe(self, websocket: WebSocket, symbol: str):
-        """Unsubscribe from symbol updates"""
-        if symbol in self.subscriptions and websocket in self.subscriptions[symbol]:
-            self.subscriptions[symbol].remove(websocket)
-            if not self.subscriptions[symbol]:
+    def _evict(self, client: ClientConnection, reason: str):
+        """Drop a client that failed or cannot keep up"""
+        logger.warning(
+            f"Evicting WebSocket client ({reason}); "
+            f"dropped {client.dropped}, conflated {client.conflated}"
+        )
+        self.disconnect(client.websocket)
+        # 1013: try again later
+        asyncio.create_task(client.close(code=1013))
+    
+    def subscribe(self, websocket: WebSocket, symbols: Iterable[str]) -> List[str]:
+        """
+        Subscribe to symbol updates
+        
+        Args:
+            websocket: Connection
+            symbols: Concrete symbol names
+            
+        Returns:
+            list: Symbols that were newly subscribed
+        """
+        owned = self.connection_symbols.get(websocket)
+        if owned is None:
+            return []
+        
+        added = []
+        first_subscribers = []
+        for symbol in symbols:
+            if symbol in owned:
+                continue
+            owned.add(symbol)
+            subscribers = self.subscriptions.get(symbol)
+            if subscribers is None:
+                subscribers = self.subscriptions[symbol] = set()
+                first_subscribers.append(symbol)
+            subscribers.add(websocket)
+            added.append(symbol)
+        
+        if first_subscribers:
+            market_feed.add_symbols(first_subscribers)
+        if added:
+            logger.info(f"Subscribed to {len(added)} symbol(s)")
+        return added
+    
+    def unsubscribe(self, websocket: WebSocket, symbols: Iterable[str]) -> List[str]:
+        """
+        Unsubscribe from symbol updates
+        
+        Args:
+            websocket: Connection
+            symbols: Concrete symbol names
+            
+        Returns:
+            list: Symbols that were unsubscribed
+        """
+        owned = self.connection_symbols.get(websocket)
+        removed = []
+        last_subscribers = []
+        for symbol in symbols:
+            if owned is not None:
+                owned.discard(symbol)
+            subscribers = self.subscriptions.get(symbol)
+            if subscribers is None or websocket not in subscribers:
+                continue
+            subscribers.discard(websocket)
+            if not subscribers:
                 del self.subscriptions[symbol]
-            logger.info(f"Unsubscribed from {symbol}")
+                last_subscribers.append(symbol)
+            removed.append(symbol)
+        
+        if last_subscribers:
+            market_feed.remove_symbols(last_subscribers)
+        if removed:
+            logger.info(f"Unsubscribed from {len(removed)} symbol(s)")
+        return removed
+    
+    async def resolve_symbols(self, websocket: WebSocket, message: dict, subscribing: bool) -> List[str]:
+        """
+        Expand the symbols named in a subscribe/unsubscribe message
+        
+        Accepts "symbol", a "symbols" list and a "group" from
+        settings.SYMBOL_GROUPS. Entries containing *, ? or [ are wildcards,
+        matched against the terminal's symbol list when subscribing and
+        against the connection's own subscriptions when unsubscribing.
+        
+        Raises:
+            ValueError: For an unknown group or malformed symbol list
+        """
+        requested = []
+        if message.get("symbol"):
+            requested.append(message["symbol"])
+        symbols = message.get("symbols") or []
+        if not isinstance(symbols, list):
+            raise ValueError("symbols must be a list")
+        requested.extend(symbols)
+        group = message.get("group")
+        if group:
+            if group not in settings.SYMBOL_GROUPS:
+                raise ValueError(f"Unknown group {group}")
+            requested.extend(settings.SYMBOL_GROUPS[group])
+        
+        concrete = [s for s in requested if not WILDCARD_CHARS.intersection(s)]
+        patterns = [s for s in requested if WILDCARD_CHARS.intersection(s)]
+        if patterns:
+            if subscribing:
+                names = await mt5_connector.aio.symbol_names() or []
+            else:
+                names = list(self.connection_symbols.get(websocket, ()))
+            for pattern in patterns:
+                concrete.extend(fnmatch.filter(names, pattern))
+        
+        # Keep order, drop duplicates
+        return list(dict.fromkeys(concrete))
+    
+    def subscribe_positions(self, websocket: WebSocket) -> None:
+        """Send position book updates to a connection, starting with a full snapshot"""
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        self.position_subscribers.add(websocket)
+        for message in position_book.snapshot_messages():
+            if not client.enqueue(json.dumps(message), key=_position_key(message)):
+                self._evict(client, "outbound queue full")
+                return
+    
+    def unsubscribe_positions(self, websocket: WebSocket) -> None:
+        """Stop sending position book updates to a connection"""
+        self.position_subscribers.discard(websocket)
+    
+    async def subscribe_bars(self, websocket: WebSocket, symbols: Iterable[str], bars: str) -> List[str]:
+        """
+        Send closed bars of a series built from ticks
+        
+        Args:
+            websocket: Connection
+            symbols: Concrete symbol names
+            bars: Bar series name, e.g. "time:5"
+            
+        Returns:
+            list: Symbols that were newly subscribed
+            
+        Raises:
+            ValueError: If the series name is invalid
+        """
+        key = bar_key(bars)
+        owned = self.connection_bars.get(websocket)
+        if owned is None:
+            return []
+        
+        added = []
+        for symbol in symbols:
+            series = (symbol, key)
+            if series in owned:
+                continue
+            owned.add(series)
+            subscribers = self.bar_subscriptions.get(series)
+            added.append(symbol)
+            if subscribers is None:
+                self.bar_subscriptions[series] = {websocket}
+                await bar_aggregator.add_series(symbol, key)
+                if websocket not in self.active_connections:
+                    # Disconnected during warm-up; disconnect() released the series
+                    break
+            else:
+                subscribers.add(websocket)
+        return added
+    
+    def unsubscribe_bars(self, websocket: WebSocket, symbols: Iterable[str], bars: str) -> List[str]:
+        """
+        Stop sending closed bars of a series
+        
+        Raises:
+            ValueError: If the series name is invalid
+        """
+        key = bar_key(bars)
+        owned = self.connection_bars.get(websocket, set())
+        removed = []
+        for symbol in symbols:
+            if (symbol, key) in owned:
+                owned.discard((symbol, key))
+                self._release_bars(websocket, symbol, key)
+                removed.append(symbol)
+        return removed
+    
+    def _release_bars(self, websocket: WebSocket, symbol: str, key: str) -> None:
+        subscribers = self.bar_subscriptions.get((symbol, key))
+        if subscribers is None or websocket not in subscribers:
+            return
+        subscribers.discard(websocket)
+        if not subscribers:
+            del self.bar_subscriptions[(symbol, key)]
+            bar_aggregator.remove_series(symbol, key)
     
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        """Send message to specific connection"""
-        await websocket.send_text(message)
+        """Queue a message for a specific connection"""
+        client = self.active_connections.get(websocket)
+        if client is not None and not client.enqueue(message):
+            self._evict(client, "outbound queue full")
     
     async def broadcast_to_symbol(self, symbol: str, message: dict):
-        """Broadcast message to all subscribers of a symbol"""
-        if symbol in self.subscriptions:
+        """Serialize once and queue the message for every subscriber of a symbol"""
+        subscribers = self.subscriptions.get(symbol)
+        if not subscribers:
+            return
+        message_text = json.dumps(message)
+        for websocket in list(subscribers):
+            client = self.active_connections.get(websocket)
+            if client is not None and not client.enqueue(message_text, key=symbol):
+                self._evict(client, "outbound queue full")
+    
+    
+    def broadcast_positions(self, messages: List[dict]):
+        """Serialize once and queue position book updates for every position subscriber"""
+        if not self.position_subscribers:
+            return
+        serialized = [(json.dumps(message), _position_key(message)) for message in messages]
+        for websocket in list(self.position_subscribers):
+            client = self.active_connections.get(websocket)
+            if client is None:
+                continue
+            for text, key in serialized:
+                if not client.enqueue(text, key=key):
+                    self._evict(client, "outbound queue full")
+                    break
+    
+    
+    def broadcast_bars(self, messages: List[dict]):
+        """Queue closed bars for the subscribers of each series; bars are never conflated"""
+        for message in messages:
+            subscribers = self.bar_subscriptions.get((message["symbol"], message["bars"]))
+            if not subscribers:
+                continue
             message_text = json.dumps(message)
-            for connection in self.subscriptions[symbol]:
-                try:
-                    await connection.send_text(message_text)
-                except Exception as e:
-                    logger.error(f"Error sending to connection: {e}")
+            for websocket in list(subscribers):
+                client = self.active_connections.get(websocket)
+                if client is not None and not client.enqueue(message_text):
+                    self._evict(client, "outbound queue full")
+
+
+def _position_key(message: dict) -> str:
+    """Conflation key: the latest update per symbol, account and snapshot is kept"""
+    if message["type"] == "position_pnl":
+        return f"position_pnl:{message['symbol']}"
+    return message["type"]
 
 
 manager = ConnectionManager()
@@ -80,8 +413,21 @@ async def websocket_endpoint(websocket: WebSocket):
     
     Client sends JSON messages:
     - {"action": "subscribe", "symbol": "EURUSD"}
+    - {"action": "subscribe", "symbols": ["EURUSD", "GBP*"]}
+    - {"action": "subscribe", "group": "majors"}
     - {"action": "unsubscribe", "symbol": "EURUSD"}
+    - {"action": "unsubscribe", "symbols": ["GBP*"]}
+    - {"action": "subscribe_positions"}
+    - {"action": "unsubscribe_positions"}
+    - {"action": "subscribe_bars", "symbols": ["EURUSD"], "bars": "time:5"}
+    - {"action": "unsubscribe_bars", "symbols": ["EURUSD"], "bars": "time:5"}
     - {"action": "ping"}
+    
+    Position subscribers receive a "positions" snapshot, then "position_pnl"
+    (per symbol) and "account_pnl" messages as ticks move open positions.
+    Bar subscribers receive a "bar" message for every closed bar of the
+    series (time:<seconds>, tick:<n>, volume:<v>, range:<price> or
+    renko:<price>).
     """
     await manager.connect(websocket)
     
@@ -93,31 +439,71 @@ async def websocket_endpoint(websocket: WebSocket):
                 message = json.loads(data)
                 action = message.get("action")
                 
-                if action == "subscribe":
-                    symbol = message.get("symbol")
-                    if symbol:
-                        manager.subscribe(websocket, symbol)
+                if action in ("subscribe", "unsubscribe"):
+                    subscribing = action == "subscribe"
+                    try:
+                        symbols = await manager.resolve_symbols(websocket, message, subscribing)
+                    except ValueError as e:
                         await manager.send_personal_message(
-                            json.dumps({
-                                "type": "subscription",
-                                "status": "success",
-                                "symbol": symbol
-                            }),
+                            json.dumps({"type": "error", "message": str(e)}),
                             websocket
                         )
+                        continue
+                    
+                    if subscribing:
+                        manager.subscribe(websocket, symbols)
+                    else:
+                        manager.unsubscribe(websocket, symbols)
+                    
+                    reply = {
+                        "type": "subscription" if subscribing else "unsubscription",
+                        "status": "success",
+                        "symbols": symbols
+                    }
+                    if message.get("symbol"):
+                        reply["symbol"] = message["symbol"]
+                    await manager.send_personal_message(json.dumps(reply), websocket)
                 
-                elif action == "unsubscribe":
-                    symbol = message.get("symbol")
-                    if symbol:
-                        manager.unsubscribe(websocket, symbol)
+                elif action in ("subscribe_positions", "unsubscribe_positions"):
+                    subscribing = action == "subscribe_positions"
+                    await manager.send_personal_message(
+                        json.dumps({
+                            "type": "subscription" if subscribing else "unsubscription",
+                            "status": "success",
+                            "channel": "positions"
+                        }),
+                        websocket
+                    )
+                    if subscribing:
+                        manager.subscribe_positions(websocket)
+                    else:
+                        manager.unsubscribe_positions(websocket)
+                
+                elif action in ("subscribe_bars", "unsubscribe_bars"):
+                    subscribing = action == "subscribe_bars"
+                    try:
+                        symbols = await manager.resolve_symbols(websocket, message, True)
+                        if subscribing:
+                            symbols = await manager.subscribe_bars(websocket, symbols, message.get("bars", ""))
+                        else:
+                            symbols = manager.unsubscribe_bars(websocket, symbols, message.get("bars", ""))
+                    except ValueError as e:
                         await manager.send_personal_message(
-                            json.dumps({
-                                "type": "unsubscription",
-                                "status": "success",
-                                "symbol": symbol
-                            }),
+                            json.dumps({"type": "error", "message": str(e)}),
                             websocket
                         )
+                        continue
+                    
+                    await manager.send_personal_message(
+                        json.dumps({
+                            "type": "subscription" if subscribing else "unsubscription",
+                            "status": "success",
+                            "channel": "bars",
+                            "bars": bar_key(message["bars"]),
+                            "symbols": symbols
+                        }),
+                        websocket
+                    )
                 
                 elif action == "ping":
                     await manager.send_personal_message(
@@ -142,21 +528,34 @@ async def websocket_endpoint(websocket: WebSocket):
 
 
 async def broadcast_price_updates():
-    """Background task to broadcast price updates (stub)"""
-    while True:
-        await asyncio.sleep(1)
-        
-        # For each subscribed symbol, get latest tick and broadcast
-        for symbol in list(manager.subscriptions.keys()):
-            if mt5_connector.connected:
-                ticks = mt5_connector.copy_ticks(symbol, 1)
-                if ticks and len(ticks) > 0:
-                    tick = ticks[0]
-                    message = {
-                        "type": "tick",
-                        "symbol": symbol,
-                        "bid": tick.get("bid"),
-                        "ask": tick.get("ask"),
-                        "time": tick.get("time")
-                    }
-                    await manager.broadcast_to_symbol(symbol, message)
+    """Background task fanning out tick deltas from the market data pump"""
+    queue = market_feed.subscribe()
+    try:
+        while True:
+            ticks = await queue.get()
+            for message in ticks:
+                await manager.broadcast_to_symbol(message["symbol"], message)
+    finally:
+        market_feed.unsubscribe(queue)
+
+
+async def broadcast_position_updates():
+    """Background task fanning out position book changes"""
+    queue = position_book.subscribe()
+    try:
+        while True:
+            messages = await queue.get()
+            manager.broadcast_positions(messages)
+    finally:
+        position_book.unsubscribe(queue)
+
+
+async def broadcast_bar_updates():
+    """Background task fanning out bars closed by the bar aggregator"""
+    queue = bar_aggregator.subscribe()
+    try:
+        while True:
+            messages = await queue.get()
+            manager.broadcast_bars(messages)
+    finally:
+        bar_aggregator.unsubscribe(queue)
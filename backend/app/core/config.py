@@ -1,7 +1,8 @@
 """Application configuration"""
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
+import sys
 
 
 class Settings(BaseSettings):
@@ -13,6 +14,18 @@ class Settings(BaseSettings):
     MT5_SERVER: str = "MetaQuotes-Demo"
     MT5_PATH: str = ""
     MT5_TIMEOUT: int = 60000
+    # Seconds a caller waits for a queued terminal call, by call type
+    MT5_ORDER_TIMEOUT: float = 10.0
+    MT5_QUERY_TIMEOUT: float = 5.0
+    MT5_MARKET_DATA_TIMEOUT: float = 5.0
+    MT5_HISTORY_TIMEOUT: float = 60.0
+    # Seconds query results are reused; 0 disables caching
+    MT5_ACCOUNT_CACHE_TTL: float = 0.25
+    MT5_POSITIONS_CACHE_TTL: float = 0.25
+    MT5_SYMBOL_CACHE_TTL: float = 300.0
+    
+    # Orders
+    ORDER_BASKET_MAX_SIZE: int = 50
     
     # API Configuration
     API_HOST: str = "0.0.0.0"
@@ -22,6 +35,87 @@ class Settings(BaseSettings):
     # Database Configuration
     DATABASE_TYPE: str = "sqlite"
     DATABASE_URL: str = "sqlite:///./trading.db"
+    # Batched log writer: flush every N rows or T ms, whichever comes first
+    DB_WRITER_BATCH_SIZE: int = 500
+    DB_WRITER_FLUSH_INTERVAL_MS: int = 250
+    DB_WRITER_QUEUE_SIZE: int = 10000
+    DB_WRITER_USE_COPY: bool = True  # PostgreSQL only
+    
+    # Streaming exports
+    EXPORT_BATCH_SIZE: int = 1000  # rows per database round-trip
+    
+    # Local deal history
+    DEAL_HISTORY_DAYS: int = 365  # history fetched on the first sync of an account
+    DEAL_SYNC_INTERVAL: float = 5.0  # seconds between terminal syncs
+    DEAL_SYNC_WINDOW_DAYS: int = 30  # days of deals fetched from the terminal at a time
+    
+    # Account history sampling and retention (0 days keeps a tier forever)
+    ACCOUNT_SAMPLE_INTERVAL: float = 1.0  # seconds, 0 disables sampling
+    ACCOUNT_HISTORY_RAW_RETENTION_DAYS: int = 2
+    ACCOUNT_HISTORY_MINUTE_RETENTION_DAYS: int = 90
+    ACCOUNT_HISTORY_HOUR_RETENTION_DAYS: int = 0
+    ACCOUNT_HISTORY_PRUNE_INTERVAL: int = 600  # seconds
+    ACCOUNT_HISTORY_MAX_POINTS: int = 5000  # rows a range may span before a coarser tier is used
+    
+    # Market data store
+    MARKET_DATA_DIR: str = "./market_data"
+    MARKET_DATA_HISTORY_DAYS: int = 365
+    MARKET_DATA_TICK_HISTORY_DAYS: int = 1
+    MARKET_DATA_SYNC_INTERVAL: float = 1.0  # seconds between terminal syncs per series
+    
+    # Live market feed
+    MARKET_FEED_INTERVAL_MS: int = 20
+    MARKET_FEED_QUEUE_SIZE: int = 1000
+    
+    # Shared-memory tick buffers of polled symbols
+    TICK_BUFFER_SIZE: int = 65536  # ticks per symbol, 52 bytes each (0 disables)
+    TICK_BUFFER_PREFIX: str = "algotrading_ticks_"  # shared memory segment name prefix
+    TICK_BUFFER_MAX_AGE: float = 1.0  # seconds a buffer is trusted after its last sync
+    TICK_BUFFER_FETCH_LIMIT: int = 10000  # ticks fetched per symbol per poll
+    
+    # Multi-process deployment (see app.services.gateway)
+    GATEWAY_ROLE: str = "single"  # single | gateway (owns the terminal) | worker (API worker of a gateway)
+    # Named pipe on Windows, Unix socket path elsewhere
+    GATEWAY_ADDRESS: str = (
+        r"\\.\pipe\algotrading-gateway" if sys.platform == "win32" else "/tmp/algotrading-gateway.sock"
+    )
+    GATEWAY_AUTHKEY: str = ""  # shared secret of the gateway and its workers (required in those roles)
+    GATEWAY_STATUS_INTERVAL: float = 1.0  # seconds between terminal status refreshes in workers
+    # API routes workers forward to the gateway, whose process owns their state
+    GATEWAY_ROUTES: List[str] = ["/api/trading", "/api/backtest", "/api/live", "/api/logs/account"]
+    
+    # Position book
+    POSITION_BOOK_RECONCILE_INTERVAL: float = 5.0  # seconds between full reconciles with the terminal
+    
+    # Bars built from ticks
+    BAR_HISTORY_SIZE: int = 5000  # closed bars kept per series
+    BAR_WARMUP_TICKS: int = 100000  # stored ticks replayed when a series starts (0 disables)
+    
+    # WebSocket fan-out
+    # Named symbol groups for {"action": "subscribe", "group": ...}; entries may be wildcards
+    SYMBOL_GROUPS: Dict[str, List[str]] = {}
+    WS_MAX_PENDING_MESSAGES: int = 256
+    WS_SEND_TIMEOUT: float = 5.0  # seconds per send before the client is evicted
+    WS_SLOW_CLIENT_TIMEOUT: float = 10.0  # seconds with a full queue before eviction
+    
+    # Backtesting
+    SWEEP_MAX_WORKERS: int = 0  # 0 = one worker per CPU
+    SWEEP_MAX_COMBINATIONS: int = 50000
+    BACKTEST_MAX_CONCURRENT_JOBS: int = 2
+    BACKTEST_JOB_HISTORY: int = 100
+    INDICATOR_CACHE_SIZE: int = 256  # vectorized indicator results kept per process
+    TICK_REPLAY_CHUNK_SIZE: int = 1_000_000  # ticks read per step in tick-replay backtests
+    MONTE_CARLO_MAX_SIMULATIONS: int = 100000  # paths per method
+    
+    # Live strategies
+    STRATEGY_MAX_RUNNING: int = 64
+    STRATEGY_WARMUP_BARS: int = 500  # closed bars passed to on_start
+    STRATEGY_TICK_BUDGET_MS: float = 5.0  # time allowed per on_tick call
+    STRATEGY_BAR_BUDGET_MS: float = 100.0  # time allowed per on_bar call
+    STRATEGY_MAX_FAULTS: int = 10  # consecutive errors or overruns before suspension
+    STRATEGY_EVENT_BUFFER: int = 1000  # buffered bar and order events per strategy
+    STRATEGY_STOP_TIMEOUT: float = 5.0  # seconds stop() waits for on_stop
+    STRATEGY_DEFAULT_MAGIC: int = 234000
     
     # Security
     SECRET_KEY: str = "your-secret-key-here-change-in-production"
@@ -33,6 +127,11 @@ class Settings(BaseSettings):
     
     # Logging
     LOG_LEVEL: str = "INFO"
+    LOG_DB_ENABLED: bool = True  # store app.* log records in system_logs
+    LOG_DB_LEVEL: str = "INFO"
+    LOG_DB_QUEUE_SIZE: int = 10000  # records waiting for the listener before new ones are dropped
+    LOG_DB_DEDUP_WINDOW: float = 10.0  # seconds a repeated message is collapsed into one summary row
+    LOG_DB_SAMPLE_RATES: Dict[str, float] = {}  # level name to fraction kept, e.g. {"INFO": 0.1}
     
     class Config:
         env_file = ".env"
@@ -42,11 +42,19 @@ async def get_db():
             await session.close()
 
 
+def _create_indexes(connection) -> None:
+    """Create indexes added to tables that already existed (create_all skips them)"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
 async def init_db():
     """Initialize database tables"""
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_create_indexes)
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
@@ -1,13 +1,29 @@
 """Main FastAPI application entry point"""
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from app.core.config import settings
 from app.api import router as api_router
 from app.db.database import init_db
+from app.services.account_sampler import account_sampler
+from app.services.bar_builder import bar_aggregator
+from app.services.db_writer import db_writer
+from app.services.gateway import gateway_server
+from app.services.gateway_client import gateway_client, GatewayRoutes
+from app.services.jobs import job_manager
+from app.services.log_handler import db_logging
+from app.services.market_feed import market_feed
+from app.services.mt5_connector import mt5_connector
+from app.services.mt5_executor import MT5CallTimeout
+from app.services.position_book import position_book
+from app.services.strategy_runtime import strategy_runtime
+from app.services.sweep import backtest_workers
+from app.api.websocket import broadcast_price_updates, broadcast_position_updates, broadcast_bar_updates
 
 # Configure logging
 logging.basicConfig(
@@ -21,12 +37,47 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
-    logger.info("Starting AlgoTrading Backend...")
+    # API workers leave account sampling and strategies to the gateway process
+    worker = settings.GATEWAY_ROLE == "worker"
+    logger.info(f"Starting AlgoTrading Backend ({settings.GATEWAY_ROLE})...")
     await init_db()
     logger.info("Database initialized")
+    db_writer.start()
+    if settings.LOG_DB_ENABLED:
+        db_logging.start(asyncio.get_running_loop())
+    if worker:
+        gateway_client.start()
+    else:
+        account_sampler.start()
+    market_feed.start(asyncio.get_running_loop())
+    broadcast_task = asyncio.create_task(broadcast_price_updates())
+    position_task = asyncio.create_task(broadcast_position_updates())
+    bar_task = asyncio.create_task(broadcast_bar_updates())
+    position_book.start()
+    bar_aggregator.start()
+    if not worker:
+        strategy_runtime.start()
+    if settings.GATEWAY_ROLE == "gateway":
+        await gateway_server.start(app)
     yield
     # Shutdown
     logger.info("Shutting down AlgoTrading Backend...")
+    if settings.GATEWAY_ROLE == "gateway":
+        await gateway_server.stop()
+    broadcast_task.cancel()
+    position_task.cancel()
+    bar_task.cancel()
+    await strategy_runtime.stop()
+    await bar_aggregator.stop()
+    await position_book.stop()
+    market_feed.stop()
+    job_manager.shutdown()
+    backtest_workers.close()
+    await account_sampler.stop()
+    await gateway_client.stop()
+    mt5_connector.executor.stop()
+    db_logging.stop()
+    await db_writer.stop()
 
 
 app = FastAPI(
@@ -45,6 +96,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.GATEWAY_ROLE == "worker":
+    app.add_middleware(GatewayRoutes, client=gateway_client, prefixes=tuple(settings.GATEWAY_ROUTES))
+
+
+@app.exception_handler(MT5CallTimeout)
+async def mt5_timeout_handler(request: Request, exc: MT5CallTimeout):
+    """Report terminal calls that did not finish in time"""
+    return JSONResponse(status_code=504, content={"detail": f"MT5 call {exc}"})
+
+
 # Include routers
 app.include_router(api_router, prefix="/api")
 
@@ -1,6 +1,6 @@
 """Database models"""
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, Text, Boolean, Index, UniqueConstraint
 from datetime import datetime
 
 from app.db.database import Base
@@ -11,8 +11,8 @@ class TradeLog(Base):
     __tablename__ = "trade_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
-    symbol = Column(String(50), index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    symbol = Column(String(50))
     order_type = Column(String(20))
     volume = Column(Float)
     price = Column(Float)
@@ -21,6 +21,12 @@ class TradeLog(Base):
     status = Column(String(20))
     order_id = Column(Integer, nullable=True)
     comment = Column(Text, nullable=True)
+    
+    # Newest-first keyset pagination, unfiltered and per symbol
+    __table_args__ = (
+        Index("ix_trade_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_trade_logs_symbol_timestamp_id", "symbol", "timestamp", "id"),
+    )
 
 
 class AccountHistory(Base):
@@ -37,16 +43,87 @@ class AccountHistory(Base):
     profit = Column(Float)
 
 
+class AccountHistoryAggregate(Base):
+    """Downsampled account history, one row per minute or hour bucket"""
+    __tablename__ = "account_history_aggregates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    resolution = Column(String(10))  # "1m" or "1h"
+    timestamp = Column(DateTime)  # bucket start
+    balance = Column(Float)
+    equity_open = Column(Float)
+    equity_high = Column(Float)
+    equity_low = Column(Float)
+    equity_close = Column(Float)
+    margin = Column(Float)
+    free_margin = Column(Float)
+    margin_level = Column(Float, nullable=True)
+    profit = Column(Float)
+    samples = Column(Integer)
+    
+    __table_args__ = (
+        Index("ix_account_history_aggregates_resolution_timestamp", "resolution", "timestamp"),
+    )
+
+
 class SystemLog(Base):
     """System event log"""
     __tablename__ = "system_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
     level = Column(String(20))
     source = Column(String(100))
     message = Column(Text)
     details = Column(Text, nullable=True)
+    
+    # Newest-first keyset pagination, unfiltered and per level
+    __table_args__ = (
+        Index("ix_system_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_system_logs_level_timestamp_id", "level", "timestamp", "id"),
+    )
+
+
+class Deal(Base):
+    """Local copy of the terminal's deal history, synced incrementally"""
+    __tablename__ = "deals"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    login = Column(BigInteger)  # account the deal belongs to
+    ticket = Column(BigInteger)
+    order = Column(BigInteger)
+    time = Column(BigInteger)  # epoch seconds, server time
+    time_msc = Column(BigInteger)
+    type = Column(Integer)
+    entry = Column(Integer)
+    magic = Column(BigInteger)
+    position_id = Column(BigInteger)
+    reason = Column(Integer)
+    volume = Column(Float)
+    price = Column(Float)
+    commission = Column(Float)
+    swap = Column(Float)
+    profit = Column(Float)
+    fee = Column(Float)
+    symbol = Column(String(50))
+    comment = Column(Text, nullable=True)
+    external_id = Column(String(100), nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint("login", "ticket", name="uq_deals_login_ticket"),
+        Index("ix_deals_login_time", "login", "time", "ticket"),
+        Index("ix_deals_login_symbol_time", "login", "symbol", "time"),
+        Index("ix_deals_login_magic_time", "login", "magic", "time"),
+        Index("ix_deals_login_position", "login", "position_id"),
+    )
+
+
+class DealSyncState(Base):
+    """Oldest deal time synced into the deals table, per account"""
+    __tablename__ = "deal_sync_state"
+    
+    login = Column(BigInteger, primary_key=True, autoincrement=False)
+    synced_from = Column(BigInteger)  # epoch seconds, server time
 
 
 class BacktestResult(Base):
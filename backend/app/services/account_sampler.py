@@ -0,0 +1,276 @@
+"""Periodic account snapshots with downsampling and retention
+
+Every ``ACCOUNT_SAMPLE_INTERVAL`` seconds the sampler records balance,
+equity and margin as a raw ``AccountHistory`` row. The same samples are
+folded in memory into 1-minute and 1-hour buckets (equity as open, high,
+low, close; everything else as the last value) which are written to
+``AccountHistoryAggregate`` when the bucket closes. All rows go through the
+batched database writer. Each tier is pruned by its own retention period.
+
+Stopping writes the buckets that are still open. On start, rows of the
+current minute and hour (left by a restart within the bucket) are taken back
+into memory and deleted, so the bucket is written once, with every sample.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.db.database import async_session_maker
+from app.models.models import AccountHistory, AccountHistoryAggregate
+from app.services.db_writer import db_writer
+from app.services.mt5_connector import mt5_connector
+
+logger = logging.getLogger(__name__)
+
+TIER_RAW = "raw"
+TIER_MINUTE = "1m"
+TIER_HOUR = "1h"
+
+AGGREGATE_SECONDS = {TIER_MINUTE: 60, TIER_HOUR: 3600}
+
+
+def tier_retention(tier: str) -> Optional[timedelta]:
+    """Retention period of a tier, or None if it is kept forever"""
+    days = {
+        TIER_RAW: settings.ACCOUNT_HISTORY_RAW_RETENTION_DAYS,
+        TIER_MINUTE: settings.ACCOUNT_HISTORY_MINUTE_RETENTION_DAYS,
+        TIER_HOUR: settings.ACCOUNT_HISTORY_HOUR_RETENTION_DAYS
+    }[tier]
+    return timedelta(days=days) if days > 0 else None
+
+
+def select_tier(from_date: datetime, to_date: datetime) -> str:
+    """
+    Pick the finest tier that still holds ``from_date`` and covers the range
+    in at most ACCOUNT_HISTORY_MAX_POINTS rows
+
+    Args:
+        from_date: Range start (UTC)
+        to_date: Range end (UTC)
+
+    Returns:
+        str: TIER_RAW, TIER_MINUTE or TIER_HOUR
+    """
+    span = max((to_date - from_date).total_seconds(), 0)
+    now = datetime.utcnow()
+    resolutions = [
+        (TIER_RAW, max(settings.ACCOUNT_SAMPLE_INTERVAL, 1e-3)),
+        (TIER_MINUTE, AGGREGATE_SECONDS[TIER_MINUTE]),
+        (TIER_HOUR, AGGREGATE_SECONDS[TIER_HOUR])
+    ]
+    for tier, seconds in resolutions:
+        retention = tier_retention(tier)
+        if retention is not None and from_date < now - retention:
+            continue
+        if span / seconds <= settings.ACCOUNT_HISTORY_MAX_POINTS:
+            return tier
+    return TIER_HOUR
+
+
+class _Bucket:
+    """Running aggregate of the samples in one time bucket"""
+
+    def __init__(self, start: datetime, sample: Dict[str, Any]):
+        self.start = start
+        self.equity_open = self.equity_high = self.equity_low = sample["equity"]
+        self.samples = 0
+        self.add(sample)
+
+    @classmethod
+    def from_rows(cls, rows: List[AccountHistoryAggregate]) -> "_Bucket":
+        """Rebuild a bucket from its stored rows, oldest first"""
+        first, last = rows[0], rows[-1]
+        bucket = cls(first.timestamp, {
+            "balance": last.balance,
+            "equity": last.equity_close,
+            "margin": last.margin,
+            "free_margin": last.free_margin,
+            "margin_level": last.margin_level,
+            "profit": last.profit
+        })
+        bucket.equity_open = first.equity_open
+        bucket.equity_high = max(row.equity_high for row in rows)
+        bucket.equity_low = min(row.equity_low for row in rows)
+        bucket.samples = sum(row.samples or 0 for row in rows)
+        return bucket
+
+    def add(self, sample: Dict[str, Any]) -> None:
+        self.equity_high = max(self.equity_high, sample["equity"])
+        self.equity_low = min(self.equity_low, sample["equity"])
+        self.last = sample
+        self.samples += 1
+
+    def row(self, resolution: str) -> Dict[str, Any]:
+        return {
+            "resolution": resolution,
+            "timestamp": self.start,
+            "balance": self.last["balance"],
+            "equity_open": self.equity_open,
+            "equity_high": self.equity_high,
+            "equity_low": self.equity_low,
+            "equity_close": self.last["equity"],
+            "margin": self.last["margin"],
+            "free_margin": self.last["free_margin"],
+            "margin_level": self.last["margin_level"],
+            "profit": self.last["profit"],
+            "samples": self.samples
+        }
+
+
+def _bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    epoch = int((timestamp - datetime(1970, 1, 1)).total_seconds())
+    return datetime.utcfromtimestamp(epoch - epoch % seconds)
+
+
+class AccountSampler:
+    """Record account snapshots and their minute/hour aggregates"""
+
+    def __init__(self, connector, writer, interval: float, prune_interval: int):
+        self.connector = connector
+        self.writer = writer
+        self.interval = interval
+        self.prune_interval = prune_interval
+        self._buckets: Dict[str, _Bucket] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start sampling and pruning; must be called from the event loop"""
+        if self._tasks or self.interval <= 0:
+            return
+        self._tasks = [
+            asyncio.create_task(self._sample_loop()),
+            asyncio.create_task(self._prune_loop())
+        ]
+        logger.info(f"Account sampler started ({self.interval}s interval)")
+
+    async def stop(self) -> None:
+        """Stop sampling and write the still-open buckets"""
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for resolution, bucket in self._buckets.items():
+            self.writer.write(AccountHistoryAggregate, bucket.row(resolution))
+        self._buckets.clear()
+        logger.info("Account sampler stopped")
+
+    def open_bucket(self, resolution: str) -> Optional[Dict[str, Any]]:
+        """Aggregate row of the bucket that has not closed yet, if any"""
+        bucket = self._buckets.get(resolution)
+        return bucket.row(resolution) if bucket is not None else None
+
+    def record(self, info: Dict[str, Any], timestamp: Optional[datetime] = None) -> None:
+        """
+        Record one account snapshot
+
+        Args:
+            info: Account information as returned by MT5Connector.account_info
+            timestamp: Sample time (UTC), defaults to now
+        """
+        timestamp = timestamp or datetime.utcnow()
+        sample = {
+            "timestamp": timestamp,
+            "balance": info.get("balance"),
+            "equity": info.get("equity"),
+            "margin": info.get("margin"),
+            "free_margin": info.get("margin_free"),
+            "margin_level": info.get("margin_level"),
+            "profit": info.get("profit")
+        }
+        self.writer.write(AccountHistory, sample)
+
+        for resolution, seconds in AGGREGATE_SECONDS.items():
+            start = _bucket_start(timestamp, seconds)
+            bucket = self._buckets.get(resolution)
+            if bucket is not None and bucket.start == start:
+                bucket.add(sample)
+                continue
+            if bucket is not None:
+                self.writer.write(AccountHistoryAggregate, bucket.row(resolution))
+            self._buckets[resolution] = _Bucket(start, sample)
+
+    async def _restore(self) -> None:
+        """Take rows of the current buckets back from the table"""
+        now = datetime.utcnow()
+        async with async_session_maker() as session:
+            for resolution, seconds in AGGREGATE_SECONDS.items():
+                start = _bucket_start(now, seconds)
+                where = (
+                    AccountHistoryAggregate.resolution == resolution,
+                    AccountHistoryAggregate.timestamp == start
+                )
+                rows = (await session.execute(
+                    select(AccountHistoryAggregate).where(*where).order_by(AccountHistoryAggregate.id)
+                )).scalars().all()
+                if not rows or resolution in self._buckets:
+                    continue
+                self._buckets[resolution] = _Bucket.from_rows(rows)
+                await session.execute(delete(AccountHistoryAggregate).where(*where))
+            await session.commit()
+
+    async def _sample_loop(self) -> None:
+        try:
+            await self._restore()
+        except Exception as e:
+            logger.error(f"Failed to restore open account history buckets: {e}")
+        loop = asyncio.get_running_loop()
+        next_sample = loop.time()
+        while True:
+            try:
+                if self.connector.connected:
+                    info = await self.connector.aio.account_info()
+                    if info is not None:
+                        self.record(info)
+            except Exception as e:
+                logger.error(f"Account sampling error: {e}")
+            # Fixed-rate schedule, skipping missed slots instead of bursting
+            next_sample += self.interval
+            now = loop.time()
+            if next_sample < now:
+                next_sample = now + self.interval
+            await asyncio.sleep(next_sample - now)
+
+    async def _prune_loop(self) -> None:
+        while True:
+            try:
+                await self.prune()
+            except Exception as e:
+                logger.error(f"Account history pruning error: {e}")
+            await asyncio.sleep(self.prune_interval)
+
+    async def prune(self) -> None:
+        """Delete rows older than their tier's retention period"""
+        now = datetime.utcnow()
+        async with async_session_maker() as session:
+            retention = tier_retention(TIER_RAW)
+            if retention is not None:
+                await session.execute(
+                    delete(AccountHistory).where(AccountHistory.timestamp < now - retention)
+                )
+            for resolution in AGGREGATE_SECONDS:
+                retention = tier_retention(resolution)
+                if retention is None:
+                    continue
+                await session.execute(
+                    delete(AccountHistoryAggregate).where(
+                        AccountHistoryAggregate.resolution == resolution,
+                        AccountHistoryAggregate.timestamp < now - retention
+                    )
+                )
+            await session.commit()
+
+
+# Global account sampler instance
+account_sampler = AccountSampler(
+    mt5_connector,
+    db_writer,
+    settings.ACCOUNT_SAMPLE_INTERVAL,
+    settings.ACCOUNT_HISTORY_PRUNE_INTERVAL
+)
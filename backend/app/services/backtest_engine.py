@@ -0,0 +1,322 @@
+"""Vectorized bar-level backtesting engine
+
+All computations work on whole columns at once. ``rates`` may be the
+structured array returned by ``mt5.copy_rates_from_pos`` /
+``mt5.copy_rates_range`` or any mapping of column name to NumPy array with
+the same field names (``time``, ``open``, ``high``, ``low``, ``close``).
+"""
+
+import logging
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.services import indicators
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+EQUITY_CURVE_POINTS = 500
+
+
+def slice_by_time(rates, start: int, end: int):
+    """
+    Restrict ``rates`` to bars with ``start <= time <= end`` without copying
+
+    Args:
+        rates: OHLC columns sorted by time
+        start: First epoch second to keep
+        end: Last epoch second to keep
+
+    Returns:
+        Same type as ``rates`` holding views of the selected range
+    """
+    times = rates["time"]
+    lo = int(np.searchsorted(times, start, side="left"))
+    hi = int(np.searchsorted(times, end, side="right"))
+    if isinstance(rates, np.ndarray):
+        return rates[lo:hi]
+    return {name: column[lo:hi] for name, column in rates.items()}
+
+
+# Returns the named indicator over the backtested rates, e.g. compute("sma", period=10)
+IndicatorFn = Callable[..., Any]
+
+
+def equity_statistics(
+    times: np.ndarray,
+    equity: np.ndarray,
+    returns: np.ndarray,
+    initial_capital: float
+) -> Dict[str, Any]:
+    """
+    Maximum drawdown and annualized Sharpe ratio of an equity curve
+
+    Args:
+        times: Epoch seconds of each equity point
+        equity: Equity after each period
+        returns: Return of each period
+        initial_capital: Starting equity (counts as the first peak)
+
+    Returns:
+        dict: ``max_drawdown`` and ``sharpe_ratio`` (None without variance)
+    """
+    running_peak = np.maximum.accumulate(np.maximum(equity, initial_capital))
+    max_drawdown = float(np.max(1.0 - equity / running_peak))
+    std = returns.std()
+    span = times[-1] - times[0]
+    sharpe_ratio = None
+    if std > 0 and span > 0:
+        periods_per_year = len(returns) / (span / SECONDS_PER_YEAR)
+        sharpe_ratio = float(returns.mean() / std * np.sqrt(periods_per_year))
+    return {"max_drawdown": max_drawdown, "sharpe_ratio": sharpe_ratio}
+
+
+def _hold_until_next_event(events: np.ndarray, has_event: np.ndarray) -> np.ndarray:
+    """Forward-fill event values so a position is held until the next event"""
+    idx = np.where(has_event, np.arange(len(events)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    # Bars before the first event map to index 0, which carries no position
+    return events[idx]
+
+
+def sma_crossover_signals(rates, params: Dict[str, Any], compute: IndicatorFn) -> np.ndarray:
+    """Long when the fast SMA is above the slow SMA, short when below"""
+    fast = compute("sma", period=int(params.get("fast_period", 10)))
+    slow = compute("sma", period=int(params.get("slow_period", 30)))
+    return np.nan_to_num(np.sign(fast - slow)).astype(np.int8)
+
+
+def ema_crossover_signals(rates, params: Dict[str, Any], compute: IndicatorFn) -> np.ndarray:
+    """Long when the fast EMA is above the slow EMA, short when below"""
+    fast = compute("ema", period=int(params.get("fast_period", 12)))
+    slow = compute("ema", period=int(params.get("slow_period", 26)))
+    return np.nan_to_num(np.sign(fast - slow)).astype(np.int8)
+
+
+def rsi_reversion_signals(rates, params: Dict[str, Any], compute: IndicatorFn) -> np.ndarray:
+    """Long below ``oversold``, short above ``overbought``, flat once RSI crosses 50"""
+    value = compute("rsi", period=int(params.get("period", 14)))
+    oversold = float(params.get("oversold", 30))
+    overbought = float(params.get("overbought", 70))
+    n = len(value)
+    above = value >= 50
+    crossed = np.zeros(n, dtype=bool)
+    crossed[1:] = above[1:] != above[:-1]
+    crossed &= ~np.isnan(value)
+    long_entry = value < oversold
+    short_entry = value > overbought
+    events = long_entry.astype(np.int8) - short_entry.astype(np.int8)
+    return _hold_until_next_event(events, long_entry | short_entry | crossed)
+
+
+def momentum_signals(rates, params: Dict[str, Any], compute: IndicatorFn) -> np.ndarray:
+    """Follow the sign of the close-to-close change over ``lookback`` bars"""
+    close = rates["close"]
+    lookback = int(params.get("lookback", 20))
+    signal = np.zeros(len(close), dtype=np.int8)
+    if 0 < lookback < len(close):
+        signal[lookback:] = np.sign(close[lookback:] - close[:-lookback])
+    return signal
+
+
+def breakout_signals(rates, params: Dict[str, Any], compute: IndicatorFn) -> np.ndarray:
+    """Donchian channel breakout: enter on a close beyond the prior N-bar range"""
+    high, low, close = rates["high"], rates["low"], rates["close"]
+    period = int(params.get("period", 20))
+    n = len(close)
+    events = np.zeros(n, dtype=np.int8)
+    has_event = np.zeros(n, dtype=bool)
+    if 0 < period < n:
+        upper = sliding_window_view(high, period).max(axis=1)[:-1]
+        lower = sliding_window_view(low, period).min(axis=1)[:-1]
+        long_entry = close[period:] > upper
+        short_entry = close[period:] < lower
+        events[period:] = long_entry.astype(np.int8) - short_entry.astype(np.int8)
+        has_event[period:] = long_entry | short_entry
+    return _hold_until_next_event(events, has_event)
+
+
+SIGNAL_GENERATORS: Dict[str, Callable[[Any, Dict[str, Any], IndicatorFn], np.ndarray]] = {
+    "sma_crossover": sma_crossover_signals,
+    "ema_crossover": ema_crossover_signals,
+    "rsi_reversion": rsi_reversion_signals,
+    "momentum": momentum_signals,
+    "breakout": breakout_signals,
+}
+
+
+def generate_signals(
+    rates,
+    params: Dict[str, Any],
+    compute: Optional[IndicatorFn] = None
+) -> np.ndarray:
+    """
+    Compute the target position (-1, 0, 1) decided at the close of each bar
+
+    Args:
+        rates: OHLC columns
+        params: Strategy parameters; ``type`` selects the signal generator
+        compute: Indicator lookup, e.g. a bound IndicatorCache; computes
+            directly if None
+
+    Returns:
+        np.ndarray: Target position per bar
+    """
+    strategy_type = params.get("type", "sma_crossover")
+    generator = SIGNAL_GENERATORS.get(strategy_type)
+    if generator is None:
+        raise ValueError(f"Unknown strategy type: {strategy_type}")
+
+    if compute is None:
+        def compute(name: str, **indicator_params) -> Any:
+            return indicators.compute(name, rates, **indicator_params)
+
+    signal = generator(rates, params, compute)
+    if not params.get("allow_short", True):
+        signal = np.maximum(signal, 0)
+    return signal
+
+
+def simulate(
+    rates,
+    signal: np.ndarray,
+    initial_capital: float,
+    params: Optional[Dict[str, Any]] = None,
+    include_trades: bool = True
+) -> Dict[str, Any]:
+    """
+    Simulate fills, equity and statistics for a target position series
+
+    A signal generated at the close of bar ``i`` is filled at the open of
+    bar ``i + 1``. Any position still open at the end is closed at the last
+    close.
+
+    Args:
+        rates: OHLC columns
+        signal: Target position per bar
+        initial_capital: Starting equity
+        params: Strategy parameters (``position_size``, ``cost``)
+        include_trades: Build the per-trade list and equity curve
+
+    Returns:
+        dict: Backtest statistics
+    """
+    params = params or {}
+    open_ = np.asarray(rates["open"], dtype=np.float64)
+    close = np.asarray(rates["close"], dtype=np.float64)
+    times = np.asarray(rates["time"], dtype=np.int64)
+    n = len(close)
+
+    size = float(params.get("position_size") or initial_capital / close[0])
+    cost = float(params.get("cost", 0.0))
+
+    position = np.zeros(n, dtype=np.float64)
+    position[1:] = signal[:-1]
+    prev_position = np.zeros(n, dtype=np.float64)
+    prev_position[1:] = position[:-1]
+    prev_close = np.empty(n, dtype=np.float64)
+    prev_close[0] = open_[0]
+    prev_close[1:] = close[:-1]
+
+    # The overnight gap belongs to the position held into the bar, the
+    # open-to-close move to the position held during the bar.
+    pnl = size * (prev_position * (open_ - prev_close) + position * (close - open_))
+    pnl -= size * cost * np.abs(position - prev_position)
+    pnl[-1] -= size * cost * abs(position[-1])
+
+    equity = initial_capital + np.cumsum(pnl)
+
+    # Trades are the runs of constant non-zero position
+    boundaries = np.flatnonzero(position != prev_position)
+    run_side = position[boundaries]
+    run_end = np.append(boundaries[1:], n)
+    is_trade = run_side != 0
+    entry_idx = boundaries[is_trade]
+    exit_idx = run_end[is_trade]
+    side = run_side[is_trade]
+    closed_in_data = exit_idx < n
+    entry_price = open_[entry_idx]
+    exit_price = np.where(closed_in_data, open_[np.minimum(exit_idx, n - 1)], close[-1])
+    trade_pnl = side * size * (exit_price - entry_price) - 2 * size * cost
+
+    total_trades = int(len(trade_pnl))
+    winning_trades = int(np.count_nonzero(trade_pnl > 0))
+
+    equity_before = np.empty(n, dtype=np.float64)
+    equity_before[0] = initial_capital
+    equity_before[1:] = equity[:-1]
+    returns = pnl / equity_before
+    risk = equity_statistics(times, equity, returns, initial_capital)
+
+    final_capital = float(equity[-1])
+    results = {
+        "bars": n,
+        "initial_capital": initial_capital,
+        "final_capital": final_capital,
+        "total_return": final_capital / initial_capital - 1.0,
+        "total_trades": total_trades,
+        "winning_trades": winning_trades,
+        "losing_trades": total_trades - winning_trades,
+        "win_rate": winning_trades / total_trades if total_trades else 0.0,
+        **risk,
+    }
+
+    if include_trades:
+        exit_time = np.where(closed_in_data, times[np.minimum(exit_idx, n - 1)], times[-1])
+        results["trades"] = [
+            {
+                "entry_time": int(t0),
+                "exit_time": int(t1),
+                "side": "buy" if s > 0 else "sell",
+                "entry_price": p0,
+                "exit_price": p1,
+                "profit": pr,
+            }
+            for t0, t1, s, p0, p1, pr in zip(
+                times[entry_idx].tolist(),
+                exit_time.tolist(),
+                side.tolist(),
+                entry_price.tolist(),
+                exit_price.tolist(),
+                trade_pnl.tolist(),
+            )
+        ]
+        step = max(1, n // EQUITY_CURVE_POINTS)
+        results["equity_curve"] = {
+            "time": times[::step].tolist(),
+            "equity": equity[::step].tolist(),
+        }
+
+    return results
+
+
+def run(
+    rates,
+    params: Dict[str, Any],
+    initial_capital: float,
+    include_trades: bool = True,
+    compute: Optional[IndicatorFn] = None,
+    progress: Optional[Callable[[float], None]] = None
+) -> Dict[str, Any]:
+    """
+    Generate signals and simulate them over ``rates``
+
+    Args:
+        rates: OHLC columns
+        params: Strategy parameters
+        initial_capital: Starting equity
+        include_trades: Build the per-trade list and equity curve
+        compute: Indicator lookup passed to the signal generator
+        progress: Called with the completed fraction between stages
+
+    Returns:
+        dict: Backtest statistics
+    """
+    if len(rates["close"]) < 2:
+        raise ValueError("At least two bars are required")
+    signal = generate_signals(rates, params, compute)
+    if progress:
+        progress(0.5)
+    return simulate(rates, signal, initial_capital, params, include_trades)
@@ -1,14 +1,31 @@
-"""Backtester service stub"""
+"""Backtester service"""
 
+import calendar
 import logging
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+import time
+from typing import Dict, Any, Callable, Iterator, List, Optional
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import backtest_engine, robustness, sweep
+from app.services.market_data import market_data_store
 
 logger = logging.getLogger(__name__)
 
+# mt5.TIMEFRAME_H1
+DEFAULT_TIMEFRAME = 16385
+
+MODE_BARS = "bars"
+MODE_TICKS = "ticks"
+
+# Gap between the requested start and the first stored tick worth a warning
+TICK_COVERAGE_TOLERANCE = timedelta(days=1)
+
 
 class Backtester:
-    """Backtesting engine stub for strategy testing"""
+    """Backtesting engine for strategy testing"""
     
     def __init__(self):
         self.strategies = {}
@@ -33,23 +50,99 @@ class Backtester:
             logger.error(f"Failed to add strategy: {e}")
             return False
     
+    def load_rates(
+        self,
+        symbol: str,
+        timeframe: int,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Load OHLC bars for a backtest from the local market data store
+        
+        Args:
+            symbol: Symbol to backtest
+            timeframe: Timeframe (mt5.TIMEFRAME_*)
+            start_date: Backtest start date
+            end_date: Backtest end date
+            
+        Returns:
+            dict: Column name to memory-mapped array or None if unavailable
+        """
+        return market_data_store.load_rates(symbol, timeframe, start_date, end_date)
+    
+    def load_ticks(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Load stored ticks for a tick-replay backtest, backfilling history
+        older than the store holds
+        
+        Args:
+            symbol: Symbol to backtest
+            start_date: Backtest start date
+            end_date: Backtest end date
+            
+        Returns:
+            dict: Column name to memory-mapped array or None if unavailable
+        """
+        return market_data_store.load_ticks(symbol, start_date, end_date)
+    
+    def _prepare_rates(
+        self,
+        symbol: str,
+        timeframe: int,
+        start_date: datetime,
+        end_date: datetime,
+        rates: Optional[np.ndarray] = None
+    ) -> Optional[np.ndarray]:
+        """Load rates if not given and restrict them to the backtest window"""
+        if rates is None:
+            rates = self.load_rates(symbol, timeframe, start_date, end_date)
+        if rates is None:
+            return None
+        return backtest_engine.slice_by_time(
+            rates,
+            calendar.timegm(start_date.utctimetuple()),
+            calendar.timegm(end_date.utctimetuple())
+        )
+    
     def run_backtest(
         self,
         strategy_id: str,
         symbol: str,
         start_date: datetime,
         end_date: datetime,
-        initial_capital: float = 10000.0
+        initial_capital: float = 10000.0,
+        timeframe: int = DEFAULT_TIMEFRAME,
+        rates: Optional[np.ndarray] = None,
+        progress: Optional[Callable[[float], None]] = None,
+        mode: str = MODE_BARS,
+        ticks: Optional[Dict[str, np.ndarray]] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Run backtest for a strategy
         
+        In "bars" mode signals fill at the next bar open. In "ticks" mode
+        stored ticks are replayed: signals are decided on bars built from the
+        ticks (``bar_seconds`` parameter) and filled against bid/ask with
+        slippage, stop/limit triggers and partial fills (see tick_engine).
+        
         Args:
             strategy_id: Strategy identifier
             symbol: Symbol to backtest
             start_date: Backtest start date
             end_date: Backtest end date
             initial_capital: Initial capital amount
+            timeframe: Bar timeframe (mt5.TIMEFRAME_*)
+            rates: OHLC bars in the mt5.copy_rates_* layout; loaded from the local
+                market data store if omitted
+            progress: Called with the completed fraction between stages
+            mode: "bars" or "ticks"
+            ticks: Tick columns for "ticks" mode; loaded from the store if omitted
             
         Returns:
             dict: Backtest results or None if failed
@@ -58,23 +151,32 @@ class Backtester:
             if strategy_id not in self.strategies:
                 logger.error(f"Strategy {strategy_id} not found")
                 return None
+            if mode not in (MODE_BARS, MODE_TICKS):
+                logger.error(f"Unknown backtest mode: {mode}")
+                return None
+            
+            parameters = self.strategies[strategy_id].get("parameters", {})
+            if mode == MODE_TICKS:
+                stats = self._run_ticks(
+                    symbol, start_date, end_date, parameters, initial_capital, ticks, progress
+                )
+            else:
+                stats = self._run_bars(
+                    symbol, timeframe, start_date, end_date, parameters, initial_capital, rates, progress
+                )
+            if stats is None:
+                return None
+            if progress:
+                progress(0.9)
             
-            # Stub implementation - returns placeholder results
             results = {
                 "strategy_id": strategy_id,
                 "symbol": symbol,
+                "mode": mode,
+                "timeframe": timeframe,
                 "start_date": start_date.isoformat(),
                 "end_date": end_date.isoformat(),
-                "initial_capital": initial_capital,
-                "final_capital": initial_capital * 1.15,  # Placeholder
-                "total_return": 0.15,  # 15% return placeholder
-                "total_trades": 42,
-                "winning_trades": 28,
-                "losing_trades": 14,
-                "win_rate": 0.67,
-                "max_drawdown": 0.08,
-                "sharpe_ratio": 1.5,
-                "trades": []  # Placeholder for trade list
+                **stats
             }
             
             self.results[strategy_id] = results
@@ -85,6 +187,382 @@ class Backtester:
             logger.error(f"Backtest failed: {e}")
             return None
     
+    def _run_bars(
+        self,
+        symbol: str,
+        timeframe: int,
+        start_date: datetime,
+        end_date: datetime,
+        parameters: Dict[str, Any],
+        initial_capital: float,
+        rates: Optional[np.ndarray],
+        progress: Optional[Callable[[float], None]]
+    ) -> Optional[Dict[str, Any]]:
+        """Bar-level backtest statistics or None without enough data"""
+        rates = self._prepare_rates(symbol, timeframe, start_date, end_date, rates)
+        if rates is None or len(rates["time"]) < 2:
+            logger.error(f"Not enough price data to backtest {symbol}")
+            return None
+        if progress:
+            progress(0.1)
+        
+        return sweep.backtest_workers.run(
+            rates,
+            parameters,
+            initial_capital,
+            MODE_BARS,
+            symbol,
+            timeframe,
+            self._engine_progress(progress)
+        )
+    
+    def _engine_progress(
+        self,
+        progress: Optional[Callable[[float], None]]
+    ) -> Optional[Callable[[float], None]]:
+        """Map the engine's progress onto the 0.1-0.9 stage of a backtest"""
+        if progress is None:
+            return None
+        return lambda fraction: progress(0.1 + fraction * 0.8)
+    
+    def _run_ticks(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        parameters: Dict[str, Any],
+        initial_capital: float,
+        ticks: Optional[Dict[str, np.ndarray]],
+        progress: Optional[Callable[[float], None]]
+    ) -> Optional[Dict[str, Any]]:
+        """Tick-replay backtest statistics or None without enough data"""
+        if ticks is None:
+            ticks = self.load_ticks(symbol, start_date, end_date)
+        if ticks is None or len(ticks["time_msc"]) < 2:
+            logger.error(f"Not enough tick data to backtest {symbol}")
+            return None
+        if progress:
+            progress(0.1)
+        
+        # The terminal may not hold ticks back to start_date
+        data_start = datetime.utcfromtimestamp(int(ticks["time_msc"][0]) / 1000)
+        data_end = datetime.utcfromtimestamp(int(ticks["time_msc"][-1]) / 1000)
+        if data_start - start_date.replace(tzinfo=None) > TICK_COVERAGE_TOLERANCE:
+            logger.warning(f"{symbol} ticks only available from {data_start.isoformat()}")
+        
+        started = time.perf_counter()
+        stats = sweep.backtest_workers.run(
+            ticks,
+            parameters,
+            initial_capital,
+            MODE_TICKS,
+            symbol,
+            progress=self._engine_progress(progress)
+        )
+        stats["data_start"] = data_start.isoformat()
+        stats["data_end"] = data_end.isoformat()
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Replayed {stats['ticks']} {symbol} ticks in {elapsed:.3f}s "
+            f"({stats['ticks'] / max(elapsed, 1e-9):,.0f} ticks/s)"
+        )
+        return stats
+    
+    def run_sweep(
+        self,
+        strategy_id: str,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        parameter_ranges: Dict[str, Dict[str, Any]],
+        method: str = "grid",
+        samples: int = 100,
+        metric: str = "sharpe_ratio",
+        top_n: int = 20,
+        initial_capital: float = 10000.0,
+        timeframe: int = DEFAULT_TIMEFRAME,
+        seed: Optional[int] = None,
+        rates: Optional[np.ndarray] = None
+    ) -> Optional[Iterator[Dict[str, Any]]]:
+        """
+        Run a parameter sweep for a strategy across a process pool
+        
+        Validation and data loading happen before this returns; the
+        backtests themselves run while the returned iterator is consumed.
+        
+        Args:
+            strategy_id: Strategy identifier
+            symbol: Symbol to backtest
+            start_date: Backtest start date
+            end_date: Backtest end date
+            parameter_ranges: Parameter name to range specification
+            method: "grid", "random" or "lhs"
+            samples: Number of sets for random and Latin hypercube sampling
+            metric: Result field used for ranking
+            top_n: Number of best results in the final ranking
+            initial_capital: Initial capital amount
+            timeframe: Bar timeframe (mt5.TIMEFRAME_*)
+            seed: Random seed for sampling methods
+            rates: OHLC bars; loaded from the local market data store if omitted
+            
+        Returns:
+            iterator: Result events or None if the sweep could not start
+        """
+        try:
+            if strategy_id not in self.strategies:
+                logger.error(f"Strategy {strategy_id} not found")
+                return None
+            
+            if not self._check_sweep_size(parameter_ranges, method, samples):
+                return None
+            parameter_sets = sweep.expand_parameters(parameter_ranges, method, samples, seed)
+            
+            rates = self._prepare_rates(symbol, timeframe, start_date, end_date, rates)
+            if rates is None or len(rates["time"]) < 2:
+                logger.error(f"Not enough price data to backtest {symbol}")
+                return None
+        except Exception as e:
+            logger.error(f"Sweep setup failed: {e}")
+            return None
+        
+        base_parameters = self.strategies[strategy_id].get("parameters", {})
+        return self._stream_sweep(
+            rates,
+            base_parameters,
+            parameter_sets,
+            metric,
+            top_n,
+            initial_capital
+        )
+    
+    def _check_sweep_size(
+        self,
+        parameter_ranges: Dict[str, Dict[str, Any]],
+        method: str,
+        samples: int
+    ) -> bool:
+        """Reject sweeps over SWEEP_MAX_COMBINATIONS before building their parameter sets"""
+        try:
+            combinations = sweep.count_parameters(parameter_ranges, method, samples)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Invalid sweep parameters: {e}")
+            return False
+        if combinations > settings.SWEEP_MAX_COMBINATIONS:
+            logger.error(
+                f"Sweep of {combinations} combinations exceeds "
+                f"limit of {settings.SWEEP_MAX_COMBINATIONS}"
+            )
+            return False
+        return True
+    
+    def _stream_sweep(
+        self,
+        rates,
+        base_parameters: Dict[str, Any],
+        parameter_sets: List[Dict[str, Any]],
+        metric: str,
+        top_n: int,
+        initial_capital: float
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield each result as it completes, then the final ranking"""
+        total = len(parameter_sets)
+        yield {"type": "start", "total": total, "metric": metric}
+        
+        results = []
+        for result in sweep.run_sweep(
+            rates,
+            base_parameters,
+            parameter_sets,
+            initial_capital,
+            settings.SWEEP_MAX_WORKERS or None
+        ):
+            results.append(result)
+            yield {"type": "result", "completed": len(results), "total": total, **result}
+        
+        ranked = sweep.rank_results(results, metric)
+        logger.info(f"Sweep of {total} parameter sets completed")
+        yield {"type": "ranking", "metric": metric, "results": ranked[:top_n]}
+    
+    def run_walk_forward(
+        self,
+        strategy_id: str,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        parameter_ranges: Dict[str, Dict[str, Any]],
+        train_days: float,
+        test_days: float,
+        step_days: Optional[float] = None,
+        anchored: bool = False,
+        method: str = "grid",
+        samples: int = 100,
+        metric: str = "sharpe_ratio",
+        initial_capital: float = 10000.0,
+        timeframe: int = DEFAULT_TIMEFRAME,
+        seed: Optional[int] = None,
+        rates: Optional[np.ndarray] = None,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Run a walk-forward optimization for a strategy
+        
+        The parameter ranges are swept on every train window; the best set
+        is then backtested on the test window that follows it.
+        
+        Args:
+            strategy_id: Strategy identifier
+            symbol: Symbol to backtest
+            start_date: Start of the first train window
+            end_date: End of the last test window
+            parameter_ranges: Parameter name to range specification
+            train_days: Train window length in days
+            test_days: Test window length in days
+            step_days: Offset between windows; defaults to test_days
+            anchored: Keep every train window starting at start_date
+            method: "grid", "random" or "lhs"
+            samples: Number of sets for random and Latin hypercube sampling
+            metric: Result field used to pick each window's parameters
+            initial_capital: Initial capital amount
+            timeframe: Bar timeframe (mt5.TIMEFRAME_*)
+            seed: Random seed for sampling methods
+            rates: OHLC bars; loaded from the local market data store if omitted
+            progress: Called with the completed fraction
+            
+        Returns:
+            dict: Out-of-sample results with per-window details or None if failed
+        """
+        try:
+            if strategy_id not in self.strategies:
+                logger.error(f"Strategy {strategy_id} not found")
+                return None
+            
+            if not self._check_sweep_size(parameter_ranges, method, samples):
+                return None
+            parameter_sets = sweep.expand_parameters(parameter_ranges, method, samples, seed)
+            rates = self._prepare_rates(symbol, timeframe, start_date, end_date, rates)
+            if rates is None or len(rates["time"]) < 2:
+                logger.error(f"Not enough price data to backtest {symbol}")
+                return None
+            
+            windows = robustness.walk_forward_windows(
+                rates["time"], train_days, test_days, step_days, anchored
+            )
+            if not windows:
+                logger.error(f"No complete walk-forward window between {start_date} and {end_date}")
+                return None
+            runs = len(parameter_sets) * len(windows)
+            if runs > settings.SWEEP_MAX_COMBINATIONS:
+                logger.error(
+                    f"Walk-forward of {runs} runs exceeds "
+                    f"limit of {settings.SWEEP_MAX_COMBINATIONS}"
+                )
+                return None
+            
+            base_parameters = self.strategies[strategy_id].get("parameters", {})
+            stats = robustness.walk_forward(
+                rates,
+                base_parameters,
+                parameter_sets,
+                windows,
+                initial_capital,
+                metric,
+                settings.SWEEP_MAX_WORKERS or None,
+                progress
+            )
+            logger.info(f"Walk-forward of {len(windows)} windows completed for strategy {strategy_id}")
+            return {
+                "strategy_id": strategy_id,
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                **stats
+            }
+            
+        except Exception as e:
+            logger.error(f"Walk-forward failed: {e}")
+            return None
+    
+    def run_monte_carlo(
+        self,
+        strategy_id: str,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime,
+        simulations: int = 1000,
+        methods: Optional[List[str]] = None,
+        confidence: Optional[List[float]] = None,
+        initial_capital: float = 10000.0,
+        timeframe: int = DEFAULT_TIMEFRAME,
+        mode: str = MODE_BARS,
+        seed: Optional[int] = None,
+        rates: Optional[np.ndarray] = None,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Backtest a strategy and run a Monte Carlo analysis of its trades
+        
+        Args:
+            strategy_id: Strategy identifier
+            symbol: Symbol to backtest
+            start_date: Backtest start date
+            end_date: Backtest end date
+            simulations: Paths per method
+            methods: "shuffle" and/or "bootstrap"; both if omitted
+            confidence: Quantiles to report; 5%, 50% and 95% if omitted
+            initial_capital: Initial capital amount
+            timeframe: Bar timeframe (mt5.TIMEFRAME_*)
+            mode: Backtest mode, "bars" or "ticks"
+            seed: Random seed
+            rates: OHLC bars; loaded from the local market data store if omitted
+            progress: Called with the completed fraction
+            
+        Returns:
+            dict: Backtest statistics with a ``monte_carlo`` section or None if failed
+        """
+        if simulations > settings.MONTE_CARLO_MAX_SIMULATIONS:
+            logger.error(
+                f"Monte Carlo of {simulations} simulations exceeds "
+                f"limit of {settings.MONTE_CARLO_MAX_SIMULATIONS}"
+            )
+            return None
+        
+        results = self.run_backtest(
+            strategy_id,
+            symbol,
+            start_date,
+            end_date,
+            initial_capital,
+            timeframe,
+            rates,
+            (lambda fraction: progress(fraction * 0.3)) if progress else None,
+            mode
+        )
+        if results is None:
+            return None
+        
+        try:
+            analysis = robustness.monte_carlo(
+                [trade["profit"] for trade in results["trades"]],
+                initial_capital,
+                simulations,
+                methods or robustness.MONTE_CARLO_METHODS,
+                confidence or (0.05, 0.5, 0.95),
+                seed,
+                settings.SWEEP_MAX_WORKERS or None,
+                (lambda fraction: progress(0.3 + fraction * 0.7)) if progress else None
+            )
+        except Exception as e:
+            logger.error(f"Monte Carlo analysis failed: {e}")
+            return None
+        
+        logger.info(f"Monte Carlo analysis completed for strategy {strategy_id}")
+        summary = {
+            name: value for name, value in results.items()
+            if name not in ("trades", "equity_curve")
+        }
+        return {**summary, "monte_carlo": analysis}
+    
     def get_results(self, strategy_id: str) -> Optional[Dict[str, Any]]:
         """
         Get backtest results
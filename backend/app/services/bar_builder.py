@@ -0,0 +1,538 @@
+"""Bars built from the live tick stream
+
+Bar series are named ``"<type>:<size>"``:
+
+- ``time:5``: 5-second bars (any whole number of seconds, so intervals MT5
+  does not offer work as well as ``time:60`` for M1)
+- ``tick:100``: a bar every 100 ticks
+- ``volume:500``: a bar once the ticks' volume reaches 500
+- ``range:0.0005``: a bar once its high - low reaches 0.0005
+- ``renko:0.001``: bricks of 0.001; a reversal needs two bricks' move
+
+Bars are built from the bid, or from the last trade price on symbols that
+report one. Each tick updates the forming bar of every series on its symbol
+in O(1); closed bars go into a fixed-size ring buffer per series and out to
+every consumer (websocket clients, the strategy runtime) as ``bar`` messages.
+Time bars close when the first tick of the next interval arrives.
+
+A new series is warmed up by replaying the newest BAR_WARMUP_TICKS ticks
+from the local market data store. Live bars are built from every tick the
+market feed writes to the tick buffers. Without buffers in this process
+(TICK_BUFFER_SIZE=0, or an API worker of a gateway deployment) only the
+ticks the feed samples every MARKET_FEED_INTERVAL_MS are seen, so tick and
+volume counts of live bars can be lower than the terminal's.
+"""
+
+import asyncio
+import logging
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.market_data import market_data_store, MarketDataStore
+from app.services.market_feed import market_feed, MarketDataPump
+
+logger = logging.getLogger(__name__)
+
+BAR_TYPES = ("time", "tick", "volume", "range", "renko")
+
+BAR_DTYPE = np.dtype([
+    ("time", "<i8"),  # open time in epoch seconds, like MT5 rates
+    ("time_msc", "<i8"),  # first tick
+    ("end_msc", "<i8"),  # last tick
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("tick_volume", "<i8"),
+    ("volume", "<f8"),
+])
+
+# Relative tolerance for price thresholds
+_EPSILON = 1e-9
+
+
+def parse_bar_spec(bars: str) -> Tuple[str, float]:
+    """
+    Parse a bar series name
+
+    Args:
+        bars: ``"<type>:<size>"``, e.g. ``"time:15"``
+
+    Returns:
+        tuple: Bar type and size
+
+    Raises:
+        ValueError: For an unknown type or a bad size
+    """
+    kind, _, size_text = bars.partition(":")
+    if kind not in BAR_TYPES:
+        raise ValueError(f"Unknown bar type {kind!r}; expected one of {', '.join(BAR_TYPES)}")
+    try:
+        size = float(size_text)
+    except ValueError:
+        raise ValueError(f"Bar size must be a number, got {size_text!r}")
+    if not size > 0 or math.isinf(size):
+        raise ValueError("Bar size must be positive")
+    if kind in ("time", "tick") and size != int(size):
+        raise ValueError(f"{kind} bars need a whole number size")
+    return kind, size
+
+
+def bar_key(bars: str) -> str:
+    """Canonical series name, so ``time:5.0`` and ``time:5`` share a series"""
+    kind, size = parse_bar_spec(bars)
+    return f"{kind}:{size:g}"
+
+
+class BarHistory:
+    """Fixed-capacity ring buffer of closed bars"""
+
+    def __init__(self, capacity: int):
+        self._data = np.zeros(capacity, dtype=BAR_DTYPE)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, bar: Tuple) -> None:
+        self._data[self._next] = bar
+        self._next = (self._next + 1) % len(self._data)
+        self._count = min(self._count + 1, len(self._data))
+
+    def to_array(self, count: Optional[int] = None) -> np.ndarray:
+        """
+        Copy of the newest bars, oldest first
+
+        Args:
+            count: Number of bars (default: all)
+
+        Returns:
+            np.ndarray: Structured array with BAR_DTYPE fields
+        """
+        n = self._count if count is None else max(min(count, self._count), 0)
+        start = (self._next - n) % len(self._data)
+        if start + n <= len(self._data):
+            return self._data[start:start + n].copy()
+        return np.concatenate((self._data[start:], self._data[:self._next]))
+
+
+class BarBuilder:
+    """
+    Forming bar and history of one series
+
+    Subclasses decide when a bar closes. The forming bar is a list
+    ``[time_msc, open, high, low, close, tick_volume, volume, end_msc]``.
+    """
+
+    def __init__(self, size: float, capacity: int):
+        self.size = size
+        self.history = BarHistory(capacity)
+        self.bar: Optional[List[Any]] = None
+        self.last_msc = -1
+
+    def update(self, time_msc: int, price: float, volume: float) -> List[Dict[str, Any]]:
+        """
+        Add a tick
+
+        Args:
+            time_msc: Tick time in epoch milliseconds
+            price: Tick price
+            volume: Tick volume
+
+        Returns:
+            list: Bars closed by this tick, oldest first (usually none)
+        """
+        raise NotImplementedError
+
+    def _open(self, start_msc: int, time_msc: int, price: float, volume: float) -> None:
+        self.bar = [start_msc, price, price, price, price, 1, volume, time_msc]
+
+    def _extend(self, time_msc: int, price: float, volume: float) -> None:
+        bar = self.bar
+        if price > bar[2]:
+            bar[2] = price
+        elif price < bar[3]:
+            bar[3] = price
+        bar[4] = price
+        bar[5] += 1
+        bar[6] += volume
+        bar[7] = time_msc
+
+    def _close(self) -> Dict[str, Any]:
+        """Move the forming bar to the history"""
+        start_msc, open_, high, low, close, ticks, volume, end_msc = self.bar
+        self.bar = None
+        return self._record(start_msc, end_msc, open_, high, low, close, ticks, volume)
+
+    def _record(self, start_msc, end_msc, open_, high, low, close, ticks, volume) -> Dict[str, Any]:
+        row = (start_msc // 1000, start_msc, end_msc, open_, high, low, close, ticks, volume)
+        self.history.append(row)
+        return dict(zip(BAR_DTYPE.names, row))
+
+    def forming(self) -> Optional[Dict[str, Any]]:
+        """The bar that is still open, if any"""
+        if self.bar is None:
+            return None
+        start_msc, open_, high, low, close, ticks, volume, end_msc = self.bar
+        return dict(zip(
+            BAR_DTYPE.names,
+            (start_msc // 1000, start_msc, end_msc, open_, high, low, close, ticks, volume)
+        ))
+
+    def replay(self, ticks: Dict[str, np.ndarray]) -> int:
+        """
+        Feed stored ticks through the builder
+
+        Args:
+            ticks: Tick columns (time_msc, bid, last, volume)
+
+        Returns:
+            int: Number of bars closed
+        """
+        prices = np.where(ticks["last"] > 0, ticks["last"], ticks["bid"])
+        valid = prices > 0
+        closed = 0
+        for time_msc, price, volume in zip(
+            ticks["time_msc"][valid].tolist(),
+            prices[valid].tolist(),
+            ticks["volume"][valid].astype(np.float64).tolist()
+        ):
+            closed += len(self.update(time_msc, price, volume))
+        return closed
+
+
+class TimeBarBuilder(BarBuilder):
+    """Bars of ``size`` seconds, aligned to the epoch"""
+
+    def __init__(self, size: float, capacity: int):
+        super().__init__(size, capacity)
+        self.interval_ms = int(size) * 1000
+
+    def update(self, time_msc: int, price: float, volume: float) -> List[Dict[str, Any]]:
+        if time_msc < self.last_msc:
+            return []
+        self.last_msc = time_msc
+        start = time_msc - time_msc % self.interval_ms
+        if self.bar is not None and start <= self.bar[0]:
+            self._extend(time_msc, price, volume)
+            return []
+        closed = [self._close()] if self.bar is not None else []
+        self._open(start, time_msc, price, volume)
+        return closed
+
+
+class TickBarBuilder(BarBuilder):
+    """A bar every ``size`` ticks"""
+
+    def update(self, time_msc: int, price: float, volume: float) -> List[Dict[str, Any]]:
+        if time_msc < self.last_msc:
+            return []
+        self.last_msc = time_msc
+        if self.bar is None:
+            self._open(time_msc, time_msc, price, volume)
+        else:
+            self._extend(time_msc, price, volume)
+        if self.bar[5] >= self.size:
+            return [self._close()]
+        return []
+
+
+class VolumeBarBuilder(BarBuilder):
+    """A bar once the ticks' volume reaches ``size``"""
+
+    def update(self, time_msc: int, price: float, volume: float) -> List[Dict[str, Any]]:
+        if time_msc < self.last_msc:
+            return []
+        self.last_msc = time_msc
+        if self.bar is None:
+            self._open(time_msc, time_msc, price, volume)
+        else:
+            self._extend(time_msc, price, volume)
+        if self.bar[6] >= self.size:
+            return [self._close()]
+        return []
+
+
+class RangeBarBuilder(BarBuilder):
+    """A bar once its high - low reaches ``size``"""
+
+    def update(self, time_msc: int, price: float, volume: float) -> List[Dict[str, Any]]:
+        if time_msc < self.last_msc:
+            return []
+        self.last_msc = time_msc
+        if self.bar is None:
+            self._open(time_msc, time_msc, price, volume)
+            return []
+        self._extend(time_msc, price, volume)
+        if self.bar[2] - self.bar[3] >= self.size * (1 - _EPSILON):
+            return [self._close()]
+        return []
+
+
+class RenkoBuilder(BarBuilder):
+    """
+    Renko bricks of ``size``
+
+    Brick edges sit on multiples of ``size``. A brick in the same direction
+    as the last one needs a move of one brick beyond its close, a reversal a
+    move of one brick beyond its open. A tick that moves several bricks
+    closes all of them; ticks and volume since the previous brick are
+    counted on the first.
+    """
+
+    def __init__(self, size: float, capacity: int):
+        super().__init__(size, capacity)
+        # Edges of the last brick, in bricks
+        self.top: Optional[int] = None
+        self.bottom: Optional[int] = None
+
+    def update(self, time_msc: int, price: float, volume: float) -> List[Dict[str, Any]]:
+        if time_msc < self.last_msc:
+            return []
+        self.last_msc = time_msc
+        if self.top is None:
+            self.top = self.bottom = int(math.floor(price / self.size + _EPSILON))
+        if self.bar is None:
+            self._open(time_msc, time_msc, price, volume)
+        else:
+            self._extend(time_msc, price, volume)
+
+        level = price / self.size
+        closed = []
+        while level >= self.top + 1 - _EPSILON:
+            closed.append(self._brick(self.top, self.top + 1, time_msc))
+            self.bottom, self.top = self.top, self.top + 1
+        while level <= self.bottom - 1 + _EPSILON:
+            closed.append(self._brick(self.bottom, self.bottom - 1, time_msc))
+            self.top, self.bottom = self.bottom, self.bottom - 1
+        return closed
+
+    def _brick(self, open_level: int, close_level: int, time_msc: int) -> Dict[str, Any]:
+        if self.bar is not None:
+            start_msc, ticks, volume = self.bar[0], self.bar[5], self.bar[6]
+            self.bar = None
+        else:
+            start_msc, ticks, volume = time_msc, 0, 0.0
+        open_, close = open_level * self.size, close_level * self.size
+        return self._record(start_msc, time_msc, open_, max(open_, close), min(open_, close), close, ticks, volume)
+
+
+BUILDERS = {
+    "time": TimeBarBuilder,
+    "tick": TickBarBuilder,
+    "volume": VolumeBarBuilder,
+    "range": RangeBarBuilder,
+    "renko": RenkoBuilder,
+}
+
+
+def create_builder(bars: str, capacity: int) -> BarBuilder:
+    """
+    Builder for a bar series name
+
+    Raises:
+        ValueError: If the name is invalid
+    """
+    kind, size = parse_bar_spec(bars)
+    return BUILDERS[kind](size, capacity)
+
+
+class BarAggregator:
+    """Build bar series from the market feed and publish closed bars"""
+
+    def __init__(
+        self,
+        feed: MarketDataPump,
+        store: MarketDataStore,
+        history_size: int,
+        warmup_ticks: int,
+        queue_size: int
+    ):
+        self.feed = feed
+        self.store = store
+        self.history_size = history_size
+        self.warmup_ticks = warmup_ticks
+        self.queue_size = queue_size
+        self.stats = {"ticks": 0, "bars": 0}
+        # symbol -> series name -> builder
+        self._builders: Dict[str, Dict[str, BarBuilder]] = {}
+        self._refs: Dict[Tuple[str, str], int] = {}
+        self._warming: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._consumers: List[asyncio.Queue] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start following ticks; must be called from the event loop"""
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._tick_loop())
+        logger.info("Bar aggregator started")
+
+    async def stop(self) -> None:
+        """Stop following ticks and drop every series"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self.feed.remove_symbols([symbol for symbol, _ in self._refs])
+        self._builders.clear()
+        self._refs.clear()
+        logger.info("Bar aggregator stopped")
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Register a consumer
+
+        Returns:
+            asyncio.Queue: Receives lists of ``bar`` messages; when the
+            consumer falls behind the oldest batch is dropped
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._consumers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._consumers:
+            self._consumers.remove(queue)
+
+    async def add_series(self, symbol: str, bars: str) -> str:
+        """
+        Start building a series, or take another reference to it
+
+        The first reference warms the series up from stored ticks.
+
+        Args:
+            symbol: Symbol name
+            bars: Series name, e.g. ``"time:5"``
+
+        Returns:
+            str: Canonical series name
+
+        Raises:
+            ValueError: If the series name is invalid
+        """
+        key = bar_key(bars)
+        series = (symbol, key)
+        self._refs[series] = self._refs.get(series, 0) + 1
+        if self._refs[series] > 1:
+            warming = self._warming.get(series)
+            if warming is not None:
+                await asyncio.shield(warming)
+            return key
+
+        warming = self._warming[series] = asyncio.get_running_loop().create_future()
+        builder = create_builder(key, self.history_size)
+        try:
+            if self.warmup_ticks > 0:
+                await asyncio.to_thread(self._warm, symbol, builder)
+        except Exception as e:
+            logger.error(f"Failed to warm up {symbol} {key} bars: {e}")
+        finally:
+            del self._warming[series]
+            warming.set_result(None)
+        if series in self._refs:
+            self._builders.setdefault(symbol, {})[key] = builder
+            self.feed.add_symbols([symbol])
+        return key
+
+    def _warm(self, symbol: str, builder: BarBuilder) -> None:
+        ticks = self.store.ticks_tail(symbol, self.warmup_ticks)
+        if ticks is not None:
+            closed = builder.replay(ticks)
+            logger.info(f"Warmed up {symbol} bars from {len(ticks['time_msc'])} ticks ({closed} bars)")
+
+    def remove_series(self, symbol: str, bars: str) -> None:
+        """Release a reference taken with add_series"""
+        key = bar_key(bars)
+        series = (symbol, key)
+        count = self._refs.get(series, 0) - 1
+        if count > 0:
+            self._refs[series] = count
+            return
+        if self._refs.pop(series, None) is None:
+            return
+        builders = self._builders.get(symbol)
+        if builders is not None and builders.pop(key, None) is not None:
+            if not builders:
+                del self._builders[symbol]
+            self.feed.remove_symbols([symbol])
+
+    def history(self, symbol: str, bars: str, count: Optional[int] = None) -> Optional[np.ndarray]:
+        """Closed bars of an active series, oldest first, or None if it is not built"""
+        builder = self._builders.get(symbol, {}).get(bar_key(bars))
+        return builder.history.to_array(count) if builder is not None else None
+
+    def forming(self, symbol: str, bars: str) -> Optional[Dict[str, Any]]:
+        """The open bar of an active series"""
+        builder = self._builders.get(symbol, {}).get(bar_key(bars))
+        return builder.forming() if builder is not None else None
+
+    def series(self) -> List[Dict[str, Any]]:
+        """Active series with their reference counts and stored bars"""
+        return [
+            {
+                "symbol": symbol,
+                "bars": key,
+                "references": self._refs.get((symbol, key), 0),
+                "closed": len(builder.history),
+                "forming": builder.forming()
+            }
+            for symbol, builders in self._builders.items()
+            for key, builder in builders.items()
+        ]
+
+    def on_ticks(self, ticks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Add tick messages from the market feed to their symbols' series
+
+        Returns:
+            list: ``bar`` messages for the bars that closed
+        """
+        messages = []
+        for tick in ticks:
+            builders = self._builders.get(tick["symbol"])
+            if not builders:
+                continue
+            price = tick.get("last") or tick.get("bid")
+            if not price:
+                continue
+            time_msc = tick["time_msc"]
+            volume = tick.get("volume") or 0
+            self.stats["ticks"] += 1
+            for key, builder in builders.items():
+                for bar in builder.update(time_msc, price, volume):
+                    messages.append({"type": "bar", "symbol": tick["symbol"], "bars": key, "bar": bar})
+        self.stats["bars"] += len(messages)
+        return messages
+
+    async def _tick_loop(self) -> None:
+        queue = self.feed.subscribe(every_tick=True)
+        try:
+            while True:
+                ticks = await queue.get()
+                messages = self.on_ticks(ticks)
+                if messages:
+                    self._publish(messages)
+        finally:
+            self.feed.unsubscribe(queue)
+
+    def _publish(self, messages: List[Dict[str, Any]]) -> None:
+        for queue in self._consumers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(messages)
+
+
+# Global bar aggregator instance
+bar_aggregator = BarAggregator(
+    market_feed,
+    market_data_store,
+    settings.BAR_HISTORY_SIZE,
+    settings.BAR_WARMUP_TICKS,
+    settings.MARKET_FEED_QUEUE_SIZE
+)
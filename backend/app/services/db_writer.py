@@ -0,0 +1,168 @@
+"""Batched write-behind pipeline for log tables
+
+Callers append rows with ``db_writer.write`` and return immediately; a
+background task collects rows from an asyncio queue and writes them in one
+transaction per batch, either when ``batch_size`` rows are waiting or
+``flush_interval_ms`` after the first row arrived. Each table in a batch is
+written with a single multi-row INSERT, or with ``COPY`` on PostgreSQL.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.db.database import async_session_maker
+
+logger = logging.getLogger(__name__)
+
+
+def _row(model: Type, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Complete a row with column defaults so every row has the same keys"""
+    row = {}
+    for column in model.__table__.columns:
+        if column.primary_key and column.autoincrement:
+            continue
+        if column.name in values:
+            row[column.name] = values[column.name]
+        elif column.default is not None and column.default.is_callable:
+            row[column.name] = column.default.arg(None)
+        elif column.default is not None:
+            row[column.name] = column.default.arg
+        else:
+            row[column.name] = None
+    return row
+
+
+class BatchWriter:
+    """Write rows to the database in batches from a background task"""
+
+    def __init__(
+        self,
+        session_maker,
+        batch_size: int = 500,
+        flush_interval_ms: int = 250,
+        queue_size: int = 10000,
+        use_copy: bool = False
+    ):
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.queue_size = queue_size
+        self.use_copy = use_copy
+        self.stats = {"written": 0, "batches": 0, "dropped": 0, "failed": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self._overflowing = False
+
+    def start(self) -> None:
+        """Start the flush task; must be called from the event loop"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+        logger.info("Database writer started")
+
+    async def stop(self) -> None:
+        """Flush every queued row and stop the flush task"""
+        if self._task is None:
+            return
+        self._closed = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        logger.info(f"Database writer stopped ({self.stats['written']} rows written)")
+
+    def write(self, model: Type, values: Dict[str, Any]) -> bool:
+        """
+        Queue a row without waiting for the database
+
+        Args:
+            model: ORM model class of the target table
+            values: Column values; missing columns get their defaults
+
+        Returns:
+            bool: False if the row was dropped (writer stopped or queue full)
+        """
+        if self._queue is None or self._closed:
+            self.stats["dropped"] += 1
+            return False
+        try:
+            self._queue.put_nowait((model, _row(model, values)))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            if not self._overflowing:
+                self._overflowing = True
+                logger.warning(f"Database writer queue full, dropping rows (first: {model.__tablename__})")
+            return False
+        self._overflowing = False
+        size = self._queue.qsize()
+        if size == 1 or size >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            if self._queue.empty():
+                if self._closed:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Let the batch fill up unless it is already full
+            if self._queue.qsize() < self.batch_size and not self._closed:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            count = min(self._queue.qsize(), self.batch_size)
+            await self._flush([self._queue.get_nowait() for _ in range(count)])
+
+    async def _flush(self, batch: List[Tuple[Type, Dict[str, Any]]]) -> None:
+        """Write one batch in a single transaction"""
+        tables: Dict[Type, List[Dict[str, Any]]] = {}
+        for model, row in batch:
+            tables.setdefault(model, []).append(row)
+        try:
+            async with self.session_maker() as session:
+                for model, rows in tables.items():
+                    if self.use_copy:
+                        await self._copy(session, model, rows)
+                    else:
+                        await session.execute(insert(model), rows)
+                await session.commit()
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.error(f"Failed to write {len(batch)} queued rows: {e}")
+
+    async def _copy(self, session, model: Type, rows: List[Dict[str, Any]]) -> None:
+        """Bulk load rows with asyncpg's COPY inside the session's transaction"""
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        columns = list(rows[0])
+        await raw.driver_connection.copy_records_to_table(
+            model.__tablename__,
+            records=[tuple(row[name] for name in columns) for row in rows],
+            columns=columns
+        )
+
+
+# Global database writer instance
+db_writer = BatchWriter(
+    async_session_maker,
+    settings.DB_WRITER_BATCH_SIZE,
+    settings.DB_WRITER_FLUSH_INTERVAL_MS,
+    settings.DB_WRITER_QUEUE_SIZE,
+    use_copy=settings.DATABASE_TYPE == "postgresql" and settings.DB_WRITER_USE_COPY
+)
@@ -0,0 +1,186 @@
+"""Incrementally synced deal history
+
+Deals are copied from the terminal into the ``deals`` table. Each sync only
+asks the terminal for deals at or after the newest stored deal time (the
+high-water mark) and inserts the tickets it has not seen, so history
+queries and P&L aggregations run against indexed local rows instead of a
+full ``history_deals_get`` round-trip per request.
+
+The oldest synced time (the low-water mark) is kept per account in
+``deal_sync_state``. Queries reaching further back backfill the missing
+window once, after which it is served locally like the rest.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert, select
+
+from app.core.config import settings
+from app.db.database import async_session_maker
+from app.models.models import Deal, DealSyncState
+from app.services.market_data import SERVER_TIME_MARGIN
+from app.services.mt5_connector import mt5_connector, MT5Connector
+
+logger = logging.getLogger(__name__)
+
+# Columns in the same shape as MT5Connector.history_deals_get returns
+DEAL_COLUMNS = [
+    column.name for column in Deal.__table__.columns
+    if column.name not in ("id", "login")
+]
+
+
+def epoch(value: datetime) -> int:
+    """Epoch seconds of a datetime; naive values are taken as UTC"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class DealHistory:
+    """Keep the deals table in step with the terminal"""
+
+    def __init__(self, connector: MT5Connector, history_days: int, sync_interval: float):
+        self.connector = connector
+        self.history_days = history_days
+        self.sync_interval = sync_interval
+        self.login: Optional[int] = None
+        self._last_sync: Optional[float] = None
+        self._synced_from: Optional[int] = None
+        self._stale = True
+        self._lock = asyncio.Lock()
+
+    def mark_stale(self) -> None:
+        """Force a sync on the next query, e.g. after an order was sent"""
+        self._stale = True
+
+    def covers(self, date_from: datetime) -> bool:
+        """Whether the local history of the synced account reaches back to ``date_from``"""
+        return self._synced_from is not None and epoch(date_from) >= self._synced_from
+
+    async def sync(self, force: bool = False, date_from: Optional[datetime] = None) -> Optional[int]:
+        """
+        Fetch deals newer than the high-water mark, and older than the
+        low-water mark if ``date_from`` reaches further back
+
+        Concurrent callers share one sync; syncs are throttled by
+        DEAL_SYNC_INTERVAL unless forced, marked stale or a backfill is needed.
+        Check ``covers(date_from)`` afterwards: a failed backfill still
+        returns the login.
+
+        Args:
+            force: Ignore the sync interval
+            date_from: Oldest time the caller is about to query
+
+        Returns:
+            int: Account login the local history belongs to, or None if
+            nothing has been synced yet
+        """
+        async with self._lock:
+            fresh = (
+                self._last_sync is not None
+                and time.monotonic() - self._last_sync < self.sync_interval
+            )
+            backfill = date_from is not None and not self.covers(date_from)
+            if fresh and not force and not self._stale and not backfill:
+                return self.login
+
+            account = await self.connector.aio.account_info()
+            if account is None:
+                return self.login
+            login = account["login"]
+
+            async with async_session_maker() as session:
+                high_water = await session.scalar(
+                    select(func.max(Deal.time)).where(Deal.login == login)
+                )
+                state = await session.get(DealSyncState, login)
+                if high_water is None:
+                    start = datetime.now(timezone.utc) - timedelta(days=self.history_days)
+                    if date_from is not None:
+                        start = min(start, datetime.fromtimestamp(epoch(date_from), tz=timezone.utc))
+                    known = set()
+                else:
+                    # Deals in the high-water second may be only partly stored
+                    start = datetime.fromtimestamp(high_water, tz=timezone.utc)
+                    known = set(await session.scalars(
+                        select(Deal.ticket).where(Deal.login == login, Deal.time >= high_water)
+                    ))
+
+                deals = await self._fetch(start, datetime.now(timezone.utc) + SERVER_TIME_MARGIN)
+                if deals is None:
+                    return self.login if self.login == login else None
+                await self._insert(session, login, deals, known)
+
+                if state is None:
+                    # Tables filled before the low-water mark was kept start at their oldest deal
+                    oldest = await session.scalar(select(func.min(Deal.time)).where(Deal.login == login))
+                    synced_from = epoch(start) if high_water is None else min(oldest, epoch(start))
+                    state = DealSyncState(login=login, synced_from=synced_from)
+                    session.add(state)
+                if date_from is not None and epoch(date_from) < state.synced_from:
+                    await self._backfill(session, state, epoch(date_from))
+                await session.commit()
+                synced_from = state.synced_from
+
+            self.login = login
+            self._synced_from = synced_from
+            self._last_sync = time.monotonic()
+            self._stale = False
+            return login
+
+    async def _insert(self, session, login: int, deals: List[Dict[str, Any]], known) -> None:
+        rows = [
+            {"login": login, **{name: deal.get(name) for name in DEAL_COLUMNS}}
+            for deal in deals
+            if deal["ticket"] not in known
+        ]
+        if rows:
+            await session.execute(insert(Deal), rows)
+            logger.info(f"Stored {len(rows)} deals for account {login}")
+
+    async def _backfill(self, session, state: DealSyncState, date_from: int) -> None:
+        """Fetch deals between ``date_from`` and the low-water mark and lower the mark"""
+        deals = await self._fetch(
+            datetime.fromtimestamp(date_from, tz=timezone.utc),
+            datetime.fromtimestamp(state.synced_from, tz=timezone.utc)
+        )
+        if deals is None:
+            logger.error(f"Failed to backfill deals of account {state.login} before {state.synced_from}")
+            return
+        # The window end is inclusive
+        known = set(await session.scalars(
+            select(Deal.ticket).where(Deal.login == state.login, Deal.time >= date_from, Deal.time <= state.synced_from)
+        ))
+        await self._insert(session, state.login, deals, known)
+        state.synced_from = date_from
+
+    async def _fetch(self, date_from: datetime, date_to: datetime) -> Optional[List[Dict[str, Any]]]:
+        """Fetch deals in DEAL_SYNC_WINDOW_DAYS windows, dropping boundary duplicates"""
+        window = timedelta(days=settings.DEAL_SYNC_WINDOW_DAYS)
+        deals: List[Dict[str, Any]] = []
+        seen = set()
+        start = date_from
+        while start < date_to:
+            end = min(start + window, date_to)
+            chunk = await self.connector.aio.history_deals_get(start, end)
+            if chunk is None:
+                return None
+            for deal in chunk:
+                if deal["ticket"] not in seen:
+                    seen.add(deal["ticket"])
+                    deals.append(deal)
+            start = end
+        return deals
+
+
+# Global deal history instance
+deal_history = DealHistory(
+    mt5_connector,
+    settings.DEAL_HISTORY_DAYS,
+    settings.DEAL_SYNC_INTERVAL
+)
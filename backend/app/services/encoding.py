@@ -0,0 +1,136 @@
+"""Column-oriented encoders for rate and tick responses
+
+Arrays are encoded straight from NumPy columns without building a Python
+object per row (except for the backwards-compatible ``records`` format).
+
+Formats:
+
+- ``records``: ``[{"time": "...", "open": ...}, ...]`` with ISO timestamps
+- ``columns``: ``{"time": [...], "open": [...], ...}`` with epoch seconds
+- ``binary``: ``<u4 header length>`` + JSON header + raw little-endian column
+  buffers; the header lists ``name``, ``dtype``, ``offset`` and ``length``
+  of each column, offsets are relative to the end of the header and 8-byte
+  aligned
+- ``arrow``: Arrow IPC stream (requires the optional ``pyarrow`` package)
+"""
+
+import json
+import struct
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+FORMAT_RECORDS = "records"
+FORMAT_COLUMNS = "columns"
+FORMAT_BINARY = "binary"
+FORMAT_ARROW = "arrow"
+
+JSON_MEDIA_TYPE = "application/json"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+FORMATS = (FORMAT_RECORDS, FORMAT_COLUMNS, FORMAT_BINARY, FORMAT_ARROW)
+
+Columns = Dict[str, np.ndarray]
+
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """
+    Pick the response format from a query parameter or the Accept header
+
+    Args:
+        requested: Explicit ``format`` query parameter
+        accept: Accept header value
+
+    Returns:
+        str: One of FORMATS
+    """
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unknown format {requested}; expected one of {', '.join(FORMATS)}")
+        return requested
+    accept = accept or ""
+    if ARROW_MEDIA_TYPE in accept:
+        return FORMAT_ARROW
+    if BINARY_MEDIA_TYPE in accept:
+        return FORMAT_BINARY
+    return FORMAT_RECORDS
+
+
+def _records(columns: Columns):
+    names = list(columns)
+    values = [columns[name].tolist() for name in names]
+    if "time" in columns:
+        index = names.index("time")
+        values[index] = [datetime.utcfromtimestamp(t).isoformat() for t in values[index]]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def _binary(columns: Columns, meta: Dict[str, Any]) -> bytes:
+    layout = []
+    buffers = []
+    offset = 0
+    for name, column in columns.items():
+        data = np.ascontiguousarray(column, dtype=column.dtype.newbyteorder("<"))
+        padding = -offset % 8
+        if padding:
+            buffers.append(b"\0" * padding)
+            offset += padding
+        layout.append({
+            "name": name,
+            "dtype": data.dtype.str,
+            "offset": offset,
+            "length": len(data)
+        })
+        buffers.append(data.tobytes())
+        offset += data.nbytes
+    header = json.dumps({**meta, "columns": layout}).encode()
+    return b"".join([struct.pack("<I", len(header)), header, *buffers])
+
+
+def _arrow(columns: Columns, meta: Dict[str, Any]) -> bytes:
+    if pa is None:
+        raise ValueError("Arrow format requires the pyarrow package")
+    table = pa.table(
+        {name: np.ascontiguousarray(column) for name, column in columns.items()},
+        metadata={key: str(value) for key, value in meta.items()}
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode(
+    columns: Columns,
+    fmt: str,
+    field: str,
+    meta: Dict[str, Any]
+) -> Tuple[bytes, str]:
+    """
+    Encode columns for an HTTP response
+
+    Args:
+        columns: Column name to NumPy array
+        fmt: One of FORMATS
+        field: JSON key holding the data (e.g. "rates", "ticks")
+        meta: Extra top-level fields (e.g. symbol)
+
+    Returns:
+        tuple: Response body and media type
+    """
+    if fmt == FORMAT_BINARY:
+        return _binary(columns, meta), BINARY_MEDIA_TYPE
+    if fmt == FORMAT_ARROW:
+        return _arrow(columns, meta), ARROW_MEDIA_TYPE
+    if fmt == FORMAT_COLUMNS:
+        data = {name: column.tolist() for name, column in columns.items()}
+    else:
+        data = _records(columns)
+    return json.dumps({**meta, field: data}).encode(), JSON_MEDIA_TYPE
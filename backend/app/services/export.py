@@ -0,0 +1,205 @@
+"""Streaming exports as NDJSON, CSV or Parquet
+
+Rows arrive in fixed-size batches (from a server-side database cursor or a
+windowed terminal query) and each batch is serialized and handed to the
+client before the next one is read, so memory use does not grow with the
+size of the export.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Type
+
+from sqlalchemy import DateTime, Float, Integer, Boolean
+
+from app.db.database import async_session_maker
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+FORMAT_PARQUET = "parquet"
+
+# Parquet is only offered when the optional pyarrow package is installed
+EXPORT_FORMATS = (FORMAT_NDJSON, FORMAT_CSV) + ((FORMAT_PARQUET,) if pa is not None else ())
+
+MEDIA_TYPES = {
+    FORMAT_NDJSON: "application/x-ndjson",
+    FORMAT_CSV: "text/csv",
+    FORMAT_PARQUET: "application/vnd.apache.parquet"
+}
+
+Batch = List[Dict[str, Any]]
+
+
+def check_format(fmt: str) -> None:
+    """
+    Raises:
+        ValueError: If the format is unknown or its dependency is missing
+    """
+    if fmt == FORMAT_PARQUET and pa is None:
+        raise ValueError("Parquet export requires the pyarrow package")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format {fmt}; expected one of {', '.join(EXPORT_FORMATS)}")
+
+
+def model_columns(model: Type) -> List[str]:
+    return [column.name for column in model.__table__.columns]
+
+
+def model_schema(model: Type, columns: Optional[List[str]] = None):
+    """Arrow schema matching a model's columns, or the named subset in that order"""
+    table_columns = model.__table__.columns
+    types = []
+    for column in ([table_columns[name] for name in columns] if columns else table_columns):
+        if isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        types.append((column.name, arrow_type))
+    return pa.schema(types)
+
+
+async def query_batches(
+    query,
+    model: Type,
+    batch_size: int,
+    columns: Optional[List[str]] = None
+) -> AsyncIterator[Batch]:
+    """
+    Read a query through a server-side cursor, ``batch_size`` rows at a time
+
+    Args:
+        query: SELECT of ``model``
+        model: ORM model class
+        batch_size: Rows fetched per round-trip
+        columns: Column names to read (defaults to all)
+
+    Yields:
+        list: Row dictionaries keyed by column name
+    """
+    table = model.__table__
+    # Plain column rows skip ORM identity tracking
+    query = query.with_only_columns(*(table.c[name] for name in columns or table.c.keys()))
+    async with async_session_maker() as session:
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
+
+def _text_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _ndjson(batch: Batch) -> bytes:
+    return "".join(
+        json.dumps({key: _text_value(value) for key, value in row.items()}) + "\n"
+        for row in batch
+    ).encode()
+
+
+def _csv(batch: Batch, columns: List[str], header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    for row in batch:
+        writer.writerow([_text_value(row.get(name)) for name in columns])
+    return buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """File object that collects written bytes until they are taken"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_export(
+    batches: AsyncIterator[Batch],
+    fmt: str,
+    columns: Optional[List[str]] = None,
+    schema=None
+) -> AsyncIterator[bytes]:
+    """
+    Serialize batches of rows as they arrive
+
+    Args:
+        batches: Async iterator of row batches
+        fmt: One of EXPORT_FORMATS
+        columns: Column order (CSV header, Parquet schema); taken from the
+            first row if None
+        schema: Arrow schema for Parquet; inferred from the first batch if None
+
+    Yields:
+        bytes: Response body chunks; each Parquet batch becomes a row group
+    """
+    if fmt == FORMAT_NDJSON:
+        async for batch in batches:
+            yield _ndjson(batch)
+        return
+
+    if fmt == FORMAT_CSV:
+        header = True
+        async for batch in batches:
+            if not batch:
+                continue
+            columns = columns or list(batch[0])
+            yield _csv(batch, columns, header)
+            header = False
+        if header and columns:
+            yield _csv([], columns, True)
+        return
+
+    sink = _ChunkSink()
+    writer: Optional["pq.ParquetWriter"] = None
+    try:
+        async for batch in batches:
+            if not batch:
+                continue
+            columns = columns or list(batch[0])
+            data = {name: [row.get(name) for row in batch] for name in columns}
+            if writer is None:
+                table = pa.table(data, schema=schema)
+                schema = table.schema
+                writer = pq.ParquetWriter(sink, schema)
+            else:
+                table = pa.table(data, schema=schema)
+            writer.write_table(table)
+            yield sink.take()
+        if writer is None:
+            schema = schema or pa.schema([(name, pa.string()) for name in columns or []])
+            writer = pq.ParquetWriter(sink, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.take()
+
+
+def export_filename(name: str, fmt: str) -> str:
+    return f"{name}_{datetime.utcnow():%Y%m%dT%H%M%S}.{fmt}"
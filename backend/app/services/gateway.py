@@ -0,0 +1,376 @@
+"""MT5 gateway: the process that owns the terminal, serving API workers
+
+With GATEWAY_ROLE=gateway the process runs everything a single-process
+deployment runs (terminal executor, market feed, tick buffers, market data
+store, position book, strategies, backtests) and additionally listens on
+GATEWAY_ADDRESS (a named pipe on Windows, a Unix socket elsewhere). API
+workers started with GATEWAY_ROLE=worker connect to it and:
+
+- run connector and market data store calls on the gateway (``call``,
+  ``store``), so all terminal traffic still goes through one executor;
+- tell it which symbols their feeds poll (``watch``) and then read those
+  symbols' ticks from the gateway's shared-memory tick buffers;
+- forward the API routes that own state kept in the gateway process
+  (orders, strategies, backtest jobs) as whole HTTP requests (``http``).
+
+See ``app.services.gateway_protocol`` for the transport and message format.
+Each worker connection gets a reader thread that hands requests to the event
+loop and a sender thread that writes the replies.
+"""
+
+import asyncio
+import logging
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import gateway_protocol
+from app.services.market_data import market_data_store, MarketDataStore
+from app.services.market_feed import market_feed, MarketDataPump
+from app.services.mt5_connector import mt5_connector, MT5Connector
+
+logger = logging.getLogger(__name__)
+
+# Store methods workers may call
+STORE_METHODS = {"sync_rates", "load_rates", "rates_tail", "sync_ticks", "read_ticks", "load_ticks", "ticks_tail"}
+
+
+def _plain(value: Any) -> Any:
+    """Turn memory-mapped columns into plain arrays so they pickle by value"""
+    if isinstance(value, dict):
+        return {key: np.asarray(column) if isinstance(column, np.memmap) else column for key, column in value.items()}
+    if isinstance(value, np.memmap):
+        return np.asarray(value)
+    return value
+
+
+class _Response:
+    """Flow control of one forwarded HTTP response"""
+
+    def __init__(self):
+        self.credit = gateway_protocol.HTTP_WINDOW
+        self.changed = asyncio.Event()
+        self.disconnected = False
+        # Set once the response is complete or the client is gone
+        self.closed = asyncio.Event()
+
+    def grant(self, chunks: int) -> None:
+        self.credit += chunks
+        self.changed.set()
+
+    def disconnect(self) -> None:
+        self.disconnected = True
+        self.changed.set()
+        self.closed.set()
+
+    async def acquire(self) -> bool:
+        """Wait for credit for one body chunk; False once the client is gone"""
+        while self.credit <= 0 and not self.disconnected:
+            self.changed.clear()
+            await self.changed.wait()
+        if self.disconnected:
+            return False
+        self.credit -= 1
+        return True
+
+
+class _Connection:
+    """One worker connection"""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.symbols: Set[str] = set()
+        self.tasks: Set[asyncio.Task] = set()
+        self.responses: Dict[int, _Response] = {}
+        self.closed = False
+        # One thread, so frames are written whole and in order
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gateway-send")
+
+    async def send(self, message: gateway_protocol.Message) -> None:
+        """Write a message; waits while the worker is not reading (back-pressure)"""
+        frame = gateway_protocol.encode(message)
+        if self.closed:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._sender, self.conn.send_bytes, frame)
+        except (OSError, EOFError, RuntimeError):
+            # Worker gone; the reader thread closes the connection
+            pass
+
+    def close(self) -> None:
+        self.closed = True
+        self._sender.shutdown(wait=False)
+        self.conn.close()
+
+
+class GatewayServer:
+    """
+    Serve the terminal, market data and stateful API routes to API workers
+
+    Args:
+        address: Named pipe or Unix socket path
+        authkey: Secret workers must prove they hold
+        connector: Connector whose executor runs the terminal calls
+        store: Local market data store
+        feed: Market feed that polls the symbols workers watch
+    """
+
+    def __init__(
+        self,
+        address: str,
+        authkey: bytes,
+        connector: MT5Connector,
+        store: MarketDataStore,
+        feed: MarketDataPump
+    ):
+        self.address = address
+        self.authkey = authkey
+        self.connector = connector
+        self.store = store
+        self.feed = feed
+        self.stats = {"connections": 0, "calls": 0, "errors": 0, "rejected": 0}
+        self._app = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[Listener] = None
+        self._accept_thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._connections: Set[_Connection] = set()
+
+    @property
+    def workers(self) -> int:
+        return len(self._connections)
+
+    async def start(self, app) -> None:
+        """
+        Listen for workers; must be called from the event loop
+
+        Args:
+            app: ASGI application that runs forwarded HTTP requests
+        """
+        if self._listener is not None:
+            return
+        gateway_protocol.check_authkey(self.authkey)
+        self._app = app
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        pipe = gateway_protocol.is_pipe(self.address)
+        if not pipe and os.path.exists(self.address) and stat.S_ISSOCK(os.stat(self.address).st_mode):
+            # Left behind by a gateway that did not shut down cleanly
+            os.unlink(self.address)
+        self._listener = Listener(self.address, authkey=self.authkey)
+        if not pipe:
+            os.chmod(self.address, 0o600)
+        self._accept_thread = threading.Thread(target=self._accept, name="gateway-accept", daemon=True)
+        self._accept_thread.start()
+        logger.info(f"MT5 gateway listening on {self.address}")
+
+    async def stop(self) -> None:
+        """Stop listening and close every worker connection"""
+        if self._listener is None:
+            return
+        self._stopping = True
+        # accept() is not interrupted by closing the listener; wake it with a connection of its own
+        try:
+            await asyncio.to_thread(lambda: Client(self.address, authkey=self.authkey).close())
+        except (OSError, AuthenticationError):
+            pass
+        await asyncio.to_thread(self._accept_thread.join, 5)
+        self._listener.close()
+        self._listener = None
+        for connection in list(self._connections):
+            self._release(connection)
+        logger.info("MT5 gateway stopped")
+
+    def status(self) -> Dict[str, bool]:
+        return {"initialized": self.connector.initialized, "connected": self.connector.connected}
+
+    def _accept(self) -> None:
+        """Accept worker connections (accept thread)"""
+        while True:
+            try:
+                conn = self._listener.accept()
+            except (AuthenticationError, EOFError) as e:
+                # Wrong key, or the client went away during the handshake
+                self.stats["rejected"] += 1
+                logger.warning(f"Rejected MT5 gateway connection: {e}")
+                continue
+            except OSError as e:
+                if self._stopping:
+                    return
+                logger.error(f"MT5 gateway accept error: {e}")
+                time.sleep(gateway_protocol.POLL_INTERVAL)
+                continue
+            if self._stopping:
+                conn.close()
+                return
+            self._loop.call_soon_threadsafe(self._open, conn)
+
+    def _open(self, conn: Connection) -> None:
+        connection = _Connection(conn)
+        self._connections.add(connection)
+        self.stats["connections"] += 1
+        threading.Thread(target=self._read, args=(connection,), name="gateway-read", daemon=True).start()
+        logger.info(f"Worker connected to MT5 gateway ({len(self._connections)} connected)")
+
+    def _read(self, connection: _Connection) -> None:
+        """Hand a connection's requests to the event loop (reader thread)"""
+        try:
+            while not connection.closed:
+                if connection.conn.poll(gateway_protocol.POLL_INTERVAL):
+                    message = gateway_protocol.decode(connection.conn.recv_bytes())
+                    self._loop.call_soon_threadsafe(self._spawn, connection, message)
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"MT5 gateway connection error: {e}")
+        try:
+            self._loop.call_soon_threadsafe(self._release, connection)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def _spawn(self, connection: _Connection, message: gateway_protocol.Message) -> None:
+        if connection.closed:
+            return
+        _, kind, payload = message
+        if kind in ("credit", "cancel"):
+            response = connection.responses.get(payload[0])
+            if response is not None:
+                if kind == "credit":
+                    response.grant(payload[1])
+                else:
+                    response.disconnect()
+            return
+        task = asyncio.create_task(self._handle(connection, *message))
+        connection.tasks.add(task)
+        task.add_done_callback(connection.tasks.discard)
+
+    def _release(self, connection: _Connection) -> None:
+        """Drop a connection and everything it requested (event loop)"""
+        if connection not in self._connections:
+            return
+        self._connections.discard(connection)
+        for task in list(connection.tasks):
+            task.cancel()
+        if connection.symbols:
+            self.feed.remove_symbols(connection.symbols)
+        connection.close()
+        logger.info(f"Worker disconnected from MT5 gateway ({len(self._connections)} connected)")
+
+    async def _handle(self, connection: _Connection, request_id: int, kind: str, payload: tuple) -> None:
+        self.stats["calls"] += 1
+        try:
+            if kind == "http":
+                await self._http(connection, request_id, *payload)
+                return
+            if kind == "call":
+                value = await self._call(*payload)
+            elif kind == "store":
+                value = await self._store(*payload)
+            elif kind == "watch":
+                value = self._watch(connection, *payload)
+            elif kind == "status":
+                value = None
+            else:
+                raise ValueError(f"Unknown gateway request: {kind}")
+            await connection.send((request_id, "result", (value, self.status())))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["errors"] += 1
+            await connection.send((request_id, "error", (type(e).__name__, str(e))))
+
+    async def _call(self, name: str, args: tuple, kwargs: dict) -> Any:
+        method = getattr(type(self.connector), name, None)
+        if getattr(method, "mt5_priority", None) is None:
+            raise ValueError(f"Not a connector call: {name}")
+        return await getattr(self.connector.aio, name)(*args, **kwargs)
+
+    async def _store(self, name: str, args: tuple, kwargs: dict) -> Any:
+        if name not in STORE_METHODS:
+            raise ValueError(f"Not a market data store call: {name}")
+        return _plain(await asyncio.to_thread(getattr(self.store, name), *args, **kwargs))
+
+    def _watch(self, connection: _Connection, symbols) -> None:
+        symbols = set(symbols)
+        added = symbols - connection.symbols
+        removed = connection.symbols - symbols
+        connection.symbols = symbols
+        if added:
+            self.feed.add_symbols(added)
+        if removed:
+            self.feed.remove_symbols(removed)
+
+    async def _http(self, connection: _Connection, request_id: int, request: Dict[str, Any], body: bytes) -> None:
+        """
+        Run a forwarded API request on the gateway's app, streaming the response back
+
+        Body chunks wait for the worker's credit; a cancel from the worker
+        (client gone) is reported to the app as ``http.disconnect``.
+        """
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "client": None,
+            "server": None,
+            "extensions": {},
+            "state": {},
+            **request
+        }
+        response = connection.responses[request_id] = _Response()
+        received = False
+        started = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await response.closed.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                await connection.send((request_id, "start", (message["status"], message.get("headers", []))))
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                if chunk:
+                    if not await response.acquire():
+                        # Client gone; like a server, drop the rest of the response
+                        return
+                    await connection.send((request_id, "body", chunk))
+                if not message.get("more_body", False):
+                    response.closed.set()
+                    await connection.send((request_id, "end", None))
+
+        try:
+            await self._app(scope, receive, send)
+        except Exception as e:
+            logger.error(f"Forwarded request {request.get('method')} {request.get('path')} failed: {e}")
+            if started:
+                await connection.send((request_id, "end", None))
+            else:
+                await connection.send((request_id, "error", (type(e).__name__, str(e))))
+        finally:
+            response.closed.set()
+            connection.responses.pop(request_id, None)
+
+
+# Global MT5 gateway instance
+gateway_server = GatewayServer(
+    settings.GATEWAY_ADDRESS,
+    gateway_protocol.authkey(),
+    mt5_connector,
+    market_data_store,
+    market_feed
+)
@@ -0,0 +1,516 @@
+"""API worker side of the MT5 gateway
+
+With GATEWAY_ROLE=worker the global connector and market data store are
+replaced by the proxies below, so the rest of the application is unchanged:
+connector calls and store reads run on the gateway (see
+``app.services.gateway``), the worker's market feed reads ticks from the
+gateway's shared-memory tick buffers, and ``GatewayRoutes`` forwards the API
+routes whose state lives in the gateway process.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import queue
+import threading
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import gateway_protocol
+from app.services.mt5_connector import MT5Connector
+from app.services.mt5_executor import MT5CallTimeout
+from app.services.tick_buffer import tick_buffers, TickBuffers
+
+logger = logging.getLogger(__name__)
+
+DISCONNECTED = {"initialized": False, "connected": False}
+
+
+class GatewayError(RuntimeError):
+    """A request failed on the gateway"""
+
+
+def _settle(future: Future, value: Any = None, error: Optional[BaseException] = None) -> None:
+    """Resolve a future unless its caller already gave up on it"""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+    except InvalidStateError:
+        pass
+
+
+class GatewayClient:
+    """
+    Connection of an API worker to the gateway
+
+    Reconnects until stopped. Requests can be sent from any thread; a writer
+    thread sends them and a reader thread hands the replies to the event
+    loop. While the gateway is unreachable requests fail with
+    MT5CallTimeout, which the API already reports as an unavailable terminal.
+
+    Args:
+        address: Gateway named pipe or Unix socket path
+        authkey: Secret shared with the gateway
+        status_interval: Seconds between terminal status refreshes
+        retry_delay: Seconds between connection attempts
+    """
+
+    def __init__(self, address: str, authkey: bytes, status_interval: float, retry_delay: float = 1.0):
+        self.address = address
+        self.authkey = authkey
+        self.status_interval = status_interval
+        self.retry_delay = retry_delay
+        self.status: Dict[str, bool] = dict(DISCONNECTED)
+        self.on_status: Optional[Callable[[Dict[str, bool]], None]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._outbox: Optional[queue.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ids = itertools.count(1)
+        self._futures: Dict[int, Future] = {}
+        self._streams: Dict[int, asyncio.Queue] = {}
+        self._watch: Optional[List[str]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._outbox is not None
+
+    def start(self) -> None:
+        """
+        Connect in the background; must be called from the event loop
+
+        Raises:
+            RuntimeError: If GATEWAY_AUTHKEY is missing or the default SECRET_KEY
+        """
+        if self._task is not None:
+            return
+        gateway_protocol.check_authkey(self.authkey)
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    # Requests --------------------------------------------------------------
+
+    def _send(
+        self,
+        kind: str,
+        payload: tuple,
+        future: Optional[Future] = None,
+        stream: Optional[asyncio.Queue] = None
+    ) -> Optional[int]:
+        """Queue a request whose replies go to ``future`` or ``stream``; returns its id, None if not connected"""
+        with self._lock:
+            if self._outbox is None:
+                return None
+            request_id = next(self._ids)
+            frame = gateway_protocol.encode((request_id, kind, payload))
+            if future is not None:
+                self._futures[request_id] = future
+            if stream is not None:
+                self._streams[request_id] = stream
+            self._outbox.put((request_id, frame))
+        return request_id
+
+    def submit(self, kind: str, *payload: Any) -> Future:
+        """
+        Send a request without waiting for it (any thread)
+
+        Returns:
+            Future: Resolves with the reply's value
+        """
+        future: Future = Future()
+        if self._send(kind, payload, future=future) is None:
+            label = payload[0] if kind in ("call", "store") else kind
+            future.set_exception(MT5CallTimeout(f"{label} failed: gateway not connected"))
+        return future
+
+    async def call(self, kind: str, *payload: Any, timeout: Optional[float] = None) -> Any:
+        """Send a request and await its reply"""
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self.submit(kind, *payload)), timeout)
+        except MT5CallTimeout:
+            raise
+        except asyncio.TimeoutError:
+            raise MT5CallTimeout(f"{kind} timed out")
+
+    def call_sync(self, kind: str, *payload: Any, timeout: Optional[float] = None) -> Any:
+        """Send a request and wait for its reply; must not be called from the event loop"""
+        try:
+            return self.submit(kind, *payload).result(timeout)
+        except MT5CallTimeout:
+            raise
+        except FutureTimeoutError:
+            raise MT5CallTimeout(f"{kind} timed out")
+
+    def watch(self, symbols: List[str]) -> None:
+        """Have the gateway poll and buffer these symbols (replaces the previous set)"""
+        self._watch = sorted(symbols)
+        self._send("watch", (self._watch,))
+
+    async def forward(self, request: Dict[str, Any], body: bytes, send: Callable, receive: Callable) -> None:
+        """
+        Run an HTTP request on the gateway's app and relay the response
+
+        Each body chunk passed on to the client returns one credit to the
+        gateway, so at most HTTP_WINDOW chunks wait here for a slow client.
+        A client that goes away cancels the request on the gateway.
+
+        Args:
+            request: ASGI scope fields of the request
+            body: Request body
+            send: ASGI send callable of the worker's connection
+            receive: ASGI receive callable, read for ``http.disconnect``
+        """
+        stream: asyncio.Queue = asyncio.Queue()
+        request_id = self._send("http", (request, body), stream=stream)
+        if request_id is None:
+            await _error_response(send, 503, "MT5 gateway not connected")
+            return
+
+        async def watch_disconnect() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            stream.put_nowait(("disconnect", None))
+
+        watcher = asyncio.create_task(watch_disconnect())
+        started = False
+        finished = False
+        try:
+            while True:
+                kind, payload = await stream.get()
+                if kind == "start":
+                    started = True
+                    status, headers = payload
+                    await send({"type": "http.response.start", "status": status, "headers": headers})
+                elif kind == "body":
+                    await send({"type": "http.response.body", "body": payload, "more_body": True})
+                    self._send("credit", (request_id, 1))
+                elif kind == "end":
+                    finished = True
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                    return
+                elif kind == "disconnect":
+                    return
+                else:
+                    finished = True
+                    if started:
+                        await send({"type": "http.response.body", "body": b"", "more_body": False})
+                    else:
+                        await _error_response(send, 502, f"MT5 gateway: {payload[1]}")
+                    return
+        finally:
+            watcher.cancel()
+            with self._lock:
+                self._streams.pop(request_id, None)
+            if not finished:
+                self._send("cancel", (request_id,))
+
+    # Connection ------------------------------------------------------------
+
+    def _fail(self, request_id: int, error: BaseException) -> None:
+        """Fail a request (event loop)"""
+        with self._lock:
+            future = self._futures.pop(request_id, None)
+            stream = self._streams.get(request_id)
+        if future is not None:
+            _settle(future, error=error)
+        if stream is not None:
+            stream.put_nowait(("error", (type(error).__name__, str(error))))
+
+    def _set_status(self, status: Dict[str, bool]) -> None:
+        if status != self.status:
+            self.status = status
+            if self.on_status is not None:
+                self.on_status(status)
+
+    def _dispatch(self, request_id: int, kind: str, payload: Any) -> None:
+        """Route a reply to its request (event loop)"""
+        with self._lock:
+            stream = self._streams.get(request_id)
+            future = self._futures.pop(request_id, None) if stream is None else None
+        if stream is not None:
+            stream.put_nowait((kind, payload))
+            return
+        if kind == "result":
+            value, status = payload
+            self._set_status(status)
+            if future is not None:
+                _settle(future, value)
+        elif kind == "error" and future is not None:
+            name, message = payload
+            if name == MT5CallTimeout.__name__:
+                _settle(future, error=MT5CallTimeout(message))
+            else:
+                _settle(future, error=GatewayError(f"{name}: {message}"))
+
+    def _write(self, conn: Connection, outbox: queue.Queue) -> None:
+        """Send queued requests until the connection ends (writer thread)"""
+        while True:
+            item = outbox.get()
+            if item is None:
+                return
+            request_id, frame = item
+            try:
+                conn.send_bytes(frame)
+            except (OSError, EOFError) as e:
+                self._loop.call_soon_threadsafe(self._fail, request_id, MT5CallTimeout(f"gateway connection lost: {e}"))
+
+    def _read(self, conn: Connection, stop: threading.Event, closed: asyncio.Future) -> None:
+        """Hand replies to the event loop until the connection ends (reader thread)"""
+        try:
+            while not stop.is_set():
+                if conn.poll(gateway_protocol.POLL_INTERVAL):
+                    self._loop.call_soon_threadsafe(self._dispatch, *gateway_protocol.decode(conn.recv_bytes()))
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            logger.error(f"MT5 gateway connection error: {e}")
+        try:
+            self._loop.call_soon_threadsafe(lambda: closed.done() or closed.set_result(None))
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    async def _poll_status(self) -> None:
+        while True:
+            try:
+                await self.call("status", timeout=self.status_interval * 5)
+            except (MT5CallTimeout, GatewayError) as e:
+                logger.warning(f"MT5 gateway status {e}")
+            await asyncio.sleep(self.status_interval)
+
+    async def _run(self) -> None:
+        warned = False
+        while True:
+            try:
+                conn = await asyncio.to_thread(Client, self.address, authkey=self.authkey)
+            except (OSError, EOFError, AuthenticationError) as e:
+                if not warned:
+                    logger.warning(f"MT5 gateway not reachable at {self.address}: {e}")
+                    warned = True
+                await asyncio.sleep(self.retry_delay)
+                continue
+            warned = False
+            outbox: queue.Queue = queue.Queue()
+            stop = threading.Event()
+            closed = self._loop.create_future()
+            threads = [
+                threading.Thread(target=self._write, args=(conn, outbox), name="gateway-client-write", daemon=True),
+                threading.Thread(target=self._read, args=(conn, stop, closed), name="gateway-client-read", daemon=True)
+            ]
+            for thread in threads:
+                thread.start()
+            with self._lock:
+                self._outbox = outbox
+            logger.info(f"Connected to MT5 gateway at {self.address}")
+            if self._watch is not None:
+                self._send("watch", (self._watch,))
+            status_task = asyncio.create_task(self._poll_status())
+            try:
+                await closed
+                logger.warning("Lost connection to MT5 gateway")
+            finally:
+                status_task.cancel()
+                with self._lock:
+                    self._outbox = None
+                    pending = list(self._futures) + list(self._streams)
+                outbox.put(None)
+                stop.set()
+                for thread in threads:
+                    await asyncio.to_thread(thread.join, 1)
+                conn.close()
+                for request_id in pending:
+                    self._fail(request_id, MT5CallTimeout("gateway connection lost"))
+                self._set_status(dict(DISCONNECTED))
+            await asyncio.sleep(self.retry_delay)
+
+
+async def _error_response(send: Callable, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class GatewayConnector(MT5Connector):
+    """
+    MT5Connector of an API worker
+
+    Every executor-backed method is sent to the gateway, with the worker's
+    call cache and timeouts applied on top of the gateway's. ``latest_ticks``
+    reads the gateway's shared-memory tick buffers instead, so the worker's
+    market feed polls without any request. ``initialized``/``connected``
+    mirror the gateway's terminal connection.
+
+    Args:
+        client: Connection to the gateway
+        buffers: Tick buffers attached to the gateway's rings
+    """
+
+    def __init__(self, client: GatewayClient, buffers: TickBuffers = tick_buffers):
+        super().__init__()
+        self.client = client
+        self.buffers = buffers
+        client.on_status = self._on_status
+
+    def _on_status(self, status: Dict[str, bool]) -> None:
+        self.initialized = status["initialized"]
+        self.connected = status["connected"]
+
+    def _dispatch(self, priority: int, method, args: tuple, kwargs: dict) -> Future:
+        return self.client.submit("call", method.__name__, args, kwargs)
+
+    def watch_symbols(self, symbols: List[str]) -> None:
+        self.client.watch(symbols)
+
+    def latest_ticks(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the current tick of several symbols from the gateway's tick buffers
+
+        Args:
+            symbols: Symbol names
+
+        Returns:
+            dict: Symbol name to tick dictionary; symbols the gateway does not
+            (yet) buffer are omitted
+        """
+        ticks = {}
+        for symbol in symbols:
+            tick = self.buffers.latest(symbol)
+            if tick is not None:
+                ticks[symbol] = tick
+        return ticks
+
+
+class RemoteMarketDataStore:
+    """
+    MarketDataStore of an API worker; every read runs on the gateway's store
+
+    Failures, including an unreachable gateway, are logged and reported like
+    the store reports them (None or False).
+
+    Args:
+        client: Connection to the gateway
+        timeout: Seconds to wait for a reply
+    """
+
+    def __init__(self, client: GatewayClient, timeout: float = settings.MT5_HISTORY_TIMEOUT):
+        self.client = client
+        self.timeout = timeout
+
+    def _call(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return self.client.call_sync("store", name, args, kwargs, timeout=self.timeout)
+        except MT5CallTimeout as e:
+            logger.error(f"Market data store {e}")
+            return None
+        except GatewayError as e:
+            logger.error(f"Market data store {name} failed on gateway: {e}")
+            return None
+
+    def sync_rates(self, symbol: str, timeframe: int, force: bool = False) -> bool:
+        return bool(self._call("sync_rates", symbol, timeframe, force))
+
+    def load_rates(
+        self,
+        symbol: str,
+        timeframe: int,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Dict[str, np.ndarray]]:
+        return self._call("load_rates", symbol, timeframe, start_date, end_date)
+
+    def rates_tail(
+        self,
+        symbol: str,
+        timeframe: int,
+        count: int,
+        start_pos: int = 0
+    ) -> Optional[Dict[str, np.ndarray]]:
+        return self._call("rates_tail", symbol, timeframe, count, start_pos)
+
+    def sync_ticks(self, symbol: str, force: bool = False) -> bool:
+        return bool(self._call("sync_ticks", symbol, force))
+
+    def read_ticks(
+        self,
+        symbol: str,
+        start_msc: Optional[int] = None,
+        end_msc: Optional[int] = None
+    ) -> Optional[Dict[str, np.ndarray]]:
+        return self._call("read_ticks", symbol, start_msc, end_msc)
+
+    def load_ticks(
+        self,
+        symbol: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Dict[str, np.ndarray]]:
+        return self._call("load_ticks", symbol, start_date, end_date)
+
+    def ticks_tail(self, symbol: str, count: int) -> Optional[Dict[str, np.ndarray]]:
+        return self._call("ticks_tail", symbol, count)
+
+
+class GatewayRoutes:
+    """
+    ASGI middleware of API workers forwarding routes to the gateway
+
+    Requests whose path starts with one of ``prefixes`` are run by the
+    gateway's app; everything else is served by the worker.
+
+    Args:
+        app: Worker's ASGI app
+        client: Connection to the gateway
+        prefixes: Path prefixes to forward
+    """
+
+    def __init__(self, app, client: GatewayClient, prefixes: Tuple[str, ...]):
+        self.app = app
+        self.client = client
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        request = {
+            key: scope[key]
+            for key in ("http_version", "method", "scheme", "path", "raw_path", "query_string", "root_path", "headers")
+            if key in scope
+        }
+        await self.client.forward(request, body, send, receive)
+
+
+# Global gateway client instance
+gateway_client = GatewayClient(
+    settings.GATEWAY_ADDRESS,
+    gateway_protocol.authkey(),
+    settings.GATEWAY_STATUS_INTERVAL
+)
@@ -0,0 +1,78 @@
+"""Transport and messages between the gateway and API workers
+
+The gateway listens with ``multiprocessing.connection.Listener`` on
+GATEWAY_ADDRESS: a named pipe on Windows (``\\\\.\\pipe\\<name>``) and a Unix
+socket elsewhere. Both ends prove they hold GATEWAY_AUTHKEY with an HMAC
+challenge before the first message is read, so only processes configured with
+the key can make the other end unpickle anything. Neither end starts without
+a key of its own: falling back to a default would let any local process run
+code in the one that owns the terminal.
+
+Every message is a pickled tuple ``(id, kind, payload)`` sent as one
+``send_bytes`` frame. Requests carry a non-zero id chosen by the worker;
+replies repeat it.
+
+Request kinds (worker -> gateway):
+    call: ``(method, args, kwargs)`` of an MT5Connector method
+    store: ``(method, args, kwargs)`` of a MarketDataStore method
+    watch: ``(symbols,)``, the full set of symbols the worker's feed polls
+    status: ``()``
+    http: ``(request, body)``, an API request to run on the gateway's app
+    credit: ``(http id, chunks)``, body chunks of a forwarded response the
+        worker has passed on; the gateway never has more than HTTP_WINDOW
+        chunks in flight, so a slow client holds back the gateway's app
+        instead of filling the worker's memory
+    cancel: ``(http id,)``, the client of a forwarded request went away;
+        the gateway's app receives ``http.disconnect``
+
+Credit and cancel get no reply.
+
+Reply kinds (gateway -> worker):
+    result: ``(value, status)``, status being the terminal connection state
+    error: ``(exception type name, message)``
+    start / body / end: response start, body chunk and end of an http request
+"""
+
+import pickle
+from typing import Any, Tuple
+
+from app.core.config import settings, Settings
+
+# Seconds a reader thread waits for data before checking whether to stop
+POLL_INTERVAL = 0.2
+
+# Body chunks of a forwarded response sent ahead of the worker's credits
+HTTP_WINDOW = 16
+
+Message = Tuple[int, str, Any]
+
+
+def authkey() -> bytes:
+    """Shared secret of the gateway and its workers; empty if not configured"""
+    return settings.GATEWAY_AUTHKEY.encode()
+
+
+def check_authkey(key: bytes) -> None:
+    """
+    Refuse to listen or connect with a missing or publicly known key
+
+    Raises:
+        RuntimeError: If the key is empty or the default SECRET_KEY
+    """
+    if not key:
+        raise RuntimeError("GATEWAY_AUTHKEY must be set for GATEWAY_ROLE=gateway and worker")
+    if key == Settings.model_fields["SECRET_KEY"].default.encode():
+        raise RuntimeError("GATEWAY_AUTHKEY must not be the default SECRET_KEY")
+
+
+def is_pipe(address: str) -> bool:
+    """Whether an address is a Windows named pipe rather than a Unix socket path"""
+    return address.startswith("\\\\")
+
+
+def encode(message: Message) -> bytes:
+    return pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode(data: bytes) -> Message:
+    return pickle.loads(data)
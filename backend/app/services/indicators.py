@@ -0,0 +1,743 @@
+"""Technical indicators in vectorized and streaming form
+
+Every indicator exists twice: a function over whole NumPy columns for
+backtests (``sma``, ``ema``, ...) and a state object updated in O(1) per new
+value for live data (``SMA``, ``EMA``, ...). Both forms perform the same
+floating-point operations in the same order, so a state fed the values of
+an array one by one reproduces the vectorized result exactly.
+
+Moving sums are kept as running totals of ``value - first value``. The
+vectorized form takes the same differences of a cumulative sum, and the
+shift keeps the totals small so long runs do not lose precision.
+Recursive indicators (EMA, Wilder smoothing) depend on their previous value
+and run as a scalar loop over the column.
+
+Values are NaN until an indicator has seen enough input.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Tuple, Type
+
+import numpy as np
+
+from app.core.config import settings
+
+NAN = float("nan")
+
+
+def _column(rates, name: str) -> np.ndarray:
+    return np.asarray(rates[name], dtype=np.float64)
+
+
+def _window_sums(values: np.ndarray, period: int) -> Tuple[float, np.ndarray, np.ndarray]:
+    """Shift, and the window sums of the shifted values and their squares"""
+    shift = float(values[0])
+    shifted = values - shift
+    csum = np.cumsum(shifted)
+    csum_sq = np.cumsum(shifted * shifted)
+    sums = np.empty(len(values) - period + 1)
+    sums_sq = np.empty(len(sums))
+    sums[0] = csum[period - 1]
+    sums[1:] = csum[period:] - csum[:-period]
+    sums_sq[0] = csum_sq[period - 1]
+    sums_sq[1:] = csum_sq[period:] - csum_sq[:-period]
+    return shift, sums, sums_sq
+
+
+def _recursive_ema(values: np.ndarray, period: int, start: int = 0) -> np.ndarray:
+    """EMA of ``values[start:]`` seeded with the SMA of its first ``period`` values"""
+    out = np.full(len(values), NAN)
+    first = start + period - 1
+    if period <= 0 or first >= len(values):
+        return out
+    alpha = 2.0 / (period + 1)
+    column = values.tolist()
+    total = 0.0
+    for value in column[start:first + 1]:
+        total += value
+    current = total / period
+    result = [current]
+    for value in column[first + 1:]:
+        current = current + alpha * (value - current)
+        result.append(current)
+    out[first:] = result
+    return out
+
+
+def _wilder(values: np.ndarray, period: int, start: int = 0) -> np.ndarray:
+    """Wilder smoothing of ``values[start:]`` seeded with the mean of its first ``period`` values"""
+    out = np.full(len(values), NAN)
+    first = start + period - 1
+    if period <= 0 or first >= len(values):
+        return out
+    column = values.tolist()
+    total = 0.0
+    for value in column[start:first + 1]:
+        total += value
+    current = total / period
+    result = [current]
+    for value in column[first + 1:]:
+        current = (current * (period - 1) + value) / period
+        result.append(current)
+    out[first:] = result
+    return out
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """Simple moving average"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), NAN)
+    if period <= 0 or len(values) < period:
+        return out
+    shift, sums, _ = _window_sums(values, period)
+    out[period - 1:] = shift + sums / period
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """Exponential moving average (alpha = 2 / (period + 1)), seeded with the SMA"""
+    return _recursive_ema(np.asarray(values, dtype=np.float64), period)
+
+
+def rsi(values: np.ndarray, period: int = 14) -> np.ndarray:
+    """Relative strength index with Wilder smoothing"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), NAN)
+    if period <= 0 or len(values) <= period:
+        return out
+    change = np.empty(len(values))
+    change[0] = 0.0
+    change[1:] = np.diff(values)
+    avg_gain = _wilder(np.where(change > 0, change, 0.0), period, 1)
+    avg_loss = _wilder(np.where(change < 0, -change, 0.0), period, 1)
+    gain, loss = avg_gain[period:], avg_loss[period:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[period:] = np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+    return out
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """High-low range extended to the previous close"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    tr = high - low
+    if len(tr) > 1:
+        prev_close = close[:-1]
+        tr[1:] = np.maximum(
+            np.maximum(tr[1:], np.abs(high[1:] - prev_close)),
+            np.abs(low[1:] - prev_close)
+        )
+    return tr
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Average true range with Wilder smoothing"""
+    return _wilder(true_range(high, low, close), period)
+
+
+def bollinger(
+    values: np.ndarray,
+    period: int = 20,
+    width: float = 2.0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bollinger bands: SMA plus and minus ``width`` population standard deviations
+
+    Returns:
+        tuple: Middle, upper and lower band
+    """
+    values = np.asarray(values, dtype=np.float64)
+    middle = np.full(len(values), NAN)
+    upper = middle.copy()
+    lower = middle.copy()
+    if period <= 0 or len(values) < period:
+        return middle, upper, lower
+    shift, sums, sums_sq = _window_sums(values, period)
+    mean = sums / period
+    variance = np.maximum(sums_sq / period - mean * mean, 0.0)
+    deviation = width * np.sqrt(variance)
+    middle[period - 1:] = shift + mean
+    upper[period - 1:] = middle[period - 1:] + deviation
+    lower[period - 1:] = middle[period - 1:] - deviation
+    return middle, upper, lower
+
+
+def macd(
+    values: np.ndarray,
+    fast: int = 12,
+    slow: int = 26,
+    signal: int = 9
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Moving average convergence/divergence
+
+    Returns:
+        tuple: MACD line (fast EMA - slow EMA), signal line (EMA of the MACD
+        line) and histogram (MACD - signal)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    line = _recursive_ema(values, fast) - _recursive_ema(values, slow)
+    signal_line = _recursive_ema(line, signal, max(fast, slow) - 1)
+    return line, signal_line, line - signal_line
+
+
+def vwap(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+    times: Optional[np.ndarray] = None,
+    anchor: int = 0
+) -> np.ndarray:
+    """
+    Volume-weighted average of the typical price (high + low + close) / 3
+
+    Args:
+        high, low, close, volume: Bar columns
+        times: Bar open times in epoch seconds, required with ``anchor``
+        anchor: Session length in seconds after which the average restarts
+            (86400 for a daily VWAP); 0 never restarts
+
+    Returns:
+        np.ndarray: VWAP per bar, NaN while the session has no volume
+    """
+    typical = (
+        np.asarray(high, dtype=np.float64)
+        + np.asarray(low, dtype=np.float64)
+        + np.asarray(close, dtype=np.float64)
+    ) / 3.0
+    volume = np.asarray(volume, dtype=np.float64)
+    weighted = typical * volume
+    out = np.full(len(typical), NAN)
+    bounds = [0, len(typical)]
+    if anchor > 0 and times is not None and len(typical):
+        session = np.asarray(times, dtype=np.int64) // anchor
+        bounds = [0, *(np.flatnonzero(np.diff(session)) + 1).tolist(), len(typical)]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        total_volume = np.cumsum(volume[start:end])
+        total_weighted = np.cumsum(weighted[start:end])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[start:end] = np.where(total_volume > 0, total_weighted / total_volume, NAN)
+    return out
+
+
+class StreamingIndicator:
+    """
+    Indicator state updated one value at a time
+
+    ``compute`` runs the matching vectorized function with the same
+    parameters over whole columns.
+    """
+
+    name = ""
+
+    def __init__(self):
+        self.value: Any = NAN
+        self.count = 0
+        # Time of the last bar passed to update_bar
+        self.time: Optional[int] = None
+
+    @property
+    def ready(self) -> bool:
+        value = self.value[0] if isinstance(self.value, tuple) else self.value
+        return not math.isnan(value)
+
+    def params(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def update_bar(self, bar: Mapping[str, Any]) -> Any:
+        """Update from a bar in the mt5.copy_rates_* layout and return the new value"""
+        raise NotImplementedError
+
+    def compute(self, rates) -> Any:
+        """Vectorized result over OHLC columns in the mt5.copy_rates_* layout"""
+        raise NotImplementedError
+
+    def warm(self, rates) -> "StreamingIndicator":
+        """Feed every bar of ``rates`` in order"""
+        columns = {name: rates[name].tolist() for name in _field_names(rates)}
+        for i in range(len(columns["time"])):
+            self.update_bar({name: column[i] for name, column in columns.items()})
+        return self
+
+
+def _field_names(rates) -> List[str]:
+    if isinstance(rates, np.ndarray):
+        return list(rates.dtype.names)
+    return list(rates)
+
+
+class _MovingSums:
+    """Window sums of shifted values and their squares, as in _window_sums"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.shift: Optional[float] = None
+        self.count = 0
+        self._total = 0.0
+        self._total_sq = 0.0
+        # Running totals of the last ``period`` updates
+        self._ring = [(0.0, 0.0)] * period
+        self._pos = 0
+
+    def add(self, value: float) -> Optional[Tuple[float, float]]:
+        """Add a value; returns the window sums once ``period`` values were seen"""
+        if self.shift is None:
+            self.shift = value
+        shifted = value - self.shift
+        prior_total, prior_total_sq = self._ring[self._pos]
+        self._total += shifted
+        self._total_sq += shifted * shifted
+        self._ring[self._pos] = (self._total, self._total_sq)
+        self._pos = (self._pos + 1) % self.period
+        self.count += 1
+        if self.count < self.period:
+            return None
+        if self.count == self.period:
+            return self._total, self._total_sq
+        return self._total - prior_total, self._total_sq - prior_total_sq
+
+
+class _EMAState:
+    """EMA recurrence shared by EMA and MACD"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.count = 0
+        self._total = 0.0
+        self.value = NAN
+
+    def add(self, value: float) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self._total += value
+        elif self.count == self.period:
+            self._total += value
+            self.value = self._total / self.period
+        else:
+            self.value = self.value + self.alpha * (value - self.value)
+        return self.value
+
+
+class _WilderState:
+    """Wilder smoothing shared by RSI and ATR"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.count = 0
+        self._total = 0.0
+        self.value = NAN
+
+    def add(self, value: float) -> float:
+        self.count += 1
+        if self.count < self.period:
+            self._total += value
+        elif self.count == self.period:
+            self._total += value
+            self.value = self._total / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + value) / self.period
+        return self.value
+
+
+class SMA(StreamingIndicator):
+    name = "sma"
+
+    def __init__(self, period: int, source: str = "close"):
+        super().__init__()
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.period = period
+        self.source = source
+        self._sums = _MovingSums(period)
+
+    def params(self) -> Dict[str, Any]:
+        return {"period": self.period, "source": self.source}
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        sums = self._sums.add(float(value))
+        if sums is not None:
+            self.value = self._sums.shift + sums[0] / self.period
+        return self.value
+
+    def update_bar(self, bar: Mapping[str, Any]) -> float:
+        self.time = bar.get("time")
+        return self.update(bar[self.source])
+
+    def compute(self, rates) -> np.ndarray:
+        return sma(_column(rates, self.source), self.period)
+
+
+class EMA(StreamingIndicator):
+    name = "ema"
+
+    def __init__(self, period: int, source: str = "close"):
+        super().__init__()
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.period = period
+        self.source = source
+        self._ema = _EMAState(period)
+
+    def params(self) -> Dict[str, Any]:
+        return {"period": self.period, "source": self.source}
+
+    def update(self, value: float) -> float:
+        self.count += 1
+        self.value = self._ema.add(float(value))
+        return self.value
+
+    def update_bar(self, bar: Mapping[str, Any]) -> float:
+        self.time = bar.get("time")
+        return self.update(bar[self.source])
+
+    def compute(self, rates) -> np.ndarray:
+        return ema(_column(rates, self.source), self.period)
+
+
+class RSI(StreamingIndicator):
+    name = "rsi"
+
+    def __init__(self, period: int = 14, source: str = "close"):
+        super().__init__()
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.period = period
+        self.source = source
+        self._previous: Optional[float] = None
+        self._gain = _WilderState(period)
+        self._loss = _WilderState(period)
+
+    def params(self) -> Dict[str, Any]:
+        return {"period": self.period, "source": self.source}
+
+    def update(self, value: float) -> float:
+        value = float(value)
+        self.count += 1
+        previous, self._previous = self._previous, value
+        if previous is None:
+            return self.value
+        change = value - previous
+        gain = self._gain.add(change if change > 0 else 0.0)
+        loss = self._loss.add(-change if change < 0 else 0.0)
+        if self._loss.count >= self.period:
+            self.value = 100.0 if loss == 0 else 100.0 - 100.0 / (1.0 + gain / loss)
+        return self.value
+
+    def update_bar(self, bar: Mapping[str, Any]) -> float:
+        self.time = bar.get("time")
+        return self.update(bar[self.source])
+
+    def compute(self, rates) -> np.ndarray:
+        return rsi(_column(rates, self.source), self.period)
+
+
+class ATR(StreamingIndicator):
+    name = "atr"
+
+    def __init__(self, period: int = 14):
+        super().__init__()
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.period = period
+        self._previous_close: Optional[float] = None
+        self._wilder = _WilderState(period)
+
+    def params(self) -> Dict[str, Any]:
+        return {"period": self.period}
+
+    def update(self, high: float, low: float, close: float) -> float:
+        high, low, close = float(high), float(low), float(close)
+        self.count += 1
+        tr = high - low
+        if self._previous_close is not None:
+            tr = max(max(tr, abs(high - self._previous_close)), abs(low - self._previous_close))
+        self._previous_close = close
+        self.value = self._wilder.add(tr)
+        return self.value
+
+    def update_bar(self, bar: Mapping[str, Any]) -> float:
+        self.time = bar.get("time")
+        return self.update(bar["high"], bar["low"], bar["close"])
+
+    def compute(self, rates) -> np.ndarray:
+        return atr(_column(rates, "high"), _column(rates, "low"), _column(rates, "close"), self.period)
+
+
+class Bollinger(StreamingIndicator):
+    """Value is the (middle, upper, lower) tuple"""
+
+    name = "bollinger"
+
+    def __init__(self, period: int = 20, width: float = 2.0, source: str = "close"):
+        super().__init__()
+        if period <= 0:
+            raise ValueError("period must be positive")
+        self.period = period
+        self.width = float(width)
+        self.source = source
+        self._sums = _MovingSums(period)
+        self.value = (NAN, NAN, NAN)
+
+    def params(self) -> Dict[str, Any]:
+        return {"period": self.period, "width": self.width, "source": self.source}
+
+    def update(self, value: float) -> Tuple[float, float, float]:
+        self.count += 1
+        sums = self._sums.add(float(value))
+        if sums is not None:
+            mean = sums[0] / self.period
+            variance = max(sums[1] / self.period - mean * mean, 0.0)
+            deviation = self.width * math.sqrt(variance)
+            middle = self._sums.shift + mean
+            self.value = (middle, middle + deviation, middle - deviation)
+        return self.value
+
+    def update_bar(self, bar: Mapping[str, Any]) -> Tuple[float, float, float]:
+        self.time = bar.get("time")
+        return self.update(bar[self.source])
+
+    def compute(self, rates) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return bollinger(_column(rates, self.source), self.period, self.width)
+
+
+class MACD(StreamingIndicator):
+    """Value is the (macd, signal, histogram) tuple"""
+
+    name = "macd"
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9, source: str = "close"):
+        super().__init__()
+        if min(fast, slow, signal) <= 0:
+            raise ValueError("periods must be positive")
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+        self.source = source
+        self._fast = _EMAState(fast)
+        self._slow = _EMAState(slow)
+        self._signal = _EMAState(signal)
+        self.value = (NAN, NAN, NAN)
+
+    def params(self) -> Dict[str, Any]:
+        return {"fast": self.fast, "slow": self.slow, "signal": self.signal, "source": self.source}
+
+    def update(self, value: float) -> Tuple[float, float, float]:
+        value = float(value)
+        self.count += 1
+        line = self._fast.add(value) - self._slow.add(value)
+        if math.isnan(line):
+            return self.value
+        signal_line = self._signal.add(line)
+        self.value = (line, signal_line, line - signal_line)
+        return self.value
+
+    def update_bar(self, bar: Mapping[str, Any]) -> Tuple[float, float, float]:
+        self.time = bar.get("time")
+        return self.update(bar[self.source])
+
+    def compute(self, rates) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return macd(_column(rates, self.source), self.fast, self.slow, self.signal)
+
+
+class VWAP(StreamingIndicator):
+    name = "vwap"
+
+    def __init__(self, anchor: int = 0, volume: str = "tick_volume"):
+        super().__init__()
+        self.anchor = int(anchor)
+        self.volume = volume
+        self._session: Optional[int] = None
+        self._total_volume = 0.0
+        self._total_weighted = 0.0
+
+    def params(self) -> Dict[str, Any]:
+        return {"anchor": self.anchor, "volume": self.volume}
+
+    def update(
+        self,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+        time: Optional[int] = None
+    ) -> float:
+        self.count += 1
+        if self.anchor > 0 and time is not None:
+            session = int(time) // self.anchor
+            if session != self._session:
+                self._session = session
+                self._total_volume = 0.0
+                self._total_weighted = 0.0
+        volume = float(volume)
+        typical = (float(high) + float(low) + float(close)) / 3.0
+        self._total_volume += volume
+        self._total_weighted += typical * volume
+        self.value = self._total_weighted / self._total_volume if self._total_volume > 0 else NAN
+        return self.value
+
+    def update_bar(self, bar: Mapping[str, Any]) -> float:
+        self.time = bar.get("time")
+        return self.update(bar["high"], bar["low"], bar["close"], bar[self.volume], self.time)
+
+    def compute(self, rates) -> np.ndarray:
+        return vwap(
+            _column(rates, "high"),
+            _column(rates, "low"),
+            _column(rates, "close"),
+            _column(rates, self.volume),
+            np.asarray(rates["time"], dtype=np.int64),
+            self.anchor
+        )
+
+
+INDICATORS: Dict[str, Type[StreamingIndicator]] = {
+    cls.name: cls for cls in (SMA, EMA, RSI, ATR, Bollinger, MACD, VWAP)
+}
+
+
+def create(name: str, **params) -> StreamingIndicator:
+    """
+    Create an indicator state by name
+
+    Raises:
+        ValueError: If the indicator is unknown or a parameter is invalid
+    """
+    cls = INDICATORS.get(name)
+    if cls is None:
+        raise ValueError(f"Unknown indicator: {name}")
+    try:
+        return cls(**params)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for {name}: {e}")
+
+
+def compute(name: str, rates, **params) -> Any:
+    """Vectorized indicator over OHLC columns, by name"""
+    return create(name, **params).compute(rates)
+
+
+def _fingerprint(rates) -> Tuple:
+    times = rates["time"]
+    if len(times) == 0:
+        return (0,)
+    return (len(times), int(times[0]), int(times[-1]))
+
+
+class IndicatorCache:
+    """
+    Indicator results keyed by (symbol, timeframe, indicator, params)
+
+    ``series`` caches vectorized results for backtests; an entry is reused
+    while it was computed over the same bars. ``stream`` hands out one shared
+    streaming state per key, and ``on_bar`` advances every state of a
+    series once per closed bar, so live strategies never recompute an
+    indicator over their history.
+    """
+
+    def __init__(self, max_series: int = 256):
+        self.max_series = max_series
+        self._series: "OrderedDict[Tuple, Tuple[Tuple, Any]]" = OrderedDict()
+        self._states: Dict[Tuple[str, Hashable], Dict[Tuple, StreamingIndicator]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def series(self, symbol: str, timeframe: Hashable, rates, name: str, **params) -> Any:
+        """
+        Vectorized indicator over ``rates``, computed once per set of bars
+
+        Args:
+            symbol: Symbol the rates belong to
+            timeframe: Bar timeframe
+            rates: OHLC columns in the mt5.copy_rates_* layout
+            name: Indicator name (see INDICATORS)
+            params: Indicator parameters
+
+        Returns:
+            Indicator array, or tuple of arrays for multi-line indicators
+        """
+        indicator = create(name, **params)
+        key = (symbol, timeframe, name, tuple(sorted(indicator.params().items())))
+        fingerprint = _fingerprint(rates)
+        with self._lock:
+            entry = self._series.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                self._series.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            self.stats["misses"] += 1
+        result = indicator.compute(rates)
+        with self._lock:
+            self._series[key] = (fingerprint, result)
+            self._series.move_to_end(key)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        return result
+
+    def bind(self, symbol: str, timeframe: Hashable, rates) -> Callable[..., Any]:
+        """``series`` with the symbol, timeframe and rates filled in"""
+        def compute_cached(name: str, **params) -> Any:
+            return self.series(symbol, timeframe, rates, name, **params)
+        return compute_cached
+
+    def stream(
+        self,
+        symbol: str,
+        timeframe: Hashable,
+        name: str,
+        history=None,
+        **params
+    ) -> StreamingIndicator:
+        """
+        Shared streaming state for a series, created on first use
+
+        Args:
+            symbol: Symbol
+            timeframe: Bar timeframe
+            name: Indicator name (see INDICATORS)
+            history: Closed bars to warm a new state with
+            params: Indicator parameters
+
+        Returns:
+            StreamingIndicator: State advanced by ``on_bar``
+        """
+        indicator = create(name, **params)
+        key = (name, tuple(sorted(indicator.params().items())))
+        with self._lock:
+            states = self._states.setdefault((symbol, timeframe), {})
+            state = states.get(key)
+            if state is None:
+                if history is not None and len(history["time"]):
+                    indicator.warm(history)
+                state = states[key] = indicator
+            return state
+
+    def on_bar(self, symbol: str, timeframe: Hashable, bar: Mapping[str, Any]) -> None:
+        """Advance every state of a series with a closed bar; bars already seen are ignored"""
+        with self._lock:
+            states = list(self._states.get((symbol, timeframe), {}).values())
+            for state in states:
+                if state.time is None or bar["time"] > state.time:
+                    state.update_bar(bar)
+
+    def drop(self, symbol: str, timeframe: Hashable) -> None:
+        """Forget the streaming states of a series"""
+        with self._lock:
+            self._states.pop((symbol, timeframe), None)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "series": len(self._series),
+                "streams": sum(len(states) for states in self._states.values()),
+                **self.stats
+            }
+
+
+# Global indicator cache instance
+indicator_cache = IndicatorCache(settings.INDICATOR_CACHE_SIZE)
@@ -0,0 +1,259 @@
+"""Background backtest jobs
+
+Jobs run on a bounded thread pool so CPU-heavy backtests never execute on
+the event loop. The threads mostly wait: the backtests themselves run in
+worker processes (see ``app.services.sweep``), which keeps long indicator
+recursions from holding the API process's GIL. Each job reports progress
+through ``Job.report_progress``, which is also where cooperative
+cancellation takes effect; a raised JobCancelled kills the job's worker
+processes. Successful results are stored in the ``backtest_results`` table.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.database import async_session_maker
+from app.models.models import BacktestResult
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = {JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED}
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested"""
+
+
+class Job:
+    """State of a single background job"""
+
+    def __init__(self, kind: str, description: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.description = description or {}
+        self.status = JOB_QUEUED
+        self.progress = 0.0
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.result_id: Optional[int] = None
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+        self.task: Optional[asyncio.Task] = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def request_cancel(self) -> None:
+        self._cancel_event.set()
+
+    def report_progress(self, fraction: float) -> None:
+        """
+        Update progress from the worker thread
+
+        Args:
+            fraction: Completed fraction between 0 and 1
+
+        Raises:
+            JobCancelled: If the job has been cancelled
+        """
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.id)
+        self.progress = round(min(max(fraction, 0.0), 1.0) * 100, 1)
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "description": self.description,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result_id": self.result_id,
+            "error": self.error
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+async def save_backtest_result(result: Dict[str, Any]) -> int:
+    """
+    Store a backtest result
+
+    Args:
+        result: Result dictionary as returned by Backtester.run_backtest
+
+    Returns:
+        int: Id of the new backtest_results row
+    """
+    record = BacktestResult(
+        strategy_id=result["strategy_id"],
+        symbol=result["symbol"],
+        start_date=datetime.fromisoformat(result["start_date"]),
+        end_date=datetime.fromisoformat(result["end_date"]),
+        initial_capital=result["initial_capital"],
+        final_capital=result["final_capital"],
+        total_return=result["total_return"],
+        total_trades=result["total_trades"],
+        winning_trades=result["winning_trades"],
+        losing_trades=result["losing_trades"],
+        win_rate=result["win_rate"],
+        max_drawdown=result["max_drawdown"],
+        sharpe_ratio=result["sharpe_ratio"],
+        results_json=json.dumps(result, default=str)
+    )
+    async with async_session_maker() as session:
+        session.add(record)
+        await session.commit()
+        return record.id
+
+
+class JobManager:
+    """Run jobs on a bounded worker pool and track their state"""
+
+    def __init__(self, max_concurrent: int = 2, history: int = 100):
+        self.jobs: Dict[str, Job] = {}
+        self.history = history
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent,
+            thread_name_prefix="backtest-job"
+        )
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[[Job], Dict[str, Any]],
+        description: Optional[Dict[str, Any]] = None,
+        persist: bool = True
+    ) -> Job:
+        """
+        Queue a job; must be called from the event loop
+
+        Args:
+            kind: Job type label
+            fn: Work function, called with the Job in a worker thread
+            description: Request summary reported with the job status
+            persist: Save the result to backtest_results on success
+
+        Returns:
+            Job: The queued job
+        """
+        job = Job(kind, description)
+        self.jobs[job.id] = job
+        self._prune()
+        job.future = self._executor.submit(self._execute, job, fn)
+        job.task = asyncio.create_task(self._track(job, persist))
+        logger.info(f"Job {job.id} ({kind}) queued")
+        return job
+
+    def _execute(self, job: Job, fn: Callable[[Job], Dict[str, Any]]) -> Dict[str, Any]:
+        """Worker-thread wrapper around the job function"""
+        if job.cancel_requested:
+            raise JobCancelled(job.id)
+        job.status = JOB_RUNNING
+        job.started_at = datetime.utcnow()
+        try:
+            result = fn(job)
+        except Exception:
+            if job.cancel_requested:
+                raise JobCancelled(job.id)
+            raise
+        if job.cancel_requested:
+            raise JobCancelled(job.id)
+        return result
+
+    async def _track(self, job: Job, persist: bool) -> None:
+        """Wait for the worker and record the outcome"""
+        try:
+            job.result = await asyncio.wrap_future(job.future)
+        except (JobCancelled, asyncio.CancelledError):
+            job.status = JOB_CANCELLED
+            logger.info(f"Job {job.id} cancelled")
+        except Exception as e:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            logger.error(f"Job {job.id} failed: {e}")
+        else:
+            if persist and job.result is not None:
+                try:
+                    job.result_id = await save_backtest_result(job.result)
+                except Exception as e:
+                    logger.error(f"Failed to save result of job {job.id}: {e}")
+            job.progress = 100.0
+            job.status = JOB_COMPLETED
+            logger.info(f"Job {job.id} completed")
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    async def wait(self, job: Job) -> Job:
+        """Wait until a job has finished"""
+        if job.task is not None:
+            await asyncio.shield(job.task)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job
+
+        Queued jobs never start; running jobs stop at their next progress
+        report, which single backtests make every sweep.PROGRESS_INTERVAL
+        seconds.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            bool: True if the job was still active
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return False
+        job.request_cancel()
+        if job.future is not None:
+            job.future.cancel()
+        return True
+
+    def _prune(self) -> None:
+        """Drop the oldest finished jobs beyond the history limit"""
+        finished = [job for job in self.jobs.values() if job.status in FINISHED_STATES]
+        excess = len(self.jobs) - self.history
+        if excess <= 0:
+            return
+        finished.sort(key=lambda job: job.created_at)
+        for job in finished[:excess]:
+            del self.jobs[job.id]
+
+    def shutdown(self) -> None:
+        """Cancel outstanding jobs and stop the worker pool"""
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global job manager instance
+job_manager = JobManager(settings.BACKTEST_MAX_CONCURRENT_JOBS, settings.BACKTEST_JOB_HISTORY)
@@ -0,0 +1,226 @@
+"""Application logs persisted to the system_logs table
+
+Records from every ``app.*`` logger go through a ``QueueHandler``, so the
+logging call itself only copies the record onto a bounded queue (dropping
+it if the queue is full) and never waits for the database or the event
+loop. A ``QueueListener``
+thread then:
+
+- collapses bursts of the same message (same logger, level and text) into
+  the first occurrence plus one summary row per LOG_DB_DEDUP_WINDOW
+- keeps only a fraction of the remaining records per level
+  (LOG_DB_SAMPLE_RATES)
+- hands rows to ``db_writer`` on the event loop, which inserts them in
+  batches
+
+Records from the database writer itself are never stored, so a failing
+database cannot feed its own errors back into the queue.
+"""
+
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.models import SystemLog
+from app.services.db_writer import db_writer, BatchWriter
+
+logger = logging.getLogger(__name__)
+
+ROOT_LOGGER = "app"
+EXCLUDED_LOGGERS = ("app.services.db_writer", __name__)
+# Seconds between sweeps for expired duplicate bursts
+DEDUP_SWEEP_INTERVAL = 1.0
+DEDUP_MAX_KEYS = 10000
+
+_exception_formatter = logging.Formatter()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking or raising on a full queue"""
+
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+        self.addFilter(lambda record: not record.name.startswith(EXCLUDED_LOGGERS))
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge args and format the traceback, keeping the message text separate"""
+        prepared = logging.LogRecord.__new__(type(record))
+        prepared.__dict__.update(record.__dict__)
+        record = prepared
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SystemLogHandler(logging.Handler):
+    """
+    Listener-side handler: deduplicate, sample and queue SystemLog rows
+
+    Args:
+        writer: Batch writer the rows are passed to
+        dedup_window: Seconds a repeated message is suppressed after its
+            first occurrence (0 disables deduplication)
+        sample_rates: Level name to fraction of records kept (default 1.0)
+    """
+
+    def __init__(
+        self,
+        writer: BatchWriter,
+        dedup_window: float,
+        sample_rates: Dict[str, float]
+    ):
+        super().__init__()
+        self.writer = writer
+        self.dedup_window = dedup_window
+        self.sample_rates = {level.upper(): rate for level, rate in sample_rates.items()}
+        self.stats = {"written": 0, "deduplicated": 0, "sampled_out": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # (logger, level, message) -> [window start, suppressed count, last record]
+        self._bursts: Dict[Tuple[str, int, str], List[Any]] = {}
+        self._last_sweep = 0.0
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_lock = threading.Lock()
+
+    def bind(self, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Set the event loop the writer runs on; None stops forwarding"""
+        self._loop = loop
+
+    def emit(self, record: logging.LogRecord) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep >= DEDUP_SWEEP_INTERVAL:
+            self._sweep(now)
+
+        if self.dedup_window > 0:
+            key = (record.name, record.levelno, record.getMessage())
+            burst = self._bursts.get(key)
+            if burst is not None and now - burst[0] < self.dedup_window:
+                burst[1] += 1
+                burst[2] = record
+                self.stats["deduplicated"] += 1
+                return
+            if burst is not None and burst[1]:
+                self._queue_row(burst[2], f"Repeated {burst[1]} more times within {self.dedup_window:g}s")
+            if len(self._bursts) >= DEDUP_MAX_KEYS:
+                self._sweep(now, force=True)
+            self._bursts[key] = [now, 0, record]
+
+        rate = self.sample_rates.get(record.levelname, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            self.stats["sampled_out"] += 1
+            return
+        self._queue_row(record, record.exc_text)
+
+    def _sweep(self, now: float, force: bool = False) -> None:
+        """Write summaries of finished bursts and forget them"""
+        self._last_sweep = now
+        for key, (started, suppressed, record) in list(self._bursts.items()):
+            if force or now - started >= self.dedup_window:
+                if suppressed:
+                    self._queue_row(record, f"Repeated {suppressed} more times within {self.dedup_window:g}s")
+                del self._bursts[key]
+
+    def _queue_row(self, record: logging.LogRecord, details: Optional[str]) -> None:
+        row = {
+            "timestamp": datetime.utcfromtimestamp(record.created),
+            "level": record.levelname,
+            "source": record.name[:100],
+            "message": record.getMessage(),
+            "details": details,
+        }
+        with self._pending_lock:
+            self._pending.append(row)
+            first = len(self._pending) == 1
+        # One loop callback per burst of rows rather than per row
+        if first and self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self.drain)
+            except RuntimeError:
+                pass
+
+    def drain(self) -> None:
+        """Pass queued rows to the writer; runs on the event loop"""
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+        for row in rows:
+            if self.writer.write(SystemLog, row):
+                self.stats["written"] += 1
+
+    def close(self) -> None:
+        self._sweep(time.monotonic(), force=True)
+        super().close()
+
+
+class DatabaseLogging:
+    """Attach the queue handler to the ``app`` logger and run its listener"""
+
+    def __init__(
+        self,
+        writer: BatchWriter,
+        level: str,
+        queue_size: int,
+        dedup_window: float,
+        sample_rates: Dict[str, float]
+    ):
+        self.level = getattr(logging, level.upper())
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.queue_handler = NonBlockingQueueHandler(self.queue)
+        self.queue_handler.setLevel(self.level)
+        self.handler = SystemLogHandler(writer, dedup_window, sample_rates)
+        self._listener: Optional[QueueListener] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start capturing records; call from the event loop after db_writer.start()"""
+        if self._listener is not None:
+            return
+        self.handler.bind(loop)
+        self._listener = QueueListener(self.queue, self.handler)
+        self._listener.start()
+        logging.getLogger(ROOT_LOGGER).addHandler(self.queue_handler)
+        logger.info("Database logging started")
+
+    def stop(self) -> None:
+        """Detach the handler and flush captured records to the writer; call before db_writer.stop()"""
+        if self._listener is None:
+            return
+        logging.getLogger(ROOT_LOGGER).removeHandler(self.queue_handler)
+        self._listener.stop()
+        self._listener = None
+        self.handler.close()
+        self.handler.bind(None)
+        self.handler.drain()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of captured, suppressed and dropped records"""
+        return {
+            **self.handler.stats,
+            "dropped": self.queue_handler.dropped,
+            "queued": self.queue.qsize(),
+        }
+
+
+# Global database logging instance
+db_logging = DatabaseLogging(
+    db_writer,
+    settings.LOG_DB_LEVEL,
+    settings.LOG_DB_QUEUE_SIZE,
+    settings.LOG_DB_DEDUP_WINDOW,
+    settings.LOG_DB_SAMPLE_RATES
+)
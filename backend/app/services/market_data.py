@@ -0,0 +1,640 @@
+"""Local columnar market-data store
+
+Rates are stored per (symbol, timeframe) and ticks per symbol. Each column
+is an append-only file of raw little-endian values
+(``<root>/rates/<symbol>/<timeframe>/<column>.bin``); reads map the files
+with ``np.memmap`` and return views, so range queries cost page-cache I/O
+instead of terminal round-trips.
+
+Only finished bars (and ticks older than the newest millisecond) are
+persisted. The bar that is still forming and the ticks of the newest
+millisecond are held in memory as "pending" rows and re-fetched on the next
+sync, which keeps the files strictly append-only.
+
+Backfilled history older than the stored rows is written to a new generation
+of column files (``<column>.<generation>.bin``, named by the ``generation``
+file) instead of rewriting mapped files in place, which Windows does not
+allow. Files of older generations are removed once nothing maps them.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.mt5_connector import mt5_connector, MT5Connector
+
+logger = logging.getLogger(__name__)
+
+RATE_COLUMNS: Dict[str, str] = {
+    "time": "<i8",
+    "open": "<f8",
+    "high": "<f8",
+    "low": "<f8",
+    "close": "<f8",
+    "tick_volume": "<u8",
+    "spread": "<i4",
+    "real_volume": "<u8",
+}
+
+TICK_COLUMNS: Dict[str, str] = {
+    "time": "<i8",
+    "bid": "<f8",
+    "ask": "<f8",
+    "last": "<f8",
+    "volume": "<u8",
+    "time_msc": "<i8",
+    "flags": "<u4",
+    "volume_real": "<f8",
+}
+
+# Bar and tick times are broker server time, which usually runs ahead of UTC
+SERVER_TIME_MARGIN = timedelta(days=1)
+RATES_FETCH_WINDOW = timedelta(days=365)
+TICKS_FETCH_WINDOW = timedelta(days=1)
+
+Columns = Dict[str, np.ndarray]
+
+
+def _empty(columns: Dict[str, str]) -> Columns:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in columns.items()}
+
+
+def _concat(columns: Dict[str, str], *parts) -> Columns:
+    return {
+        name: np.concatenate([np.asarray(part[name], dtype=dtype) for part in parts])
+        for name, dtype in columns.items()
+    }
+
+
+def _utc(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+def describe_columns(columns: Columns) -> Dict[str, Any]:
+    """
+    Picklable form of columns for another process
+
+    Views of the store's column files become ``(path, dtype, offset,
+    length)`` so the other process maps the same pages instead of receiving
+    a copy; any other array is passed by value.
+
+    Args:
+        columns: Column name to array, e.g. from ``load_ticks``
+
+    Returns:
+        dict: Column name to a file location or array, for ``open_columns``
+    """
+    described: Dict[str, Any] = {}
+    for name, column in columns.items():
+        mapped = column.base if isinstance(column, np.memmap) else None
+        if not isinstance(mapped, np.memmap):
+            mapped = column
+        if isinstance(column, np.memmap) and column.filename and column.flags.c_contiguous:
+            offset = mapped.offset + column.ctypes.data - mapped.ctypes.data
+            described[name] = (str(column.filename), column.dtype.str, offset, len(column))
+        else:
+            described[name] = np.asarray(column)
+    return described
+
+
+def open_columns(described: Dict[str, Any]) -> Columns:
+    """Columns from ``describe_columns``, mapping the described files read-only"""
+    columns: Columns = {}
+    for name, value in described.items():
+        if isinstance(value, tuple):
+            path, dtype, offset, length = value
+            if length:
+                columns[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(length,))
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+        else:
+            columns[name] = value
+    return columns
+
+
+class ColumnSeries:
+    """Append-only set of column files sorted by a key column"""
+
+    def __init__(self, path: Path, columns: Dict[str, str], key: str):
+        self.path = path
+        self.columns = columns
+        self.key = key
+        self.lock = threading.RLock()
+        self._maps: Columns = _empty(columns)
+        self._mapped_length = 0
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._generation = self._read_generation()
+        self._remove_stale()
+        self._repair()
+
+    def _file(self, name: str, generation: Optional[int] = None) -> Path:
+        generation = self._generation if generation is None else generation
+        # Generation 0 keeps the original file names
+        return self.path / (f"{name}.{generation}.bin" if generation else f"{name}.bin")
+
+    def _read_generation(self) -> int:
+        try:
+            return int((self.path / "generation").read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _remove_stale(self) -> None:
+        """Delete column files of other generations; ones still mapped are retried later"""
+        current = {self._file(name).name for name in self.columns}
+        for path in self.path.glob("*.bin"):
+            if path.name not in current:
+                try:
+                    path.unlink()
+                except OSError:
+                    # Still mapped (Windows); removed after a later prepend or restart
+                    pass
+
+    def _column_length(self, name: str) -> int:
+        try:
+            return os.path.getsize(self._file(name)) // np.dtype(self.columns[name]).itemsize
+        except FileNotFoundError:
+            return 0
+
+    def __len__(self) -> int:
+        return self._column_length(self.key)
+
+    def _repair(self) -> None:
+        """Trim columns left uneven by an interrupted append"""
+        length = min(self._column_length(name) for name in self.columns)
+        for name, dtype in self.columns.items():
+            path = self._file(name)
+            if path.exists() and self._column_length(name) != length:
+                os.truncate(path, length * np.dtype(dtype).itemsize)
+                logger.warning(f"Trimmed {path} to {length} rows")
+
+    def append(self, data) -> int:
+        """
+        Append rows sorted by the key column
+
+        The key column is written last, so its length is always the number
+        of complete rows.
+
+        Args:
+            data: Structured array or mapping with every column
+
+        Returns:
+            int: Number of rows appended
+        """
+        count = len(data[self.key])
+        if count == 0:
+            return 0
+        order = [name for name in self.columns if name != self.key] + [self.key]
+        with self.lock:
+            for name in order:
+                values = np.ascontiguousarray(data[name], dtype=self.columns[name])
+                with open(self._file(name), "ab") as f:
+                    f.write(values.tobytes())
+        return count
+
+    def prepend(self, data) -> int:
+        """
+        Insert rows older than everything stored
+
+        Columns are written to files of a new generation, which the
+        ``generation`` file then points to, so mapped files are never
+        replaced and arrays mapped earlier stay valid.
+
+        Args:
+            data: Structured array or mapping with every column
+
+        Returns:
+            int: Number of rows inserted
+        """
+        count = len(data[self.key])
+        if count == 0:
+            return 0
+        with self.lock:
+            current = self.view()
+            generation = self._generation + 1
+            for name, dtype in self.columns.items():
+                with open(self._file(name, generation), "wb") as f:
+                    f.write(np.ascontiguousarray(data[name], dtype=dtype).tobytes())
+                    f.write(np.ascontiguousarray(current[name]).tobytes())
+            # The pointer is never mapped, so replacing it works on every platform
+            tmp = self.path / "generation.tmp"
+            tmp.write_text(str(generation))
+            os.replace(tmp, self.path / "generation")
+            self._generation = generation
+            self._maps = _empty(self.columns)
+            self._mapped_length = -1
+            del current
+            self._remove_stale()
+        return count
+
+    def view(self) -> Columns:
+        """Memory-mapped views over all stored rows"""
+        with self.lock:
+            length = len(self)
+            if length == 0:
+                return _empty(self.columns)
+            if length != self._mapped_length:
+                self._maps = {
+                    name: np.memmap(self._file(name), dtype=dtype, mode="r", shape=(length,))
+                    for name, dtype in self.columns.items()
+                }
+                self._mapped_length = length
+            return self._maps
+
+    def first(self) -> Optional[int]:
+        keys = self.view()[self.key]
+        return int(keys[0]) if len(keys) else None
+
+    def last(self) -> Optional[int]:
+        keys = self.view()[self.key]
+        return int(keys[-1]) if len(keys) else None
+
+    def range(self, start: Optional[int] = None, end: Optional[int] = None) -> Columns:
+        """Rows with ``start <= key <= end`` as zero-copy views"""
+        columns = self.view()
+        keys = columns[self.key]
+        lo = 0 if start is None else int(np.searchsorted(keys, start, side="left"))
+        hi = len(keys) if end is None else int(np.searchsorted(keys, end, side="right"))
+        return {name: column[lo:hi] for name, column in columns.items()}
+
+
+class MarketDataStore:
+    """On-disk rate and tick history filled incrementally from MT5"""
+
+    def __init__(self, root: str, connector: MT5Connector):
+        self.root = Path(root)
+        self.connector = connector
+        self._series: Dict[Tuple, ColumnSeries] = {}
+        self._pending: Dict[Tuple, Columns] = {}
+        self._last_sync: Dict[Tuple, float] = {}
+        self._sync_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _safe(name: str) -> str:
+        return name.replace(os.sep, "_").replace("/", "_")
+
+    def _get_series(self, key: Tuple) -> ColumnSeries:
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                if key[0] == "rates":
+                    _, symbol, timeframe = key
+                    path = self.root / "rates" / self._safe(symbol) / str(timeframe)
+                    series = ColumnSeries(path, RATE_COLUMNS, "time")
+                else:
+                    _, symbol = key
+                    path = self.root / "ticks" / self._safe(symbol)
+                    series = ColumnSeries(path, TICK_COLUMNS, "time_msc")
+                self._series[key] = series
+                self._sync_locks[key] = threading.Lock()
+            return series
+
+    def _fetch_windows(
+        self,
+        fetch: Callable[[datetime, datetime], Optional[np.ndarray]],
+        date_from: datetime,
+        date_to: datetime,
+        window: timedelta,
+        key: str
+    ) -> Optional[np.ndarray]:
+        """Fetch a long range from the terminal in bounded windows"""
+        chunks = []
+        start = date_from
+        while start < date_to:
+            end = min(start + window, date_to)
+            chunk = fetch(start, end)
+            if chunk is None:
+                return None
+            # Window bounds are inclusive; drop rows already fetched
+            if chunks:
+                chunk = chunk[chunk[key] > chunks[-1][key][-1]]
+            if len(chunk):
+                chunks.append(chunk)
+            start = end
+        if not chunks:
+            return None
+        return np.concatenate(chunks)
+
+    def _should_sync(self, key: Tuple, force: bool) -> bool:
+        last = self._last_sync.get(key)
+        return force or last is None or time.monotonic() - last >= settings.MARKET_DATA_SYNC_INTERVAL
+
+    def sync_rates(self, symbol: str, timeframe: int, force: bool = False) -> bool:
+        """
+        Fetch bars newer than the last stored bar
+
+        Args:
+            symbol: Symbol name
+            timeframe: Timeframe (mt5.TIMEFRAME_*)
+            force: Ignore MARKET_DATA_SYNC_INTERVAL
+
+        Returns:
+            bool: True if the store is up to date
+        """
+        key = ("rates", symbol, timeframe)
+        series = self._get_series(key)
+        if not self._should_sync(key, force):
+            return True
+
+        with self._sync_locks[key]:
+            if not self._should_sync(key, force):
+                return True
+            last = series.last()
+            if last is None:
+                date_from = datetime.now(timezone.utc) - timedelta(days=settings.MARKET_DATA_HISTORY_DAYS)
+            else:
+                date_from = _utc(last + 1)
+            date_to = datetime.now(timezone.utc) + SERVER_TIME_MARGIN
+
+            rates = self._fetch_windows(
+                lambda a, b: self.connector.copy_rates_range(symbol, timeframe, a, b),
+                date_from,
+                date_to,
+                RATES_FETCH_WINDOW,
+                "time"
+            )
+            if rates is None:
+                return last is not None
+            if last is not None:
+                rates = rates[rates["time"] > last]
+            if len(rates):
+                # The newest bar is still forming
+                appended = series.append(rates[:-1])
+                self._pending[key] = _concat(RATE_COLUMNS, rates[-1:])
+                if appended:
+                    logger.info(f"Stored {appended} {symbol} bars (timeframe {timeframe})")
+            self._last_sync[key] = time.monotonic()
+            return True
+
+    def load_rates(
+        self,
+        symbol: str,
+        timeframe: int,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Columns]:
+        """
+        Read finished bars for a date range, backfilling older history first
+
+        Args:
+            symbol: Symbol name
+            timeframe: Timeframe (mt5.TIMEFRAME_*)
+            start_date: Range start
+            end_date: Range end
+
+        Returns:
+            dict: Column name to memory-mapped view or None if unavailable
+        """
+        try:
+            key = ("rates", symbol, timeframe)
+            series = self._get_series(key)
+            start = start_date.replace(tzinfo=start_date.tzinfo or timezone.utc)
+            end = end_date.replace(tzinfo=end_date.tzinfo or timezone.utc)
+
+            with self._sync_locks[key]:
+                first = series.first()
+                if first is not None and start.timestamp() < first:
+                    older = self._fetch_windows(
+                        lambda a, b: self.connector.copy_rates_range(symbol, timeframe, a, b),
+                        start,
+                        _utc(first - 1),
+                        RATES_FETCH_WINDOW,
+                        "time"
+                    )
+                    if older is not None:
+                        older = older[older["time"] < first]
+                        series.prepend(older)
+                        logger.info(f"Backfilled {len(older)} {symbol} bars (timeframe {timeframe})")
+                elif first is None:
+                    rates = self._fetch_windows(
+                        lambda a, b: self.connector.copy_rates_range(symbol, timeframe, a, b),
+                        start,
+                        datetime.now(timezone.utc) + SERVER_TIME_MARGIN,
+                        RATES_FETCH_WINDOW,
+                        "time"
+                    )
+                    if rates is not None and len(rates):
+                        series.append(rates[:-1])
+                        self._pending[key] = _concat(RATE_COLUMNS, rates[-1:])
+                        self._last_sync[key] = time.monotonic()
+
+            if series.last() is None or series.last() < end.timestamp():
+                self.sync_rates(symbol, timeframe)
+
+            return series.range(int(start.timestamp()), int(end.timestamp()))
+        except Exception as e:
+            logger.error(f"Failed to load rates for {symbol}: {e}")
+            return None
+
+    def rates_tail(
+        self,
+        symbol: str,
+        timeframe: int,
+        count: int,
+        start_pos: int = 0
+    ) -> Optional[Columns]:
+        """
+        Read bars by position like mt5.copy_rates_from_pos
+
+        Position 0 is the bar that is currently forming.
+
+        Args:
+            symbol: Symbol name
+            timeframe: Timeframe (mt5.TIMEFRAME_*)
+            count: Number of bars
+            start_pos: Bars to skip back from the newest one
+
+        Returns:
+            dict: Column name to array or None if nothing is stored
+        """
+        key = ("rates", symbol, timeframe)
+        self.sync_rates(symbol, timeframe)
+        stored = self._get_series(key).view()
+        pending = self._pending.get(key, _empty(RATE_COLUMNS))
+        stored_count = len(stored["time"])
+        total = stored_count + len(pending["time"])
+        if total == 0:
+            return None
+
+        hi = max(total - start_pos, 0)
+        lo = max(hi - count, 0)
+        if hi <= stored_count:
+            return {name: column[lo:hi] for name, column in stored.items()}
+        return _concat(
+            RATE_COLUMNS,
+            {name: column[lo:] for name, column in stored.items()},
+            {name: column[max(lo - stored_count, 0):hi - stored_count] for name, column in pending.items()}
+        )
+
+    def sync_ticks(self, symbol: str, force: bool = False) -> bool:
+        """
+        Fetch ticks newer than the last stored tick
+
+        Args:
+            symbol: Symbol name
+            force: Ignore MARKET_DATA_SYNC_INTERVAL
+
+        Returns:
+            bool: True if the store is up to date
+        """
+        key = ("ticks", symbol)
+        series = self._get_series(key)
+        if not self._should_sync(key, force):
+            return True
+
+        with self._sync_locks[key]:
+            if not self._should_sync(key, force):
+                return True
+            last = series.last()
+            if last is None:
+                date_from = datetime.now(timezone.utc) - timedelta(days=settings.MARKET_DATA_TICK_HISTORY_DAYS)
+            else:
+                date_from = _utc(last // 1000)
+            date_to = datetime.now(timezone.utc) + SERVER_TIME_MARGIN
+
+            ticks = self._fetch_windows(
+                lambda a, b: self.connector.copy_ticks_range(symbol, a, b),
+                date_from,
+                date_to,
+                TICKS_FETCH_WINDOW,
+                "time_msc"
+            )
+            if ticks is None:
+                return last is not None
+            if last is not None:
+                ticks = ticks[ticks["time_msc"] > last]
+            self._append_ticks(key, series, ticks)
+            self._last_sync[key] = time.monotonic()
+            return True
+
+    def _append_ticks(self, key: Tuple, series: "ColumnSeries", ticks: np.ndarray) -> None:
+        """Store fetched ticks, holding back the newest millisecond"""
+        if not len(ticks):
+            return
+        # More ticks may still arrive within the newest millisecond
+        newest = ticks["time_msc"][-1]
+        split = int(np.searchsorted(ticks["time_msc"], newest, side="left"))
+        appended = series.append(ticks[:split])
+        self._pending[key] = _concat(TICK_COLUMNS, ticks[split:])
+        if appended:
+            logger.debug(f"Stored {appended} {key[1]} ticks")
+
+    def load_ticks(self, symbol: str, start_date: datetime, end_date: datetime) -> Optional[Columns]:
+        """
+        Read stored ticks for a date range, backfilling older history first
+
+        Ticks are otherwise only kept from MARKET_DATA_TICK_HISTORY_DAYS
+        before the first sync onwards. The range may still start later than
+        ``start_date`` if the terminal has no older ticks.
+
+        Args:
+            symbol: Symbol name
+            start_date: Range start
+            end_date: Range end
+
+        Returns:
+            dict: Column name to memory-mapped view or None if unavailable
+        """
+        try:
+            key = ("ticks", symbol)
+            series = self._get_series(key)
+            start = start_date.replace(tzinfo=start_date.tzinfo or timezone.utc)
+            end = end_date.replace(tzinfo=end_date.tzinfo or timezone.utc)
+            start_msc = int(start.timestamp() * 1000)
+
+            with self._sync_locks[key]:
+                first = series.first()
+                if first is not None and start_msc < first:
+                    older = self._fetch_windows(
+                        lambda a, b: self.connector.copy_ticks_range(symbol, a, b),
+                        start,
+                        _utc(first // 1000),
+                        TICKS_FETCH_WINDOW,
+                        "time_msc"
+                    )
+                    if older is not None:
+                        older = older[older["time_msc"] < first]
+                        series.prepend(older)
+                        logger.info(f"Backfilled {len(older)} {symbol} ticks")
+                elif first is None:
+                    ticks = self._fetch_windows(
+                        lambda a, b: self.connector.copy_ticks_range(symbol, a, b),
+                        start,
+                        datetime.now(timezone.utc) + SERVER_TIME_MARGIN,
+                        TICKS_FETCH_WINDOW,
+                        "time_msc"
+                    )
+                    if ticks is not None:
+                        self._append_ticks(key, series, ticks)
+                        self._last_sync[key] = time.monotonic()
+
+            if series.last() is None or series.last() < end.timestamp() * 1000:
+                self.sync_ticks(symbol)
+
+            return series.range(start_msc, int(end.timestamp() * 1000) + 999)
+        except Exception as e:
+            logger.error(f"Failed to load ticks for {symbol}: {e}")
+            return None
+
+    def read_ticks(
+        self,
+        symbol: str,
+        start_msc: Optional[int] = None,
+        end_msc: Optional[int] = None
+    ) -> Columns:
+        """
+        Read stored ticks for a time range as zero-copy views
+
+        Args:
+            symbol: Symbol name
+            start_msc: Range start in epoch milliseconds
+            end_msc: Range end in epoch milliseconds
+
+        Returns:
+            dict: Column name to memory-mapped view
+        """
+        return self._get_series(("ticks", symbol)).range(start_msc, end_msc)
+
+    def ticks_tail(self, symbol: str, count: int) -> Optional[Columns]:
+        """
+        Read the newest ``count`` ticks
+
+        Args:
+            symbol: Symbol name
+            count: Number of ticks
+
+        Returns:
+            dict: Column name to array or None if nothing is stored
+        """
+        key = ("ticks", symbol)
+        self.sync_ticks(symbol)
+        stored = self._get_series(key).view()
+        pending = self._pending.get(key, _empty(TICK_COLUMNS))
+        pending_count = len(pending["time_msc"])
+        total = len(stored["time_msc"]) + pending_count
+        if total == 0:
+            return None
+        if count <= pending_count:
+            return {name: column[pending_count - count:] for name, column in pending.items()}
+        from_stored = min(count - pending_count, len(stored["time_msc"]))
+        return _concat(
+            TICK_COLUMNS,
+            {name: column[len(column) - from_stored:] for name, column in stored.items()},
+            pending
+        )
+
+
+# Global market data store instance
+if settings.GATEWAY_ROLE == "worker":
+    # The gateway process owns the store's files
+    from app.services.gateway_client import RemoteMarketDataStore, gateway_client
+    market_data_store = RemoteMarketDataStore(gateway_client)
+else:
+    market_data_store = MarketDataStore(settings.MARKET_DATA_DIR, mt5_connector)
@@ -0,0 +1,300 @@
+"""Live tick feed
+
+A dedicated thread polls the current tick of every subscribed symbol in one
+batch per cycle, keeps only ticks whose ``time_msc`` changed and hands each
+batch of deltas to the event loop, where it is put on every consumer's
+asyncio queue. The same thread keeps every tick of the polled symbols in
+shared-memory ring buffers (see ``app.services.tick_buffer``); consumers that
+need every tick rather than the latest per poll (tick-built bars) receive the
+ticks written to the buffers instead of the deltas.
+
+A consumer that falls behind still gets every symbol's latest tick: once its
+queue is full, new ticks are kept in a pending dict keyed by symbol, newest
+tick wins, and handed over as one batch when the consumer takes the next
+batch. Every-tick consumers are not conflated, since dropping intermediate
+ticks would change the bars built from them; when their queue is full the
+oldest batch is dropped and its ticks are counted in ``stats``.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.mt5_connector import mt5_connector, MT5Connector
+from app.services.tick_buffer import tick_buffers, TickBuffers
+
+logger = logging.getLogger(__name__)
+
+
+def tick_message(symbol: str, tick: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the websocket payload for a tick"""
+    return {
+        "type": "tick",
+        "symbol": symbol,
+        "bid": tick.get("bid"),
+        "ask": tick.get("ask"),
+        "last": tick.get("last"),
+        "volume": tick.get("volume"),
+        "time_msc": tick.get("time_msc"),
+        "time": datetime.utcfromtimestamp(tick.get("time_msc", 0) / 1000).isoformat()
+    }
+
+
+def _tick_messages(symbol: str, ticks: np.ndarray) -> List[Dict[str, Any]]:
+    """Build tick payloads for every row of a tick array"""
+    columns = {name: ticks[name].tolist() for name in ("bid", "ask", "last", "volume", "time_msc")}
+    return [tick_message(symbol, dict(zip(columns, values))) for values in zip(*columns.values())]
+
+
+class ConflatingQueue(asyncio.Queue):
+    """
+    Queue of message batches that conflates what does not fit
+
+    Once the queue is full, offered messages go into a pending dict keyed
+    by ``key`` (newest wins, combined with ``combine``), which is queued as
+    one batch as soon as the consumer takes a batch.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.pending: Dict[Hashable, Dict[str, Any]] = {}
+
+    def key(self, message: Dict[str, Any]) -> Hashable:
+        return message["symbol"]
+
+    def combine(self, old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        """Pending message replacing ``old`` with the same key"""
+        return new
+
+    def merge(self, message: Dict[str, Any]) -> int:
+        """Add a message to the pending ones; returns the number it replaced"""
+        key = self.key(message)
+        # Re-inserted, so pending messages stay in arrival order
+        old = self.pending.pop(key, None)
+        self.pending[key] = message if old is None else self.combine(old, message)
+        return 0 if old is None else 1
+
+    def offer(self, batch: List[Dict[str, Any]]) -> int:
+        """
+        Queue a batch, or merge it into the pending messages if the queue is full
+
+        Returns:
+            int: Number of pending messages replaced by newer ones
+        """
+        if not self.pending and not self.full():
+            self.put_nowait(batch)
+            return 0
+        return sum(self.merge(message) for message in batch)
+
+    def get_nowait(self) -> List[Dict[str, Any]]:
+        # Queue.get() also ends here
+        batch = super().get_nowait()
+        if self.pending:
+            pending, self.pending = self.pending, {}
+            self.put_nowait(list(pending.values()))
+        return batch
+
+
+class MarketDataPump:
+    """Poll subscribed symbols on a dedicated thread and publish tick deltas"""
+
+    def __init__(
+        self,
+        connector: MT5Connector,
+        interval_ms: int,
+        queue_size: int,
+        buffers: Optional[TickBuffers] = None
+    ):
+        self.connector = connector
+        self.buffers = buffers
+        self.interval = interval_ms / 1000
+        self.queue_size = queue_size
+        self._symbols: Dict[str, int] = {}
+        self._last_msc: Dict[str, int] = {}
+        self._last_ticks: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"conflated_ticks": 0, "dropped_ticks": 0}
+        self._consumers: List[ConflatingQueue] = []
+        self._tick_consumers: List[asyncio.Queue] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def symbols(self) -> Set[str]:
+        with self._lock:
+            return set(self._symbols)
+
+    def add_symbols(self, symbols: Iterable[str]) -> None:
+        """
+        Start polling symbols
+
+        Symbols are reference counted, so several users (websocket clients,
+        strategies) can request the same symbol independently.
+        """
+        with self._lock:
+            before = len(self._symbols)
+            for symbol in symbols:
+                self._symbols[symbol] = self._symbols.get(symbol, 0) + 1
+            if len(self._symbols) != before:
+                self.connector.watch_symbols(list(self._symbols))
+
+    def remove_symbols(self, symbols: Iterable[str]) -> None:
+        """Release symbols requested with add_symbols"""
+        with self._lock:
+            before = len(self._symbols)
+            for symbol in symbols:
+                count = self._symbols.get(symbol, 0) - 1
+                if count > 0:
+                    self._symbols[symbol] = count
+                else:
+                    self._symbols.pop(symbol, None)
+                    self._last_msc.pop(symbol, None)
+                    self._last_ticks.pop(symbol, None)
+            if len(self._symbols) != before:
+                self.connector.watch_symbols(list(self._symbols))
+
+    def last_tick(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Latest tick message of a polled symbol, if one has arrived"""
+        with self._lock:
+            return self._last_ticks.get(symbol)
+
+    def subscribe(self, every_tick: bool = False) -> asyncio.Queue:
+        """
+        Register a consumer
+
+        Args:
+            every_tick: Receive every tick written to the tick buffers
+                instead of the latest tick per symbol per poll. Without
+                buffers in this process (disabled, or an API worker of a
+                gateway deployment) the polled ticks are delivered either way
+
+        Returns:
+            asyncio.Queue: Receives lists of tick messages. When the consumer
+            falls behind, ticks that do not fit are conflated to the newest
+            per symbol and delivered with its next ``get``; every-tick
+            consumers lose their oldest batch instead
+        """
+        if every_tick:
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+            self._tick_consumers.append(queue)
+        else:
+            queue = ConflatingQueue(self.queue_size)
+            self._consumers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        for consumers in (self._consumers, self._tick_consumers):
+            if queue in consumers:
+                consumers.remove(queue)
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start the polling thread; batches are delivered on ``loop``"""
+        if self._thread is not None:
+            return
+        self._loop = loop
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="market-feed", daemon=True)
+        self._thread.start()
+        logger.info("Market data pump started")
+
+    def stop(self) -> None:
+        """Stop the polling thread"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+        logger.info("Market data pump stopped")
+
+    def _poll(self, symbols: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+        """Fetch current ticks; returns all of them and messages for the ones that changed"""
+        if not symbols:
+            return {}, []
+
+        latest = self.connector.latest_ticks(symbols) or {}
+        changed = []
+        for symbol, tick in latest.items():
+            time_msc = tick.get("time_msc")
+            with self._lock:
+                if symbol not in self._symbols or self._last_msc.get(symbol) == time_msc:
+                    continue
+                self._last_msc[symbol] = time_msc
+                message = self._last_ticks[symbol] = tick_message(symbol, tick)
+            changed.append(message)
+        return latest, changed
+
+    def _buffer(
+        self,
+        symbols: List[str],
+        latest: Dict[str, Dict[str, Any]],
+        batch: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Append every tick since the last poll to the symbols' ring buffers
+
+        Returns:
+            list: Messages for every stored tick of the symbols in ``batch``;
+            symbols without a ring keep their polled tick
+        """
+        self.buffers.sync(symbols)
+        pending = self.buffers.pending(latest)
+        fetched = self.connector.ticks_since(pending, self.buffers.fetch_limit) if pending else {}
+        stored = self.buffers.store(latest, fetched)
+        messages = []
+        for message in batch:
+            ticks = stored.get(message["symbol"])
+            if ticks is None:
+                messages.append(message)
+            else:
+                messages.extend(_tick_messages(message["symbol"], ticks))
+        return messages
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                if self.connector.connected:
+                    with self._lock:
+                        symbols = list(self._symbols)
+                    latest, batch = self._poll(symbols)
+                    if batch:
+                        self._loop.call_soon_threadsafe(self._publish, batch)
+                    # After publishing, so tick delivery never waits for the fetch
+                    if self.buffers is not None and self.buffers.enabled:
+                        batch = self._buffer(symbols, latest, batch)
+                    if batch and self._tick_consumers:
+                        self._loop.call_soon_threadsafe(self._publish_every_tick, batch)
+            except Exception as e:
+                logger.error(f"Market data pump error: {e}")
+            self._stop.wait(max(self.interval - (time.monotonic() - started), 0))
+        if self.buffers is not None:
+            self.buffers.close_all()
+
+    def _publish(self, batch: List[Dict[str, Any]]) -> None:
+        """Deliver polled ticks to every consumer, conflating for full queues (event loop)"""
+        for queue in self._consumers:
+            self.stats["conflated_ticks"] += queue.offer(batch)
+
+    def _publish_every_tick(self, batch: List[Dict[str, Any]]) -> None:
+        """Deliver buffered ticks to every-tick consumers; full queues lose their oldest batch (event loop)"""
+        for queue in self._tick_consumers:
+            if queue.full():
+                self.stats["dropped_ticks"] += len(queue.get_nowait())
+            queue.put_nowait(batch)
+
+
+# Global market data pump instance
+market_feed = MarketDataPump(
+    mt5_connector,
+    settings.MARKET_FEED_INTERVAL_MS,
+    settings.MARKET_FEED_QUEUE_SIZE,
+    # API workers read the gateway's buffers instead of writing their own
+    tick_buffers if tick_buffers.owner else None
+)
@@ -0,0 +1,88 @@
+"""Latency histograms
+
+Durations are counted in fixed log-scale buckets (1-2-5 steps from 1 µs to
+10 s), so recording is O(1) and memory does not grow with the number of
+samples. Percentiles are reported as the upper bound of their bucket.
+"""
+
+import bisect
+import threading
+from typing import Any, Dict, List
+
+# Bucket upper bounds in seconds
+BUCKET_BOUNDS: List[float] = [
+    base * 10.0 ** exponent
+    for exponent in range(-6, 1)
+    for base in (1, 2, 5)
+] + [10.0]
+
+
+def _label(bound: float) -> str:
+    if bound < 1e-3:
+        return f"{bound * 1e6:g}us"
+    if bound < 1:
+        return f"{bound * 1e3:g}ms"
+    return f"{bound:g}s"
+
+
+class LatencyHistogram:
+    """Thread-safe histogram of durations in seconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(BUCKET_BOUNDS) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        index = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def _percentile(self, fraction: float) -> float:
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if count and seen >= target:
+                return BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self, buckets: bool = False) -> Dict[str, Any]:
+        """
+        Summary in milliseconds
+
+        Args:
+            buckets: Include the non-empty bucket counts
+
+        Returns:
+            dict: count, mean_ms, p50_ms, p90_ms, p99_ms and max_ms
+        """
+        with self._lock:
+            if not self.count:
+                summary: Dict[str, Any] = {"count": 0}
+            else:
+                summary = {
+                    "count": self.count,
+                    "mean_ms": self.total / self.count * 1e3,
+                    "p50_ms": min(self._percentile(0.5), self.max) * 1e3,
+                    "p90_ms": min(self._percentile(0.9), self.max) * 1e3,
+                    "p99_ms": min(self._percentile(0.99), self.max) * 1e3,
+                    "max_ms": self.max * 1e3
+                }
+            if buckets:
+                summary["buckets"] = {
+                    (_label(BUCKET_BOUNDS[i]) if i < len(BUCKET_BOUNDS) else "inf"): count
+                    for i, count in enumerate(self._counts)
+                    if count
+                }
+            return summary
@@ -0,0 +1,103 @@
+"""Short-lived cache for MT5 query results
+
+Entries hold the executor future of the call that produced them, so
+concurrent identical requests share one in-flight terminal call
+(single-flight) and later requests reuse the result until its TTL expires.
+Failed calls (None results or exceptions) are never cached.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+
+
+class CallCache:
+    """TTL cache of executor futures keyed by method name and arguments"""
+
+    def __init__(self, ttls: Dict[str, float]):
+        """
+        Args:
+            ttls: Method name to time-to-live in seconds; 0 disables caching
+        """
+        self.ttls = ttls
+        self._entries: Dict[Tuple, Tuple[float, Future]] = {}
+        self._lock = threading.Lock()
+        self._stats = {name: {"hits": 0, "coalesced": 0, "misses": 0} for name in ttls}
+
+    def ttl(self, name: str) -> float:
+        return self.ttls.get(name, 0)
+
+    def get_or_submit(
+        self,
+        name: str,
+        args: Tuple,
+        kwargs: Dict[str, Any],
+        submit: Callable[[], Future]
+    ) -> Future:
+        """
+        Return the cached or in-flight future for a call, submitting it if needed
+
+        Args:
+            name: Method name
+            args: Positional arguments of the call
+            kwargs: Keyword arguments of the call
+            submit: Queues the call and returns its future
+
+        Returns:
+            Future: Shared future with the call's result
+        """
+        key = (name, args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, future = entry
+                if not future.done():
+                    self._stats[name]["coalesced"] += 1
+                    return future
+                if expires > time.monotonic():
+                    self._stats[name]["hits"] += 1
+                    return future
+            self._stats[name]["misses"] += 1
+            future = submit()
+            self._entries[key] = (math.inf, future)
+        future.add_done_callback(lambda done: self._complete(key, done))
+        return future
+
+    def _complete(self, key: Tuple, future: Future) -> None:
+        """Start the TTL of a finished call, or forget it if it failed"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] is not future:
+                # Invalidated while in flight
+                return
+            if future.cancelled() or future.exception() is not None or future.result() is None:
+                del self._entries[key]
+            else:
+                self._entries[key] = (time.monotonic() + self.ttls[key[0]], future)
+
+    def invalidate(self, *names: str) -> None:
+        """
+        Drop cached results
+
+        Args:
+            names: Method names to drop; drops everything when empty
+        """
+        with self._lock:
+            if not names:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] in names]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit, coalesced and miss counts with the TTL of every cached method"""
+        with self._lock:
+            entries = {name: 0 for name in self._stats}
+            for key in self._entries:
+                entries[key[0]] += 1
+            return {
+                name: {"ttl": self.ttls[name], "entries": entries[name], **counts}
+                for name, counts in self._stats.items()
+            }
@@ -1,23 +1,177 @@
 """MetaTrader 5 Connector Service"""
 
 import MetaTrader5 as mt5
+import functools
 import logging
 from typing import Optional, List, Dict, Any
-from datetime import datetime
-import pandas as pd
+from datetime import datetime, timezone
+import numpy as np
 
 from app.core.config import settings
+from app.services.mt5_cache import CallCache
+from app.services.mt5_executor import (
+    MT5Executor,
+    MT5CallTimeout,
+    PRIORITY_CONTROL,
+    PRIORITY_ORDER,
+    PRIORITY_QUERY,
+    PRIORITY_MARKET_DATA,
+    PRIORITY_HISTORY
+)
 
 logger = logging.getLogger(__name__)
 
 
+def mt5_call(priority: int):
+    """
+    Run a connector method on the connector's MT5 executor
+    
+    The blocking method waits for the executor; calls that time out are
+    logged and return None like any other failed call. The same method is
+    available as a coroutine on ``MT5Connector.aio``. Methods with a cache
+    TTL are served through the connector's call cache.
+    
+    Args:
+        priority: Executor priority (PRIORITY_*)
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return self._call(priority, method, args, kwargs)
+            except MT5CallTimeout as e:
+                logger.error(f"MT5 call {e}")
+                return None
+        wrapper.mt5_priority = priority
+        return wrapper
+    return decorator
+
+
+class AsyncMT5Connector:
+    """
+    Awaitable facade over an MT5Connector
+    
+    Every executor-backed method of the connector is available as a
+    coroutine, e.g. ``await mt5_connector.aio.account_info()``. Unlike the
+    blocking methods, a call that times out raises MT5CallTimeout.
+    """
+    
+    def __init__(self, connector: "MT5Connector"):
+        self._connector = connector
+    
+    def __getattr__(self, name: str):
+        method = getattr(type(self._connector), name, None)
+        priority = getattr(method, "mt5_priority", None)
+        if priority is None:
+            raise AttributeError(name)
+        connector = self._connector
+        
+        async def call(*args, **kwargs):
+            return await connector._call_async(priority, method.__wrapped__, args, kwargs)
+        
+        call.__name__ = name
+        setattr(self, name, call)
+        return call
+
+
 class MT5Connector:
     """MetaTrader 5 connection and trading operations"""
     
-    def __init__(self):
+    def __init__(self, mt5_module=None, executor: Optional[MT5Executor] = None):
+        """
+        Args:
+            mt5_module: MetaTrader5 API module (a fake can be injected for testing)
+            executor: Executor all terminal calls run on
+        """
+        self.mt5 = mt5_module or mt5
+        self.executor = executor or MT5Executor({
+            PRIORITY_CONTROL: None,
+            PRIORITY_ORDER: settings.MT5_ORDER_TIMEOUT,
+            PRIORITY_QUERY: settings.MT5_QUERY_TIMEOUT,
+            PRIORITY_MARKET_DATA: settings.MT5_MARKET_DATA_TIMEOUT,
+            PRIORITY_HISTORY: settings.MT5_HISTORY_TIMEOUT
+        })
+        self.cache = CallCache({
+            "account_info": settings.MT5_ACCOUNT_CACHE_TTL,
+            "positions_get": settings.MT5_POSITIONS_CACHE_TTL,
+            "symbol_info": settings.MT5_SYMBOL_CACHE_TTL,
+            "symbol_names": settings.MT5_SYMBOL_CACHE_TTL
+        })
+        self.aio = AsyncMT5Connector(self)
         self.initialized = False
         self.connected = False
     
+    def _dispatch(self, priority: int, method, args: tuple, kwargs: dict):
+        """Queue a call on the executor; returns its future"""
+        return self.executor.submit(priority, method, (self, *args), kwargs)
+    
+    def _submit(self, priority: int, method, args: tuple, kwargs: dict):
+        """Queue a call, sharing a cached or in-flight result when the method is cached"""
+        if not self.cache.ttl(method.__name__):
+            return self._dispatch(priority, method, args, kwargs), False
+        future = self.cache.get_or_submit(
+            method.__name__,
+            args,
+            kwargs,
+            lambda: self._dispatch(priority, method, args, kwargs)
+        )
+        return future, True
+    
+    def _call(self, priority: int, method, args: tuple, kwargs: dict) -> Any:
+        """Run a connector method on the executor and wait for it"""
+        if self.executor.in_worker():
+            return method(self, *args, **kwargs)
+        future, shared = self._submit(priority, method, args, kwargs)
+        return self.executor.wait(future, priority, cancel=not shared, label=method.__name__)
+    
+    async def _call_async(self, priority: int, method, args: tuple, kwargs: dict) -> Any:
+        """Run a connector method on the executor without blocking the event loop"""
+        future, shared = self._submit(priority, method, args, kwargs)
+        return await self.executor.wait_async(
+            future,
+            priority,
+            cancel=not shared,
+            label=method.__name__
+        )
+    
+    def submit_order(self, request: Dict[str, Any]):
+        """
+        Queue an order_send call without waiting for it
+        
+        Several orders can be queued back to back and awaited together with
+        ``executor.wait_async(future, PRIORITY_ORDER)``.
+        
+        Args:
+            request: Order request dictionary
+            
+        Returns:
+            Future: Resolves with the order_send result; carries the
+            executor's queue and run timestamps
+        """
+        return self._dispatch(PRIORITY_ORDER, MT5Connector.order_send.__wrapped__, (request,), {})
+    
+    def watch_symbols(self, symbols: List[str]) -> None:
+        """
+        Called by the market feed whenever the set of polled symbols changes
+        
+        A connector that owns the terminal polls whatever it is asked for;
+        the gateway connector of API workers forwards the set so the gateway
+        polls and buffers those symbols.
+        
+        Args:
+            symbols: Every symbol the feed polls
+        """
+    
+    def invalidate_cache(self, *names: str) -> None:
+        """
+        Drop cached query results, e.g. after an order or a position change
+        
+        Args:
+            names: Connector method names; drops everything when empty
+        """
+        self.cache.invalidate(*names)
+    
+    @mt5_call(PRIORITY_CONTROL)
     def initialize(self, path: Optional[str] = None, timeout: int = 60000) -> bool:
         """
         Initialize MT5 connection
@@ -32,25 +186,26 @@ class MT5Connector:
         try:
             mt5_path = path or settings.MT5_PATH or None
             if mt5_path:
-                result = mt5.initialize(
+                result = self.mt5.initialize(
                     path=mt5_path,
                     timeout=timeout
                 )
             else:
-                result = mt5.initialize(timeout=timeout)
+                result = self.mt5.initialize(timeout=timeout)
             
             if result:
                 self.initialized = True
                 logger.info("MT5 initialized successfully")
                 return True
             else:
-                error = mt5.last_error()
+                error = self.mt5.last_error()
                 logger.error(f"MT5 initialization failed: {error}")
                 return False
         except Exception as e:
             logger.error(f"MT5 initialization exception: {e}")
             return False
     
+    @mt5_call(PRIORITY_CONTROL)
     def login(self, login: int, password: str, server: str) -> bool:
         """
         Login to MT5 account
@@ -68,30 +223,34 @@ class MT5Connector:
                 if not self.initialize():
                     return False
             
-            result = mt5.login(login=login, password=password, server=server)
+            result = self.mt5.login(login=login, password=password, server=server)
             
             if result:
                 self.connected = True
+                self.invalidate_cache()
                 logger.info(f"Logged in to MT5 account {login}")
                 return True
             else:
-                error = mt5.last_error()
+                error = self.mt5.last_error()
                 logger.error(f"MT5 login failed: {error}")
                 return False
         except Exception as e:
             logger.error(f"MT5 login exception: {e}")
             return False
     
+    @mt5_call(PRIORITY_CONTROL)
     def shutdown(self) -> None:
         """Shutdown MT5 connection"""
         try:
-            mt5.shutdown()
+            self.mt5.shutdown()
             self.initialized = False
             self.connected = False
+            self.invalidate_cache()
             logger.info("MT5 connection closed")
         except Exception as e:
             logger.error(f"MT5 shutdown exception: {e}")
     
+    @mt5_call(PRIORITY_QUERY)
     def account_info(self) -> Optional[Dict[str, Any]]:
         """
         Get account information
@@ -104,9 +263,9 @@ class MT5Connector:
                 logger.warning("Not connected to MT5")
                 return None
             
-            account = mt5.account_info()
+            account = self.mt5.account_info()
             if account is None:
-                error = mt5.last_error()
+                error = self.mt5.last_error()
                 logger.error(f"Failed to get account info: {error}")
                 return None
             
@@ -115,6 +274,7 @@ class MT5Connector:
             logger.error(f"Account info exception: {e}")
             return None
     
+    @mt5_call(PRIORITY_QUERY)
     def symbol_info(self, symbol: str) -> Optional[Dict[str, Any]]:
         """
         Get symbol information
@@ -130,9 +290,9 @@ class MT5Connector:
                 logger.warning("Not connected to MT5")
                 return None
             
-            info = mt5.symbol_info(symbol)
+            info = self.mt5.symbol_info(symbol)
             if info is None:
-                error = mt5.last_error()
+                error = self.mt5.last_error()
                 logger.error(f"Failed to get symbol info for {symbol}: {error}")
                 return None
             
@@ -141,15 +301,99 @@ class MT5Connector:
             logger.error(f"Symbol info exception: {e}")
             return None
     
+    @mt5_call(PRIORITY_QUERY)
+    def symbol_names(self) -> Optional[List[str]]:
+        """
+        Get the names of all symbols available in the terminal
+        
+        Returns:
+            list: Symbol names or None if failed
+        """
+        try:
+            if not self.connected:
+                logger.warning("Not connected to MT5")
+                return None
+            
+            symbols = self.mt5.symbols_get()
+            if symbols is None:
+                error = self.mt5.last_error()
+                logger.error(f"Failed to get symbols: {error}")
+                return None
+            
+            return [symbol.name for symbol in symbols]
+        except Exception as e:
+            logger.error(f"Symbols get exception: {e}")
+            return None
+    
+    @mt5_call(PRIORITY_MARKET_DATA)
+    def latest_ticks(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the current tick of several symbols in one batch
+        
+        Args:
+            symbols: Symbol names
+            
+        Returns:
+            dict: Symbol name to tick dictionary; symbols without a tick are omitted
+        """
+        ticks = {}
+        if not self.connected:
+            return ticks
+        
+        for symbol in symbols:
+            try:
+                tick = self.mt5.symbol_info_tick(symbol)
+                if tick is not None:
+                    ticks[symbol] = tick._asdict()
+            except Exception as e:
+                logger.error(f"Symbol info tick exception for {symbol}: {e}")
+        return ticks
+    
+    @mt5_call(PRIORITY_MARKET_DATA)
+    def ticks_since(self, since: Dict[str, int], limit: int) -> Dict[str, Optional[np.ndarray]]:
+        """
+        Get every tick from a given time on for several symbols in one batch
+        
+        Ticks stamped with the ``since`` millisecond itself are included:
+        more of them may have arrived after the newest one already held, so
+        the caller drops the ones it has.
+        
+        Args:
+            since: Symbol name to the time_msc of the newest tick already held
+            limit: Maximum ticks requested per symbol
+            
+        Returns:
+            dict: Symbol name to the ticks (raw MT5 structured array), or
+            None if they could not be fetched completely (error or more than
+            ``limit`` ticks)
+        """
+        ticks = {}
+        if not self.connected:
+            return ticks
+        
+        for symbol, last_msc in since.items():
+            try:
+                date_from = datetime.fromtimestamp(last_msc // 1000, tz=timezone.utc)
+                fetched = self.mt5.copy_ticks_from(symbol, date_from, limit, self.mt5.COPY_TICKS_ALL)
+                if fetched is None or len(fetched) >= limit:
+                    ticks[symbol] = None
+                else:
+                    ticks[symbol] = fetched[fetched["time_msc"] >= last_msc]
+            except Exception as e:
+                logger.error(f"Copy ticks exception for {symbol}: {e}")
+                ticks[symbol] = None
+        return ticks
+    
+    @mt5_call(PRIORITY_MARKET_DATA)
     def copy_rates(
         self,
         symbol: str,
         timeframe: int,
         start_pos: int = 0,
         count: int = 100
-    ) -> Optional[List[Dict[str, Any]]]:
+    ) -> Optional[np.ndarray]:
         """
-        Get historical rates
+        Get historical rates as the raw MT5 structured array
         
         Args:
             symbol: Symbol name
@@ -158,34 +402,69 @@ class MT5Connector:
             count: Number of bars
             
         Returns:
-            list: List of rate dictionaries or None if failed
+            np.ndarray: Rates with time/open/high/low/close/... fields or None if failed
         """
         try:
             if not self.connected:
                 logger.warning("Not connected to MT5")
                 return None
             
-            rates = mt5.copy_rates_from_pos(symbol, timeframe, start_pos, count)
+            rates = self.mt5.copy_rates_from_pos(symbol, timeframe, start_pos, count)
             if rates is None or len(rates) == 0:
-                error = mt5.last_error()
+                error = self.mt5.last_error()
                 logger.error(f"Failed to get rates for {symbol}: {error}")
                 return None
             
-            df = pd.DataFrame(rates)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-            return df.to_dict('records')
+            return rates
         except Exception as e:
             logger.error(f"Copy rates exception: {e}")
             return None
     
+    @mt5_call(PRIORITY_HISTORY)
+    def copy_rates_range(
+        self,
+        symbol: str,
+        timeframe: int,
+        date_from: datetime,
+        date_to: datetime
+    ) -> Optional[np.ndarray]:
+        """
+        Get historical rates for a date range as the raw MT5 structured array
+        
+        Args:
+            symbol: Symbol name
+            timeframe: Timeframe (mt5.TIMEFRAME_*)
+            date_from: Range start
+            date_to: Range end
+        
+        Returns:
+            np.ndarray: Rates with time/open/high/low/close/... fields or None if failed
+        """
+        try:
+            if not self.connected:
+                logger.warning("Not connected to MT5")
+                return None
+            
+            rates = self.mt5.copy_rates_range(symbol, timeframe, date_from, date_to)
+            if rates is None:
+                error = self.mt5.last_error()
+                logger.error(f"Failed to get rates for {symbol}: {error}")
+                return None
+            
+            return rates
+        except Exception as e:
+            logger.error(f"Copy rates range exception: {e}")
+            return None
+    
+    @mt5_call(PRIORITY_MARKET_DATA)
     def copy_ticks(
         self,
         symbol: str,
         count: int = 100,
         flags: int = mt5.COPY_TICKS_ALL
-    ) -> Optional[List[Dict[str, Any]]]:
+    ) -> Optional[np.ndarray]:
         """
-        Get tick data
+        Get the newest ticks as the raw MT5 structured array
         
         Args:
             symbol: Symbol name
@@ -193,26 +472,61 @@ class MT5Connector:
             flags: Tick type flags
             
         Returns:
-            list: List of tick dictionaries or None if failed
+            np.ndarray: Ticks with time/bid/ask/last/volume/time_msc/... fields or None if failed
         """
         try:
             if not self.connected:
                 logger.warning("Not connected to MT5")
                 return None
             
-            ticks = mt5.copy_ticks_from(symbol, datetime.now(), count, flags)
+            ticks = self.mt5.copy_ticks_from(symbol, datetime.now(), count, flags)
             if ticks is None or len(ticks) == 0:
-                error = mt5.last_error()
+                error = self.mt5.last_error()
                 logger.error(f"Failed to get ticks for {symbol}: {error}")
                 return None
             
-            df = pd.DataFrame(ticks)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-            return df.to_dict('records')
+            return ticks
         except Exception as e:
             logger.error(f"Copy ticks exception: {e}")
             return None
     
+    @mt5_call(PRIORITY_HISTORY)
+    def copy_ticks_range(
+        self,
+        symbol: str,
+        date_from: datetime,
+        date_to: datetime,
+        flags: int = mt5.COPY_TICKS_ALL
+    ) -> Optional[np.ndarray]:
+        """
+        Get ticks for a date range as the raw MT5 structured array
+        
+        Args:
+            symbol: Symbol name
+            date_from: Range start
+            date_to: Range end
+            flags: Tick type flags
+            
+        Returns:
+            np.ndarray: Ticks with time/bid/ask/last/volume/time_msc/... fields or None if failed
+        """
+        try:
+            if not self.connected:
+                logger.warning("Not connected to MT5")
+                return None
+            
+            ticks = self.mt5.copy_ticks_range(symbol, date_from, date_to, flags)
+            if ticks is None:
+                error = self.mt5.last_error()
+                logger.error(f"Failed to get ticks for {symbol}: {error}")
+                return None
+            
+            return ticks
+        except Exception as e:
+            logger.error(f"Copy ticks range exception: {e}")
+            return None
+    
+    @mt5_call(PRIORITY_ORDER)
     def order_send(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Send trading order
@@ -228,9 +542,11 @@ class MT5Connector:
                 logger.warning("Not connected to MT5")
                 return None
             
-            result = mt5.order_send(request)
+            result = self.mt5.order_send(request)
+            # Balance, margin and positions may have changed even if the order failed
+            self.invalidate_cache("account_info", "positions_get")
             if result is None:
-                error = mt5.last_error()
+                error = self.mt5.last_error()
                 logger.error(f"Failed to send order: {error}")
                 return None
             
@@ -239,6 +555,7 @@ class MT5Connector:
             logger.error(f"Order send exception: {e}")
             return None
     
+    @mt5_call(PRIORITY_QUERY)
     def positions_get(self, symbol: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
         """
         Get open positions
@@ -255,12 +572,12 @@ class MT5Connector:
                 return None
             
             if symbol:
-                positions = mt5.positions_get(symbol=symbol)
+                positions = self.mt5.positions_get(symbol=symbol)
             else:
-                positions = mt5.positions_get()
+                positions = self.mt5.positions_get()
             
             if positions is None:
-                error = mt5.last_error()
+                error = self.mt5.last_error()
                 logger.error(f"Failed to get positions: {error}")
                 return None
             
@@ -269,6 +586,7 @@ class MT5Connector:
             logger.error(f"Positions get exception: {e}")
             return None
     
+    @mt5_call(PRIORITY_HISTORY)
     def history_deals_get(
         self,
         from_date: datetime,
@@ -292,12 +610,12 @@ class MT5Connector:
                 return None
             
             if group:
-                deals = mt5.history_deals_get(from_date, to_date, group=group)
+                deals = self.mt5.history_deals_get(from_date, to_date, group=group)
             else:
-                deals = mt5.history_deals_get(from_date, to_date)
+                deals = self.mt5.history_deals_get(from_date, to_date)
             
             if deals is None:
-                error = mt5.last_error()
+                error = self.mt5.last_error()
                 logger.error(f"Failed to get history deals: {error}")
                 return None
             
@@ -308,4 +626,9 @@ class MT5Connector:
 
 
 # Global MT5 connector instance
-mt5_connector = MT5Connector()
+if settings.GATEWAY_ROLE == "worker":
+    # Terminal calls go to the gateway process (see app.services.gateway)
+    from app.services.gateway_client import GatewayConnector, gateway_client
+    mt5_connector = GatewayConnector(gateway_client)
+else:
+    mt5_connector = MT5Connector()
@@ -0,0 +1,227 @@
+"""Single-thread executor for MetaTrader 5 calls
+
+The MetaTrader5 package talks to the terminal over blocking IPC and is not
+safe for concurrent use, so every call goes through one worker thread.
+Calls wait in a priority queue (orders first, history downloads last) and
+callers stop waiting once a call's timeout expires; a call that is still
+queued at that point is dropped instead of being sent to the terminal.
+
+Futures carry ``time.perf_counter`` timestamps of when the call was queued
+(``submitted_at``), picked up (``started_at``) and finished
+(``finished_at``), so callers can tell queueing time from terminal time.
+"""
+
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Lower values run first
+PRIORITY_CONTROL = 0
+PRIORITY_ORDER = 1
+PRIORITY_QUERY = 2
+PRIORITY_MARKET_DATA = 3
+PRIORITY_HISTORY = 4
+
+# Marker for "use the executor's timeout for this priority"
+DEFAULT_TIMEOUT = object()
+
+
+class MT5CallTimeout(TimeoutError):
+    """Raised when an MT5 call does not finish within its timeout"""
+
+
+class MT5Executor:
+    """Run callables one at a time, in priority order, on a dedicated thread"""
+
+    def __init__(self, timeouts: Optional[Dict[int, Optional[float]]] = None):
+        self.timeouts = timeouts or {}
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of queued calls"""
+        return self._queue.qsize()
+
+    def in_worker(self) -> bool:
+        """True when called from the executor thread itself"""
+        return threading.current_thread() is self._thread
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="mt5-executor", daemon=True)
+                self._thread.start()
+
+    def submit(
+        self,
+        priority: int,
+        fn: Callable[..., Any],
+        args: Tuple = (),
+        kwargs: Optional[Dict[str, Any]] = None
+    ) -> Future:
+        """
+        Queue a call
+
+        Args:
+            priority: One of the PRIORITY_* constants
+            fn: Callable to run on the executor thread
+            args: Positional arguments
+            kwargs: Keyword arguments
+
+        Returns:
+            Future: Resolves with the call's result
+        """
+        future: Future = Future()
+        future.submitted_at = time.perf_counter()
+        self._ensure_started()
+        self._queue.put((priority, next(self._sequence), future, fn, args, kwargs or {}))
+        return future
+
+    def _timeout(self, priority: int, timeout: Any) -> Optional[float]:
+        if timeout is DEFAULT_TIMEOUT:
+            return self.timeouts.get(priority)
+        return timeout
+
+    def wait(
+        self,
+        future: Future,
+        priority: int,
+        timeout: Any = DEFAULT_TIMEOUT,
+        cancel: bool = True,
+        label: str = "MT5 call"
+    ) -> Any:
+        """
+        Block until a submitted call finishes
+
+        Args:
+            future: Future returned by ``submit``
+            priority: Priority the call was submitted with
+            timeout: Seconds to wait (defaults to the priority's timeout)
+            cancel: Drop the call if it is still queued when the wait times
+                out; pass False for futures shared with other callers
+            label: Call name used in the timeout message
+
+        Raises:
+            MT5CallTimeout: If the call does not finish within the timeout
+        """
+        try:
+            return future.result(self._timeout(priority, timeout))
+        except MT5CallTimeout:
+            # Raised by the call itself, e.g. an unreachable MT5 gateway
+            raise
+        except FutureTimeoutError:
+            if cancel:
+                future.cancel()
+            raise MT5CallTimeout(f"{label} timed out")
+
+    async def wait_async(
+        self,
+        future: Future,
+        priority: int,
+        timeout: Any = DEFAULT_TIMEOUT,
+        cancel: bool = True,
+        label: str = "MT5 call"
+    ) -> Any:
+        """Awaitable version of ``wait``; the event loop is never blocked"""
+        waiter = asyncio.wrap_future(future)
+        try:
+            return await asyncio.wait_for(
+                waiter if cancel else asyncio.shield(waiter),
+                self._timeout(priority, timeout)
+            )
+        except MT5CallTimeout:
+            raise
+        except asyncio.TimeoutError:
+            if cancel:
+                future.cancel()
+            raise MT5CallTimeout(f"{label} timed out")
+
+    def call(
+        self,
+        priority: int,
+        fn: Callable[..., Any],
+        args: Tuple = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        timeout: Any = DEFAULT_TIMEOUT
+    ) -> Any:
+        """
+        Run a call on the executor thread and block until it finishes
+
+        Calls made from the executor thread run inline.
+
+        Raises:
+            MT5CallTimeout: If the call does not finish within the timeout
+        """
+        if self.in_worker():
+            return fn(*args, **(kwargs or {}))
+        future = self.submit(priority, fn, args, kwargs)
+        return self.wait(future, priority, timeout, label=getattr(fn, "__name__", "MT5 call"))
+
+    async def call_async(
+        self,
+        priority: int,
+        fn: Callable[..., Any],
+        args: Tuple = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        timeout: Any = DEFAULT_TIMEOUT
+    ) -> Any:
+        """
+        Awaitable version of ``call``
+
+        Raises:
+            MT5CallTimeout: If the call does not finish within the timeout
+        """
+        future = self.submit(priority, fn, args, kwargs)
+        return await self.wait_async(
+            future,
+            priority,
+            timeout,
+            label=getattr(fn, "__name__", "MT5 call")
+        )
+
+    def _run(self) -> None:
+        while True:
+            _, _, future, fn, args, kwargs = self._queue.get()
+            if future is None:
+                break
+            # Skips calls whose caller already gave up
+            if not future.set_running_or_notify_cancel():
+                continue
+            future.started_at = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.finished_at = time.perf_counter()
+                future.set_exception(e)
+            else:
+                future.finished_at = time.perf_counter()
+                future.set_result(result)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker thread and cancel queued calls"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put((-1, next(self._sequence), None, None, (), {}))
+        thread.join(timeout=timeout)
+        while True:
+            try:
+                _, _, future, _, _, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None:
+                future.cancel()
+        with self._lock:
+            self._thread = None
+        logger.info("MT5 executor stopped")
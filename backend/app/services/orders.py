@@ -0,0 +1,435 @@
+"""Order pipeline shared by the REST API and live strategies
+
+Every order is validated against a local snapshot of its symbol's
+specification (trading mode, volume limits and step, stops level) before it
+reaches the terminal; the snapshot is refreshed in the background, so
+validation never waits for a terminal call once a symbol has been seen.
+Valid orders are queued on the MT5 executor's order lane back to back, so a
+basket is sent without a round-trip through the event loop between orders.
+
+Each order's time is split into stages, each with its own histogram:
+``validation`` (pre-trade checks), ``queue`` (waiting for the executor),
+``terminal`` (the order_send call) and ``fill`` (request received to
+confirmed execution). A ``TradeLog`` row is queued on the batched writer for
+every order, and the local deal history and position book are marked stale.
+
+An order whose wait times out while the terminal is already executing it
+cannot be withdrawn; it is reported with status ``unknown`` and its real
+result is logged (and the local state marked stale again) once the call
+returns.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import MetaTrader5 as mt5
+
+from app.core.config import settings
+from app.models.models import TradeLog
+from app.services.db_writer import db_writer
+from app.services.deal_history import deal_history
+from app.services.market_feed import market_feed, MarketDataPump
+from app.services.metrics import LatencyHistogram
+from app.services.mt5_connector import mt5_connector, MT5Connector
+from app.services.mt5_executor import MT5CallTimeout, PRIORITY_ORDER
+from app.services.position_book import position_book
+
+logger = logging.getLogger(__name__)
+
+ORDER_TYPE_NAMES = {
+    mt5.ORDER_TYPE_BUY: "BUY",
+    mt5.ORDER_TYPE_SELL: "SELL",
+    mt5.ORDER_TYPE_BUY_LIMIT: "BUY_LIMIT",
+    mt5.ORDER_TYPE_SELL_LIMIT: "SELL_LIMIT",
+    mt5.ORDER_TYPE_BUY_STOP: "BUY_STOP",
+    mt5.ORDER_TYPE_SELL_STOP: "SELL_STOP",
+}
+
+BUY_TYPES = {mt5.ORDER_TYPE_BUY, mt5.ORDER_TYPE_BUY_LIMIT, mt5.ORDER_TYPE_BUY_STOP}
+
+SUCCESS_RETCODES = {mt5.TRADE_RETCODE_DONE, mt5.TRADE_RETCODE_PLACED, mt5.TRADE_RETCODE_DONE_PARTIAL}
+
+STAGES = ("validation", "queue", "terminal", "fill")
+
+STATUS_EXECUTED = "executed"
+STATUS_REJECTED = "rejected"
+STATUS_INVALID = "invalid"
+STATUS_FAILED = "failed"
+STATUS_UNKNOWN = "unknown"  # timed out while the terminal was executing it
+
+
+class OrderValidationError(ValueError):
+    """Raised when an order fails its pre-trade checks"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _off_step(value: float, step: float) -> bool:
+    steps = value / step
+    return abs(steps - round(steps)) > 1e-6
+
+
+def validate_order(
+    request: Dict[str, Any],
+    info: Optional[Dict[str, Any]],
+    tick: Optional[Dict[str, Any]] = None
+) -> List[str]:
+    """
+    Pre-trade checks of an order against the symbol specification
+
+    Args:
+        request: Request in the mt5.order_send layout
+        info: Symbol information as returned by MT5Connector.symbol_info
+        tick: Latest tick (bid/ask); falls back to the prices in ``info``
+
+    Returns:
+        list: Error messages, empty if the order passed
+    """
+    symbol = request.get("symbol")
+    if info is None:
+        return [f"Unknown symbol {symbol}"]
+    action = request.get("action")
+    if action not in (mt5.TRADE_ACTION_DEAL, mt5.TRADE_ACTION_PENDING):
+        return []
+
+    errors = []
+    order_type = request.get("type")
+    if order_type not in ORDER_TYPE_NAMES:
+        return [f"Unsupported order type {order_type}"]
+    is_buy = order_type in BUY_TYPES
+    closing = request.get("position") is not None
+
+    trade_mode = info.get("trade_mode")
+    if trade_mode == mt5.SYMBOL_TRADE_MODE_DISABLED:
+        errors.append(f"Trading is disabled for {symbol}")
+    elif trade_mode == mt5.SYMBOL_TRADE_MODE_CLOSEONLY and not closing:
+        errors.append(f"{symbol} only allows closing positions")
+    elif trade_mode == mt5.SYMBOL_TRADE_MODE_LONGONLY and not is_buy and not closing:
+        errors.append(f"{symbol} only allows long positions")
+    elif trade_mode == mt5.SYMBOL_TRADE_MODE_SHORTONLY and is_buy and not closing:
+        errors.append(f"{symbol} only allows short positions")
+
+    volume = request.get("volume")
+    volume_min = info.get("volume_min") or 0.0
+    volume_max = info.get("volume_max") or 0.0
+    volume_step = info.get("volume_step") or 0.0
+    if volume is None or volume <= 0:
+        errors.append("Volume must be positive")
+    else:
+        if volume_min and volume < volume_min * (1 - 1e-9):
+            errors.append(f"Volume {volume} is below the minimum {volume_min}")
+        if volume_max and volume > volume_max * (1 + 1e-9):
+            errors.append(f"Volume {volume} is above the maximum {volume_max}")
+        if volume_step and _off_step(volume, volume_step):
+            errors.append(f"Volume {volume} is not a multiple of the step {volume_step}")
+
+    bid = (tick or {}).get("bid") or info.get("bid")
+    ask = (tick or {}).get("ask") or info.get("ask")
+    market = ask if is_buy else bid
+    price = request.get("price")
+    if action == mt5.TRADE_ACTION_PENDING and not price:
+        errors.append("Pending orders need a price")
+        return errors
+    price = price or market
+    if not price:
+        return errors
+
+    min_distance = (info.get("trade_stops_level") or 0) * (info.get("point") or 0.0)
+    direction = 1 if is_buy else -1
+    sl = request.get("sl")
+    tp = request.get("tp")
+    if sl and direction * (price - sl) < min_distance:
+        errors.append(f"Stop loss {sl} must be at least {min_distance:g} {'below' if is_buy else 'above'} {price}")
+    if tp and direction * (tp - price) < min_distance:
+        errors.append(f"Take profit {tp} must be at least {min_distance:g} {'above' if is_buy else 'below'} {price}")
+
+    if action == mt5.TRADE_ACTION_PENDING and market:
+        # Limit orders rest on the favourable side of the market, stop orders beyond it
+        limit = order_type in (mt5.ORDER_TYPE_BUY_LIMIT, mt5.ORDER_TYPE_SELL_LIMIT)
+        side = -direction if limit else direction
+        if side * (price - market) < min_distance:
+            errors.append(
+                f"{ORDER_TYPE_NAMES[order_type]} price {price} must be at least "
+                f"{min_distance:g} {'above' if side > 0 else 'below'} the market ({market})"
+            )
+    return errors
+
+
+def log_order(
+    request: Dict[str, Any],
+    result: Optional[Dict[str, Any]],
+    status: Optional[str] = None,
+    comment: Optional[str] = None
+) -> None:
+    """Queue a trade log row for an order (written in the background)"""
+    values = {
+        "symbol": request.get("symbol"),
+        "order_type": ORDER_TYPE_NAMES.get(request.get("type"), str(request.get("type"))),
+        "volume": request.get("volume"),
+        "price": request.get("price"),
+        "sl": request.get("sl"),
+        "tp": request.get("tp"),
+        "status": status or STATUS_FAILED,
+        "comment": comment or request.get("comment")
+    }
+    if result is not None:
+        values.update({
+            "volume": result.get("volume") or request.get("volume"),
+            "price": result.get("price") or request.get("price"),
+            "status": STATUS_EXECUTED if result.get("retcode") in SUCCESS_RETCODES else STATUS_REJECTED,
+            "order_id": result.get("order"),
+            "comment": result.get("comment")
+        })
+    db_writer.write(TradeLog, values)
+
+
+class OrderService:
+    """Validate, send, time and record orders"""
+
+    def __init__(self, connector: MT5Connector, feed: MarketDataPump, spec_ttl: float):
+        self.connector = connector
+        self.feed = feed
+        self.spec_ttl = spec_ttl
+        # symbol -> (symbol_info, monotonic time fetched)
+        self._specs: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.latency = {stage: LatencyHistogram() for stage in STAGES}
+        self.counters = {
+            "orders": 0,
+            STATUS_EXECUTED: 0,
+            STATUS_REJECTED: 0,
+            STATUS_INVALID: 0,
+            STATUS_FAILED: 0,
+            STATUS_UNKNOWN: 0
+        }
+
+    async def _fetch_spec(self, symbol: str) -> Optional[Dict[str, Any]]:
+        try:
+            info = await self.connector.aio.symbol_info(symbol)
+        except MT5CallTimeout as e:
+            logger.error(f"Symbol specification {e}")
+            info = None
+        if info is not None:
+            self._specs[symbol] = (info, time.monotonic())
+        return info
+
+    def _refresh_done(self, symbol: str) -> None:
+        self._refreshing.pop(symbol, None)
+
+    async def symbol_spec(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Symbol specification for validation
+
+        Only the first request for a symbol waits for the terminal; after
+        that the stored snapshot is returned and refreshed in the background
+        once it is older than the symbol cache TTL.
+        """
+        entry = self._specs.get(symbol)
+        if entry is None:
+            return await self._fetch_spec(symbol)
+        info, fetched = entry
+        if time.monotonic() - fetched > self.spec_ttl and symbol not in self._refreshing:
+            task = asyncio.create_task(self._fetch_spec(symbol))
+            self._refreshing[symbol] = task
+            task.add_done_callback(lambda _: self._refresh_done(symbol))
+        return info
+
+    async def prefetch(self, symbols: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Load the specifications of symbols that will be traded, concurrently"""
+        unique = list(dict.fromkeys(symbols))
+        infos = await asyncio.gather(*(self.symbol_spec(symbol) for symbol in unique))
+        return dict(zip(unique, infos))
+
+    async def validate(self, request: Dict[str, Any]) -> List[str]:
+        """Run the pre-trade checks of one order"""
+        symbol = request.get("symbol")
+        info = await self.symbol_spec(symbol) if symbol else None
+        return validate_order(request, info, self.feed.last_tick(symbol) if symbol else None)
+
+    async def submit(
+        self,
+        requests: List[Dict[str, Any]],
+        atomic: bool = False,
+        validate: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate and send a batch of orders
+
+        The specifications of every symbol in the batch are gathered at
+        once, and all valid orders are queued on the executor before any is
+        awaited.
+
+        Args:
+            requests: Requests in the mt5.order_send layout
+            atomic: Send nothing if any order fails validation
+            validate: Run the pre-trade checks
+
+        Returns:
+            list: One outcome per request, in order, with ``status``,
+            ``result``, ``errors`` and per-stage ``latency_ms``
+        """
+        return [outcome for outcome, _ in await self._submit(requests, atomic, validate)]
+
+    async def _submit(
+        self,
+        requests: List[Dict[str, Any]],
+        atomic: bool,
+        validate: bool
+    ) -> List[Tuple[Dict[str, Any], Optional[BaseException]]]:
+        """Outcomes paired with the exception raised by the terminal call, if any"""
+        received = time.perf_counter()
+        specs = await self.prefetch([r["symbol"] for r in requests if r.get("symbol")]) if validate else {}
+        # Every order waited for the specifications
+        fetched = time.perf_counter() - received
+        outcomes: List[Dict[str, Any]] = []
+        for request in requests:
+            started = time.perf_counter()
+            errors = []
+            if validate:
+                symbol = request.get("symbol")
+                tick = self.feed.last_tick(symbol) if symbol else None
+                errors = validate_order(request, specs.get(symbol), tick)
+            elapsed = fetched + time.perf_counter() - started
+            if validate:
+                self.latency["validation"].record(elapsed)
+            outcomes.append({
+                "request": request,
+                "status": STATUS_INVALID if errors else None,
+                "errors": errors,
+                "result": None,
+                "latency_ms": {"validation": elapsed * 1e3}
+            })
+        self.counters["orders"] += len(outcomes)
+
+        invalid = [outcome for outcome in outcomes if outcome["errors"]]
+        for outcome in invalid:
+            self.counters[STATUS_INVALID] += 1
+            log_order(outcome["request"], None, STATUS_INVALID, outcome["errors"][0][:255])
+        if invalid and atomic:
+            for outcome in outcomes:
+                if not outcome["errors"]:
+                    self.counters[STATUS_INVALID] += 1
+                    outcome["status"] = STATUS_INVALID
+                    outcome["errors"] = ["Not sent: another order in the batch failed validation"]
+            return [(outcome, None) for outcome in outcomes]
+
+        pending = [outcome for outcome in outcomes if not outcome["errors"]]
+        futures = [self.connector.submit_order(outcome["request"]) for outcome in pending]
+        results = await asyncio.gather(
+            *(
+                self.connector.executor.wait_async(future, PRIORITY_ORDER, label="order_send")
+                for future in futures
+            ),
+            return_exceptions=True
+        )
+        done = time.perf_counter()
+        exceptions: Dict[int, BaseException] = {}
+
+        for outcome, future, result in zip(pending, futures, results):
+            latency = outcome["latency_ms"]
+            started_at = getattr(future, "started_at", None)
+            finished_at = getattr(future, "finished_at", None)
+            if started_at is not None:
+                self.latency["queue"].record(started_at - future.submitted_at)
+                latency["queue"] = (started_at - future.submitted_at) * 1e3
+            if started_at is not None and finished_at is not None:
+                self.latency["terminal"].record(finished_at - started_at)
+                latency["terminal"] = (finished_at - started_at) * 1e3
+            latency["total"] = (done - received) * 1e3
+
+            if isinstance(result, MT5CallTimeout) and not future.cancelled():
+                # Already running in the terminal, so it may still execute
+                exceptions[id(outcome)] = MT5CallTimeout(f"{result}; the order may still execute")
+                outcome["status"] = STATUS_UNKNOWN
+                outcome["errors"] = [
+                    f"MT5 call {result} while the terminal was executing it; "
+                    "the result is logged when it arrives"
+                ]
+                log_order(outcome["request"], None, STATUS_UNKNOWN, "Timed out in the terminal, result pending")
+                loop = asyncio.get_running_loop()
+                future.add_done_callback(
+                    lambda finished, request=outcome["request"]: loop.call_soon_threadsafe(
+                        self._late_result, request, finished
+                    )
+                )
+            elif isinstance(result, BaseException):
+                exceptions[id(outcome)] = result
+                outcome["status"] = STATUS_FAILED
+                outcome["errors"] = [
+                    f"MT5 call {result} before the order was sent" if isinstance(result, MT5CallTimeout) else str(result)
+                ]
+                log_order(outcome["request"], None)
+            else:
+                outcome["result"] = result
+                if result is None:
+                    outcome["status"] = STATUS_FAILED
+                elif result.get("retcode") in SUCCESS_RETCODES:
+                    outcome["status"] = STATUS_EXECUTED
+                    # Each order's own completion, not the slowest of the basket
+                    filled = (finished_at if finished_at is not None else done) - received
+                    self.latency["fill"].record(filled)
+                    latency["fill"] = filled * 1e3
+                else:
+                    outcome["status"] = STATUS_REJECTED
+                    outcome["errors"] = [f"Terminal rejected the order: {result.get('retcode')} {result.get('comment')}"]
+                log_order(outcome["request"], result)
+            self.counters[outcome["status"]] += 1
+
+        if pending:
+            deal_history.mark_stale()
+            position_book.mark_stale()
+        return [(outcome, exceptions.get(id(outcome))) for outcome in outcomes]
+
+    def _late_result(self, request: Dict[str, Any], future) -> None:
+        """Record the result of an order whose wait timed out (event loop)"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        result = None if error is not None else future.result()
+        if result is None:
+            logger.error(f"Late order_send for {request.get('symbol')} failed: {error}")
+        else:
+            logger.warning(
+                f"Late order_send result for {request.get('symbol')}: "
+                f"{result.get('retcode')} {result.get('comment')}"
+            )
+        log_order(request, result)
+        deal_history.mark_stale()
+        position_book.mark_stale()
+
+    async def send(self, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Validate and send one order
+
+        Returns:
+            dict: Order result or None if the call failed
+
+        Raises:
+            OrderValidationError: If the order fails its pre-trade checks
+            MT5CallTimeout: If the terminal did not answer in time
+        """
+        outcome, exception = (await self._submit([request], False, True))[0]
+        if outcome["status"] == STATUS_INVALID:
+            raise OrderValidationError(outcome["errors"])
+        if exception is not None:
+            raise exception
+        return outcome["result"]
+
+    def stats(self, buckets: bool = False) -> Dict[str, Any]:
+        return {
+            "counters": dict(self.counters),
+            "latency": {stage: histogram.snapshot(buckets) for stage, histogram in self.latency.items()}
+        }
+
+
+# Global order service instance
+order_service = OrderService(mt5_connector, market_feed, settings.MT5_SYMBOL_CACHE_TTL)
+
+
+async def send_order(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Validate, send and record one order (see OrderService.send)"""
+    return await order_service.send(request)
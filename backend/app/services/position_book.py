@@ -0,0 +1,385 @@
+"""In-memory book of open positions marked to market on every tick
+
+The book is loaded from ``positions_get`` once and then reconciled against
+the terminal every POSITION_BOOK_RECONCILE_INTERVAL seconds and right after
+an order is sent. Between reconciliations each position's floating profit is
+updated from the live tick feed: longs are marked at the bid, shorts at the
+ask, and the price move is converted to account currency with the profit per
+price unit implied by the terminal's last reported profit for that position
+(falling back to ``trade_tick_value / trade_tick_size``).
+
+Per-symbol and account totals are updated incrementally, so a tick only
+touches the positions in its own symbol. Every change is published to
+consumers as a batch of messages (see ``subscribe``). A consumer that falls
+behind gets its backlog conflated: the newest ``account_pnl``, the newest
+``positions`` snapshot and, per symbol, the newest ``position_pnl`` with the
+latest update of every ticket.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.services.market_feed import market_feed, ConflatingQueue, MarketDataPump
+from app.services.mt5_connector import mt5_connector, MT5Connector
+from app.services.mt5_executor import MT5CallTimeout
+
+logger = logging.getLogger(__name__)
+
+# mt5.POSITION_TYPE_BUY / mt5.POSITION_TYPE_SELL
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+
+
+def _side(position: Dict[str, Any]) -> int:
+    return 1 if position.get("type") == POSITION_TYPE_BUY else -1
+
+
+class _BookQueue(ConflatingQueue):
+    """Conflates book messages per type and symbol; snapshots are never dropped"""
+
+    def key(self, message: Dict[str, Any]) -> Hashable:
+        return (message["type"], message.get("symbol"))
+
+    def combine(self, old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        if new["type"] != "position_pnl":
+            return new
+        # A tick may only reprice some of a symbol's positions
+        updates = {update["ticket"]: update for update in old["updates"]}
+        updates.update((update["ticket"], update) for update in new["updates"])
+        return {**new, "updates": list(updates.values())}
+
+    def merge(self, message: Dict[str, Any]) -> int:
+        if message["type"] != "positions":
+            return super().merge(message)
+        # The snapshot already has the prices of every pending update
+        stale = [key for key in self.pending if key[0] == "position_pnl"]
+        for key in stale:
+            del self.pending[key]
+        return len(stale) + super().merge(message)
+
+
+class PositionBook:
+    """Open positions, floating profit, exposure and equity kept in memory"""
+
+    def __init__(
+        self,
+        connector: MT5Connector,
+        feed: MarketDataPump,
+        reconcile_interval: float,
+        queue_size: int
+    ):
+        self.connector = connector
+        self.feed = feed
+        self.reconcile_interval = reconcile_interval
+        self.queue_size = queue_size
+        self.ready = False
+        self.balance: Optional[float] = None
+        self.floating = 0.0
+        self.stats = {"reconciles": 0, "ticks": 0, "opened": 0, "closed": 0, "conflated": 0}
+        self._positions: Dict[int, Dict[str, Any]] = {}
+        # Account-currency profit per unit of price per lot, per ticket
+        self._factors: Dict[int, float] = {}
+        self._by_symbol: Dict[str, Set[int]] = {}
+        self._symbol_profit: Dict[str, float] = {}
+        self._contract_sizes: Dict[str, float] = {}
+        self._consumers: List[_BookQueue] = []
+        self._stale: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Load the book and follow ticks; must be called from the event loop"""
+        if self._tasks:
+            return
+        self._stale = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._reconcile_loop()),
+            asyncio.create_task(self._tick_loop())
+        ]
+        logger.info(f"Position book started ({self.reconcile_interval}s reconcile interval)")
+
+    async def stop(self) -> None:
+        """Stop following the terminal and release the polled symbols"""
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.feed.remove_symbols(list(self._by_symbol))
+        self._by_symbol.clear()
+        self.ready = False
+        logger.info("Position book stopped")
+
+    def mark_stale(self) -> None:
+        """Reconcile as soon as possible, e.g. after an order was sent"""
+        if self._stale is not None:
+            self._stale.set()
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Register a consumer
+
+        Returns:
+            asyncio.Queue: Receives lists of ``position_pnl``, ``account_pnl``
+            and ``positions`` messages; when the consumer falls behind,
+            messages that do not fit are conflated and delivered with its
+            next ``get``
+        """
+        queue = _BookQueue(self.queue_size)
+        self._consumers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._consumers:
+            self._consumers.remove(queue)
+
+    # Queries -------------------------------------------------------------
+
+    def positions(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Copies of the open positions, optionally for one symbol"""
+        if symbol is None:
+            tickets: Iterable[int] = self._positions
+        else:
+            tickets = self._by_symbol.get(symbol, ())
+        return [dict(self._positions[ticket]) for ticket in tickets]
+
+    def exposure(self, symbol: str) -> Dict[str, Any]:
+        """Net volume, notional value and floating profit of one symbol"""
+        volume = 0.0
+        notional = 0.0
+        contract_size = self._contract_sizes.get(symbol)
+        for ticket in self._by_symbol.get(symbol, ()):
+            position = self._positions[ticket]
+            lots = _side(position) * position["volume"]
+            volume += lots
+            if contract_size is not None:
+                notional += lots * contract_size * position["price_current"]
+        return {
+            "symbol": symbol,
+            "positions": len(self._by_symbol.get(symbol, ())),
+            "volume": volume,
+            "notional": notional if contract_size is not None else None,
+            "profit": self._symbol_profit.get(symbol, 0.0)
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Account totals and per-symbol exposure"""
+        return {
+            "ready": self.ready,
+            "positions": len(self._positions),
+            "balance": self.balance,
+            "floating": self.floating,
+            "equity": self.balance + self.floating if self.balance is not None else None,
+            "exposure": [self.exposure(symbol) for symbol in self._by_symbol]
+        }
+
+    # Marking ---------------------------------------------------------------
+
+    def _position_profit(self, position: Dict[str, Any]) -> float:
+        return position["profit"] + position.get("swap", 0.0)
+
+    def _mark(self, ticket: int, bid: Optional[float], ask: Optional[float]) -> bool:
+        """Reprice one position; returns True if its profit changed"""
+        position = self._positions[ticket]
+        side = _side(position)
+        price = bid if side > 0 else ask
+        factor = self._factors.get(ticket)
+        if not price or factor is None or price == position["price_current"]:
+            return False
+        old = self._position_profit(position)
+        position["price_current"] = price
+        position["profit"] = side * position["volume"] * factor * (price - position["price_open"])
+        change = self._position_profit(position) - old
+        self._symbol_profit[position["symbol"]] += change
+        self.floating += change
+        return True
+
+    def on_ticks(self, ticks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Mark positions to the given ticks
+
+        Args:
+            ticks: Tick messages from the market feed
+
+        Returns:
+            list: Messages describing what changed
+        """
+        messages = []
+        for tick in ticks:
+            symbol = tick.get("symbol")
+            tickets = self._by_symbol.get(symbol)
+            if not tickets:
+                continue
+            changed = [
+                ticket for ticket in tickets
+                if self._mark(ticket, tick.get("bid"), tick.get("ask"))
+            ]
+            if changed:
+                messages.append(self._symbol_message(symbol, changed))
+        self.stats["ticks"] += len(ticks)
+        if messages:
+            messages.append(self._account_message())
+        return messages
+
+    def _symbol_message(self, symbol: str, tickets: Iterable[int]) -> Dict[str, Any]:
+        return {
+            "type": "position_pnl",
+            **self.exposure(symbol),
+            "updates": [
+                {
+                    "ticket": ticket,
+                    "price_current": self._positions[ticket]["price_current"],
+                    "profit": self._positions[ticket]["profit"]
+                }
+                for ticket in tickets
+            ]
+        }
+
+    def _account_message(self) -> Dict[str, Any]:
+        return {
+            "type": "account_pnl",
+            "balance": self.balance,
+            "floating": self.floating,
+            "equity": self.balance + self.floating if self.balance is not None else None,
+            "positions": len(self._positions)
+        }
+
+    def snapshot_messages(self) -> List[Dict[str, Any]]:
+        """Full state as messages, sent to new websocket subscribers"""
+        return [
+            {"type": "positions", "positions": self.positions()},
+            self._account_message()
+        ]
+
+    # Reconciliation --------------------------------------------------------
+
+    async def _symbol_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Symbol specification; remembers the contract size for exposure"""
+        info = await self.connector.aio.symbol_info(symbol)
+        if info is not None:
+            self._contract_sizes[symbol] = info.get("trade_contract_size")
+        return info
+
+    async def _factor(self, position: Dict[str, Any]) -> Optional[float]:
+        """Profit per unit of price per lot implied by the terminal's numbers"""
+        move = position["price_current"] - position["price_open"]
+        if move and position["volume"] and position["profit"]:
+            return position["profit"] / (_side(position) * position["volume"] * move)
+        info = await self._symbol_info(position["symbol"])
+        if info and info.get("trade_tick_size"):
+            return info["trade_tick_value"] / info["trade_tick_size"]
+        return None
+
+    async def reconcile(self) -> bool:
+        """
+        Replace the book with the terminal's positions and balance
+
+        Returns:
+            bool: True if the terminal answered
+        """
+        try:
+            positions = await self.connector.aio.positions_get()
+            account = await self.connector.aio.account_info()
+        except MT5CallTimeout as e:
+            logger.warning(f"Position reconcile {e}")
+            return False
+        if positions is None or account is None:
+            return False
+
+        first = not self.ready
+        previous = self._positions
+        # Copies: positions_get results are shared through the call cache, and _mark updates them
+        current = {position["ticket"]: dict(position) for position in positions}
+        opened = current.keys() - previous.keys()
+        closed = previous.keys() - current.keys()
+
+        factors = {}
+        for ticket, position in current.items():
+            factor = await self._factor(position)
+            if factor is None:
+                factor = self._factors.get(ticket)
+            if factor is not None:
+                factors[ticket] = factor
+            if position["symbol"] not in self._contract_sizes:
+                await self._symbol_info(position["symbol"])
+
+        by_symbol: Dict[str, Set[int]] = {}
+        for ticket, position in current.items():
+            by_symbol.setdefault(position["symbol"], set()).add(ticket)
+        added_symbols = by_symbol.keys() - self._by_symbol.keys()
+        removed_symbols = self._by_symbol.keys() - by_symbol.keys()
+
+        self._positions = current
+        self._factors = factors
+        self._by_symbol = by_symbol
+        self._symbol_profit = {
+            symbol: sum(self._position_profit(current[ticket]) for ticket in tickets)
+            for symbol, tickets in by_symbol.items()
+        }
+        self.floating = sum(self._symbol_profit.values())
+        self.balance = account.get("balance")
+
+        if added_symbols:
+            self.feed.add_symbols(added_symbols)
+        if removed_symbols:
+            self.feed.remove_symbols(removed_symbols)
+
+        # The terminal's prices may be older than the ticks already seen
+        for symbol in by_symbol:
+            tick = self.feed.last_tick(symbol)
+            if tick is not None:
+                for ticket in by_symbol[symbol]:
+                    self._mark(ticket, tick.get("bid"), tick.get("ask"))
+
+        self.ready = True
+        self.stats["reconciles"] += 1
+        self.stats["opened"] += len(opened)
+        self.stats["closed"] += len(closed)
+        if first or opened or closed:
+            self._publish(self.snapshot_messages())
+        else:
+            self._publish(
+                [self._symbol_message(symbol, tickets) for symbol, tickets in by_symbol.items()]
+                + [self._account_message()]
+            )
+        return True
+
+    async def _reconcile_loop(self) -> None:
+        while True:
+            try:
+                if self.connector.connected:
+                    await self.reconcile()
+            except Exception as e:
+                logger.error(f"Position reconcile error: {e}")
+            try:
+                await asyncio.wait_for(self._stale.wait(), self.reconcile_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._stale.clear()
+
+    async def _tick_loop(self) -> None:
+        queue = self.feed.subscribe()
+        try:
+            while True:
+                ticks = await queue.get()
+                if self.ready:
+                    messages = self.on_ticks(ticks)
+                    if messages:
+                        self._publish(messages)
+        finally:
+            self.feed.unsubscribe(queue)
+
+    def _publish(self, messages: List[Dict[str, Any]]) -> None:
+        for queue in self._consumers:
+            self.stats["conflated"] += queue.offer(messages)
+
+
+# Global position book instance
+position_book = PositionBook(
+    mt5_connector,
+    market_feed,
+    settings.POSITION_BOOK_RECONCILE_INTERVAL,
+    settings.MARKET_FEED_QUEUE_SIZE
+)
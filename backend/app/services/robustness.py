@@ -0,0 +1,323 @@
+"""Walk-forward and Monte Carlo robustness analysis
+
+Walk-forward analysis optimizes parameters on rolling train windows and
+scores the winner on the window that follows, so every reported trade is
+out of sample. Monte Carlo analysis reorders or resamples a backtest's
+trade profits to show how much of its return and drawdown depended on the
+particular sequence of trades.
+
+Both run on process pools. All walk-forward windows share one SweepPool:
+price columns are copied into shared memory once and every worker computes
+each indicator once for all the windows it backtests. Monte Carlo paths are
+simulated in vectorized batches spread over a plain process pool.
+"""
+
+import logging
+import os
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services import backtest_engine, sweep
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+MONTE_CARLO_METHODS = ("shuffle", "bootstrap")
+MONTE_CARLO_BATCH = 500  # paths per task
+SUMMARY_FIELDS = ("total_return", "max_drawdown", "sharpe_ratio", "total_trades", "win_rate")
+
+
+def walk_forward_windows(
+    times: np.ndarray,
+    train_days: float,
+    test_days: float,
+    step_days: Optional[float] = None,
+    anchored: bool = False
+) -> List[Dict[str, Tuple[int, int]]]:
+    """
+    Split a bar series into consecutive train/test windows
+
+    Args:
+        times: Bar times in epoch seconds
+        train_days: Length of each train window
+        test_days: Length of each test window, which starts where its
+            train window ends
+        step_days: Offset between windows; defaults to ``test_days`` so
+            the test windows tile the series
+        anchored: Start every train window at the first bar (expanding
+            window) instead of rolling it forward
+
+    Returns:
+        list: ``{"train": (lo, hi), "test": (lo, hi)}`` bar index ranges
+
+    Raises:
+        ValueError: If a length is not positive
+    """
+    train = int(train_days * DAY_SECONDS)
+    test = int(test_days * DAY_SECONDS)
+    step = int((step_days or test_days) * DAY_SECONDS)
+    if train <= 0 or test <= 0 or step <= 0:
+        raise ValueError("Window lengths must be positive")
+
+    windows = []
+    if len(times) == 0:
+        return windows
+    first, last = int(times[0]), int(times[-1])
+    offset = 0
+    while first + offset + train <= last:
+        train_start = first if anchored else first + offset
+        train_end = first + offset + train
+        lo, mid, hi = np.searchsorted(times, [train_start, train_end, train_end + test], side="left")
+        if mid - lo >= 2 and hi - mid >= 2:
+            windows.append({"train": (int(lo), int(mid)), "test": (int(mid), int(hi))})
+        offset += step
+    return windows
+
+
+def _summary(stats: Dict[str, Any], metric: str) -> Dict[str, Any]:
+    fields = SUMMARY_FIELDS if metric in SUMMARY_FIELDS else SUMMARY_FIELDS + (metric,)
+    return {name: stats.get(name) for name in fields}
+
+
+def _efficiency(windows: List[Dict[str, Any]], metric: str) -> Optional[float]:
+    """Mean out-of-sample metric relative to the mean in-sample metric"""
+    pairs = [
+        (window["train"][metric], window["test"][metric])
+        for window in windows
+        if "test" in window
+        and window["train"].get(metric) is not None
+        and window["test"].get(metric) is not None
+    ]
+    if not pairs:
+        return None
+    train_mean = float(np.mean([train for train, _ in pairs]))
+    if train_mean == 0:
+        return None
+    return float(np.mean([test for _, test in pairs])) / train_mean
+
+
+def walk_forward(
+    rates,
+    base_parameters: Dict[str, Any],
+    parameter_sets: List[Dict[str, Any]],
+    windows: List[Dict[str, Tuple[int, int]]],
+    initial_capital: float,
+    metric: str = "sharpe_ratio",
+    max_workers: Optional[int] = None,
+    progress: Optional[Callable[[float], None]] = None
+) -> Dict[str, Any]:
+    """
+    Optimize on every train window and score the winner on its test window
+
+    Each test run starts as soon as its train window is ranked, while other
+    windows are still training. The test windows' target positions are
+    stitched together and simulated as one out-of-sample backtest.
+
+    Args:
+        rates: OHLC columns
+        base_parameters: Strategy parameters the sets are merged onto
+        parameter_sets: Parameter overrides to evaluate per train window
+        windows: Bar index ranges from walk_forward_windows
+        initial_capital: Starting equity
+        metric: Result field used to pick the best parameters
+        max_workers: Worker processes (defaults to the CPU count)
+        progress: Called with the completed fraction
+
+    Returns:
+        dict: Out-of-sample statistics plus per-window parameters and
+        train/test summaries
+    """
+    batches = [
+        parameter_sets[i:i + sweep.TASK_BATCH_SIZE]
+        for i in range(0, len(parameter_sets), sweep.TASK_BATCH_SIZE)
+    ]
+    total = len(windows) * (len(batches) + 1)
+    completed = 0
+    train_results: List[List[Dict[str, Any]]] = [[] for _ in windows]
+    best: List[Optional[Dict[str, Any]]] = [None] * len(windows)
+    tests: List[Optional[Dict[str, Any]]] = [None] * len(windows)
+
+    with sweep.SweepPool(rates, max_workers) as pool:
+        train_futures: Dict[Future, int] = {}
+        for index, window in enumerate(windows):
+            for batch in batches:
+                future = pool.submit(base_parameters, batch, initial_capital, window["train"])
+                train_futures[future] = index
+        remaining = Counter(train_futures.values())
+
+        test_futures: Dict[Future, int] = {}
+        for future in as_completed(train_futures):
+            index = train_futures[future]
+            train_results[index].extend(future.result())
+            remaining[index] -= 1
+            completed += 1
+            if remaining[index] == 0:
+                ranked = sweep.rank_results(train_results[index], metric)
+                best[index] = next((result for result in ranked if "error" not in result), None)
+                if best[index] is None:
+                    completed += 1
+                else:
+                    test_futures[pool.submit(
+                        base_parameters,
+                        [best[index]["parameters"]],
+                        initial_capital,
+                        windows[index]["test"],
+                        include_signal=True
+                    )] = index
+            if progress:
+                progress(completed / total)
+
+        for future in as_completed(test_futures):
+            tests[test_futures[future]] = future.result()[0]
+            completed += 1
+            if progress:
+                progress(completed / total)
+
+    times = rates["time"]
+    first = windows[0]["test"][0]
+    last = windows[-1]["test"][1]
+    # Later windows take over where test windows overlap; gaps stay flat
+    signal = np.zeros(last - first, dtype=np.int8)
+    reports = []
+    for index, window in enumerate(windows):
+        train_lo, train_hi = window["train"]
+        test_lo, test_hi = window["test"]
+        report: Dict[str, Any] = {
+            "train_start": int(times[train_lo]),
+            "train_end": int(times[train_hi - 1]),
+            "test_start": int(times[test_lo]),
+            "test_end": int(times[test_hi - 1]),
+        }
+        if best[index] is None:
+            report["error"] = "No parameter set completed"
+        else:
+            report["parameters"] = best[index]["parameters"]
+            report["train"] = _summary(best[index], metric)
+            test = tests[index]
+            if test is None or "error" in test:
+                report["error"] = test["error"] if test else "Test run did not complete"
+            else:
+                signal[test_lo - first:test_hi - first] = test["signal"]
+                report["test"] = _summary(test, metric)
+        reports.append(report)
+
+    out_of_sample = {name: np.asarray(rates[name][first:last]) for name in sweep.SWEEP_COLUMNS}
+    results = backtest_engine.simulate(out_of_sample, signal, initial_capital, base_parameters)
+    results["metric"] = metric
+    results["efficiency"] = _efficiency(reports, metric)
+    results["windows"] = reports
+    return results
+
+
+def _simulate_paths(
+    profits: np.ndarray,
+    initial_capital: float,
+    method: str,
+    count: int,
+    seed: np.random.SeedSequence
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Total return and maximum drawdown of ``count`` resampled trade sequences"""
+    rng = np.random.default_rng(seed)
+    n = len(profits)
+    if method == "shuffle":
+        paths = rng.permuted(np.tile(profits, (count, 1)), axis=1)
+    else:
+        paths = profits[rng.integers(0, n, size=(count, n))]
+    equity = initial_capital + np.cumsum(paths, axis=1)
+    peak = np.maximum.accumulate(np.maximum(equity, initial_capital), axis=1)
+    max_drawdown = np.max(1.0 - equity / peak, axis=1)
+    return equity[:, -1] / initial_capital - 1.0, max_drawdown
+
+
+def _distribution(values: np.ndarray, confidence: Sequence[float]) -> Dict[str, Any]:
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "percentiles": {
+            f"p{level * 100:g}": float(value)
+            for level, value in zip(confidence, np.quantile(values, confidence))
+        },
+    }
+
+
+def monte_carlo(
+    profits: Sequence[float],
+    initial_capital: float,
+    simulations: int = 1000,
+    methods: Sequence[str] = MONTE_CARLO_METHODS,
+    confidence: Sequence[float] = (0.05, 0.5, 0.95),
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    progress: Optional[Callable[[float], None]] = None
+) -> Dict[str, Any]:
+    """
+    Confidence intervals for return and drawdown from resampled trades
+
+    ``shuffle`` replays the same trades in random order, which keeps the
+    total return and shows the spread of drawdowns. ``bootstrap`` draws
+    trades with replacement, which varies both.
+
+    Args:
+        profits: Profit of each trade in order
+        initial_capital: Starting equity
+        simulations: Paths per method
+        methods: Any of "shuffle" and "bootstrap"
+        confidence: Quantiles to report, between 0 and 1
+        seed: Random seed
+        max_workers: Worker processes (defaults to the CPU count)
+        progress: Called with the completed fraction
+
+    Returns:
+        dict: Per method, the distribution of ``total_return`` and
+        ``max_drawdown`` and the probability of a loss
+
+    Raises:
+        ValueError: On unknown methods, bad quantiles or fewer than two trades
+    """
+    profits = np.asarray(profits, dtype=np.float64)
+    if len(profits) < 2:
+        raise ValueError("At least two trades are required")
+    unknown = set(methods) - set(MONTE_CARLO_METHODS)
+    if unknown:
+        raise ValueError(f"Unknown Monte Carlo methods: {', '.join(sorted(unknown))}")
+    if any(not 0 <= level <= 1 for level in confidence):
+        raise ValueError("Confidence levels must be between 0 and 1")
+
+    counts = [
+        min(MONTE_CARLO_BATCH, simulations - start)
+        for start in range(0, simulations, MONTE_CARLO_BATCH)
+    ]
+    seeds = iter(np.random.SeedSequence(seed).spawn(len(counts) * len(methods)))
+    returns: Dict[str, List[np.ndarray]] = {method: [] for method in methods}
+    drawdowns: Dict[str, List[np.ndarray]] = {method: [] for method in methods}
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = {
+            executor.submit(_simulate_paths, profits, initial_capital, method, count, next(seeds)): method
+            for method in methods
+            for count in counts
+        }
+        try:
+            for completed, future in enumerate(as_completed(futures), 1):
+                total_return, max_drawdown = future.result()
+                returns[futures[future]].append(total_return)
+                drawdowns[futures[future]].append(max_drawdown)
+                if progress:
+                    progress(completed / len(futures))
+        finally:
+            for future in futures:
+                future.cancel()
+
+    results: Dict[str, Any] = {"simulations": simulations, "trades": len(profits)}
+    for method in methods:
+        total_return = np.concatenate(returns[method])
+        max_drawdown = np.concatenate(drawdowns[method])
+        results[method] = {
+            "total_return": _distribution(total_return, confidence),
+            "max_drawdown": _distribution(max_drawdown, confidence),
+            "probability_of_loss": float(np.mean(total_return < 0)),
+        }
+    return results
@@ -0,0 +1,716 @@
+"""Live strategy runtime
+
+Strategies subscribe to symbols and receive ``on_tick`` and ``on_bar`` calls
+from the live market feed. Each strategy runs on its own worker thread and
+has its own event buffer. Ticks are conflated per symbol, so a strategy that
+falls behind only ever sees the latest tick, and a slow strategy never holds
+up the event loop or the other strategies. Every hook call is timed against
+a budget. A strategy that overruns its budget or raises on too many
+consecutive events is suspended. Budgets are not preemptive: a hook is only
+measured once it returns, so a hook that never returns stalls its own
+strategy (not the others), and stopping it gives up on ``on_stop`` after
+STRATEGY_STOP_TIMEOUT seconds.
+
+Bars close when the first tick of the next bar arrives; the closed bar is
+then fetched once per series from the terminal and handed to every
+strategy on that series. Strategies started with a ``bars`` series (e.g.
+``"time:5"`` or ``"renko:0.001"``) instead receive bars built from the tick
+stream by ``app.services.bar_builder``, without calling the terminal. Orders
+placed by strategies go through ``app.services.orders`` like orders sent
+over the REST API.
+"""
+
+import asyncio
+import calendar
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple, Type
+
+import MetaTrader5 as mt5
+import numpy as np
+
+from app.core.config import settings
+from app.services import indicators, orders
+from app.services.bar_builder import bar_aggregator, bar_key, BarAggregator
+from app.services.market_feed import market_feed, MarketDataPump
+from app.services.metrics import LatencyHistogram
+from app.services.mt5_connector import mt5_connector, MT5Connector
+
+logger = logging.getLogger(__name__)
+
+STATE_STARTING = "starting"
+STATE_RUNNING = "running"
+STATE_SUSPENDED = "suspended"
+STATE_STOPPED = "stopped"
+
+EVENT_BAR = "bar"
+EVENT_ORDER = "order"
+
+# Timeframe constants below 16384 count minutes; hours, weeks and months
+# are flagged with the high bits
+_HOUR_FLAG = 0x4000
+_WEEK_FLAG = 0x8000
+_MONTH_FLAG = 0xC000
+# MT5 weeks start on Sunday; the epoch was a Thursday
+_WEEK_OFFSET = 4 * 86400
+
+# The event loop only keeps weak references to tasks
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def bar_start(timestamp: int, timeframe: int) -> int:
+    """
+    Open time of the bar containing ``timestamp``
+
+    Args:
+        timestamp: Server time in epoch seconds
+        timeframe: Timeframe (mt5.TIMEFRAME_*)
+
+    Returns:
+        int: Bar open time in epoch seconds
+    """
+    if timeframe >= _MONTH_FLAG:
+        moment = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        return calendar.timegm((moment.year, moment.month, 1, 0, 0, 0))
+    if timeframe >= _WEEK_FLAG:
+        return (timestamp + _WEEK_OFFSET) // 604800 * 604800 - _WEEK_OFFSET
+    seconds = (timeframe - _HOUR_FLAG) * 3600 if timeframe > _HOUR_FLAG else timeframe * 60
+    return timestamp - timestamp % seconds
+
+
+class Strategy:
+    """
+    Base class of live strategies
+
+    Hooks run on the strategy's worker thread, one event at a time. Orders
+    are placed through ``self.context`` and complete asynchronously; their
+    results arrive in ``on_order``.
+    """
+
+    def __init__(self, strategy_id: str, parameters: Dict[str, Any]):
+        self.strategy_id = strategy_id
+        self.parameters = parameters
+        self.context: Optional["StrategyContext"] = None
+
+    def on_start(self, history: Dict[str, np.ndarray]) -> None:
+        """Called once with the closed bars of every symbol (symbol -> rates)"""
+
+    def on_tick(self, tick: Dict[str, Any]) -> None:
+        """Called with the latest tick message of a symbol"""
+
+    def on_bar(self, symbol: str, bar: Dict[str, Any]) -> None:
+        """Called when a bar of the strategy's timeframe (or bar series) closes"""
+
+    def on_order(self, result: Dict[str, Any]) -> None:
+        """Called with the outcome of an order placed through the context"""
+
+    def on_stop(self) -> None:
+        """Called once when the strategy is stopped"""
+
+
+class SignalStrategy(Strategy):
+    """
+    Live counterpart of the backtest signal generators
+
+    Computes the same target position (-1, 0, 1) from streaming indicators
+    at every bar close and trades ``volume`` lots towards it.
+    """
+
+    def on_start(self, history: Dict[str, np.ndarray]) -> None:
+        params = self.parameters
+        kind = params.get("type", "sma_crossover")
+        self.kind = kind
+        self.state: Dict[str, Dict[str, Any]] = {}
+        for symbol, rates in history.items():
+            if kind in ("sma_crossover", "ema_crossover"):
+                name = "sma" if kind == "sma_crossover" else "ema"
+                default_fast, default_slow = (10, 30) if name == "sma" else (12, 26)
+                state = {
+                    "fast": self.context.indicator(symbol, name, period=int(params.get("fast_period", default_fast))),
+                    "slow": self.context.indicator(symbol, name, period=int(params.get("slow_period", default_slow)))
+                }
+            elif kind == "rsi_reversion":
+                rsi = self.context.indicator(symbol, "rsi", period=int(params.get("period", 14)))
+                state = {"rsi": rsi, "above": None, "target": 0}
+            elif kind == "momentum":
+                lookback = int(params.get("lookback", 20))
+                state = {"closes": deque(rates["close"][-(lookback + 1):].tolist(), maxlen=lookback + 1)}
+            elif kind == "breakout":
+                period = int(params.get("period", 20))
+                state = {
+                    "highs": deque(rates["high"][-period:].tolist(), maxlen=period),
+                    "lows": deque(rates["low"][-period:].tolist(), maxlen=period),
+                    "target": 0
+                }
+            else:
+                raise ValueError(f"Strategy type {kind} is not available live")
+            self.state[symbol] = state
+
+    def _target(self, symbol: str, bar: Dict[str, Any]) -> int:
+        params = self.parameters
+        state = self.state[symbol]
+        if self.kind in ("sma_crossover", "ema_crossover"):
+            difference = state["fast"].value - state["slow"].value
+            return 0 if np.isnan(difference) else int(np.sign(difference))
+        if self.kind == "rsi_reversion":
+            value = state["rsi"].value
+            if np.isnan(value):
+                return 0
+            above = value >= 50
+            if state["above"] is not None and above != state["above"]:
+                state["target"] = 0
+            state["above"] = above
+            if value < float(params.get("oversold", 30)):
+                state["target"] = 1
+            elif value > float(params.get("overbought", 70)):
+                state["target"] = -1
+            return state["target"]
+        if self.kind == "momentum":
+            closes = state["closes"]
+            closes.append(bar["close"])
+            if len(closes) < closes.maxlen:
+                return 0
+            return int(np.sign(closes[-1] - closes[0]))
+        highs, lows = state["highs"], state["lows"]
+        if len(highs) == highs.maxlen:
+            if bar["close"] > max(highs):
+                state["target"] = 1
+            elif bar["close"] < min(lows):
+                state["target"] = -1
+        highs.append(bar["high"])
+        lows.append(bar["low"])
+        return state["target"]
+
+    def on_bar(self, symbol: str, bar: Dict[str, Any]) -> None:
+        target = self._target(symbol, bar)
+        if not self.parameters.get("allow_short", True):
+            target = max(target, 0)
+        self.context.set_target(symbol, target, float(self.parameters.get("volume", 0.01)))
+
+
+STRATEGY_TYPES: Dict[str, Type[Strategy]] = {
+    name: SignalStrategy
+    for name in ("sma_crossover", "ema_crossover", "rsi_reversion", "momentum", "breakout")
+}
+
+
+def register_strategy(name: str, cls: Type[Strategy]) -> None:
+    """Make a Strategy subclass available as parameters["type"] == name"""
+    STRATEGY_TYPES[name] = cls
+
+
+class StrategyContext:
+    """
+    Orders, indicators and market state available to a strategy
+
+    Methods are safe to call from the strategy's worker thread; orders are
+    handed to the event loop and do not block the hook.
+    """
+
+    def __init__(self, runner: "StrategyRunner"):
+        self._runner = runner
+        self.history: Dict[str, np.ndarray] = {}
+        self.last_tick: Dict[str, Dict[str, Any]] = {}
+        self._indicators: Dict[str, List[indicators.StreamingIndicator]] = {}
+
+    @property
+    def magic(self) -> int:
+        return self._runner.magic
+
+    def indicator(self, symbol: str, name: str, **params) -> indicators.StreamingIndicator:
+        """
+        Streaming indicator warmed with the symbol's history
+
+        The runtime advances it with every closed bar before ``on_bar``.
+        """
+        state = indicators.create(name, **params)
+        history = self.history.get(symbol)
+        if history is not None and len(history):
+            state.warm(history)
+        self._indicators.setdefault(symbol, []).append(state)
+        return state
+
+    def _advance(self, symbol: str, bar: Dict[str, Any]) -> None:
+        for state in self._indicators.get(symbol, ()):
+            state.update_bar(bar)
+
+    def buy(self, symbol: str, volume: float, **fields) -> None:
+        """Send a market buy order"""
+        self._runner.submit_order(symbol, mt5.ORDER_TYPE_BUY, volume, **fields)
+
+    def sell(self, symbol: str, volume: float, **fields) -> None:
+        """Send a market sell order"""
+        self._runner.submit_order(symbol, mt5.ORDER_TYPE_SELL, volume, **fields)
+
+    def set_target(self, symbol: str, target: int, volume: float) -> None:
+        """
+        Move the strategy's position in ``symbol`` to ``target`` * ``volume``
+
+        Opposite positions of this strategy (by magic number) are closed by
+        ticket, so this works on netting and hedging accounts alike. Nothing
+        is sent while an earlier target for the symbol is still in flight.
+        """
+        self._runner.submit_target(symbol, target, volume)
+
+
+class StrategyRunner:
+    """One live strategy with its worker thread, event buffer and metrics"""
+
+    def __init__(
+        self,
+        strategy: Strategy,
+        symbols: List[str],
+        timeframe: int,
+        magic: int,
+        loop: asyncio.AbstractEventLoop,
+        connector: MT5Connector,
+        bars: Optional[str] = None
+    ):
+        self.strategy = strategy
+        self.strategy_id = strategy.strategy_id
+        self.symbols = symbols
+        self.timeframe = timeframe
+        self.bars = bars
+        self.magic = magic
+        self.state = STATE_STARTING
+        self.reason: Optional[str] = None
+        self.started_at = datetime.utcnow()
+        self.loop = loop
+        self.connector = connector
+        self.context = StrategyContext(self)
+        strategy.context = self.context
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"strategy-{self.strategy_id}")
+        self._events: Deque[Tuple[float, str, Any]] = deque()
+        self._ticks: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._targets: Dict[str, int] = {}
+        self._targets_in_flight: Set[str] = set()
+        self._faults = 0
+
+        self.tick_budget = settings.STRATEGY_TICK_BUDGET_MS / 1000
+        self.bar_budget = settings.STRATEGY_BAR_BUDGET_MS / 1000
+        self.counters = {
+            "ticks": 0,
+            "bars": 0,
+            "orders": 0,
+            "conflated_ticks": 0,
+            "dropped_events": 0,
+            "budget_overruns": 0,
+            "errors": 0
+        }
+        self.latency = {
+            "queue": LatencyHistogram(),
+            "on_tick": LatencyHistogram(),
+            "on_bar": LatencyHistogram(),
+            "order": LatencyHistogram()
+        }
+
+    async def start(self, history: Dict[str, np.ndarray]) -> None:
+        """Run on_start on the worker thread and begin processing events"""
+        self.context.history = history
+        await self.loop.run_in_executor(self._executor, self.strategy.on_start, history)
+        self.state = STATE_RUNNING
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            # Queued behind a hook that may never return
+            await asyncio.wait_for(
+                self.loop.run_in_executor(self._executor, self.strategy.on_stop),
+                settings.STRATEGY_STOP_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Strategy {self.strategy_id} on_stop did not run within "
+                f"{settings.STRATEGY_STOP_TIMEOUT}s; a hook may be stuck"
+            )
+        except Exception as e:
+            logger.error(f"Strategy {self.strategy_id} on_stop failed: {e}")
+        self._executor.shutdown(wait=False)
+        if self.state != STATE_SUSPENDED:
+            self.state = STATE_STOPPED
+
+    def push_tick(self, tick: Dict[str, Any]) -> None:
+        """Buffer a tick, replacing an unprocessed tick of the same symbol"""
+        if self.state != STATE_RUNNING:
+            return
+        if tick["symbol"] in self._ticks:
+            self.counters["conflated_ticks"] += 1
+        self._ticks[tick["symbol"]] = (time.perf_counter(), tick)
+        self._wakeup.set()
+
+    def push_event(self, kind: str, payload: Any) -> None:
+        """Buffer a bar or order event; events are only dropped when the buffer is full"""
+        if self.state != STATE_RUNNING:
+            return
+        if len(self._events) >= settings.STRATEGY_EVENT_BUFFER:
+            self.counters["dropped_events"] += 1
+            return
+        self._events.append((time.perf_counter(), kind, payload))
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while self.state == STATE_RUNNING:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            events = list(self._events)
+            self._events.clear()
+            ticks = list(self._ticks.values())
+            self._ticks.clear()
+            await self.loop.run_in_executor(self._executor, self._process, events, ticks)
+
+    def _process(self, events: List[Tuple[float, str, Any]], ticks: List[Tuple[float, Dict[str, Any]]]) -> None:
+        """Run hooks for a drained batch (worker thread)"""
+        for received, kind, payload in events:
+            if self.state != STATE_RUNNING:
+                return
+            self.latency["queue"].record(time.perf_counter() - received)
+            if kind == EVENT_BAR:
+                symbol, bar = payload
+                self.counters["bars"] += 1
+                self._invoke("on_bar", self.bar_budget, self._on_bar, symbol, bar)
+            else:
+                self._invoke("on_order", None, self.strategy.on_order, payload)
+        for received, tick in ticks:
+            if self.state != STATE_RUNNING:
+                return
+            self.latency["queue"].record(time.perf_counter() - received)
+            self.counters["ticks"] += 1
+            self.context.last_tick[tick["symbol"]] = tick
+            self._invoke("on_tick", self.tick_budget, self.strategy.on_tick, tick)
+
+    def _on_bar(self, symbol: str, bar: Dict[str, Any]) -> None:
+        self.context._advance(symbol, bar)
+        self.strategy.on_bar(symbol, bar)
+
+    def _invoke(self, hook: str, budget: Optional[float], fn: Callable, *args) -> None:
+        started = time.perf_counter()
+        try:
+            fn(*args)
+            fault = False
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.error(f"Strategy {self.strategy_id} {hook} failed: {e}")
+            fault = True
+        elapsed = time.perf_counter() - started
+        if hook in self.latency:
+            self.latency[hook].record(elapsed)
+        if budget is not None and elapsed > budget:
+            self.counters["budget_overruns"] += 1
+            fault = True
+        self._faults = self._faults + 1 if fault else 0
+        if self._faults >= settings.STRATEGY_MAX_FAULTS:
+            self.state = STATE_SUSPENDED
+            self.reason = f"{self._faults} consecutive errors or budget overruns (last in {hook})"
+            logger.warning(f"Strategy {self.strategy_id} suspended: {self.reason}")
+
+    def submit_order(self, symbol: str, order_type: int, volume: float, **fields) -> None:
+        """Hand a market order to the event loop (callable from any thread)"""
+        self.loop.call_soon_threadsafe(
+            lambda: _spawn(self._send(symbol, order_type, volume, time.perf_counter(), fields))
+        )
+
+    def submit_target(self, symbol: str, target: int, volume: float) -> None:
+        """Hand a target position change to the event loop (callable from any thread)"""
+        def schedule():
+            if self._targets.get(symbol, 0) == target or symbol in self._targets_in_flight:
+                return
+            self._targets_in_flight.add(symbol)
+            _spawn(self._move_to_target(symbol, target, volume))
+        self.loop.call_soon_threadsafe(schedule)
+
+    def _request(self, symbol: str, order_type: int, volume: float, fields: Dict[str, Any]) -> Dict[str, Any]:
+        request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": symbol,
+            "volume": volume,
+            "type": order_type,
+            "deviation": 20,
+            "magic": self.magic,
+            "comment": f"strategy {self.strategy_id}"[:31],
+            **fields
+        }
+        tick = self.context.last_tick.get(symbol)
+        if "price" not in request and tick is not None:
+            request["price"] = tick["ask"] if order_type == mt5.ORDER_TYPE_BUY else tick["bid"]
+        return request
+
+    async def _send(
+        self,
+        symbol: str,
+        order_type: int,
+        volume: float,
+        submitted: float,
+        fields: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        request = self._request(symbol, order_type, volume, fields)
+        try:
+            result = await orders.send_order(request)
+        except Exception as e:
+            logger.error(f"Strategy {self.strategy_id} order failed: {e}")
+            result = None
+        self.counters["orders"] += 1
+        self.latency["order"].record(time.perf_counter() - submitted)
+        self.push_event(EVENT_ORDER, {"request": request, "result": result})
+        return result
+
+    async def _move_to_target(self, symbol: str, target: int, volume: float) -> None:
+        submitted = time.perf_counter()
+        try:
+            positions = await self.connector.aio.positions_get(symbol)
+            if positions is None:
+                return
+            own = [p for p in positions if p.get("magic") == self.magic]
+            side = {mt5.POSITION_TYPE_BUY: 1, mt5.POSITION_TYPE_SELL: -1}
+            held = 0.0
+            results = []
+            for position in own:
+                if side.get(position["type"]) != target:
+                    close_type = mt5.ORDER_TYPE_SELL if side.get(position["type"]) == 1 else mt5.ORDER_TYPE_BUY
+                    results.append(await self._send(
+                        symbol, close_type, position["volume"], submitted, {"position": position["ticket"]}
+                    ))
+                else:
+                    held += position["volume"]
+            if target != 0 and held < volume:
+                order_type = mt5.ORDER_TYPE_BUY if target > 0 else mt5.ORDER_TYPE_SELL
+                results.append(await self._send(symbol, order_type, round(volume - held, 8), submitted, {}))
+            self.connector.invalidate_cache("positions_get")
+            # Otherwise the next request for the same target retries
+            if all(result is not None and result.get("retcode") in orders.SUCCESS_RETCODES for result in results):
+                self._targets[symbol] = target
+        except Exception as e:
+            logger.error(f"Strategy {self.strategy_id} could not reach target for {symbol}: {e}")
+        finally:
+            self._targets_in_flight.discard(symbol)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "strategy_id": self.strategy_id,
+            "type": self.strategy.parameters.get("type"),
+            "state": self.state,
+            "reason": self.reason,
+            "symbols": self.symbols,
+            "timeframe": self.timeframe,
+            "bars": self.bars,
+            "magic": self.magic,
+            "started_at": self.started_at.isoformat(),
+            "pending_events": len(self._events) + len(self._ticks),
+            "counters": dict(self.counters),
+            "latency": {name: histogram.snapshot() for name, histogram in self.latency.items()}
+        }
+
+
+class StrategyRuntime:
+    """Run live strategies against the market feed"""
+
+    def __init__(self, connector: MT5Connector, feed: MarketDataPump, bars: BarAggregator):
+        self.connector = connector
+        self.feed = feed
+        self.bars = bars
+        self.runners: Dict[str, StrategyRunner] = {}
+        self._by_symbol: Dict[str, Set[StrategyRunner]] = {}
+        # (symbol, timeframe) -> open time of the bar currently forming
+        self._forming: Dict[Tuple[str, int], int] = {}
+        self._last_bar: Dict[Tuple[str, int], int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._bar_queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._bar_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start dispatching ticks and built bars; must be called from the event loop"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = self.feed.subscribe()
+        self._bar_queue = self.bars.subscribe()
+        self._task = asyncio.create_task(self._dispatch())
+        self._bar_task = asyncio.create_task(self._dispatch_bars())
+        logger.info("Strategy runtime started")
+
+    async def stop(self) -> None:
+        """Stop every strategy and the dispatcher"""
+        for strategy_id in list(self.runners):
+            await self.stop_strategy(strategy_id)
+        if self._task is not None:
+            self._task.cancel()
+            self._bar_task.cancel()
+            await asyncio.gather(self._task, self._bar_task, return_exceptions=True)
+            self._task = None
+            self._bar_task = None
+            self.feed.unsubscribe(self._queue)
+            self.bars.unsubscribe(self._bar_queue)
+        logger.info("Strategy runtime stopped")
+
+    async def start_strategy(
+        self,
+        strategy_id: str,
+        parameters: Dict[str, Any],
+        symbols: List[str],
+        timeframe: int,
+        bars: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Start a strategy live
+
+        Args:
+            strategy_id: Strategy identifier
+            parameters: Strategy parameters; ``type`` selects the class from
+                STRATEGY_TYPES, ``magic`` tags its orders and positions
+            symbols: Symbols to trade
+            timeframe: Bar timeframe (mt5.TIMEFRAME_*)
+            bars: Bar series built from ticks (e.g. ``"time:5"``); replaces
+                ``timeframe`` when given
+
+        Returns:
+            dict: Runner info
+
+        Raises:
+            ValueError: If the strategy cannot be started
+        """
+        if self._task is None:
+            raise ValueError("Strategy runtime is not running")
+        if strategy_id in self.runners:
+            raise ValueError(f"Strategy {strategy_id} is already running")
+        if not symbols:
+            raise ValueError("At least one symbol is required")
+        if len(self.runners) >= settings.STRATEGY_MAX_RUNNING:
+            raise ValueError(f"At most {settings.STRATEGY_MAX_RUNNING} strategies can run at once")
+        cls = STRATEGY_TYPES.get(parameters.get("type", "sma_crossover"))
+        if cls is None:
+            raise ValueError(f"Unknown strategy type: {parameters.get('type')}")
+
+        history = {}
+        if bars is not None:
+            bars = bar_key(bars)
+            for symbol in symbols:
+                await self.bars.add_series(symbol, bars)
+                history[symbol] = self.bars.history(symbol, bars, settings.STRATEGY_WARMUP_BARS)
+        else:
+            for symbol in symbols:
+                rates = await self.connector.aio.copy_rates(symbol, timeframe, 1, settings.STRATEGY_WARMUP_BARS)
+                if rates is None:
+                    raise ValueError(f"No bars available for {symbol}")
+                history[symbol] = rates
+
+        runner = StrategyRunner(
+            cls(strategy_id, parameters),
+            symbols,
+            timeframe,
+            int(parameters.get("magic", settings.STRATEGY_DEFAULT_MAGIC)),
+            self._loop,
+            self.connector,
+            bars
+        )
+        try:
+            await runner.start(history)
+        except Exception as e:
+            await runner.stop()
+            self._release_series(runner)
+            raise ValueError(f"Strategy {strategy_id} failed to start: {e}")
+
+        self.runners[strategy_id] = runner
+        for symbol in symbols:
+            self._by_symbol.setdefault(symbol, set()).add(runner)
+            if bars is None:
+                self._last_bar.setdefault((symbol, timeframe), int(history[symbol]["time"][-1]))
+        self.feed.add_symbols(symbols)
+        logger.info(f"Strategy {strategy_id} started on {', '.join(symbols)}")
+        return runner.info()
+
+    async def stop_strategy(self, strategy_id: str) -> Optional[Dict[str, Any]]:
+        """Stop a strategy; returns its final info or None if it was not running"""
+        runner = self.runners.pop(strategy_id, None)
+        if runner is None:
+            return None
+        for symbol in runner.symbols:
+            subscribers = self._by_symbol.get(symbol)
+            if subscribers is not None:
+                subscribers.discard(runner)
+                if not subscribers:
+                    del self._by_symbol[symbol]
+        series = {(r_symbol, r.timeframe) for r in self.runners.values() for r_symbol in r.symbols}
+        for key in [key for key in self._forming if key not in series]:
+            self._forming.pop(key, None)
+            self._last_bar.pop(key, None)
+        self.feed.remove_symbols(runner.symbols)
+        self._release_series(runner)
+        await runner.stop()
+        logger.info(f"Strategy {strategy_id} stopped")
+        return runner.info()
+
+    def _release_series(self, runner: StrategyRunner) -> None:
+        if runner.bars is not None:
+            for symbol in runner.symbols:
+                self.bars.remove_series(symbol, runner.bars)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [runner.info() for runner in self.runners.values()]
+
+    async def _dispatch(self) -> None:
+        while True:
+            batch = await self._queue.get()
+            for tick in batch:
+                runners = self._by_symbol.get(tick["symbol"])
+                if not runners:
+                    continue
+                for runner in runners:
+                    runner.push_tick(tick)
+                self._check_bar_close(tick["symbol"], tick["time_msc"] // 1000, runners)
+
+    async def _dispatch_bars(self) -> None:
+        while True:
+            batch = await self._bar_queue.get()
+            for message in batch:
+                for runner in self._by_symbol.get(message["symbol"], ()):
+                    if runner.bars == message["bars"]:
+                        runner.push_event(EVENT_BAR, (message["symbol"], message["bar"]))
+
+    def _check_bar_close(self, symbol: str, timestamp: int, runners: Set[StrategyRunner]) -> None:
+        for timeframe in {runner.timeframe for runner in runners if runner.bars is None}:
+            key = (symbol, timeframe)
+            start = bar_start(timestamp, timeframe)
+            forming = self._forming.get(key)
+            self._forming[key] = max(start, forming or start)
+            if forming is not None and start > forming:
+                _spawn(self._publish_closed_bar(symbol, timeframe))
+
+    async def _publish_closed_bar(self, symbol: str, timeframe: int) -> None:
+        """Fetch the newest closed bar of a series and hand it to its strategies"""
+        try:
+            rates = await self.connector.aio.copy_rates(symbol, timeframe, 1, 1)
+        except Exception as e:
+            logger.error(f"Failed to fetch closed {symbol} bar: {e}")
+            return
+        if rates is None or not len(rates):
+            return
+        bar = {name: rates[name][-1].item() for name in rates.dtype.names}
+        key = (symbol, timeframe)
+        if bar["time"] <= self._last_bar.get(key, -1):
+            return
+        self._last_bar[key] = bar["time"]
+        for runner in list(self._by_symbol.get(symbol, ())):
+            if runner.timeframe == timeframe:
+                runner.push_event(EVENT_BAR, (symbol, bar))
+
+
+# Global strategy runtime instance
+strategy_runtime = StrategyRuntime(mt5_connector, market_feed, bar_aggregator)
@@ -0,0 +1,532 @@
+"""Parameter sweeps over a process pool
+
+Price columns are copied once into a ``multiprocessing.shared_memory`` block;
+every worker attaches to it in its initializer and builds zero-copy NumPy
+views, so only parameter sets and summary statistics cross process
+boundaries. Batches may be restricted to a bar window (walk-forward
+analysis); windows are views of the shared columns and indicators are
+computed once per worker over the whole series and sliced per window.
+
+Single backtests run on ``BacktestWorkers``: long-lived processes that are
+reused from one backtest to the next and keep their own indicator cache.
+Columns read from the market data store reach them as file locations (see
+``market_data.describe_columns``), so tick histories are mapped again
+rather than copied. The pure-Python indicator recursions then never hold the
+calling process's GIL, and a cancelled job kills its worker instead of
+waiting for it to finish.
+"""
+
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import backtest_engine, tick_engine
+from app.services.indicators import indicator_cache, IndicatorCache
+from app.services.market_data import describe_columns, open_columns
+
+logger = logging.getLogger(__name__)
+
+SWEEP_COLUMNS = ("time", "open", "high", "low", "close")
+TASK_BATCH_SIZE = 16
+
+# Seconds between progress polls of a single backtest
+PROGRESS_INTERVAL = 0.1
+
+# Metrics where a smaller value ranks higher
+ASCENDING_METRICS = {"max_drawdown"}
+
+# Worker-process state, set by _init_worker
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_rates: Optional[Dict[str, np.ndarray]] = None
+# Indicators are shared by every parameter set that uses the same periods
+_worker_indicators: Optional[IndicatorCache] = None
+
+
+class SharedRates:
+    """OHLC columns packed into one shared memory block"""
+
+    def __init__(self, rates, columns: Tuple[str, ...] = SWEEP_COLUMNS):
+        arrays = [np.ascontiguousarray(rates[name]) for name in columns]
+        self.length = len(arrays[0])
+        self.layout: List[Tuple[str, str, int]] = []
+        offset = 0
+        for name, array in zip(columns, arrays):
+            # Keep every column 8-byte aligned
+            offset = (offset + 7) & ~7
+            self.layout.append((name, array.dtype.str, offset))
+            offset += array.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for (name, dtype, start), array in zip(self.layout, arrays):
+            np.ndarray(self.length, dtype=dtype, buffer=self.shm.buf, offset=start)[:] = array
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self) -> None:
+        """Release and unlink the shared block"""
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_rates(
+    shm: shared_memory.SharedMemory,
+    length: int,
+    layout: List[Tuple[str, str, int]]
+) -> Dict[str, np.ndarray]:
+    """Build column views over an attached shared memory block"""
+    return {
+        name: np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=offset)
+        for name, dtype, offset in layout
+    }
+
+
+def _init_worker(shm_name: str, length: int, layout: List[Tuple[str, str, int]]) -> None:
+    global _worker_shm, _worker_rates, _worker_indicators
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_rates = attach_rates(_worker_shm, length, layout)
+    _worker_indicators = IndicatorCache()
+
+
+def _slice_result(value: Any, lo: int, hi: int) -> Any:
+    """Restrict an indicator result (array or dict of arrays) to bars ``lo:hi``"""
+    if isinstance(value, dict):
+        return {name: column[lo:hi] for name, column in value.items()}
+    return value[lo:hi]
+
+
+def _run_batch(
+    base_parameters: Dict[str, Any],
+    batch: List[Dict[str, Any]],
+    initial_capital: float,
+    window: Optional[Tuple[int, int]] = None,
+    include_signal: bool = False
+) -> List[Dict[str, Any]]:
+    rates = _worker_rates
+    compute = _worker_indicators.bind(_worker_shm.name, None, _worker_rates)
+    if window is not None:
+        lo, hi = window
+        rates = {name: column[lo:hi] for name, column in _worker_rates.items()}
+        whole_series = compute
+
+        def compute(name: str, **params) -> Any:
+            return _slice_result(whole_series(name, **params), lo, hi)
+
+    results = []
+    for params in batch:
+        try:
+            merged = {**base_parameters, **params}
+            if include_signal:
+                if len(rates["close"]) < 2:
+                    raise ValueError("At least two bars are required")
+                signal = backtest_engine.generate_signals(rates, merged, compute)
+                stats = backtest_engine.simulate(
+                    rates, signal, initial_capital, merged, include_trades=False
+                )
+                stats["signal"] = signal
+            else:
+                stats = backtest_engine.run(
+                    rates,
+                    merged,
+                    initial_capital,
+                    include_trades=False,
+                    compute=compute
+                )
+            results.append({"parameters": params, **stats})
+        except Exception as e:
+            results.append({"parameters": params, "error": str(e)})
+    return results
+
+
+class SweepPool:
+    """
+    Process pool whose workers share one copy of the price columns
+
+    Args:
+        rates: OHLC columns
+        max_workers: Worker processes (defaults to the CPU count)
+    """
+
+    def __init__(self, rates, max_workers: Optional[int] = None):
+        self.shared = SharedRates(rates)
+        try:
+            self.executor = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count(),
+                initializer=_init_worker,
+                initargs=(self.shared.name, self.shared.length, self.shared.layout)
+            )
+        except Exception:
+            self.shared.close()
+            raise
+
+    def submit(
+        self,
+        base_parameters: Dict[str, Any],
+        batch: List[Dict[str, Any]],
+        initial_capital: float,
+        window: Optional[Tuple[int, int]] = None,
+        include_signal: bool = False
+    ) -> Future:
+        """
+        Backtest a batch of parameter sets on one worker
+
+        Args:
+            base_parameters: Strategy parameters the sets are merged onto
+            batch: Parameter overrides to evaluate
+            initial_capital: Starting equity
+            window: Bar index range ``(lo, hi)`` to backtest; all bars if None
+            include_signal: Add each run's target position array as ``signal``
+
+        Returns:
+            Future: Resolves to one result dict per parameter set
+        """
+        return self.executor.submit(
+            _run_batch, base_parameters, batch, initial_capital, window, include_signal
+        )
+
+    def close(self, terminate: bool = False) -> None:
+        """
+        Cancel pending batches, stop the workers and free the shared block
+
+        Args:
+            terminate: Kill workers in the middle of a batch instead of
+                waiting for them
+        """
+        if terminate:
+            # ProcessPoolExecutor has no public way to stop a running task
+            for process in list((self.executor._processes or {}).values()):
+                process.terminate()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.shared.close()
+
+    def __enter__(self) -> "SweepPool":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        # An abandoned sweep (cancelled job, closed stream) needs no more results
+        self.close(terminate=exc_type is not None)
+
+
+def _step(spec: Dict[str, Any]) -> float:
+    step = spec.get("step")
+    if step is None:
+        return 1
+    if step <= 0:
+        raise ValueError(f"Step must be positive, got {step}")
+    return step
+
+
+def _range_values(spec: Dict[str, Any]) -> List[Any]:
+    if spec.get("values") is not None:
+        return list(spec["values"])
+    start, stop = spec["min"], spec["max"]
+    step = _step(spec)
+    values = np.arange(start, stop + step / 2, step)
+    if spec.get("integer"):
+        return [int(round(v)) for v in values]
+    return [float(v) for v in values]
+
+
+def _scale(spec: Dict[str, Any], fraction: np.ndarray) -> List[Any]:
+    """Map fractions in [0, 1) onto a parameter range"""
+    if spec.get("values") is not None:
+        values = list(spec["values"])
+        idx = np.minimum((fraction * len(values)).astype(int), len(values) - 1)
+        return [values[i] for i in idx]
+    low, high = spec["min"], spec["max"]
+    if spec.get("integer"):
+        return [int(v) for v in np.floor(low + fraction * (high - low + 1))]
+    return [float(v) for v in low + fraction * (high - low)]
+
+
+def _axis_length(spec: Dict[str, Any]) -> int:
+    """Number of grid values of a range, matching _range_values without building it"""
+    if spec.get("values") is not None:
+        return len(spec["values"])
+    # np.arange(min, max + step / 2, step)
+    span = (spec["max"] - spec["min"]) / _step(spec) + 0.5
+    if not math.isfinite(span):
+        raise ValueError(f"Range {spec['min']}..{spec['max']} is not finite")
+    return max(math.ceil(span), 0)
+
+
+def count_parameters(
+    ranges: Dict[str, Dict[str, Any]],
+    method: str = "grid",
+    samples: int = 100
+) -> int:
+    """
+    Number of parameter sets expand_parameters would return, without building them
+
+    Raises:
+        ValueError: If a range or the method is invalid
+    """
+    if not ranges:
+        return 1
+    if method == "grid":
+        return math.prod(_axis_length(spec) for spec in ranges.values())
+    if method not in ("random", "lhs"):
+        raise ValueError(f"Unknown sweep method: {method}")
+    if samples <= 0:
+        raise ValueError(f"Samples must be positive, got {samples}")
+    for spec in ranges.values():
+        if spec.get("values") is not None and not spec["values"]:
+            raise ValueError("Parameter values must not be empty")
+    return samples
+
+
+def expand_parameters(
+    ranges: Dict[str, Dict[str, Any]],
+    method: str = "grid",
+    samples: int = 100,
+    seed: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Expand parameter ranges into concrete parameter sets
+
+    Each range is either ``{"values": [...]}`` or ``{"min", "max"}`` with an
+    optional ``step`` (grid) and ``integer`` flag. Check the size with
+    count_parameters first; this builds every set.
+
+    Args:
+        ranges: Parameter name to range specification
+        method: "grid", "random" or "lhs" (Latin hypercube)
+        samples: Number of sets for random and Latin hypercube sampling
+        seed: Random seed
+
+    Returns:
+        list: Parameter dictionaries
+    """
+    names = list(ranges)
+    if not names:
+        return [{}]
+
+    if method == "grid":
+        axes = [_range_values(ranges[name]) for name in names]
+        return [dict(zip(names, combo)) for combo in itertools.product(*axes)]
+
+    rng = np.random.default_rng(seed)
+    if method == "random":
+        fractions = rng.random((len(names), samples))
+    elif method == "lhs":
+        # One sample per stratum on every axis, strata shuffled independently
+        strata = np.stack([rng.permutation(samples) for _ in names])
+        fractions = (strata + rng.random((len(names), samples))) / samples
+    else:
+        raise ValueError(f"Unknown sweep method: {method}")
+
+    columns = [_scale(ranges[name], fractions[i]) for i, name in enumerate(names)]
+    return [dict(zip(names, combo)) for combo in zip(*columns)]
+
+
+def rank_results(
+    results: List[Dict[str, Any]],
+    metric: str
+) -> List[Dict[str, Any]]:
+    """Sort results best-first by ``metric``; failed runs go last"""
+    descending = metric not in ASCENDING_METRICS
+
+    def key(result):
+        value = result.get(metric)
+        if value is None:
+            return (1, 0.0)
+        return (0, -value if descending else value)
+
+    return sorted(results, key=key)
+
+
+def run_sweep(
+    rates,
+    base_parameters: Dict[str, Any],
+    parameter_sets: List[Dict[str, Any]],
+    initial_capital: float,
+    max_workers: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Backtest every parameter set on a process pool
+
+    Args:
+        rates: OHLC columns
+        base_parameters: Strategy parameters the sets are merged onto
+        parameter_sets: Parameter overrides to evaluate
+        initial_capital: Starting equity
+        max_workers: Worker processes (defaults to the CPU count)
+
+    Yields:
+        dict: One result per parameter set, in completion order
+    """
+    with SweepPool(rates, max_workers) as pool:
+        futures = [
+            pool.submit(base_parameters, parameter_sets[i:i + TASK_BATCH_SIZE], initial_capital)
+            for i in range(0, len(parameter_sets), TASK_BATCH_SIZE)
+        ]
+        for future in as_completed(futures):
+            for result in future.result():
+                yield result
+
+
+
+def _serve(conn: Connection, progress) -> None:
+    """Run backtests sent by BacktestWorkers until the pipe closes (worker process)"""
+
+    def report(fraction: float) -> None:
+        progress.value = fraction
+
+    while True:
+        try:
+            mode, symbol, timeframe, described, parameters, initial_capital = conn.recv()
+        except (EOFError, OSError):
+            return
+        columns = None
+        try:
+            columns = open_columns(described)
+            if mode == "ticks":
+                stats = tick_engine.run(columns, parameters, initial_capital, progress=report)
+            else:
+                stats = backtest_engine.run(
+                    columns,
+                    parameters,
+                    initial_capital,
+                    compute=indicator_cache.bind(symbol, timeframe, columns),
+                    progress=report
+                )
+            reply = ("result", stats)
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        # Unmap the files before waiting, so a later prepend can remove them
+        del columns
+        conn.send(reply)
+
+
+class _Worker:
+    """One backtest process and the pipe to it"""
+
+    def __init__(self):
+        self.progress = multiprocessing.Value("d", 0.0)
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_serve,
+            args=(child, self.progress),
+            name="backtest-worker",
+            daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def kill(self) -> None:
+        self.process.terminate()
+        self.process.join(5)
+        self.conn.close()
+
+
+class BacktestWorkers:
+    """
+    Worker processes for single backtests, reused between backtests
+
+    Each backtest gets a worker of its own, so killing it for a cancelled
+    job never affects another job's backtest.
+
+    Args:
+        max_idle: Idle workers kept for the next backtests
+    """
+
+    def __init__(self, max_idle: int):
+        self.max_idle = max_idle
+        self.stats = {"started": 0, "reused": 0, "killed": 0}
+        self._idle: List[_Worker] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    self.stats["reused"] += 1
+                    return worker
+                worker.kill()
+            self.stats["started"] += 1
+        return _Worker()
+
+    def _release(self, worker: _Worker) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(worker)
+                return
+        worker.kill()
+
+    def run(
+        self,
+        columns,
+        parameters: Dict[str, Any],
+        initial_capital: float,
+        mode: str = "bars",
+        symbol: Optional[str] = None,
+        timeframe: Optional[int] = None,
+        progress: Optional[Callable[[float], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run one full backtest in a worker process
+
+        The calling thread only waits, polling the worker's progress every
+        PROGRESS_INTERVAL. An exception raised by ``progress`` (a cancelled
+        job) kills the worker.
+
+        Args:
+            columns: OHLC columns, or tick columns in "ticks" mode
+            parameters: Strategy parameters
+            initial_capital: Starting equity
+            mode: "bars" (backtest_engine) or "ticks" (tick_engine)
+            symbol: Symbol of the rates, for the worker's indicator cache
+            timeframe: Timeframe of the rates, for the worker's indicator cache
+            progress: Called with the completed fraction
+
+        Returns:
+            dict: Backtest statistics with trades and equity curve
+
+        Raises:
+            RuntimeError: If the backtest failed or its worker died
+        """
+        names = tick_engine.REPLAY_COLUMNS if mode == "ticks" else SWEEP_COLUMNS
+        described = describe_columns({name: columns[name] for name in names})
+        worker = self._acquire()
+        reply = None
+        try:
+            worker.progress.value = 0.0
+            worker.conn.send((mode, symbol, timeframe, described, parameters, initial_capital))
+            while not worker.conn.poll(PROGRESS_INTERVAL):
+                if not worker.process.is_alive():
+                    raise RuntimeError("Backtest worker exited")
+                if progress:
+                    progress(worker.progress.value)
+            reply = worker.conn.recv()
+        finally:
+            if reply is None:
+                self.stats["killed"] += 1
+                worker.kill()
+            else:
+                self._release(worker)
+        status, value = reply
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    def close(self) -> None:
+        """Stop the idle workers"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.kill()
+
+
+# Global backtest workers instance
+backtest_workers = BacktestWorkers(settings.BACKTEST_MAX_CONCURRENT_JOBS)
@@ -0,0 +1,446 @@
+"""Per-symbol tick ring buffers in shared memory
+
+Every symbol the market feed polls gets a fixed-size ring of its newest
+ticks in a ``multiprocessing.shared_memory`` segment named
+``<TICK_BUFFER_PREFIX><symbol>``, so other processes can map the same ticks
+without copying them. A ring takes TICK_BUFFER_SIZE * 52 bytes plus a
+64-byte header, whatever the tick rate.
+
+Layout: eight int64 header fields (see ``HEADER_*``) followed by one column
+per field of TICK_BUFFER_COLUMNS, each ``capacity`` values long. Slot
+``i % capacity`` holds the i-th tick written.
+
+The feed thread is the only writer. Rings hold every tick (not just the
+ones the feed polled): for each symbol whose tick changed, the feed fetches
+all ticks from the millisecond of the newest one in its ring on and skips
+the ones of that millisecond the ring already holds. Whenever completeness cannot be
+guaranteed (a failed fetch, more ticks than one fetch returns) the ring
+restarts from the current tick, so the ticks it covers are always
+contiguous.
+
+Readers use the header's sequence number as a seqlock: it is odd while a
+write is in progress, and a copy is only returned if the sequence did not
+change while it was taken. API workers of a gateway deployment (see
+``app.services.gateway``) attach to the gateway's rings this way.
+"""
+
+import logging
+import re
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TICK_BUFFER_COLUMNS: Dict[str, str] = {
+    "time_msc": "<i8",
+    "bid": "<f8",
+    "ask": "<f8",
+    "last": "<f8",
+    "volume": "<u8",
+    "volume_real": "<f8",
+    "flags": "<u4",
+}
+# Column order of market_data.TICK_COLUMNS, which /api/mt5/ticks returns
+RESPONSE_COLUMNS = ("time", "bid", "ask", "last", "volume", "time_msc", "flags", "volume_real")
+
+MAGIC = 0x5449434B52494E47  # "TICKRING"
+HEADER_MAGIC = 0
+HEADER_CAPACITY = 1
+HEADER_SEQUENCE = 2
+HEADER_WRITTEN = 3  # ticks written since the ring was created
+HEADER_START = 4  # value of WRITTEN when the current contiguous run began
+HEADER_SYNCED_MS = 5  # wall-clock time the ring was last confirmed current
+HEADER_FIELDS = 8
+HEADER_BYTES = HEADER_FIELDS * 8
+
+ROW_BYTES = sum(np.dtype(dtype).itemsize for dtype in TICK_BUFFER_COLUMNS.values())
+READ_RETRIES = 8
+
+
+def segment_name(prefix: str, symbol: str) -> str:
+    """Shared memory name of a symbol's ring; characters other than [A-Za-z0-9] are hex-escaped"""
+    return prefix + re.sub(r"[^A-Za-z0-9]", lambda m: f"_{ord(m.group()):02x}", symbol)
+
+
+class TickRing:
+    """
+    One symbol's ring, created by the writer or attached by a reader
+
+    Args:
+        name: Shared memory segment name
+        capacity: Ticks held; required when creating
+        create: Create the segment instead of attaching to it
+    """
+
+    def __init__(self, name: str, capacity: Optional[int] = None, create: bool = False):
+        self.name = name
+        self.owner = create
+        if create:
+            try:
+                self._shm = SharedMemory(name, create=True, size=HEADER_BYTES + capacity * ROW_BYTES)
+            except FileExistsError:
+                # Left behind by a process that did not shut down cleanly
+                stale = SharedMemory(name)
+                stale.close()
+                stale.unlink()
+                self._shm = SharedMemory(name, create=True, size=HEADER_BYTES + capacity * ROW_BYTES)
+        else:
+            self._shm = SharedMemory(name)
+            # Only the creator may unlink the segment when it exits
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+
+        self._header = np.ndarray(HEADER_FIELDS, dtype="<i8", buffer=self._shm.buf)
+        if create:
+            self._header[:] = 0
+            self._header[HEADER_CAPACITY] = capacity
+            self._header[HEADER_MAGIC] = MAGIC
+        elif self._header[HEADER_MAGIC] != MAGIC:
+            self.close()
+            raise ValueError(f"{name} is not a tick ring")
+        self.capacity = int(self._header[HEADER_CAPACITY])
+
+        self._columns: Dict[str, np.ndarray] = {}
+        offset = HEADER_BYTES
+        for column, dtype in TICK_BUFFER_COLUMNS.items():
+            self._columns[column] = np.ndarray(self.capacity, dtype=dtype, buffer=self._shm.buf, offset=offset)
+            offset += self.capacity * np.dtype(dtype).itemsize
+
+    @property
+    def nbytes(self) -> int:
+        return self._shm.size
+
+    def __len__(self) -> int:
+        header = self._header
+        return int(min(header[HEADER_WRITTEN] - header[HEADER_START], self.capacity))
+
+    @property
+    def last_msc(self) -> Optional[int]:
+        """time_msc of the newest tick, or None if the ring is empty"""
+        written = int(self._header[HEADER_WRITTEN])
+        if written == self._header[HEADER_START]:
+            return None
+        return int(self._columns["time_msc"][(written - 1) % self.capacity])
+
+    @property
+    def synced_at(self) -> float:
+        """Epoch seconds at which the writer last confirmed the ring is current"""
+        return self._header[HEADER_SYNCED_MS] / 1000
+
+    # Writer side ---------------------------------------------------------
+
+    def extend(self, ticks: np.ndarray) -> None:
+        """Append ticks (an MT5 tick array or anything with the same fields), oldest first"""
+        n = len(ticks)
+        if n == 0:
+            return
+        if n > self.capacity:
+            ticks = ticks[n - self.capacity:]
+            n = self.capacity
+        header = self._header
+        written = int(header[HEADER_WRITTEN])
+        first = written % self.capacity
+        split = min(n, self.capacity - first)
+        header[HEADER_SEQUENCE] += 1
+        for column, values in self._columns.items():
+            source = ticks[column]
+            values[first:first + split] = source[:split]
+            values[:n - split] = source[split:]
+        header[HEADER_WRITTEN] = written + n
+        header[HEADER_SEQUENCE] += 1
+
+    def count_at(self, time_msc: int) -> int:
+        """Number of the newest ticks stamped ``time_msc``"""
+        written = int(self._header[HEADER_WRITTEN])
+        times = self._columns["time_msc"]
+        count = 0
+        while count < len(self) and times[(written - 1 - count) % self.capacity] == time_msc:
+            count += 1
+        return count
+
+    def reset(self) -> None:
+        """Forget the held ticks; the next tick starts a new contiguous run"""
+        header = self._header
+        header[HEADER_SEQUENCE] += 1
+        header[HEADER_START] = header[HEADER_WRITTEN]
+        header[HEADER_SEQUENCE] += 1
+
+    def mark_synced(self, timestamp: Optional[float] = None) -> None:
+        self._header[HEADER_SYNCED_MS] = int((timestamp or time.time()) * 1000)
+
+    # Reader side ---------------------------------------------------------
+
+    def tail(self, count: int) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Copy the newest ``count`` ticks
+
+        Args:
+            count: Number of ticks
+
+        Returns:
+            dict: Column name to array, in the order of the ticks endpoint,
+            or None if the ring holds fewer ticks or kept changing
+        """
+        # Read before the header: close() clears the columns first
+        columns = self._columns
+        header = self._header
+        if header is None or not columns:
+            return None
+        for _ in range(READ_RETRIES):
+            sequence = int(header[HEADER_SEQUENCE])
+            if sequence % 2:
+                continue
+            written = int(header[HEADER_WRITTEN])
+            available = min(written - int(header[HEADER_START]), self.capacity)
+            if count > available:
+                return None
+            first = (written - count) % self.capacity
+            if first + count <= self.capacity:
+                copies = {name: values[first:first + count].copy() for name, values in columns.items()}
+            else:
+                copies = {
+                    name: np.concatenate((values[first:], values[:written % self.capacity]))
+                    for name, values in columns.items()
+                }
+            if int(header[HEADER_SEQUENCE]) == sequence:
+                copies["time"] = copies["time_msc"] // 1000
+                return {name: copies[name] for name in RESPONSE_COLUMNS}
+        return None
+
+    def close(self) -> None:
+        """Unmap the segment; the creator also removes it"""
+        self._columns = {}
+        self._header = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A reader still holds a view; the mapping goes away with it
+            pass
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class TickBuffers:
+    """
+    Rings of the symbols the market feed polls, owned by the feed thread
+
+    Args:
+        capacity: Ticks per symbol (0 disables the buffers)
+        prefix: Shared memory name prefix
+        max_age: Seconds after the last confirmed sync a ring is still
+            trusted to hold the newest ticks
+        fetch_limit: Ticks fetched per symbol per poll; a symbol with more
+            new ticks restarts its ring
+        owner: Create and write the rings; when False (API workers) the
+            rings another process writes are attached on first read
+    """
+
+    def __init__(self, capacity: int, prefix: str, max_age: float, fetch_limit: int, owner: bool = True):
+        self.capacity = capacity
+        self.prefix = prefix
+        self.max_age = max_age
+        self.fetch_limit = fetch_limit
+        self.owner = owner
+        self.stats = {"hits": 0, "misses": 0, "resets": 0}
+        self._rings: Dict[str, TickRing] = {}
+        self._failed: Set[str] = set()
+        self._retry_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def sync(self, symbols: Iterable[str]) -> None:
+        """Create rings for new symbols and remove rings of dropped ones (feed thread)"""
+        wanted = set(symbols)
+        self._failed &= wanted
+        for symbol in wanted - self._rings.keys() - self._failed:
+            try:
+                ring = TickRing(segment_name(self.prefix, symbol), self.capacity, create=True)
+            except OSError as e:
+                logger.error(f"Failed to create tick buffer for {symbol}: {e}")
+                self._failed.add(symbol)
+                continue
+            with self._lock:
+                self._rings[symbol] = ring
+        for symbol in self._rings.keys() - wanted:
+            with self._lock:
+                ring = self._rings.pop(symbol)
+            ring.close()
+
+    def pending(self, latest: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Rings missing ticks (feed thread)
+
+        Args:
+            latest: Current tick per symbol from the poll
+
+        Returns:
+            dict: Symbol to the time_msc of its ring's newest tick, for every
+            non-empty ring whose symbol has a newer current tick
+        """
+        since = {}
+        for symbol, tick in latest.items():
+            ring = self._rings.get(symbol)
+            if ring is not None:
+                last_msc = ring.last_msc
+                if last_msc is not None and tick.get("time_msc", 0) > last_msc:
+                    since[symbol] = last_msc
+        return since
+
+    def store(
+        self,
+        latest: Dict[str, Dict[str, Any]],
+        fetched: Dict[str, Optional[np.ndarray]]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Write one poll's ticks (feed thread)
+
+        Args:
+            latest: Current tick per symbol from the poll
+            fetched: Ticks of the ``pending`` rings, or None where they
+                could not be fetched completely
+
+        Returns:
+            dict: Symbol to the ticks appended to its ring, for every ring
+            that received any
+        """
+        now = time.time()
+        stored = {}
+        for symbol, tick in latest.items():
+            ring = self._rings.get(symbol)
+            if ring is None:
+                continue
+            ticks = None
+            if symbol in fetched:
+                ticks = fetched[symbol]
+                if ticks is None:
+                    ring.reset()
+                    self.stats["resets"] += 1
+                    ticks = _tick_row(tick)
+                else:
+                    ticks = _unheld(ring, ticks)
+            elif ring.last_msc is None:
+                ticks = _tick_row(tick)
+            if ticks is not None and len(ticks):
+                ring.extend(ticks)
+                stored[symbol] = ticks
+            ring.mark_synced(now)
+        return stored
+
+    def close_all(self) -> None:
+        if self.owner:
+            self.sync(())
+            return
+        with self._lock:
+            rings = list(self._rings.values())
+            self._rings.clear()
+        for ring in rings:
+            ring.close()
+
+    def _attach(self, symbol: str, now: float) -> Optional[TickRing]:
+        """Ring another process writes, re-attached when it is not current (readers)"""
+        with self._lock:
+            ring = self._rings.get(symbol)
+            if ring is not None and now - ring.synced_at <= self.max_age:
+                return ring
+            if self._retry_at.get(symbol, 0) > now:
+                return ring
+            self._retry_at[symbol] = now + self.max_age
+            if ring is not None:
+                # The writer may have replaced the segment
+                del self._rings[symbol]
+                ring.close()
+            try:
+                ring = TickRing(segment_name(self.prefix, symbol))
+            except (FileNotFoundError, ValueError):
+                return None
+            self._rings[symbol] = ring
+            return ring
+
+    def _current(self, symbol: str) -> Optional[TickRing]:
+        """Ring of a symbol if it is trusted to hold the newest ticks"""
+        now = time.time()
+        if self.owner:
+            with self._lock:
+                ring = self._rings.get(symbol)
+        else:
+            ring = self._attach(symbol, now)
+        if ring is not None and now - ring.synced_at <= self.max_age:
+            return ring
+        return None
+
+    def tail(self, symbol: str, count: int) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Newest ticks of a buffered symbol
+
+        Returns:
+            dict: Column name to array, or None if the symbol has no ring,
+            the ring holds fewer than ``count`` ticks or it is not current
+        """
+        ring = self._current(symbol)
+        ticks = ring.tail(count) if ring is not None else None
+        self.stats["hits" if ticks is not None else "misses"] += 1
+        return ticks
+
+    def latest(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Newest tick of a buffered symbol as a tick dictionary, or None if there is no current one"""
+        ring = self._current(symbol)
+        ticks = ring.tail(1) if ring is not None else None
+        if ticks is None:
+            return None
+        return {name: column[0].item() for name, column in ticks.items()}
+
+    def info(self) -> List[Dict[str, Any]]:
+        """Held ticks and size of every ring"""
+        with self._lock:
+            rings = list(self._rings.items())
+        return [
+            {
+                "symbol": symbol,
+                "segment": ring.name,
+                "ticks": len(ring),
+                "capacity": ring.capacity,
+                "bytes": ring.nbytes,
+                "last_msc": ring.last_msc,
+                "synced_at": ring.synced_at
+            }
+            for symbol, ring in rings
+        ]
+
+
+def _unheld(ring: TickRing, ticks: np.ndarray) -> np.ndarray:
+    """Drop fetched ticks of the ring's newest millisecond that the ring already holds"""
+    last_msc = ring.last_msc
+    if last_msc is None:
+        return ticks
+    # Fetches start at last_msc, so its ticks lead, in the order they were first stored
+    same = int(np.searchsorted(ticks["time_msc"], last_msc, side="right"))
+    return ticks[min(same, ring.count_at(last_msc)):]
+
+
+def _tick_row(tick: Dict[str, Any]) -> np.ndarray:
+    row = np.zeros(1, dtype=list(TICK_BUFFER_COLUMNS.items()))
+    for column in TICK_BUFFER_COLUMNS:
+        row[column] = tick.get(column) or 0
+    return row
+
+
+# Global tick buffers instance
+tick_buffers = TickBuffers(
+    settings.TICK_BUFFER_SIZE,
+    settings.TICK_BUFFER_PREFIX,
+    settings.TICK_BUFFER_MAX_AGE,
+    settings.TICK_BUFFER_FETCH_LIMIT,
+    owner=settings.GATEWAY_ROLE != "worker"
+)
@@ -0,0 +1,516 @@
+"""Event-driven tick replay backtesting
+
+Replays stored ticks (the ``mt5.copy_ticks_*`` columns ``time_msc``,
+``bid``, ``ask``, ``last``, ``volume``, ``flags``) instead of bars. Signals
+are still decided on bars, built here from tick prices, but every order is
+filled against the ticks that follow it:
+
+- market orders cross the spread (buy at the ask, sell at the bid) and pay
+  ``slippage`` on top; ``latency_ms`` delays them after the bar close
+- stop losses trigger on the first tick through the stop and fill like a
+  market order from that tick
+- take profits and limit entries fill at their limit price once touched
+- with ``tick_liquidity`` set, no more than that quantity fills per tick,
+  so large orders fill over several ticks (partial fills)
+
+Ticks are never visited one at a time in Python. Bars are built chunk by
+chunk with ufunc reductions, and between orders the open position is
+scanned for stop/limit triggers with vectorized comparisons over growing
+chunks, so memory-mapped histories stream from disk without being loaded
+whole.
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import backtest_engine, indicators
+
+logger = logging.getLogger(__name__)
+
+Columns = Dict[str, np.ndarray]
+
+EXIT_SIGNAL = "signal"
+EXIT_STOP_LOSS = "stop_loss"
+EXIT_TAKE_PROFIT = "take_profit"
+EXIT_END = "end"
+
+# Columns the replay reads
+REPLAY_COLUMNS = ("time_msc", "bid", "ask", "last")
+
+# First trigger scans look at few ticks; stops are often hit soon after entry
+FIRST_SCAN_CHUNK = 4096
+
+
+def build_bars(
+    ticks: Columns,
+    interval_ms: int,
+    prices: str = "quote",
+    chunk_size: Optional[int] = None
+) -> Columns:
+    """
+    Aggregate ticks into time bars
+
+    Args:
+        ticks: Tick columns sorted by ``time_msc``
+        interval_ms: Bar length in milliseconds
+        prices: ``quote`` for the bid/ask midpoint or ``last`` for trade prices
+        chunk_size: Ticks read per step; defaults to TICK_REPLAY_CHUNK_SIZE
+
+    Returns:
+        dict: ``time`` (bar open, epoch seconds), ``open``, ``high``, ``low``,
+        ``close``, ``tick_volume`` and ``end_msc`` (bar close, epoch ms)
+    """
+    chunk_size = chunk_size or settings.TICK_REPLAY_CHUNK_SIZE
+    times = ticks["time_msc"]
+    n = len(times)
+    parts: List[Columns] = []
+    for lo in range(0, n, chunk_size):
+        hi = min(lo + chunk_size, n)
+        if prices == "last":
+            price = np.asarray(ticks["last"][lo:hi], dtype=np.float64)
+        else:
+            price = (np.asarray(ticks["bid"][lo:hi], dtype=np.float64) + ticks["ask"][lo:hi]) * 0.5
+        bar_id = np.asarray(times[lo:hi]) // interval_ms
+        starts = np.flatnonzero(np.diff(bar_id, prepend=bar_id[0] - 1))
+        ends = np.append(starts[1:], len(bar_id))
+        parts.append({
+            "id": bar_id[starts],
+            "open": price[starts],
+            "high": np.maximum.reduceat(price, starts),
+            "low": np.minimum.reduceat(price, starts),
+            "close": price[ends - 1],
+            "tick_volume": (ends - starts).astype(np.uint64),
+        })
+
+    if not parts:
+        return {
+            name: np.empty(0, dtype=dtype)
+            for name, dtype in (
+                ("time", np.int64), ("open", np.float64), ("high", np.float64),
+                ("low", np.float64), ("close", np.float64),
+                ("tick_volume", np.uint64), ("end_msc", np.int64),
+            )
+        }
+
+    # A bar may straddle a chunk boundary; merge rows with the same id
+    merged = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    bar_id = merged["id"]
+    starts = np.flatnonzero(np.diff(bar_id, prepend=bar_id[0] - 1))
+    ends = np.append(starts[1:], len(bar_id))
+    bar_id = bar_id[starts]
+    return {
+        "time": bar_id * interval_ms // 1000,
+        "open": merged["open"][starts],
+        "high": np.maximum.reduceat(merged["high"], starts),
+        "low": np.minimum.reduceat(merged["low"], starts),
+        "close": merged["close"][ends - 1],
+        "tick_volume": np.add.reduceat(merged["tick_volume"], starts),
+        "end_msc": (bar_id + 1) * interval_ms,
+    }
+
+
+@dataclass
+class Fill:
+    price: float
+    quantity: float
+    index: int  # last tick used
+    partial: bool = False
+
+
+@dataclass
+class Position:
+    side: int
+    quantity: float
+    entry_price: float
+    entry_msc: int
+    stop_price: Optional[float]
+    take_price: Optional[float]
+    partial: bool
+
+
+class TickReplay:
+    """
+    Replay one target-position series over ticks
+
+    Args:
+        ticks: Tick columns sorted by ``time_msc``
+        params: Strategy parameters; fill model options are ``slippage``,
+            ``spread`` (added around ``last`` prices), ``latency_ms``,
+            ``stop_loss`` / ``take_profit`` (price distances), ``entry``
+            (``market`` or ``limit``), ``limit_offset``, ``tick_liquidity``
+            and ``prices`` (``quote`` or ``last``)
+        chunk_size: Largest number of ticks compared per trigger scan
+    """
+
+    def __init__(self, ticks: Columns, params: Dict[str, Any], chunk_size: Optional[int] = None):
+        self.ticks = ticks
+        self.times = ticks["time_msc"]
+        self.n = len(self.times)
+        self.chunk_size = chunk_size or settings.TICK_REPLAY_CHUNK_SIZE
+
+        self.use_last = params.get("prices", "quote") == "last"
+        self.half_spread = float(params.get("spread", 0.0)) / 2 if self.use_last else 0.0
+        self.slippage = float(params.get("slippage", 0.0))
+        self.latency_ms = int(params.get("latency_ms", 0))
+        self.stop_distance = float(params.get("stop_loss", 0.0))
+        self.take_distance = float(params.get("take_profit", 0.0))
+        self.limit_entry = params.get("entry", "market") == "limit"
+        self.limit_offset = float(params.get("limit_offset", 0.0))
+        self.liquidity = float(params.get("tick_liquidity", 0.0))
+        self.cost = float(params.get("cost", 0.0))
+
+        self.trades: List[Dict[str, Any]] = []
+        self.counts = {
+            "orders": 0,
+            "partial_fills": 0,
+            "unfilled_orders": 0,
+            EXIT_STOP_LOSS: 0,
+            EXIT_TAKE_PROFIT: 0,
+        }
+
+    # Executable prices -------------------------------------------------
+
+    def ask(self, lo: int, hi: int) -> np.ndarray:
+        """Price a buy pays on ticks ``lo:hi`` before slippage"""
+        column = self.ticks["last" if self.use_last else "ask"][lo:hi]
+        return np.asarray(column, dtype=np.float64) + self.half_spread
+
+    def bid(self, lo: int, hi: int) -> np.ndarray:
+        """Price a sell receives on ticks ``lo:hi`` before slippage"""
+        column = self.ticks["last" if self.use_last else "bid"][lo:hi]
+        return np.asarray(column, dtype=np.float64) - self.half_spread
+
+    def _scan(
+        self,
+        start: int,
+        end: int,
+        predicate: Callable[[int, int], np.ndarray],
+        count: int = 1
+    ) -> np.ndarray:
+        """
+        Indices of the first ``count`` ticks in ``start:end`` matching ``predicate``
+
+        Chunks start at FIRST_SCAN_CHUNK ticks and double up to chunk_size,
+        so triggers close to ``start`` are found without touching the rest.
+        """
+        found: List[np.ndarray] = []
+        remaining = count
+        step = min(FIRST_SCAN_CHUNK, self.chunk_size)
+        lo = start
+        while lo < end and remaining > 0:
+            hi = min(lo + step, end)
+            hits = np.flatnonzero(predicate(lo, hi))[:remaining]
+            if len(hits):
+                found.append(hits + lo)
+                remaining -= len(hits)
+            lo = hi
+            step = min(step * 2, self.chunk_size)
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    # Orders ------------------------------------------------------------
+
+    def market(self, side: int, index: int, quantity: float) -> Fill:
+        """Fill a market order from tick ``index``, walking ticks if liquidity is limited"""
+        self.counts["orders"] += 1
+        if self.liquidity <= 0:
+            prices = self.ask(index, index + 1) if side > 0 else self.bid(index, index + 1)
+            return Fill(float(prices[0]) + side * self.slippage, quantity, index)
+
+        needed = math.ceil(quantity / self.liquidity - 1e-9)
+        hi = min(index + needed, self.n)
+        prices = self.ask(index, hi) if side > 0 else self.bid(index, hi)
+        sizes = np.full(len(prices), self.liquidity)
+        filled = min(quantity, self.liquidity * len(prices))
+        sizes[-1] = filled - self.liquidity * (len(prices) - 1)
+        price = float(np.dot(prices, sizes) / filled) + side * self.slippage
+        partial = len(prices) > 1
+        if partial:
+            self.counts["partial_fills"] += 1
+        return Fill(price, filled, hi - 1, partial)
+
+    def limit(self, side: int, index: int, expiry: int, quantity: float) -> Optional[Fill]:
+        """
+        Work a limit order placed ``limit_offset`` away from the touch at tick ``index``
+
+        Fills at the limit price on touching ticks before ``expiry``; with
+        limited liquidity only ``tick_liquidity`` fills per touching tick and
+        the rest is cancelled at expiry.
+        """
+        self.counts["orders"] += 1
+        if side > 0:
+            price = float(self.ask(index, index + 1)[0]) - self.limit_offset
+            touches = lambda lo, hi: self.ask(lo, hi) <= price
+        else:
+            price = float(self.bid(index, index + 1)[0]) + self.limit_offset
+            touches = lambda lo, hi: self.bid(lo, hi) >= price
+
+        needed = 1 if self.liquidity <= 0 else math.ceil(quantity / self.liquidity - 1e-9)
+        hits = self._scan(index, expiry, touches, needed)
+        if not len(hits):
+            self.counts["unfilled_orders"] += 1
+            return None
+        filled = quantity if self.liquidity <= 0 else min(quantity, self.liquidity * len(hits))
+        partial = len(hits) > 1 or filled < quantity
+        if partial:
+            self.counts["partial_fills"] += 1
+        return Fill(price, filled, int(hits[-1]), partial)
+
+    # Position lifecycle --------------------------------------------------
+
+    def open(self, side: int, index: int, expiry: int, quantity: float) -> Tuple[Optional[Position], int]:
+        """Enter a position; returns it (None if unfilled) and the next tick to replay"""
+        if self.limit_entry:
+            fill = self.limit(side, index, expiry, quantity)
+            if fill is None:
+                return None, expiry
+        else:
+            fill = self.market(side, index, quantity)
+
+        position = Position(
+            side=side,
+            quantity=fill.quantity,
+            entry_price=fill.price,
+            entry_msc=int(self.times[fill.index]),
+            stop_price=fill.price - side * self.stop_distance if self.stop_distance > 0 else None,
+            take_price=fill.price + side * self.take_distance if self.take_distance > 0 else None,
+            partial=fill.partial,
+        )
+        return position, fill.index + 1
+
+    def close(self, position: Position, fill: Fill, reason: str) -> None:
+        """Record the trade closing ``position`` with ``fill``"""
+        profit = position.side * position.quantity * (fill.price - position.entry_price)
+        profit -= 2 * position.quantity * self.cost
+        self.trades.append({
+            "entry_msc": position.entry_msc,
+            "exit_msc": int(self.times[fill.index]),
+            "side": position.side,
+            "quantity": position.quantity,
+            "entry_price": position.entry_price,
+            "exit_price": fill.price,
+            "profit": profit,
+            "exit_reason": reason,
+            "partial": position.partial or fill.partial,
+        })
+        if reason in self.counts:
+            self.counts[reason] += 1
+
+    def check_exits(self, position: Position, start: int, end: int) -> Optional[int]:
+        """
+        Close ``position`` if its stop loss or take profit triggers in ``start:end``
+
+        Returns:
+            int: Next tick to replay, or None if the position is still open
+        """
+        stop, take = position.stop_price, position.take_price
+        if stop is None and take is None:
+            return None
+
+        # Longs exit on the bid, shorts on the ask
+        exit_price = self.bid if position.side > 0 else self.ask
+        side = position.side
+
+        def triggered(lo: int, hi: int) -> np.ndarray:
+            price = exit_price(lo, hi)
+            hit = np.zeros(len(price), dtype=bool)
+            if stop is not None:
+                hit |= side * (price - stop) <= 0
+            if take is not None:
+                hit |= side * (price - take) >= 0
+            return hit
+
+        hits = self._scan(start, end, triggered)
+        if not len(hits):
+            return None
+        index = int(hits[0])
+        price = float(exit_price(index, index + 1)[0])
+        # A tick through both levels is taken as the stop (conservative)
+        if stop is not None and side * (price - stop) <= 0:
+            fill = self.market(-side, index, position.quantity)
+            self.close(position, fill, EXIT_STOP_LOSS)
+            return fill.index + 1
+        self.counts["orders"] += 1
+        self.close(position, Fill(take, position.quantity, index), EXIT_TAKE_PROFIT)
+        return index + 1
+
+    def run(self, event_msc: np.ndarray, event_target: np.ndarray, size: float) -> None:
+        """
+        Replay target position changes
+
+        Args:
+            event_msc: Decision time of each change in epoch milliseconds
+            event_target: Target position (-1, 0, 1) after each change
+            size: Quantity per position
+        """
+        event_index = np.searchsorted(self.times, event_msc + self.latency_ms, side="left")
+        expiry = np.append(event_index[1:], self.n)
+        position: Optional[Position] = None
+        cursor = 0
+
+        for index, target, expires in zip(event_index.tolist(), event_target.tolist(), expiry.tolist()):
+            if position is not None:
+                resumed = self.check_exits(position, cursor, min(index, self.n))
+                if resumed is not None:
+                    position, cursor = None, resumed
+            if index >= self.n:
+                break
+            index = max(index, cursor)
+            if index >= self.n:
+                break
+            if position is not None and position.side == target:
+                continue
+
+            if position is not None:
+                fill = self.market(-position.side, index, position.quantity)
+                self.close(position, fill, EXIT_SIGNAL)
+                position = None
+                cursor = fill.index + 1 if self.liquidity > 0 else index
+                index = cursor
+            if target != 0 and index < self.n:
+                position, cursor = self.open(target, index, max(expires, index + 1), size)
+
+        if position is not None:
+            resumed = self.check_exits(position, cursor, self.n)
+            if resumed is None:
+                last = self.n - 1
+                price = self.bid(last, last + 1) if position.side > 0 else self.ask(last, last + 1)
+                self.close(position, Fill(float(price[0]), position.quantity, last), EXIT_END)
+
+
+def _equity_at(
+    trades: List[Dict[str, Any]],
+    times_msc: np.ndarray,
+    marks: np.ndarray,
+    initial_capital: float,
+    cost: float
+) -> np.ndarray:
+    """Equity at each time: realized profit plus the open trade marked at ``marks``"""
+    equity = np.full(len(times_msc), initial_capital, dtype=np.float64)
+    if not trades:
+        return equity
+    entry = np.array([trade["entry_msc"] for trade in trades], dtype=np.int64)
+    exit_ = np.array([trade["exit_msc"] for trade in trades], dtype=np.int64)
+    profit = np.array([trade["profit"] for trade in trades], dtype=np.float64)
+    side = np.array([trade["side"] for trade in trades], dtype=np.float64)
+    quantity = np.array([trade["quantity"] for trade in trades], dtype=np.float64)
+    entry_price = np.array([trade["entry_price"] for trade in trades], dtype=np.float64)
+
+    realized = np.concatenate(([0.0], np.cumsum(profit)))
+    equity += realized[np.searchsorted(exit_, times_msc, side="right")]
+
+    last_entered = np.searchsorted(entry, times_msc, side="right") - 1
+    current = np.maximum(last_entered, 0)
+    is_open = (last_entered >= 0) & (times_msc < exit_[current])
+    unrealized = side[current] * quantity[current] * (marks - entry_price[current])
+    unrealized -= quantity[current] * cost
+    equity += np.where(is_open, unrealized, 0.0)
+    return equity
+
+
+def run(
+    ticks: Columns,
+    params: Dict[str, Any],
+    initial_capital: float,
+    include_trades: bool = True,
+    compute: Optional[backtest_engine.IndicatorFn] = None,
+    chunk_size: Optional[int] = None,
+    progress: Optional[Callable[[float], None]] = None
+) -> Dict[str, Any]:
+    """
+    Generate signals on tick-built bars and replay them tick by tick
+
+    Args:
+        ticks: Tick columns sorted by ``time_msc``
+        params: Strategy parameters; ``bar_seconds`` sets the signal bar
+            length (default 60), see TickReplay for the fill model options
+        initial_capital: Starting equity
+        include_trades: Build the per-trade list and equity curve
+        compute: Indicator lookup over the tick-built bars
+        chunk_size: Ticks read per step; defaults to TICK_REPLAY_CHUNK_SIZE
+        progress: Called with the completed fraction between stages
+
+    Returns:
+        dict: Backtest statistics in the same layout as
+        backtest_engine.simulate plus fill counts
+    """
+    interval_ms = int(float(params.get("bar_seconds", 60)) * 1000)
+    if interval_ms <= 0:
+        raise ValueError("bar_seconds must be positive")
+    prices = params.get("prices", "quote")
+    bars = build_bars(ticks, interval_ms, prices, chunk_size)
+    if len(bars["close"]) < 2:
+        raise ValueError("At least two bars of ticks are required")
+    if progress:
+        progress(0.3)
+
+    if compute is None:
+        def compute(name: str, **indicator_params) -> Any:
+            return indicators.compute(name, bars, **indicator_params)
+
+    signal = backtest_engine.generate_signals(bars, params, compute)
+    previous = np.concatenate(([0], signal[:-1]))
+    changed = np.flatnonzero(signal != previous)
+    if progress:
+        progress(0.5)
+
+    replay = TickReplay(ticks, params, chunk_size)
+    size = float(params.get("position_size") or initial_capital / bars["open"][0])
+    replay.run(bars["end_msc"][changed], signal[changed].astype(np.int64), size)
+    if progress:
+        progress(0.9)
+
+    # Equity is sampled at every bar close plus the end of the replay
+    times_msc = np.append(np.minimum(bars["end_msc"], replay.times[-1]), replay.times[-1])
+    marks = np.append(bars["close"], bars["close"][-1])
+    equity = _equity_at(replay.trades, times_msc, marks, initial_capital, replay.cost)
+    final_capital = initial_capital + sum(trade["profit"] for trade in replay.trades)
+    equity[-1] = final_capital
+    equity_before = np.concatenate(([initial_capital], equity[:-1]))
+    returns = (equity - equity_before) / equity_before
+    risk = backtest_engine.equity_statistics(times_msc // 1000, equity, returns, initial_capital)
+
+    total_trades = len(replay.trades)
+    winning_trades = sum(1 for trade in replay.trades if trade["profit"] > 0)
+    results: Dict[str, Any] = {
+        "ticks": replay.n,
+        "bars": len(bars["close"]),
+        "initial_capital": initial_capital,
+        "final_capital": final_capital,
+        "total_return": final_capital / initial_capital - 1.0,
+        "total_trades": total_trades,
+        "winning_trades": winning_trades,
+        "losing_trades": total_trades - winning_trades,
+        "win_rate": winning_trades / total_trades if total_trades else 0.0,
+        **risk,
+        "fills": dict(replay.counts),
+    }
+
+    if include_trades:
+        results["trades"] = [
+            {
+                "entry_time": trade["entry_msc"] // 1000,
+                "exit_time": trade["exit_msc"] // 1000,
+                "entry_time_msc": trade["entry_msc"],
+                "exit_time_msc": trade["exit_msc"],
+                "side": "buy" if trade["side"] > 0 else "sell",
+                "quantity": trade["quantity"],
+                "entry_price": trade["entry_price"],
+                "exit_price": trade["exit_price"],
+                "profit": trade["profit"],
+                "exit_reason": trade["exit_reason"],
+                "partial": trade["partial"],
+            }
+            for trade in replay.trades
+        ]
+        step = max(1, len(equity) // backtest_engine.EQUITY_CURVE_POINTS)
+        results["equity_curve"] = {
+            "time": (times_msc[::step] // 1000).tolist(),
+            "equity": equity[::step].tolist(),
+        }
+
+    return results
@@ -0,0 +1,4 @@
+from tests import fake_mt5
+
+# Before any app module imports MetaTrader5
+fake_mt5.install()
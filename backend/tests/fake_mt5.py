@@ -0,0 +1,122 @@
+"""Stand-in for the MetaTrader5 package, which only installs on Windows
+
+``install()`` registers a module with the constants the app reads at import
+time. ``FakeTerminal`` is passed to ``MT5Connector(mt5_module=...)`` so
+tests can script terminal responses and count calls.
+"""
+
+import sys
+import threading
+import types
+from collections import namedtuple
+
+import numpy as np
+
+CONSTANTS = {
+    "TIMEFRAME_M1": 1,
+    "TIMEFRAME_M5": 5,
+    "TIMEFRAME_M15": 15,
+    "TIMEFRAME_M30": 30,
+    "TIMEFRAME_H1": 16385,
+    "TIMEFRAME_H4": 16388,
+    "TIMEFRAME_D1": 16408,
+    "TIMEFRAME_W1": 32769,
+    "TIMEFRAME_MN1": 49153,
+    "COPY_TICKS_ALL": -1,
+    "COPY_TICKS_INFO": 1,
+    "COPY_TICKS_TRADE": 2,
+    "ORDER_TYPE_BUY": 0,
+    "ORDER_TYPE_SELL": 1,
+    "ORDER_TYPE_BUY_LIMIT": 2,
+    "ORDER_TYPE_SELL_LIMIT": 3,
+    "ORDER_TYPE_BUY_STOP": 4,
+    "ORDER_TYPE_SELL_STOP": 5,
+    "TRADE_ACTION_DEAL": 1,
+    "TRADE_ACTION_PENDING": 5,
+    "TRADE_ACTION_SLTP": 6,
+    "TRADE_ACTION_MODIFY": 7,
+    "TRADE_ACTION_REMOVE": 8,
+    "TRADE_RETCODE_PLACED": 10008,
+    "TRADE_RETCODE_DONE": 10009,
+    "TRADE_RETCODE_DONE_PARTIAL": 10010,
+    "SYMBOL_TRADE_MODE_DISABLED": 0,
+    "SYMBOL_TRADE_MODE_LONGONLY": 1,
+    "SYMBOL_TRADE_MODE_SHORTONLY": 2,
+    "SYMBOL_TRADE_MODE_CLOSEONLY": 3,
+    "SYMBOL_TRADE_MODE_FULL": 4,
+    "POSITION_TYPE_BUY": 0,
+    "POSITION_TYPE_SELL": 1,
+    "DEAL_TYPE_BUY": 0,
+    "DEAL_TYPE_SELL": 1,
+    "DEAL_TYPE_BALANCE": 2,
+    "DEAL_ENTRY_IN": 0,
+    "DEAL_ENTRY_OUT": 1,
+}
+
+RATES_DTYPE = np.dtype([
+    ("time", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("tick_volume", "<u8"),
+    ("spread", "<i4"),
+    ("real_volume", "<u8"),
+])
+
+AccountInfo = namedtuple("AccountInfo", "login balance equity margin margin_free margin_level profit currency")
+
+
+def install() -> None:
+    """Register the fake as ``MetaTrader5`` unless the real package is importable"""
+    try:
+        import MetaTrader5  # noqa: F401
+    except ImportError:
+        module = types.ModuleType("MetaTrader5")
+        module.__dict__.update(CONSTANTS)
+        sys.modules["MetaTrader5"] = module
+
+
+def random_rates(count: int, seed: int = 0, start: int = 1_600_000_000, step: int = 3600) -> np.ndarray:
+    """Random-walk bars in the mt5.copy_rates_* layout"""
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 1e-3, count))
+    rates = np.zeros(count, dtype=RATES_DTYPE)
+    rates["time"] = start + step * np.arange(count)
+    rates["open"] = np.r_[close[0], close[:-1]] + rng.normal(0, 2e-4, count)
+    rates["close"] = close
+    rates["high"] = np.maximum(rates["open"], close) + rng.uniform(0, 1e-3, count)
+    rates["low"] = np.minimum(rates["open"], close) - rng.uniform(0, 1e-3, count)
+    rates["tick_volume"] = rng.integers(1, 1000, count)
+    return rates
+
+
+class FakeTerminal:
+    """Scriptable terminal: counts calls and can hold them until released"""
+
+    def __init__(self):
+        self.__dict__.update(CONSTANTS)
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+        self.equity = 10000.0
+        # Tick history served by copy_ticks_from, in the TICK_BUFFER_COLUMNS layout
+        self.ticks = None
+
+    def initialize(self, **kwargs):
+        return True
+
+    def last_error(self):
+        return (1, "Success")
+
+    def account_info(self):
+        self.calls.append("account_info")
+        self.entered.set()
+        self.gate.wait(5)
+        return AccountInfo(1, 10000.0, self.equity, 0.0, 10000.0, None, 0.0, "USD")
+
+    def copy_ticks_from(self, symbol, date_from, count, flags):
+        self.calls.append(("copy_ticks_from", symbol, flags))
+        start_msc = int(date_from.timestamp()) * 1000
+        return self.ticks[self.ticks["time_msc"] >= start_msc][:count]
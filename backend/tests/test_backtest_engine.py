@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from app.services import backtest_engine
+from tests.fake_mt5 import random_rates
+
+
+def _rates(opens, closes):
+    rates = random_rates(len(opens))
+    rates["open"] = opens
+    rates["close"] = closes
+    rates["high"] = np.maximum(rates["open"], rates["close"])
+    rates["low"] = np.minimum(rates["open"], rates["close"])
+    return rates
+
+
+def test_hand_computed_long_trade():
+    rates = _rates([10.0, 11.0, 12.0, 13.0], [10.5, 11.5, 12.5, 13.5])
+    # Long from the close of bar 0: filled at 11 (bar 1 open), closed at 13 (bar 3 open)
+    signal = np.array([1.0, 1.0, 0.0, 0.0])
+    stats = backtest_engine.simulate(rates, signal, 1000.0, {"position_size": 2})
+    assert stats["total_trades"] == 1
+    trade = stats["trades"][0]
+    assert (trade["entry_price"], trade["exit_price"], trade["profit"]) == (11.0, 13.0, 4.0)
+    assert stats["final_capital"] == pytest.approx(1004.0)
+
+
+def test_open_position_closes_at_last_close():
+    rates = _rates([10.0, 11.0, 12.0], [10.5, 11.5, 12.5])
+    signal = np.array([-1.0, -1.0, -1.0])
+    stats = backtest_engine.simulate(rates, signal, 1000.0, {"position_size": 1})
+    assert stats["trades"][0]["exit_price"] == 12.5
+    assert stats["final_capital"] == pytest.approx(1000.0 - 1.5)
+
+
+@pytest.mark.parametrize("cost", [0.0, 1e-4])
+def test_equity_matches_trade_profits(cost):
+    rates = random_rates(2000, seed=3)
+    rng = np.random.default_rng(4)
+    # Runs of random targets, including direct long/short flips
+    signal = np.repeat(rng.choice([-1.0, 0.0, 1.0], 200), 10)
+    stats = backtest_engine.simulate(rates, signal, 10000.0, {"position_size": 1000, "cost": cost})
+    profits = sum(trade["profit"] for trade in stats["trades"])
+    assert stats["final_capital"] - stats["initial_capital"] == pytest.approx(profits, abs=1e-6)
+    assert stats["total_return"] == pytest.approx(stats["final_capital"] / 10000.0 - 1)
+    assert stats["winning_trades"] + stats["losing_trades"] == stats["total_trades"] == len(stats["trades"])
+    assert stats["total_trades"] > 50
+
+
+def test_flat_signal_keeps_capital():
+    rates = random_rates(100)
+    stats = backtest_engine.simulate(rates, np.zeros(100), 5000.0)
+    assert stats["final_capital"] == 5000.0
+    assert stats["total_trades"] == 0
+
+
+def test_run_matches_simulate_of_generated_signal():
+    rates = random_rates(500, seed=5)
+    params = {"type": "sma_crossover", "fast_period": 5, "slow_period": 20}
+    stats = backtest_engine.run(rates, params, 10000.0)
+    signal = backtest_engine.generate_signals(rates, params, None)
+    assert stats["final_capital"] == backtest_engine.simulate(rates, signal, 10000.0, params)["final_capital"]
+
+
+def test_run_needs_two_bars():
+    with pytest.raises(ValueError):
+        backtest_engine.run(random_rates(1), {}, 10000.0)
+
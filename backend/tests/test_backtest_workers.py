@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from app.services import backtest_engine, tick_engine
+from app.services.market_data import describe_columns, open_columns
+from app.services.sweep import BacktestWorkers
+from tests.fake_mt5 import random_rates
+
+
+@pytest.fixture
+def workers():
+    workers = BacktestWorkers(1)
+    yield workers
+    workers.close()
+
+
+def _columns(rates):
+    return {name: rates[name] for name in ("time", "open", "high", "low", "close")}
+
+
+def _ticks(count, seed=0):
+    rng = np.random.default_rng(seed)
+    bid = 1.1 + np.cumsum(rng.normal(0, 1e-5, count))
+    return {
+        "time_msc": 1_600_000_000_000 + np.arange(count, dtype=np.int64) * 250,
+        "bid": bid,
+        "ask": bid + 1e-5,
+        "last": np.zeros(count),
+    }
+
+
+def test_file_views_are_described_by_location(tmp_path):
+    path = tmp_path / "close.bin"
+    np.arange(100, dtype="<f8").tofile(path)
+    mapped = np.memmap(path, dtype="<f8", mode="r", shape=(100,))
+    described = describe_columns({"close": mapped[10:20][2:], "open": np.ones(3)})
+    assert described["close"] == (str(path), "<f8", 12 * 8, 8)
+    assert isinstance(described["open"], np.ndarray)
+    opened = open_columns(described)
+    assert opened["close"].tolist() == list(range(12, 20))
+    assert opened["open"].tolist() == [1.0, 1.0, 1.0]
+
+
+def test_worker_backtest_matches_in_process_run(workers):
+    rates = random_rates(2000, seed=6)
+    params = {"type": "ema_crossover", "fast_period": 12, "slow_period": 26}
+    reported = []
+    stats = workers.run(_columns(rates), params, 10000.0, symbol="EURUSD", timeframe=16385, progress=reported.append)
+    expected = backtest_engine.run(rates, params, 10000.0)
+    assert stats["final_capital"] == expected["final_capital"]
+    assert stats["trades"] == expected["trades"]
+    assert all(0.0 <= fraction <= 1.0 for fraction in reported)
+
+
+def test_worker_replays_ticks_from_mapped_files(workers, tmp_path):
+    ticks = _ticks(20_000)
+    mapped = {}
+    for name, column in ticks.items():
+        column.tofile(tmp_path / f"{name}.bin")
+        mapped[name] = np.memmap(tmp_path / f"{name}.bin", dtype=column.dtype, mode="r", shape=column.shape)
+    params = {"type": "sma_crossover", "fast_period": 5, "slow_period": 20, "bar_seconds": 60}
+    stats = workers.run(mapped, params, 10000.0, mode="ticks")
+    assert stats["final_capital"] == tick_engine.run(ticks, params, 10000.0)["final_capital"]
+
+
+def test_workers_are_reused(workers):
+    rates = _columns(random_rates(500, seed=1))
+    for _ in range(3):
+        workers.run(rates, {"type": "sma_crossover"}, 10000.0, symbol="EURUSD", timeframe=16385)
+    assert workers.stats == {"started": 1, "reused": 2, "killed": 0}
+
+
+def test_errors_are_raised_and_keep_the_worker(workers):
+    with pytest.raises(RuntimeError, match="two bars"):
+        workers.run(_columns(random_rates(1)), {}, 10000.0)
+    assert workers.stats["killed"] == 0
+
+
+def test_worker_is_killed_when_progress_raises(workers):
+    class Cancelled(Exception):
+        pass
+
+    def cancel(fraction):
+        raise Cancelled()
+
+    rates = _columns(random_rates(3_000_000, seed=7))
+    with pytest.raises(Cancelled):
+        workers.run(rates, {"type": "rsi_reversion"}, 10000.0, symbol="EURUSD", timeframe=16385, progress=cancel)
+    assert workers.stats["killed"] == 1
+    # The next backtest starts a fresh worker
+    workers.run(_columns(random_rates(500)), {"type": "sma_crossover"}, 10000.0)
+    assert workers.stats["started"] == 2
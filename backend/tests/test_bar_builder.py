@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from app.services.bar_builder import (
+    BarHistory,
+    BAR_DTYPE,
+    bar_key,
+    create_builder,
+    parse_bar_spec
+)
+
+SIZE = 0.001
+
+
+def _feed(builder, ticks):
+    """Feed (time_msc, price[, volume]) ticks; returns every closed bar"""
+    closed = []
+    for tick in ticks:
+        time_msc, price = tick[:2]
+        volume = tick[2] if len(tick) > 2 else 1.0
+        closed.extend(builder.update(time_msc, price, volume))
+    return closed
+
+
+def test_parse_bar_spec():
+    assert parse_bar_spec("time:5") == ("time", 5.0)
+    assert parse_bar_spec("renko:0.001") == ("renko", 0.001)
+    assert bar_key("time:5.0") == bar_key("time:5") == "time:5"
+    for bad in ("weekly:1", "time:abc", "time:0", "tick:1.5", "range:-1", "volume:inf"):
+        with pytest.raises(ValueError):
+            parse_bar_spec(bad)
+
+
+def test_time_bars_close_on_next_interval():
+    builder = create_builder("time:5", 10)
+    closed = _feed(builder, [(1000, 1.0), (2000, 1.2), (4999, 0.9), (5000, 1.1), (16000, 1.3)])
+    assert [(bar["time_msc"], bar["open"], bar["high"], bar["low"], bar["close"], bar["tick_volume"])
+            for bar in closed] == [(0, 1.0, 1.2, 0.9, 0.9, 3), (5000, 1.1, 1.1, 1.1, 1.1, 1)]
+    # Empty intervals produce no bars; the forming bar starts on its own interval
+    assert builder.forming()["time_msc"] == 15000
+    assert builder.forming()["time"] == 15
+
+
+def test_time_bars_ignore_out_of_order_ticks():
+    builder = create_builder("time:5", 10)
+    _feed(builder, [(6000, 1.0), (5500, 2.0)])
+    assert builder.forming()["high"] == 1.0
+
+
+def test_tick_bars():
+    builder = create_builder("tick:3", 10)
+    closed = _feed(builder, [(i, 1.0 + i) for i in range(7)])
+    assert [bar["close"] for bar in closed] == [3.0, 6.0]
+    assert builder.forming()["tick_volume"] == 1
+
+
+def test_volume_bars():
+    builder = create_builder("volume:10", 10)
+    closed = _feed(builder, [(1, 1.0, 4), (2, 1.1, 4), (3, 1.2, 4), (4, 1.3, 9), (5, 1.4, 1)])
+    assert [(bar["volume"], bar["close"]) for bar in closed] == [(12.0, 1.2), (10.0, 1.4)]
+
+
+def test_range_bars():
+    builder = create_builder("range:0.5", 10)
+    closed = _feed(builder, [(1, 10.0), (2, 10.2), (3, 9.8), (4, 9.7), (5, 9.6)])
+    assert [(bar["high"], bar["low"]) for bar in closed] == [(10.2, 9.7)]
+    assert builder.forming()["open"] == 9.6
+
+
+def _bricks(closed):
+    return [(round(bar["open"] / SIZE), round(bar["close"] / SIZE)) for bar in closed]
+
+
+def test_renko_bricks_in_one_direction():
+    builder = create_builder(f"renko:{SIZE}", 10)
+    closed = _feed(builder, [(1, 1.0000), (2, 1.0006), (3, 1.0010), (4, 1.0015), (5, 1.0020)])
+    assert _bricks(closed) == [(1000, 1001), (1001, 1002)]
+    assert closed[0]["tick_volume"] == 3
+
+
+def test_renko_reversal_needs_two_bricks():
+    builder = create_builder(f"renko:{SIZE}", 10)
+    closed = _feed(builder, [(1, 1.0000), (2, 1.0010), (3, 1.0020)])
+    assert _bricks(closed) == [(1000, 1001), (1001, 1002)]
+    # One brick back from the last close is not yet a reversal
+    assert _feed(builder, [(4, 1.0010)]) == []
+    reversal = _feed(builder, [(5, 1.0005), (6, 1.0000)])
+    assert _bricks(reversal) == [(1001, 1000)]
+    assert reversal[0]["tick_volume"] == 3
+    # After a down brick, the next down brick needs just one more brick
+    assert _bricks(_feed(builder, [(7, 0.9990)])) == [(1000, 999)]
+
+
+def test_renko_gap_closes_several_bricks():
+    builder = create_builder(f"renko:{SIZE}", 10)
+    closed = _feed(builder, [(1, 1.0000), (2, 1.0031)])
+    assert _bricks(closed) == [(1000, 1001), (1001, 1002), (1002, 1003)]
+    # Ticks and volume count on the first brick only
+    assert [bar["tick_volume"] for bar in closed] == [2, 0, 0]
+    assert all(bar["end_msc"] == 2 for bar in closed)
+
+
+def test_renko_gap_reversal():
+    builder = create_builder(f"renko:{SIZE}", 10)
+    _feed(builder, [(1, 1.0000), (2, 1.0010)])
+    assert _bricks(_feed(builder, [(3, 0.9980)])) == [(1000, 999), (999, 998)]
+
+
+def test_renko_high_low_span_the_brick():
+    builder = create_builder(f"renko:{SIZE}", 10)
+    down = _feed(builder, [(1, 1.0000), (2, 0.9990)])[0]
+    assert (down["high"], down["low"]) == (pytest.approx(1.0), pytest.approx(0.999))
+
+
+def test_history_keeps_newest_bars_in_order():
+    history = BarHistory(3)
+    for i in range(5):
+        history.append((i, i * 1000, i * 1000, 1.0, 1.0, 1.0, 1.0, 1, 1.0))
+    assert history.to_array()["time"].tolist() == [2, 3, 4]
+    assert history.to_array(2)["time"].tolist() == [3, 4]
+    assert history.to_array().dtype == BAR_DTYPE
+
+
+def test_replay_matches_live_updates():
+    ticks = {
+        "time_msc": np.arange(0, 60000, 700, dtype=np.int64),
+        "bid": 1.0 + np.sin(np.arange(0, 60000, 700) / 5000) * 0.01,
+        "last": np.zeros(86),
+        "volume": np.ones(86, dtype=np.uint64),
+    }
+    replayed = create_builder("time:5", 100)
+    replayed.replay(ticks)
+    live = create_builder("time:5", 100)
+    _feed(live, list(zip(ticks["time_msc"].tolist(), ticks["bid"].tolist())))
+    assert np.array_equal(replayed.history.to_array(), live.history.to_array())
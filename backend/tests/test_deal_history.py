@@ -0,0 +1,123 @@
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db.database import Base
+from app.models.models import Deal
+from app.services import deal_history as deal_history_module
+from app.services.deal_history import DealHistory, epoch
+
+DAY = 86400
+
+
+class FakeConnector:
+    """Serves account 1's deals; ``aio`` is itself, like MT5Connector.aio"""
+
+    def __init__(self, deals):
+        self.deals = deals
+        self.fetches = []
+        self.fail = False
+        self.aio = self
+
+    async def account_info(self):
+        return {"login": 1}
+
+    async def history_deals_get(self, date_from, date_to):
+        if self.fail:
+            return None
+        self.fetches.append((epoch(date_from), epoch(date_to)))
+        return [deal for deal in self.deals if epoch(date_from) <= deal["time"] <= epoch(date_to)]
+
+
+def _deal(ticket, time):
+    return {"ticket": ticket, "time": time, "symbol": "EURUSD", "profit": 1.0, "volume": 0.1}
+
+
+def _run(tmp_path, monkeypatch, body):
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'deals.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        maker = async_sessionmaker(engine, expire_on_commit=False)
+        monkeypatch.setattr(deal_history_module, "async_session_maker", maker)
+
+        async def stored():
+            async with maker() as session:
+                return list(await session.scalars(select(Deal.ticket).order_by(Deal.ticket)))
+
+        try:
+            return await body(stored)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_sync_only_fetches_from_the_high_water_mark(tmp_path, monkeypatch):
+    now = epoch(datetime.now(timezone.utc))
+    connector = FakeConnector([_deal(1, now - 20 * DAY), _deal(2, now - 60), _deal(3, now - 400 * DAY)])
+    history = DealHistory(connector, 30, 60.0)
+
+    async def body(stored):
+        assert await history.sync() == 1
+        # The first sync covers DEAL_HISTORY_DAYS only
+        assert await stored() == [1, 2]
+        assert connector.fetches[0][0] - (now - 30 * DAY) in (0, 1)
+
+        # Throttled until the interval passes or the history is marked stale
+        connector.fetches.clear()
+        await history.sync()
+        assert connector.fetches == []
+
+        # A second deal in the high-water second is added without duplicating the first
+        connector.deals.append(_deal(4, now - 60))
+        history.mark_stale()
+        await history.sync()
+        assert [start for start, _ in connector.fetches] == [now - 60]
+        assert await stored() == [1, 2, 4]
+
+    _run(tmp_path, monkeypatch, body)
+
+
+def test_older_queries_backfill_below_the_low_water_mark_once(tmp_path, monkeypatch):
+    now = epoch(datetime.now(timezone.utc))
+    connector = FakeConnector([_deal(1, now - 10 * DAY), _deal(2, now - 45 * DAY), _deal(3, now - 90 * DAY)])
+    history = DealHistory(connector, 30, 60.0)
+    date_from = datetime.fromtimestamp(now - 60 * DAY, tz=timezone.utc)
+
+    async def body(stored):
+        await history.sync()
+        assert await stored() == [1]
+        assert not history.covers(date_from)
+
+        connector.fetches.clear()
+        await history.sync(date_from=date_from)
+        assert history.covers(date_from)
+        assert await stored() == [1, 2]
+        # Only the missing window below the low-water mark is fetched
+        backfill = [(start, end) for start, end in connector.fetches if start == epoch(date_from)]
+        assert len(backfill) == 1 and backfill[0][1] - (now - 30 * DAY) in (0, 1)
+
+        connector.fetches.clear()
+        await history.sync(date_from=date_from)
+        assert connector.fetches == []
+
+    _run(tmp_path, monkeypatch, body)
+
+
+def test_failed_fetch_leaves_nothing_synced(tmp_path, monkeypatch):
+    now = datetime.now(timezone.utc)
+    connector = FakeConnector([_deal(1, epoch(now) - DAY)])
+    connector.fail = True
+    history = DealHistory(connector, 30, 60.0)
+
+    async def body(stored):
+        assert await history.sync() is None
+        assert not history.covers(now)
+        connector.fail = False
+        assert await history.sync() == 1
+        assert await stored() == [1]
+
+    _run(tmp_path, monkeypatch, body)
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from app.core.config import Settings
+from app.services import gateway_protocol
+from app.services.gateway import GatewayServer
+from app.services.gateway_client import GatewayClient
+from app.services.market_data import MarketDataStore
+from app.services.mt5_connector import MT5Connector
+from app.services.mt5_executor import MT5Executor
+from tests.fake_mt5 import FakeTerminal
+
+AUTHKEY = b"test-gateway-key"
+
+# Progress of the last request the _stream app served
+app_state = {}
+
+
+class FakeFeed:
+    def __init__(self):
+        self.symbols = set()
+
+    def add_symbols(self, symbols):
+        self.symbols |= set(symbols)
+
+    def remove_symbols(self, symbols):
+        self.symbols -= set(symbols)
+
+
+async def _stream(scope, receive, send):
+    """ASGI app streaming 100 chunks; records how far it got and what it received"""
+    await receive()
+    app_state["sent"] = 0
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"x-path", scope["path"].encode())]})
+    for _ in range(100):
+        await send({"type": "http.response.body", "body": b"x" * 100, "more_body": True})
+        app_state["sent"] += 1
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+    app_state["after"] = await receive()
+
+
+def _run(tmp_path, body):
+    terminal = FakeTerminal()
+    connector = MT5Connector(mt5_module=terminal, executor=MT5Executor())
+    connector.connected = True
+    feed = FakeFeed()
+    address = str(tmp_path / "gateway.sock")
+    server = GatewayServer(address, AUTHKEY, connector, MarketDataStore(str(tmp_path / "md"), connector), feed)
+
+    async def main():
+        await server.start(_stream)
+        client = GatewayClient(address, AUTHKEY, 60.0, retry_delay=0.05)
+        client.start()
+        try:
+            for _ in range(100):
+                if client.connected:
+                    break
+                await asyncio.sleep(0.05)
+            assert client.connected
+            return await body(server, client, terminal, feed)
+        finally:
+            await client.stop()
+            await server.stop()
+
+    try:
+        return asyncio.run(main())
+    finally:
+        connector.executor.stop()
+
+
+def test_authkey_must_be_set_and_not_the_default():
+    with pytest.raises(RuntimeError):
+        gateway_protocol.check_authkey(b"")
+    with pytest.raises(RuntimeError):
+        gateway_protocol.check_authkey(Settings.model_fields["SECRET_KEY"].default.encode())
+    gateway_protocol.check_authkey(AUTHKEY)
+
+
+def test_calls_and_watches_round_trip(tmp_path):
+    async def body(server, client, terminal, feed):
+        account = await client.call("call", "account_info", (), {}, timeout=5)
+        assert account["login"] == 1 and account["equity"] == terminal.equity
+        assert terminal.calls == ["account_info"]
+        with pytest.raises(Exception, match="Not a connector call"):
+            await client.call("call", "invalidate_cache", (), {}, timeout=5)
+
+        await client.call("watch", ["EURUSD", "GBPUSD"], timeout=5)
+        assert feed.symbols == {"EURUSD", "GBPUSD"}
+        await client.call("watch", ["EURUSD"], timeout=5)
+        assert feed.symbols == {"EURUSD"}
+
+    _run(tmp_path, body)
+
+
+def test_wrong_key_is_rejected(tmp_path):
+    async def body(server, client, terminal, feed):
+        intruder = GatewayClient(server.address, b"not-the-key", 60.0, retry_delay=0.05)
+        intruder.start()
+        try:
+            for _ in range(100):
+                if server.stats["rejected"]:
+                    break
+                await asyncio.sleep(0.05)
+            assert server.stats["rejected"] >= 1
+            assert not intruder.connected
+        finally:
+            await intruder.stop()
+
+    _run(tmp_path, body)
+
+
+def test_forwarded_response_is_streamed_whole(tmp_path):
+    async def body(server, client, terminal, feed):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        async def receive():
+            await asyncio.sleep(3600)
+
+        await client.forward({"method": "GET", "path": "/api/mt5/ticks", "headers": []}, b"", send, receive)
+        assert sent[0]["status"] == 200 and sent[0]["headers"] == [(b"x-path", b"/api/mt5/ticks")]
+        assert b"".join(m.get("body", b"") for m in sent[1:]) == b"x" * 10000
+        assert sent[-1]["more_body"] is False
+
+    _run(tmp_path, body)
+
+
+def test_slow_client_holds_back_the_gateway_and_disconnects_reach_it(tmp_path):
+    async def body(server, client, terminal, feed):
+        relayed = []
+        gone = asyncio.Event()
+
+        async def send(message):
+            relayed.append(message)
+            await asyncio.sleep(0.02)
+
+        async def receive():
+            await gone.wait()
+            return {"type": "http.disconnect"}
+
+        app_state.clear()
+        task = asyncio.create_task(
+            client.forward({"method": "GET", "path": "/api/export", "headers": []}, b"", send, receive)
+        )
+        await asyncio.sleep(0.3)
+        # No more than the window runs ahead of what the client took
+        assert app_state["sent"] <= len(relayed) + gateway_protocol.HTTP_WINDOW
+        assert app_state["sent"] < 100
+
+        gone.set()
+        await asyncio.wait_for(task, 5)
+        for _ in range(100):
+            if "after" in app_state:
+                break
+            await asyncio.sleep(0.02)
+        assert app_state["after"] == {"type": "http.disconnect"}
+
+    _run(tmp_path, body)
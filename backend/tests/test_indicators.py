@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from app.services import indicators
+from tests.fake_mt5 import random_rates
+
+RATES = random_rates(400, seed=1)
+
+CASES = [
+    ("sma", {"period": 20}),
+    ("ema", {"period": 20}),
+    ("rsi", {"period": 14}),
+    ("atr", {"period": 14}),
+    ("bollinger", {"period": 20, "width": 2.0}),
+    ("macd", {"fast": 12, "slow": 26, "signal": 9}),
+    ("vwap", {"anchor": 86400}),
+]
+
+
+def _streamed(state, rates):
+    """Value after every bar, as arrays shaped like the vectorized result"""
+    values = []
+    columns = {name: rates[name].tolist() for name in rates.dtype.names}
+    for i in range(len(rates)):
+        values.append(state.update_bar({name: column[i] for name, column in columns.items()}))
+    if isinstance(values[0], tuple):
+        return tuple(np.array(part) for part in zip(*values))
+    return np.array(values)
+
+
+@pytest.mark.parametrize("name,params", CASES)
+def test_streaming_matches_vectorized(name, params):
+    state = indicators.create(name, **params)
+    streamed = _streamed(state, RATES)
+    vectorized = state.compute(RATES)
+    assert np.isfinite(vectorized[0] if isinstance(vectorized, tuple) else vectorized).sum() > 300
+    if isinstance(vectorized, tuple):
+        assert len(streamed) == len(vectorized)
+        for got, expected in zip(streamed, vectorized):
+            np.testing.assert_allclose(got, expected, rtol=1e-9, atol=1e-12, equal_nan=True)
+    else:
+        np.testing.assert_allclose(streamed, vectorized, rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize("name,params", CASES)
+def test_warm_then_update_matches_vectorized(name, params):
+    split = 250
+    state = indicators.create(name, **params).warm(RATES[:split])
+    streamed = _streamed(state, RATES[split:])
+    vectorized = state.compute(RATES)
+    if isinstance(vectorized, tuple):
+        for got, expected in zip(streamed, vectorized):
+            np.testing.assert_allclose(got, expected[split:], rtol=1e-9, atol=1e-12, equal_nan=True)
+    else:
+        np.testing.assert_allclose(streamed, vectorized[split:], rtol=1e-9, atol=1e-12, equal_nan=True)
+
+
+def test_sma_known_values():
+    np.testing.assert_allclose(indicators.sma(np.array([1.0, 2.0, 3.0, 4.0]), 2), [np.nan, 1.5, 2.5, 3.5])
+
+
+def test_unknown_indicator():
+    with pytest.raises(ValueError):
+        indicators.create("nope")
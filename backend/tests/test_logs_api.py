@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.api import logs
+from app.db.database import Base
+from app.models.models import TradeLog
+
+START = datetime(2024, 1, 1)
+
+
+async def _with_trades(body, count=25):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            # Three rows per timestamp, so pages split rows that share one
+            db.add_all(
+                TradeLog(
+                    timestamp=START + timedelta(seconds=i // 3),
+                    symbol="EURUSD" if i % 2 else "GBPUSD",
+                    order_type="BUY",
+                    volume=0.1,
+                    price=1.1,
+                    status="EXECUTED"
+                )
+                for i in range(count)
+            )
+            await db.commit()
+            return await body(db)
+    finally:
+        await engine.dispose()
+
+
+async def _pages(db, limit, **filters):
+    pages = []
+    before = None
+    while True:
+        page = await logs.get_trade_logs(
+            limit=limit, symbol=filters.get("symbol"), before=before,
+            from_date=filters.get("from_date"), to_date=filters.get("to_date"), db=db
+        )
+        pages.append([log["id"] for log in page["logs"]])
+        before = page["next_cursor"]
+        if before is None:
+            return pages
+
+
+def test_pages_cover_every_row_once_newest_first():
+    pages = asyncio.run(_with_trades(lambda db: _pages(db, 4)))
+    assert [len(page) for page in pages] == [4] * 6 + [1]
+    assert sum(pages, []) == list(range(25, 0, -1))
+
+
+def test_exact_multiple_ends_with_an_empty_page():
+    pages = asyncio.run(_with_trades(lambda db: _pages(db, 5), count=10))
+    assert pages == [[10, 9, 8, 7, 6], [5, 4, 3, 2, 1], []]
+
+
+def test_cursor_combines_with_filters():
+    to_date = START + timedelta(seconds=6)
+
+    async def body(db):
+        return await _pages(db, 3, symbol="EURUSD", to_date=to_date)
+
+    pages = asyncio.run(_with_trades(body))
+    # Ids are 1-based, so EURUSD rows (odd i) have even ids; to_date keeps i < 18
+    assert sum(pages, []) == [18, 16, 14, 12, 10, 8, 6, 4, 2]
+
+
+def test_invalid_cursor_is_a_bad_request():
+    async def body(db):
+        return await logs.get_trade_logs(
+            limit=10, symbol=None, before="yesterday", from_date=None, to_date=None, db=db
+        )
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_with_trades(body))
+    assert error.value.status_code == 400
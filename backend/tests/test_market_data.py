@@ -0,0 +1,65 @@
+import numpy as np
+
+from app.services.market_data import ColumnSeries, RATE_COLUMNS
+from tests.fake_mt5 import random_rates
+
+
+def _series(path):
+    return ColumnSeries(path, RATE_COLUMNS, "time")
+
+
+def test_append_and_range(tmp_path):
+    rates = random_rates(100)
+    series = _series(tmp_path)
+    assert series.append(rates[:60]) == 60
+    assert series.append(rates[60:]) == 40
+    assert series.append(rates[:0]) == 0
+    assert len(series) == 100
+    assert (series.first(), series.last()) == (int(rates["time"][0]), int(rates["time"][-1]))
+
+    view = series.view()
+    assert isinstance(view["close"], np.memmap)
+    for name in RATE_COLUMNS:
+        np.testing.assert_array_equal(view[name], rates[name])
+
+    # Inclusive on both ends
+    selected = series.range(int(rates["time"][10]), int(rates["time"][19]))
+    np.testing.assert_array_equal(selected["close"], rates["close"][10:20])
+    assert len(series.range(end=int(rates["time"][0]) - 1)["time"]) == 0
+
+
+def test_reopen_trims_an_interrupted_append(tmp_path):
+    rates = random_rates(20)
+    _series(tmp_path).append(rates)
+    # A crash between column writes leaves the non-key columns longer
+    with open(tmp_path / "close.bin", "ab") as f:
+        f.write(np.zeros(3, dtype="<f8").tobytes())
+
+    series = _series(tmp_path)
+    assert len(series) == 20
+    np.testing.assert_array_equal(series.view()["close"], rates["close"])
+
+
+def test_prepend_writes_a_new_generation(tmp_path):
+    rates = random_rates(100)
+    series = _series(tmp_path)
+    series.append(rates[50:])
+    before = series.view()
+    old_close = np.array(before["close"])
+
+    assert series.prepend(rates[:50]) == 50
+    assert (tmp_path / "generation").read_text() == "1"
+    assert (tmp_path / "close.1.bin").exists()
+    np.testing.assert_array_equal(series.view()["time"], rates["time"])
+    np.testing.assert_array_equal(series.view()["close"], rates["close"])
+    # Views mapped before the prepend still read the old rows
+    np.testing.assert_array_equal(before["close"], old_close)
+
+    # Appends go to the current generation and it survives a reopen
+    more = random_rates(10, start=int(rates["time"][-1]) + 60)
+    series.append(more)
+    del before
+    reopened = _series(tmp_path)
+    assert len(reopened) == 110
+    np.testing.assert_array_equal(reopened.view()["close"][-10:], more["close"])
+    assert not (tmp_path / "close.bin").exists()
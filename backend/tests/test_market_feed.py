@@ -0,0 +1,74 @@
+import asyncio
+
+from app.services.market_feed import MarketDataPump
+from tests.fake_mt5 import FakeTerminal
+
+
+def _tick(symbol, time_msc):
+    return {"type": "tick", "symbol": symbol, "bid": time_msc / 1000, "time_msc": time_msc}
+
+
+def _batches(queue):
+    batches = []
+    while not queue.empty():
+        batches.append([(m["symbol"], m["time_msc"]) for m in queue.get_nowait()])
+    return batches
+
+
+def test_overflow_is_conflated_per_symbol_and_delivered_last():
+    pump = MarketDataPump(FakeTerminal(), 20, 2)
+    queue = pump.subscribe()
+    pump._publish([_tick("EURUSD", 1), _tick("GBPUSD", 2)])
+    pump._publish([_tick("USDJPY", 3)])
+    pump._publish([_tick("EURUSD", 4), _tick("GBPUSD", 5)])
+    pump._publish([_tick("EURUSD", 6)])
+    assert _batches(queue) == [
+        [("EURUSD", 1), ("GBPUSD", 2)],
+        [("USDJPY", 3)],
+        [("GBPUSD", 5), ("EURUSD", 6)],
+    ]
+    assert pump.stats["conflated_ticks"] == 1
+
+
+def test_single_slot_queue_keeps_newest_tick_of_every_symbol():
+    pump = MarketDataPump(FakeTerminal(), 20, 1)
+    queue = pump.subscribe()
+    for time_msc, symbol in enumerate(["EURUSD", "GBPUSD", "EURUSD", "USDJPY", "GBPUSD"]):
+        pump._publish([_tick(symbol, time_msc)])
+    assert _batches(queue) == [[("EURUSD", 0)], [("EURUSD", 2), ("USDJPY", 3), ("GBPUSD", 4)]]
+
+
+def test_pending_ticks_reach_a_waiting_consumer():
+    pump = MarketDataPump(FakeTerminal(), 20, 1)
+    queue = pump.subscribe()
+    pump._publish([_tick("EURUSD", 1)])
+    pump._publish([_tick("EURUSD", 2)])
+
+    async def consume():
+        return [await queue.get() for _ in range(2)]
+
+    first, second = asyncio.run(consume())
+    assert (first[0]["time_msc"], second[0]["time_msc"]) == (1, 2)
+
+
+def test_other_consumers_are_not_affected():
+    pump = MarketDataPump(FakeTerminal(), 20, 1)
+    slow = pump.subscribe()
+    fast = pump.subscribe()
+    pump._publish([_tick("EURUSD", 1)])
+    assert _batches(fast) == [[("EURUSD", 1)]]
+    pump._publish([_tick("GBPUSD", 2)])
+    pump._publish([_tick("USDJPY", 3)])
+    assert _batches(fast) == [[("GBPUSD", 2)], [("USDJPY", 3)]]
+    assert _batches(slow) == [[("EURUSD", 1)], [("GBPUSD", 2), ("USDJPY", 3)]]
+
+
+def test_every_tick_consumers_drop_whole_batches_and_count_them():
+    pump = MarketDataPump(FakeTerminal(), 20, 2)
+    queue = pump.subscribe(every_tick=True)
+    pump._publish_every_tick([_tick("EURUSD", 1), _tick("EURUSD", 2)])
+    pump._publish_every_tick([_tick("EURUSD", 3)])
+    pump._publish_every_tick([_tick("EURUSD", 4), _tick("EURUSD", 5)])
+    # Never conflated: later batches keep every tick
+    assert _batches(queue) == [[("EURUSD", 3)], [("EURUSD", 4), ("EURUSD", 5)]]
+    assert pump.stats["dropped_ticks"] == 2
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from app.services.mt5_cache import CallCache
+from app.services.mt5_connector import MT5Connector
+from app.services.mt5_executor import MT5Executor
+from tests.fake_mt5 import FakeTerminal
+
+
+class Submitter:
+    """Hands out futures the test resolves itself"""
+
+    def __init__(self):
+        self.futures = []
+
+    def __call__(self) -> Future:
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+def test_concurrent_calls_share_one_future():
+    cache = CallCache({"account_info": 60})
+    submit = Submitter()
+    first = cache.get_or_submit("account_info", (), {}, submit)
+    second = cache.get_or_submit("account_info", (), {}, submit)
+    assert first is second
+    assert len(submit.futures) == 1
+    assert cache.stats()["account_info"]["coalesced"] == 1
+
+
+def test_result_is_reused_until_invalidated():
+    cache = CallCache({"account_info": 60})
+    submit = Submitter()
+    cache.get_or_submit("account_info", (), {}, submit).set_result({"equity": 1})
+    assert cache.get_or_submit("account_info", (), {}, submit).result() == {"equity": 1}
+    assert len(submit.futures) == 1
+
+    cache.invalidate("account_info")
+    cache.get_or_submit("account_info", (), {}, submit)
+    assert len(submit.futures) == 2
+
+
+def test_arguments_are_part_of_the_key():
+    cache = CallCache({"symbol_info": 60})
+    submit = Submitter()
+    cache.get_or_submit("symbol_info", ("EURUSD",), {}, submit)
+    cache.get_or_submit("symbol_info", ("GBPUSD",), {}, submit)
+    assert len(submit.futures) == 2
+
+
+def test_expired_result_is_fetched_again():
+    cache = CallCache({"account_info": 0.0001})
+    submit = Submitter()
+    cache.get_or_submit("account_info", (), {}, submit).set_result({"equity": 1})
+    threading.Event().wait(0.01)
+    cache.get_or_submit("account_info", (), {}, submit)
+    assert len(submit.futures) == 2
+
+
+def test_failures_are_not_cached():
+    cache = CallCache({"account_info": 60})
+    submit = Submitter()
+    cache.get_or_submit("account_info", (), {}, submit).set_result(None)
+    cache.get_or_submit("account_info", (), {}, submit).set_exception(RuntimeError("terminal"))
+    cache.get_or_submit("account_info", (), {}, submit)
+    assert len(submit.futures) == 3
+
+
+def test_call_invalidated_in_flight_is_not_cached():
+    cache = CallCache({"positions_get": 60})
+    submit = Submitter()
+    stale = cache.get_or_submit("positions_get", (), {}, submit)
+    cache.invalidate("positions_get")
+    stale.set_result([{"ticket": 1}])
+    fresh = cache.get_or_submit("positions_get", (), {}, submit)
+    assert fresh is not stale
+    assert len(submit.futures) == 2
+
+
+def test_invalidate_without_names_drops_everything():
+    cache = CallCache({"account_info": 60, "positions_get": 60})
+    submit = Submitter()
+    cache.get_or_submit("account_info", (), {}, submit).set_result({})
+    cache.get_or_submit("positions_get", (), {}, submit).set_result([])
+    cache.invalidate()
+    assert all(stats["entries"] == 0 for stats in cache.stats().values())
+
+
+def test_connector_coalesces_concurrent_calls():
+    terminal = FakeTerminal()
+    connector = MT5Connector(mt5_module=terminal, executor=MT5Executor())
+    connector.cache = CallCache({"account_info": 60})
+    connector.connected = True
+    terminal.gate.clear()
+
+    async def main():
+        calls = [asyncio.create_task(connector.aio.account_info()) for _ in range(5)]
+        await asyncio.to_thread(terminal.entered.wait, 5)
+        terminal.gate.set()
+        return await asyncio.gather(*calls)
+
+    try:
+        results = asyncio.run(main())
+        assert terminal.calls == ["account_info"]
+        assert all(result == results[0] for result in results)
+
+        # Served from the cache until invalidated
+        connector.account_info()
+        assert len(terminal.calls) == 1
+        connector.invalidate_cache("account_info")
+        connector.account_info()
+        assert len(terminal.calls) == 2
+    finally:
+        terminal.gate.set()
+        connector.executor.stop()
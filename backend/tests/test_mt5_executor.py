@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.mt5_connector import MT5Connector
+from app.services.mt5_executor import (
+    MT5CallTimeout,
+    MT5Executor,
+    PRIORITY_HISTORY,
+    PRIORITY_MARKET_DATA,
+    PRIORITY_ORDER,
+    PRIORITY_QUERY
+)
+from tests.fake_mt5 import FakeTerminal
+
+
+@pytest.fixture
+def executor():
+    executor = MT5Executor()
+    yield executor
+    executor.stop()
+
+
+def _block(executor):
+    """Occupy the worker until the returned event is set"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    executor.submit(PRIORITY_ORDER, hold)
+    assert started.wait(5)
+    return release
+
+
+def test_calls_run_in_priority_order(executor):
+    release = _block(executor)
+    ran = []
+    futures = [
+        executor.submit(priority, ran.append, (name,))
+        for priority, name in [
+            (PRIORITY_HISTORY, "history"),
+            (PRIORITY_MARKET_DATA, "market data"),
+            (PRIORITY_ORDER, "order 1"),
+            (PRIORITY_QUERY, "query"),
+            (PRIORITY_ORDER, "order 2"),
+        ]
+    ]
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert ran == ["order 1", "order 2", "query", "market data", "history"]
+
+
+def test_timed_out_queued_call_is_dropped(executor):
+    release = _block(executor)
+    ran = []
+    future = executor.submit(PRIORITY_QUERY, ran.append, ("query",))
+    with pytest.raises(MT5CallTimeout):
+        executor.wait(future, PRIORITY_QUERY, timeout=0.05, label="query")
+    assert future.cancelled()
+    release.set()
+    executor.call(PRIORITY_QUERY, lambda: None)
+    assert ran == []
+
+
+def test_timed_out_queued_call_is_kept_without_cancel(executor):
+    release = _block(executor)
+    future = executor.submit(PRIORITY_QUERY, lambda: "shared")
+    with pytest.raises(MT5CallTimeout):
+        executor.wait(future, PRIORITY_QUERY, timeout=0.05, cancel=False)
+    release.set()
+    assert future.result(5) == "shared"
+
+
+def test_running_call_finishes_after_timeout(executor):
+    future = executor.submit(PRIORITY_ORDER, lambda: time.sleep(0.2) or "sent")
+    with pytest.raises(MT5CallTimeout):
+        executor.wait(future, PRIORITY_ORDER, timeout=0.05)
+    # Already running, so it cannot be withdrawn
+    assert not future.cancelled()
+    assert future.result(5) == "sent"
+
+
+def test_wait_async_times_out_and_cancels(executor):
+    release = _block(executor)
+    ran = []
+
+    async def main():
+        future = executor.submit(PRIORITY_QUERY, ran.append, ("query",))
+        with pytest.raises(MT5CallTimeout):
+            await executor.wait_async(future, PRIORITY_QUERY, timeout=0.05)
+        return future
+
+    future = asyncio.run(main())
+    assert future.cancelled()
+    release.set()
+    executor.call(PRIORITY_QUERY, lambda: None)
+    assert ran == []
+
+
+def test_default_timeout_comes_from_priority():
+    executor = MT5Executor({PRIORITY_QUERY: 0.05})
+    try:
+        release = _block(executor)
+        future = executor.submit(PRIORITY_QUERY, lambda: None)
+        with pytest.raises(MT5CallTimeout, match="slow timed out"):
+            executor.wait(future, PRIORITY_QUERY, label="slow")
+        release.set()
+    finally:
+        executor.stop()
+
+
+def test_futures_carry_timestamps(executor):
+    future = executor.submit(PRIORITY_QUERY, lambda: 1)
+    assert future.result(5) == 1
+    assert future.submitted_at <= future.started_at <= future.finished_at
+
+
+def test_call_exception_propagates(executor):
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        executor.call(PRIORITY_QUERY, fail)
+
+
+def test_stop_cancels_queued_calls():
+    executor = MT5Executor()
+    release = _block(executor)
+    future = executor.submit(PRIORITY_HISTORY, lambda: None)
+    threading.Timer(0.1, release.set).start()
+    # The stop marker outranks every queued call
+    executor.stop()
+    assert future.cancelled()
+
+
+def test_connector_runs_calls_on_the_executor():
+    terminal = FakeTerminal()
+    connector = MT5Connector(mt5_module=terminal, executor=MT5Executor())
+    connector.connected = True
+    try:
+        info = connector.account_info()
+        assert info["equity"] == terminal.equity
+        assert asyncio.run(connector.aio.account_info())["login"] == 1
+    finally:
+        connector.executor.stop()
+
+
+def test_connector_timeouts():
+    terminal = FakeTerminal()
+    connector = MT5Connector(mt5_module=terminal, executor=MT5Executor({PRIORITY_QUERY: 0.05}))
+    connector.connected = True
+    terminal.gate.clear()
+    try:
+        # Blocking methods log and return None, coroutines raise
+        assert connector.account_info() is None
+        with pytest.raises(MT5CallTimeout):
+            asyncio.run(connector.aio.account_info())
+    finally:
+        terminal.gate.set()
+        connector.executor.stop()
@@ -0,0 +1,151 @@
+import asyncio
+
+import MetaTrader5 as mt5
+import pytest
+
+from app.services import orders
+from app.services.orders import OrderService, validate_order
+
+INFO = {
+    "trade_mode": mt5.SYMBOL_TRADE_MODE_FULL,
+    "volume_min": 0.01,
+    "volume_max": 100.0,
+    "volume_step": 0.01,
+    "trade_stops_level": 10,
+    "point": 0.0001,
+    "bid": 1.1000,
+    "ask": 1.1002,
+}
+
+
+def _order(**fields):
+    request = {"action": mt5.TRADE_ACTION_DEAL, "symbol": "EURUSD", "type": mt5.ORDER_TYPE_BUY, "volume": 0.1}
+    request.update(fields)
+    return request
+
+
+def test_valid_market_order_passes():
+    assert validate_order(_order(sl=1.0950, tp=1.1100), INFO) == []
+    assert validate_order(_order(type=mt5.ORDER_TYPE_SELL, sl=1.1050, tp=1.0900), INFO) == []
+
+
+def test_unknown_symbol_and_type():
+    assert validate_order(_order(), None) == ["Unknown symbol EURUSD"]
+    assert validate_order(_order(type=99), INFO) == ["Unsupported order type 99"]
+    # Modifications and removals are not checked
+    assert validate_order({"action": mt5.TRADE_ACTION_SLTP, "symbol": "EURUSD"}, INFO) == []
+
+
+@pytest.mark.parametrize(
+    "volume, message",
+    [
+        (0, "Volume must be positive"),
+        (None, "Volume must be positive"),
+        (0.001, "below the minimum"),
+        (150.0, "above the maximum"),
+        (0.015, "not a multiple of the step"),
+    ],
+)
+def test_volume_limits(volume, message):
+    errors = validate_order(_order(volume=volume), INFO)
+    assert message in errors[0]
+
+
+def test_volume_on_step_despite_float_error():
+    assert validate_order(_order(volume=0.1 + 0.2), INFO) == []
+
+
+@pytest.mark.parametrize(
+    "trade_mode, order_type, closing, allowed",
+    [
+        (mt5.SYMBOL_TRADE_MODE_DISABLED, mt5.ORDER_TYPE_BUY, True, False),
+        (mt5.SYMBOL_TRADE_MODE_CLOSEONLY, mt5.ORDER_TYPE_BUY, False, False),
+        (mt5.SYMBOL_TRADE_MODE_CLOSEONLY, mt5.ORDER_TYPE_SELL, True, True),
+        (mt5.SYMBOL_TRADE_MODE_LONGONLY, mt5.ORDER_TYPE_SELL, False, False),
+        (mt5.SYMBOL_TRADE_MODE_LONGONLY, mt5.ORDER_TYPE_SELL, True, True),
+        (mt5.SYMBOL_TRADE_MODE_SHORTONLY, mt5.ORDER_TYPE_BUY, False, False),
+        (mt5.SYMBOL_TRADE_MODE_SHORTONLY, mt5.ORDER_TYPE_SELL, False, True),
+    ],
+)
+def test_trade_modes(trade_mode, order_type, closing, allowed):
+    request = _order(type=order_type, position=123 if closing else None)
+    errors = validate_order(request, {**INFO, "trade_mode": trade_mode})
+    assert (errors == []) == allowed
+
+
+def test_stops_level_is_measured_from_the_entry_side():
+    # 10 points = 0.0010 from the ask for a buy
+    assert validate_order(_order(sl=1.0990), INFO) == []
+    errors = validate_order(_order(sl=1.0995, tp=1.1005), INFO)
+    assert len(errors) == 2
+    assert errors[0].startswith("Stop loss 1.0995 must be at least 0.001 below")
+    assert errors[1].startswith("Take profit 1.1005 must be at least 0.001 above")
+
+
+def test_latest_tick_overrides_the_specification_prices():
+    tick = {"bid": 1.2000, "ask": 1.2002}
+    assert validate_order(_order(sl=1.0950), INFO, tick) == []
+    assert "Stop loss" in validate_order(_order(sl=1.1995), INFO, tick)[0]
+
+
+@pytest.mark.parametrize(
+    "order_type, price, allowed",
+    [
+        (mt5.ORDER_TYPE_BUY_LIMIT, 1.0900, True),
+        (mt5.ORDER_TYPE_BUY_LIMIT, 1.1100, False),
+        (mt5.ORDER_TYPE_BUY_STOP, 1.1100, True),
+        (mt5.ORDER_TYPE_BUY_STOP, 1.1005, False),
+        (mt5.ORDER_TYPE_SELL_LIMIT, 1.1100, True),
+        (mt5.ORDER_TYPE_SELL_STOP, 1.0900, True),
+        (mt5.ORDER_TYPE_SELL_STOP, 1.1100, False),
+    ],
+)
+def test_pending_price_side(order_type, price, allowed):
+    request = _order(action=mt5.TRADE_ACTION_PENDING, type=order_type, price=price)
+    assert (validate_order(request, INFO) == []) == allowed
+
+
+def test_pending_order_needs_a_price():
+    request = _order(action=mt5.TRADE_ACTION_PENDING, type=mt5.ORDER_TYPE_BUY_LIMIT)
+    assert validate_order(request, INFO) == ["Pending orders need a price"]
+
+
+class SpecConnector:
+    """Serves symbol_info slowly and records how many calls overlap"""
+
+    def __init__(self):
+        self.aio = self
+        self.active = 0
+        self.overlap = 0
+        self.fetched = []
+
+    async def symbol_info(self, symbol):
+        self.fetched.append(symbol)
+        self.active += 1
+        self.overlap = max(self.overlap, self.active)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        return INFO if symbol != "XXXYYY" else None
+
+
+class NoTicks:
+    def last_tick(self, symbol):
+        return None
+
+
+def test_atomic_basket_fetches_specs_at_once_and_counts_unsent_orders(monkeypatch):
+    logged = []
+    monkeypatch.setattr(orders, "log_order", lambda request, result, status=None, comment=None: logged.append(status))
+    connector = SpecConnector()
+    service = OrderService(connector, NoTicks(), 60.0)
+    basket = [_order(symbol="EURUSD"), _order(symbol="GBPUSD"), _order(symbol="EURUSD"), _order(symbol="XXXYYY")]
+
+    outcomes = asyncio.run(service.submit(basket, atomic=True))
+    assert sorted(connector.fetched) == ["EURUSD", "GBPUSD", "XXXYYY"]
+    assert connector.overlap == 3
+    assert [outcome["status"] for outcome in outcomes] == [orders.STATUS_INVALID] * 4
+    assert outcomes[3]["errors"] == ["Unknown symbol XXXYYY"]
+    # Only the failing order is logged; all four are counted as invalid
+    assert logged == [orders.STATUS_INVALID]
+    assert service.counters["orders"] == 4
+    assert service.counters[orders.STATUS_INVALID] == 4
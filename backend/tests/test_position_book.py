@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+
+from app.services.position_book import PositionBook, POSITION_TYPE_BUY, POSITION_TYPE_SELL
+
+SPECS = {
+    "EURUSD": {"trade_contract_size": 100000.0, "trade_tick_value": 1.0, "trade_tick_size": 0.00001},
+    "USDJPY": {"trade_contract_size": 100000.0, "trade_tick_value": 0.9, "trade_tick_size": 0.001},
+}
+
+
+class FakeConnector:
+    """Terminal positions and balance; ``aio`` is itself, like MT5Connector.aio"""
+
+    def __init__(self, positions):
+        self.positions = positions
+        self.balance = 10000.0
+        self.aio = self
+
+    async def positions_get(self):
+        return [dict(position) for position in self.positions]
+
+    async def account_info(self):
+        return {"balance": self.balance}
+
+    async def symbol_info(self, symbol):
+        return SPECS.get(symbol)
+
+
+class FakeFeed:
+    def __init__(self):
+        self.symbols = set()
+        self.ticks = {}
+
+    def add_symbols(self, symbols):
+        self.symbols |= set(symbols)
+
+    def remove_symbols(self, symbols):
+        self.symbols -= set(symbols)
+
+    def last_tick(self, symbol):
+        return self.ticks.get(symbol)
+
+
+def _position(ticket, symbol, side, volume, price_open, price_current, profit):
+    return {
+        "ticket": ticket,
+        "symbol": symbol,
+        "type": side,
+        "volume": volume,
+        "price_open": price_open,
+        "price_current": price_current,
+        "profit": profit,
+        "swap": 0.0,
+    }
+
+
+POSITIONS = [
+    # 1 lot long, 10 pips up = 100 USD
+    _position(1, "EURUSD", POSITION_TYPE_BUY, 1.0, 1.1000, 1.1010, 100.0),
+    # 0.5 lot short, still at the open, so the factor comes from the tick value
+    _position(2, "EURUSD", POSITION_TYPE_SELL, 0.5, 1.1012, 1.1012, 0.0),
+    _position(3, "USDJPY", POSITION_TYPE_BUY, 2.0, 150.00, 150.50, 600.0),
+]
+
+
+def _book(positions=POSITIONS):
+    connector = FakeConnector(list(positions))
+    feed = FakeFeed()
+    return PositionBook(connector, feed, 60.0, 4), connector, feed
+
+
+def _tick(symbol, bid, ask):
+    return {"type": "tick", "symbol": symbol, "bid": bid, "ask": ask}
+
+
+def test_reconcile_loads_positions_and_publishes_a_snapshot():
+    book, _, feed = _book()
+    queue = book.subscribe()
+    assert asyncio.run(book.reconcile())
+    assert book.ready
+    assert feed.symbols == {"EURUSD", "USDJPY"}
+    assert book.floating == pytest.approx(700.0)
+    assert book.summary()["equity"] == pytest.approx(10700.0)
+
+    batch = queue.get_nowait()
+    assert batch[0]["type"] == "positions" and len(batch[0]["positions"]) == 3
+    assert batch[1]["type"] == "account_pnl"
+
+
+def test_ticks_mark_longs_at_the_bid_and_shorts_at_the_ask():
+    book, _, _ = _book()
+    asyncio.run(book.reconcile())
+    messages = book.on_ticks([_tick("EURUSD", 1.1020, 1.1022)])
+
+    long, short = sorted(book.positions("EURUSD"), key=lambda p: p["ticket"])
+    assert long["profit"] == pytest.approx(200.0)
+    # 10 pips against a 0.5 lot short at 10 USD per pip per lot
+    assert short["price_current"] == 1.1022
+    assert short["profit"] == pytest.approx(-50.0)
+
+    symbol_message, account_message = messages
+    assert symbol_message["type"] == "position_pnl"
+    assert symbol_message["profit"] == pytest.approx(150.0)
+    assert symbol_message["volume"] == pytest.approx(0.5)
+    assert account_message["floating"] == pytest.approx(750.0)
+    # USDJPY is untouched by a EURUSD tick
+    assert book.exposure("USDJPY")["profit"] == pytest.approx(600.0)
+
+
+def test_unchanged_and_unknown_ticks_publish_nothing():
+    book, _, _ = _book()
+    asyncio.run(book.reconcile())
+    assert book.on_ticks([_tick("GBPUSD", 1.25, 1.2502)]) == []
+    assert book.on_ticks([_tick("EURUSD", 1.1010, 1.1012)]) == []
+
+
+def test_reconcile_replaces_closed_positions_and_keeps_newer_ticks():
+    book, connector, feed = _book()
+    queue = book.subscribe()
+    asyncio.run(book.reconcile())
+    queue.get_nowait()
+
+    connector.positions = POSITIONS[2:]
+    feed.ticks["USDJPY"] = _tick("USDJPY", 150.60, 150.62)
+    asyncio.run(book.reconcile())
+    assert feed.symbols == {"USDJPY"}
+    assert [p["ticket"] for p in book.positions()] == [3]
+    # The terminal's price is older than the feed's last tick
+    assert book.positions()[0]["profit"] == pytest.approx(720.0)
+    assert book.floating == pytest.approx(720.0)
+    assert queue.get_nowait()[0]["type"] == "positions"
+    assert book.stats["closed"] == 2
+
+
+def test_slow_consumer_keeps_snapshots_and_every_ticket_update():
+    book, connector, _ = _book()
+    queue = book.subscribe()
+    asyncio.run(book.reconcile())
+    # Fill the queue (size 4) with snapshots and price updates
+    for bid in (1.1011, 1.1012, 1.1013):
+        book._publish(book.on_ticks([_tick("EURUSD", bid, 1.1022)]))
+    # Only the long moves on the bid; then only the short on the ask
+    book._publish(book.on_ticks([_tick("EURUSD", 1.1014, 1.1022)]))
+    book._publish(book.on_ticks([_tick("EURUSD", 1.1014, 1.1025)]))
+    book._publish(book.on_ticks([_tick("USDJPY", 150.7, 150.72)]))
+
+    batches = [queue.get_nowait() for _ in range(5)]
+    assert queue.empty()
+    assert batches[0][0]["type"] == "positions"
+    pending = batches[-1]
+    assert [(m["type"], m.get("symbol")) for m in pending] == [
+        ("position_pnl", "EURUSD"), ("position_pnl", "USDJPY"), ("account_pnl", None)
+    ]
+    updates = {update["ticket"]: update["price_current"] for update in pending[0]["updates"]}
+    assert updates == {1: 1.1014, 2: 1.1025}
+    assert pending[2]["floating"] == pytest.approx(book.floating)
+
+    # A snapshot supersedes pending updates but is never dropped
+    for bid in (1.1020, 1.1021, 1.1022, 1.1023, 1.1024):
+        book._publish(book.on_ticks([_tick("EURUSD", bid, 1.1030)]))
+    connector.positions = POSITIONS[:1]
+    asyncio.run(book.reconcile())
+    book._publish(book.on_ticks([_tick("EURUSD", 1.1030, 1.1032)]))
+    batches = [queue.get_nowait() for _ in range(5)]
+    assert [m["type"] for m in batches[-1]] == ["positions", "position_pnl", "account_pnl"]
+    assert [update["ticket"] for update in batches[-1][1]["updates"]] == [1]
+    assert book.stats["conflated"] > 0
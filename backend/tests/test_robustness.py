@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.services import robustness
+from app.services.robustness import DAY_SECONDS, walk_forward_windows
+
+START = 1_600_000_000
+# Hourly bars over 10 days
+TIMES = START + 3600 * np.arange(240)
+
+
+def _days(windows):
+    """Windows as (train start, train end, test end) day offsets"""
+    return [
+        (
+            (TIMES[w["train"][0]] - START) // DAY_SECONDS,
+            (TIMES[w["test"][0]] - START) // DAY_SECONDS,
+            (TIMES[w["test"][1] - 1] - START) // DAY_SECONDS + 1,
+        )
+        for w in windows
+    ]
+
+
+def test_rolling_windows_tile_the_test_periods():
+    windows = walk_forward_windows(TIMES, 4, 2)
+    assert _days(windows) == [(0, 4, 6), (2, 6, 8), (4, 8, 10)]
+    for window in windows:
+        assert window["train"][1] == window["test"][0]
+        assert window["train"][1] - window["train"][0] == 4 * 24
+
+
+def test_anchored_windows_grow_from_the_first_bar():
+    windows = walk_forward_windows(TIMES, 4, 2, anchored=True)
+    assert _days(windows) == [(0, 4, 6), (0, 6, 8), (0, 8, 10)]
+
+
+def test_step_can_overlap_test_windows():
+    windows = walk_forward_windows(TIMES, 4, 2, step_days=1)
+    assert [train_start for train_start, _, _ in _days(windows)] == [0, 1, 2, 3, 4, 5]
+    # The last test window is cut short by the end of the series
+    assert _days(windows)[-1] == (5, 9, 10)
+
+
+def test_windows_without_enough_bars_are_skipped():
+    # Days 4 to 6 have no bars
+    times = TIMES[(TIMES < START + 4 * DAY_SECONDS) | (TIMES >= START + 6 * DAY_SECONDS)]
+    windows = walk_forward_windows(times, 4, 2)
+    for window in windows:
+        assert window["test"][1] - window["test"][0] >= 2
+    assert len(windows) == 2
+
+
+def test_short_or_empty_series_have_no_windows():
+    assert walk_forward_windows(TIMES, 20, 2) == []
+    assert walk_forward_windows(TIMES[:0], 4, 2) == []
+
+
+@pytest.mark.parametrize("train, test, step", [(0, 2, None), (4, 0, None), (4, 2, -1)])
+def test_window_lengths_must_be_positive(train, test, step):
+    with pytest.raises(ValueError):
+        walk_forward_windows(TIMES, train, test, step)
+
+
+def test_shuffled_paths_keep_the_total_return():
+    profits = np.array([50.0, -30.0, 20.0, -10.0, 40.0])
+    total_return, max_drawdown = robustness._simulate_paths(
+        profits, 1000.0, "shuffle", 200, np.random.SeedSequence(1)
+    )
+    np.testing.assert_allclose(total_return, 0.07)
+    # Worst case is both losses in a row right after the start
+    assert max_drawdown.max() <= 40 / 1000 + 1e-12
+    assert max_drawdown.min() >= 0
@@ -0,0 +1,87 @@
+import pytest
+
+from app.services import sweep
+
+RANGES = {
+    "fast_period": {"min": 5, "max": 20, "step": 5, "integer": True},
+    "threshold": {"min": 0.1, "max": 0.3, "step": 0.1},
+    "mode": {"values": ["a", "b"]},
+}
+
+
+def test_grid_is_the_full_product():
+    sets = sweep.expand_parameters(RANGES)
+    assert len(sets) == 4 * 3 * 2
+    assert sets[0] == {"fast_period": 5, "threshold": pytest.approx(0.1), "mode": "a"}
+    assert sorted({s["fast_period"] for s in sets}) == [5, 10, 15, 20]
+    assert all(isinstance(s["fast_period"], int) for s in sets)
+    # The float range includes its maximum despite rounding
+    assert max(s["threshold"] for s in sets) == pytest.approx(0.3)
+
+
+def test_no_ranges_is_one_default_set():
+    assert sweep.expand_parameters({}) == [{}]
+    assert sweep.count_parameters({}) == 1
+
+
+@pytest.mark.parametrize("method", ["random", "lhs"])
+def test_sampling_stays_in_range_and_is_seeded(method):
+    sets = sweep.expand_parameters(RANGES, method, samples=50, seed=7)
+    assert len(sets) == 50
+    for s in sets:
+        assert 5 <= s["fast_period"] <= 20 and isinstance(s["fast_period"], int)
+        assert 0.1 <= s["threshold"] < 0.3
+        assert s["mode"] in ("a", "b")
+    assert sets == sweep.expand_parameters(RANGES, method, samples=50, seed=7)
+
+
+def test_latin_hypercube_covers_every_stratum():
+    samples = 10
+    sets = sweep.expand_parameters({"x": {"min": 0.0, "max": 1.0}}, "lhs", samples=samples, seed=3)
+    assert sorted(int(s["x"] * samples) for s in sets) == list(range(samples))
+
+
+@pytest.mark.parametrize(
+    "ranges",
+    [
+        RANGES,
+        {"x": {"min": 0.0, "max": 1.0, "step": 0.1}},
+        {"x": {"min": 1, "max": 100, "step": 7, "integer": True}},
+        {"x": {"min": 5, "max": 1}},
+    ],
+)
+def test_count_matches_grid_expansion(ranges):
+    assert sweep.count_parameters(ranges) == len(sweep.expand_parameters(ranges))
+
+
+def test_count_does_not_build_huge_grids():
+    ranges = {name: {"min": 0, "max": 999} for name in "abcd"}
+    assert sweep.count_parameters(ranges) == 1000 ** 4
+    assert sweep.count_parameters(ranges, "random", samples=25) == 25
+
+
+@pytest.mark.parametrize(
+    "ranges, method, samples",
+    [
+        ({"x": {"min": 0, "max": 1, "step": 0}}, "grid", 100),
+        ({"x": {"min": 0, "max": float("inf")}}, "grid", 100),
+        ({"x": {"min": 0, "max": 1}}, "annealing", 100),
+        ({"x": {"min": 0, "max": 1}}, "random", 0),
+        ({"x": {"values": []}}, "lhs", 10),
+    ],
+)
+def test_count_rejects_invalid_ranges(ranges, method, samples):
+    with pytest.raises(ValueError):
+        sweep.count_parameters(ranges, method, samples)
+
+
+def test_rank_results_orders_by_metric_with_failures_last():
+    results = [
+        {"id": 1, "total_return": 5.0, "max_drawdown": 20.0},
+        {"id": 2, "error": "ValueError: bad"},
+        {"id": 3, "total_return": 12.0, "max_drawdown": 35.0},
+        {"id": 4, "total_return": -3.0, "max_drawdown": 2.0},
+    ]
+    assert [r["id"] for r in sweep.rank_results(results, "total_return")] == [3, 1, 4, 2]
+    # Lower drawdown is better
+    assert [r["id"] for r in sweep.rank_results(results, "max_drawdown")] == [4, 1, 3, 2]
@@ -0,0 +1,82 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from app.services.mt5_connector import MT5Connector
+from app.services.mt5_executor import MT5Executor
+from app.services.tick_buffer import TICK_BUFFER_COLUMNS, TickBuffers
+from tests.fake_mt5 import FakeTerminal
+
+SYMBOL = "EURUSD"
+
+
+def _ticks(times_msc, start_bid=1.1):
+    ticks = np.zeros(len(times_msc), dtype=list(TICK_BUFFER_COLUMNS.items()))
+    ticks["time_msc"] = times_msc
+    ticks["bid"] = start_bid + np.arange(len(times_msc)) * 1e-5
+    ticks["ask"] = ticks["bid"] + 1e-5
+    return ticks
+
+
+def _latest(ticks):
+    return {SYMBOL: {name: ticks[name][-1].item() for name in TICK_BUFFER_COLUMNS}}
+
+
+@pytest.fixture
+def buffers():
+    buffers = TickBuffers(64, f"test_{uuid.uuid4().hex[:8]}_", 5.0, 1000)
+    buffers.sync([SYMBOL])
+    yield buffers
+    buffers.close_all()
+
+
+@pytest.fixture
+def connector():
+    terminal = FakeTerminal()
+    # Distinct from the module constant, so the call must read it from the terminal
+    terminal.COPY_TICKS_ALL = 7
+    connector = MT5Connector(mt5_module=terminal, executor=MT5Executor())
+    connector.connected = True
+    yield connector
+    connector.executor.stop()
+
+
+def test_ticks_since_keeps_the_held_millisecond(connector):
+    connector.mt5.ticks = _ticks([1_000_100, 1_000_500, 1_000_500, 1_000_900])
+    fetched = connector.ticks_since({SYMBOL: 1_000_500}, 100)[SYMBOL]
+    assert fetched["time_msc"].tolist() == [1_000_500, 1_000_500, 1_000_900]
+    assert connector.mt5.calls == [("copy_ticks_from", SYMBOL, 7)]
+
+
+def test_ticks_since_rejects_incomplete_fetches(connector):
+    connector.mt5.ticks = _ticks(np.arange(1_000_000, 1_000_010))
+    assert connector.ticks_since({SYMBOL: 1_000_000}, 5) == {SYMBOL: None}
+
+
+def test_store_skips_held_ticks_of_the_newest_millisecond(buffers, connector):
+    history = _ticks([1_000_100, 1_000_500, 1_000_500, 1_000_500, 1_000_900])
+    ring_first = history[:3]
+    buffers.store(_latest(ring_first[:1]), {})
+    buffers.store(_latest(ring_first), {SYMBOL: ring_first[1:]})
+    assert buffers.tail(SYMBOL, 3)["bid"].tolist() == ring_first["bid"].tolist()
+
+    # A third tick arrived in 1_000_500 after the ring's newest, then a newer one
+    connector.mt5.ticks = history
+    pending = buffers.pending(_latest(history))
+    assert pending == {SYMBOL: 1_000_500}
+    fetched = connector.ticks_since(pending, buffers.fetch_limit)
+    stored = buffers.store(_latest(history), fetched)
+    assert stored[SYMBOL]["bid"].tolist() == history["bid"][3:].tolist()
+    ring = buffers.tail(SYMBOL, 5)
+    assert ring["time_msc"].tolist() == history["time_msc"].tolist()
+    assert ring["bid"].tolist() == history["bid"].tolist()
+
+
+def test_failed_fetch_restarts_from_the_current_tick(buffers):
+    ticks = _ticks([1_000_100, 1_000_200])
+    buffers.store(_latest(ticks[:1]), {})
+    buffers.store(_latest(ticks), {SYMBOL: None})
+    assert buffers.stats["resets"] == 1
+    assert buffers.tail(SYMBOL, 2) is None
+    assert buffers.tail(SYMBOL, 1)["time_msc"].tolist() == [1_000_200]
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from app.services import tick_engine
+from app.services.tick_engine import TickReplay
+
+SPREAD = 0.0002
+
+
+def _ticks(bids, step_ms=100, start_msc=1_600_000_000_000):
+    bids = np.asarray(bids, dtype=np.float64)
+    return {
+        "time_msc": start_msc + step_ms * np.arange(len(bids), dtype=np.int64),
+        "bid": bids,
+        "ask": bids + SPREAD,
+        "last": bids + SPREAD / 2,
+    }
+
+
+def test_market_order_crosses_the_spread_with_slippage():
+    replay = TickReplay(_ticks([1.1000, 1.1010]), {"slippage": 0.0001})
+    buy = replay.market(1, 1, 1.0)
+    sell = replay.market(-1, 1, 1.0)
+    assert buy.price == pytest.approx(1.1010 + SPREAD + 0.0001)
+    assert sell.price == pytest.approx(1.1010 - 0.0001)
+    assert replay.counts["orders"] == 2
+
+
+def test_stop_loss_fills_at_the_first_tick_through_the_stop():
+    ticks = _ticks([1.1000, 1.0995, 1.0985, 1.0970, 1.0960])
+    replay = TickReplay(ticks, {"stop_loss": 0.0020})
+    replay.run(ticks["time_msc"][:1], np.array([1]), 1.0)
+    trade, = replay.trades
+    assert trade["entry_price"] == pytest.approx(1.1000 + SPREAD)
+    # The stop is 1.0982; the first bid at or below it is 1.0970, a gap through the stop
+    assert trade["exit_reason"] == tick_engine.EXIT_STOP_LOSS
+    assert trade["exit_price"] == pytest.approx(1.0970)
+    assert trade["exit_msc"] == ticks["time_msc"][3]
+    assert replay.counts[tick_engine.EXIT_STOP_LOSS] == 1
+
+
+def test_take_profit_fills_at_its_limit_price():
+    ticks = _ticks([1.1000, 1.1005, 1.1030, 1.1000])
+    replay = TickReplay(ticks, {"take_profit": 0.0010})
+    replay.run(ticks["time_msc"][:1], np.array([1]), 1.0)
+    trade, = replay.trades
+    assert trade["exit_reason"] == tick_engine.EXIT_TAKE_PROFIT
+    assert trade["exit_price"] == pytest.approx(1.1000 + SPREAD + 0.0010)
+    assert trade["exit_msc"] == ticks["time_msc"][2]
+
+
+def test_open_position_is_closed_at_the_end():
+    ticks = _ticks([1.1000, 1.1010, 1.1020])
+    replay = TickReplay(ticks, {})
+    replay.run(ticks["time_msc"][:1], np.array([-1]), 2.0)
+    trade, = replay.trades
+    assert trade["exit_reason"] == tick_engine.EXIT_END
+    assert trade["profit"] == pytest.approx(-2.0 * (1.1020 + SPREAD - 1.1000))
+
+
+def test_limit_entry_fills_when_touched_before_expiry():
+    ticks = _ticks([1.1000, 1.0998, 1.0990, 1.1000])
+    replay = TickReplay(ticks, {"entry": "limit", "limit_offset": 0.0008})
+    fill = replay.limit(1, 0, len(ticks["bid"]), 1.0)
+    # Limit at the ask minus the offset; the ask touches it on tick 2
+    assert fill.price == pytest.approx(1.1000 + SPREAD - 0.0008)
+    assert fill.index == 2 and not fill.partial
+
+    assert replay.limit(1, 0, 2, 1.0) is None
+    assert replay.counts["unfilled_orders"] == 1
+
+
+def test_limited_liquidity_splits_market_orders_over_ticks():
+    ticks = _ticks([1.1000, 1.1010, 1.1020, 1.1030])
+    replay = TickReplay(ticks, {"tick_liquidity": 1.0})
+    fill = replay.market(1, 0, 2.5)
+    # 1 + 1 + 0.5 filled on ticks 0..2
+    expected = (1.1000 + 1.1010 + 0.5 * 1.1020) / 2.5 + SPREAD
+    assert fill.price == pytest.approx(expected)
+    assert (fill.quantity, fill.index, fill.partial) == (2.5, 2, True)
+    assert replay.counts["partial_fills"] == 1
+
+
+def test_limited_liquidity_cancels_the_unfilled_rest_of_a_limit_order():
+    ticks = _ticks([1.1000, 1.0990, 1.1010, 1.0990, 1.1010])
+    replay = TickReplay(ticks, {"tick_liquidity": 1.0, "limit_offset": 0.0005})
+    fill = replay.limit(1, 0, 4, 3.0)
+    # Two touching ticks before expiry, one unit each
+    assert (fill.quantity, fill.index, fill.partial) == (2.0, 3, True)
+
+
+def test_bars_do_not_depend_on_the_chunk_size():
+    rng = np.random.default_rng(5)
+    ticks = _ticks(1.1 + np.cumsum(rng.normal(0, 1e-4, 5000)), step_ms=37)
+    whole = tick_engine.build_bars(ticks, 60_000, chunk_size=10_000)
+    chunked = tick_engine.build_bars(ticks, 60_000, chunk_size=333)
+    for name in whole:
+        np.testing.assert_array_equal(whole[name], chunked[name])
+    assert int(whole["tick_volume"].sum()) == 5000